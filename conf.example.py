@@ -9,3 +9,170 @@ DEBUG_MODE = True  # default debug behavior
 # connections time out and the (patchright) chromium does NOT use the system proxy.
 # Point this at your local proxy port, e.g. "http://127.0.0.1:7890". None = no proxy.
 YT_PROXY = None
+# Publish rate limits (token buckets shared across backend, CLI and batch workers).
+# Each entry is (capacity, interval_seconds): `capacity` jobs may start back-to-back,
+# then one more every `interval_seconds`. Set an entry to None to disable that bucket.
+# Platforms not listed use 10 jobs / 6s per platform and 2 jobs / 300s per account.
+RATE_LIMITS = {
+    # "douyin": {"platform": (10, 6), "account": (2, 300)},
+    # "xiaohongshu": {"platform": (5, 12), "account": (1, 600)},
+}
+# Per-platform retry budgets: at most `max_retries` retries per rolling `window_seconds`
+# across all jobs in one process, so a broken platform fails fast instead of looping.
+# Platforms not listed get (300, 60). Set an entry to None to disable the budget.
+RETRY_BUDGETS = {
+    # "douyin": (120, 60),
+}
+# Publish circuit breaker: after `failure_threshold` consecutive failures with the same
+# platform/phase/error signature, new jobs for that platform fail fast ("fail") or wait
+# ("park") until `cooldown_seconds` pass, then a single probe job decides whether to close.
+CIRCUIT_BREAKER = {
+    # "failure_threshold": 3,
+    # "cooldown_seconds": 900,
+    # "on_open": "fail",
+    # "park_timeout_seconds": 3600,
+}
+# Once the video file has finished uploading, a failure while filling metadata, setting
+# the cover only retries the remaining steps in the same page, for at most this many
+# seconds, instead of re-uploading the whole video. The publish click keeps its own retry
+# budget and is not retried again on top of it.
+PHASE_RESUME_DEADLINE = 900
+# Long-lived remote Chromium instances reachable over CDP (e.g. containers started with
+# --remote-debugging-port=9222). When set, uploads and cookie checks connect to the least
+# busy one instead of launching a local browser. Each entry is a CDP URL or a dict with
+# cdp_url, capacity (concurrent jobs), staging_dir (a local dir that is also mounted on the
+# browser host) and remote_staging_dir (the same dir as seen by the browser).
+REMOTE_BROWSERS = [
+    # "http://127.0.0.1:9222",
+    # {"cdp_url": "http://10.0.0.8:9222", "capacity": 6,
+    #  "staging_dir": "/srv/sau-stage", "remote_staging_dir": "/stage"},
+]
+# Opt-in persistent browser profile per account for douyin, tencent, kuaishou and
+# xiaohongshu uploads: the creator center's scripts, fonts and images stay in the disk
+# cache between uploads. Keys: enabled, platforms, root (profile directory root),
+# max_cache_mb (Chromium disk cache size), max_profile_mb (old cache files are evicted
+# above this), compact_interval_hours, lock_stale_seconds. Ignored with REMOTE_BROWSERS.
+PERSISTENT_PROFILES = {
+    # "enabled": True,
+    # "platforms": ["douyin", "tencent", "kuaishou", "xiaohongshu"],
+    # "max_cache_mb": 512,
+    # "max_profile_mb": 1024,
+    # "compact_interval_hours": 24,
+}
+# Block requests the upload automation does not need (analytics beacons, images, video
+# previews, fonts) on creator pages, per platform. True uses the built-in rule; a dict
+# replaces block_resource_types, block_url_patterns (regexes) or allow_url_patterns.
+# Upload, sign, publish and login requests are never blocked. Turn a platform off again
+# if its page breaks without some of these resources.
+REQUEST_FILTER = {
+    # "douyin": True,
+    # "kuaishou": True,
+    # "xiaohongshu": {"block_resource_types": ["media", "font"]},
+}
+# Watchdog for hung uploads: longest time (seconds) a job may stay in one phase before it
+# is cancelled, its browser force-closed and leftover browser processes killed. Phases are
+# start, rate_limit, open_page, upload_file, fill_meta, set_cover, publish and default
+# (any other phase); None disables the deadline. Overrides utils/watchdog.py defaults.
+PHASE_DEADLINES = {
+    # "upload_file": 7200,
+    # "publish": 900,
+}
+# Browser supervisor: every launched browser is registered with its PID and temp profile.
+# Long-lived shared browsers (`sau batch`) whose processes together use more than
+# max_rss_mb are restarted when idle. `sau batch` and the backend reap registered browsers
+# whose launching process died, and the temp profiles registered browsers left behind once
+# older than temp_dir_max_age_hours, at startup and every reap_interval_seconds.
+BROWSER_SUPERVISOR = {
+    # "max_rss_mb": 2048,
+    # "reap_interval_seconds": 600,
+    # "temp_dir_max_age_hours": 6,
+}
+# Metrics: each process (backend, CLI run, batch worker) writes its counters to
+# directory/<pid>-<start>.json every flush_interval_seconds and at exit; the backend's
+# GET /metrics and `sau metrics` add them up. Snapshots of exited processes are dropped
+# after retention_hours. "enabled": False stops writing snapshots.
+METRICS = {
+    # "directory": "/var/lib/sau/metrics",
+    # "flush_interval_seconds": 15,
+    # "retention_hours": 24,
+}
+# Seconds a successful pre-publish cookie check (`sau <platform> upload-*`, `sau batch`) is
+# reused while the cookie file is unchanged; account validation and login always re-check.
+COOKIE_CHECK_CACHE_SECONDS = 300
+# Cookie keep-alive: each login is refreshed with one page load on the creator home
+# refresh_before_expiry_hours before its auth cookies expire, and at least every
+# refresh_interval_hours after its last upload, one account at a time and no more often
+# than min_seconds_between_refreshes. Logins that are gone or still end within
+# relogin_warning_hours are flagged for a QR code re-login (`sau cookies status`).
+# Runs inside the backend and `sau cookies keepalive`; "enabled": False turns it off.
+COOKIE_KEEPALIVE = {
+    # "refresh_interval_hours": 24,
+    # "refresh_before_expiry_hours": 48,
+    # "relogin_warning_hours": 72,
+    # "min_seconds_between_refreshes": 120,
+}
+# Record / replay creator-center sessions as HAR. "record" saves every browser context a
+# run opens to directory/01.zip, 02.zip, ... (bodies and timings; upload request bodies
+# are dropped); "replay" serves the same run offline from them, delaying responses by
+# their recorded time (replay_latency) and taking upload bytes in at
+# upload_mb_per_second. SAU_HAR_MODE / SAU_HAR_DIR override mode and directory.
+HAR_SESSIONS = {
+    # "mode": "replay",
+    # "directory": "har/douyin-video",
+    # "upload_mb_per_second": 20,
+    # "replay_latency": True,
+}
+# YouTube resumable upload engine (`sau youtube upload-video --engine resumable`, or
+# "engine" per batch row): uploads through the Data API instead of YouTube Studio, in
+# chunk_mb chunks (multiple of 0.25) that resume after network drops. Needs an OAuth
+# client and one refresh token per account (scope youtube.upload). Videos uploaded by an
+# unaudited API project stay private. "engine" sets the default for jobs that pick none.
+YT_API = {
+    # "engine": "browser",
+    # "client_id": "xxx.apps.googleusercontent.com",
+    # "client_secret": "xxx",
+    # "refresh_tokens": {"my_channel": "1//xxx"},
+    # "chunk_mb": 16,
+}
+# Bilibili upload engine. "native" uploads in-process over the web uploader's chunked
+# protocol with the cookie file `sau bilibili login` saved, `threads` chunks at a time,
+# retrying single chunks; when it fails before the submission is sent, the upload is
+# retried with biliup unless fallback_to_biliup is False. "biliup" always shells out.
+# `sau bilibili upload-video --engine` (or "engine" per batch row) overrides it per job.
+BILIBILI_UPLOAD = {
+    # "engine": "native",
+    # "fallback_to_biliup": True,
+    # "threads": 3,
+    # "upcdn": "bda2",
+}
+# Job scheduling for `sau batch` / `watch` / `plan` and the backend's publish requests.
+# Waiting jobs start by priority class (urgent, normal, bulk; a job's "priority" field or
+# --priority, else default_priority), then earliest publish time, then a weighted fair
+# share per operator and per "platform:account" (weight 2 gets twice the slots of 1).
+# A scheduled job that, at job_seconds per job (default_job_seconds for other platforms),
+# cannot finish deadline_margin_seconds before its publish time is "defer"red behind work
+# that still can, "reject"ed, or admitted anyway ("off"). The backend runs at most
+# backend_concurrency publishes at once, backend_platform_concurrency per platform.
+SCHEDULER = {
+    # "default_priority": "normal",
+    # "admission": "defer",
+    # "deadline_margin_seconds": 0,
+    # "default_job_seconds": 600,
+    # "job_seconds": {"douyin": 300, "bilibili": 900},
+    # "operator_weights": {"ops": 2},
+    # "account_weights": {"douyin:main_channel": 2},
+    # "backend_concurrency": 4,
+    # "backend_platform_concurrency": 2,
+}
+# Job history: every finished publish job's seconds per phase, file size and outcome go to
+# db/database.db and are kept retention_days. `sau plan --estimate`, `sau batch --estimate`
+# and the backend's /estimatePublish predict completion from the p50 / p95 of the last
+# window_days of successful jobs per platform and size bucket (<50MB, 50-200MB,
+# 200MB-1GB, >=1GB); a bucket with fewer than min_samples jobs falls back to the whole
+# platform, then to SCHEDULER's job_seconds. The scheduler's admission control uses the
+# same p50. "enabled": False stops recording.
+JOB_HISTORY = {
+    # "window_days": 30,
+    # "retention_days": 90,
+    # "min_samples": 5,
+}
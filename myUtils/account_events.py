@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from queue import Empty, Queue
+
+from loguru import logger
+
+from conf import BASE_DIR
+from myUtils.listing import ACCOUNT_COLUMNS, DATABASE_PATH, PLATFORM_TYPES
+from utils.cookie_keepalive import STATUS_RELOGIN
+
+# 断线重连时能补发的最近事件数，超出后让前端整表重新拉取
+HISTORY_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+# 只在事件里出现、不写库的临时状态
+STATUS_VALIDATING = -1
+
+
+class AccountEventBroker:
+    """
+    Fans account status deltas out to every connected /accountEvents stream.
+    Events carry an increasing id, so a reconnecting EventSource (Last-Event-ID)
+    gets what it missed from the recent history, or a "reset" when it fell too
+    far behind and should reload the list.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers: set[Queue] = set()
+        self._history: deque = deque(maxlen=history_size)
+        self._sequence = 0
+
+    def publish(self, kind: str, account: dict) -> dict:
+        """
+        :param kind: "upsert" (new or changed account), "delete" or "validating"
+        :param account: Row as a dict, at least {"id": ...}
+        """
+        with self._lock:
+            self._sequence += 1
+            event = {"id": self._sequence, "type": kind, "account": account}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for queue in subscribers:
+            queue.put(event)
+        return event
+
+    def subscribe(self, last_event_id: int | None = None, queue=None):
+        """
+        :param queue: Where events are put, queue.Queue by default; the ASGI backend
+            passes a myUtils.asgi.LoopQueue and reads it with astream()
+        """
+        queue = Queue() if queue is None else queue
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._sequence:
+                missed = [event for event in self._history if event["id"] > last_event_id]
+                if not missed or missed[0]["id"] != last_event_id + 1:
+                    # 中间的事件已经不在历史里了，或者后端重启过（编号从头开始）
+                    queue.put({"id": self._sequence, "type": "reset", "account": None})
+                else:
+                    for event in missed:
+                        queue.put(event)
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue) -> None:
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def stream(self, queue: Queue, heartbeat: float = HEARTBEAT_SECONDS):
+        """SSE frames for one subscriber; a comment line every `heartbeat` seconds keeps proxies from closing it."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = queue.get(timeout=heartbeat)
+                except Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield self._frame(event)
+        finally:
+            self.unsubscribe(queue)
+
+    async def astream(self, queue, heartbeat: float = HEARTBEAT_SECONDS):
+        """stream() on an event loop, for a subscriber with an awaitable get()."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield self._frame(event)
+        finally:
+            self.unsubscribe(queue)
+
+    @staticmethod
+    def _frame(event: dict) -> str:
+        return f"id: {event['id']}\nevent: account\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+account_events = AccountEventBroker()
+
+
+def account_row(conn: sqlite3.Connection, where: str, value) -> dict | None:
+    row = conn.execute(f"SELECT {', '.join(ACCOUNT_COLUMNS)} FROM user_info WHERE {where} = ?", (value,)).fetchone()
+    return dict(zip(ACCOUNT_COLUMNS, row)) if row else None
+
+
+def publish_account(account_id: int, db_path: str | Path = DATABASE_PATH, reason: str | None = None) -> None:
+    """Push the current row of one account, e.g. after a login or an edit."""
+    with sqlite3.connect(db_path) as conn:
+        account = account_row(conn, "id", account_id)
+    if account is not None:
+        account_events.publish("upsert", {**account, "reason": reason})
+
+
+def set_account_status(file_path: str, status: int, reason: str, db_path: str | Path = DATABASE_PATH) -> bool:
+    """
+    Store a validation result for the account owning cookie `file_path` and push it
+    when the status actually changed.
+    :returns: whether the status changed
+    """
+    with sqlite3.connect(db_path) as conn:
+        account = account_row(conn, "filePath", file_path)
+        if account is None or account["status"] == status:
+            return False
+        conn.execute("UPDATE user_info SET status = ? WHERE id = ?", (status, account["id"]))
+        conn.commit()
+    account_events.publish("upsert", {**account, "status": status, "reason": reason})
+    return True
+
+
+def backend_accounts(db_path: str | Path = DATABASE_PATH):
+    """Accounts of the web UI as (platform, userName, cookie file), for utils.cookie_keepalive."""
+    if not Path(db_path).exists():
+        return
+    platforms = {type_: platform for platform, type_ in PLATFORM_TYPES.items()}
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT type, filePath, userName FROM user_info").fetchall()
+    for type_, file_path, user_name in rows:
+        if type_ in platforms:
+            yield platforms[type_], user_name, Path(BASE_DIR / "cookiesFile" / file_path)
+
+
+def flag_relogin(platform: str, account: str, account_file: Path, status: str) -> None:
+    """Keep-alive listener: a web UI account the refresh found logged out is marked invalid."""
+    # 快到期但还能用的账号（expiring）不改状态，只在保活状态里提示
+    if status == STATUS_RELOGIN and account_file.parent.name == "cookiesFile":
+        set_account_status(account_file.name, 0, "needs_relogin")
+
+
+async def validate_accounts(check, db_path: str | Path = DATABASE_PATH) -> list[list]:
+    """
+    Re-check the cookie of every account, pushing a "validating" event before and the
+    result after each one, so an open page updates row by row. An account whose check
+    raises keeps its stored status, is pushed with reason "error", and the next one is
+    checked.
+    :param check: async (type, filePath) -> bool, e.g. myUtils.auth.check_cookie
+    :returns: rows in the /getAccounts shape with the checked status
+    """
+    with sqlite3.connect(db_path) as conn:
+        rows = [list(row) for row in conn.execute(f"SELECT {', '.join(ACCOUNT_COLUMNS)} FROM user_info")]
+    for row in rows:
+        account = dict(zip(ACCOUNT_COLUMNS, row))
+        account_events.publish("validating", {**account, "status": STATUS_VALIDATING})
+        try:
+            valid = await check(row[1], row[2])
+        except Exception as exc:
+            logger.warning(f"Validating account {account['userName']} ({row[2]}) failed: {exc}")
+            account_events.publish("upsert", {**account, "reason": "error"})
+            continue
+        if not valid:
+            # 和以前一样只把失效的账号标成 0，有效的保持库里的状态
+            row[4] = 0
+        if not set_account_status(row[2], row[4], "validated", db_path):
+            account_events.publish("upsert", {**account, "status": row[4], "reason": "validated"})
+    return rows
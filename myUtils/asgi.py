@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from utils import metrics
+
+# 上传内容攒够这么多再写一次盘，少切几次线程
+WRITE_BUFFER_BYTES = 1024 * 1024
+# multipart 里普通表单字段（不是文件）的大小上限
+MAX_FIELD_BYTES = 64 * 1024
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    # 关键：禁用 Nginx 缓冲
+    (b"x-accel-buffering", b"no"),
+]
+
+
+class RequestError(Exception):
+    """A request a native route rejects; answered as {"code", "msg", "data": None} with that status."""
+
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.msg = msg
+
+
+class LoopQueue:
+    """
+    Queue bound to the event loop it was created on: put() may be called from any thread
+    or task, get() is awaited on that loop. Takes the place of queue.Queue when the
+    consumer is an SSE response, so a waiting stream costs a suspended task instead of
+    a thread polling the queue.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, item) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def get(self):
+        return await self._queue.get()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+class Request:
+    """The parts of an ASGI HTTP scope the native routes use."""
+
+    def __init__(self, scope: dict, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])
+        }
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        self.args = {name: values[0] for name, values in query.items()}
+
+    async def wait_disconnect(self) -> None:
+        while (await self.receive())["type"] != "http.disconnect":
+            pass
+
+
+@dataclass(slots=True)
+class UploadedFile:
+    """One file part of a multipart body, already on disk under a temporary name."""
+
+    field_name: str
+    filename: str
+    path: Path
+    size: int = 0
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+async def send_json(send, payload: dict, status: int = 200) -> None:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_event_stream(request: Request, send, frames) -> None:
+    """
+    Send SSE frames from an async iterator until it ends or the client goes away; the
+    iterator is closed either way so subscriptions behind it are released.
+    """
+    await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+
+    async def pump():
+        async for frame in frames:
+            await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(request.wait_disconnect())
+    try:
+        await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        if pump_task.done():
+            pump_task.result()
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        for task in (pump_task, disconnect_task):
+            task.cancel()
+        await asyncio.gather(pump_task, disconnect_task, return_exceptions=True)
+        await frames.aclose()
+
+
+async def receive_multipart(request: Request, directory: Path, max_bytes: int) -> tuple[dict[str, str], list[UploadedFile]]:
+    """
+    Parse a multipart/form-data body as it arrives, writing file parts straight to
+    `directory` instead of holding them in memory or a spooled temp file.
+    :returns: (form fields, uploaded files); the caller moves or discards the files
+    :raises RequestError: 400 for a malformed body, 413 past `max_bytes`
+    """
+    mimetype, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get("boundary")
+    if mimetype != "multipart/form-data" or not boundary:
+        raise RequestError(400, "Expected a multipart/form-data body")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise RequestError(413, f"Request body is larger than {max_bytes} bytes")
+
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    fields: dict[str, str] = {}
+    files: list[UploadedFile] = []
+    part = None
+    buffer = bytearray()
+    handle = None
+    received = 0
+    finished = False
+    try:
+        more_body = True
+        while more_body:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                raise RequestError(400, "Client disconnected during the upload")
+            chunk = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            received += len(chunk)
+            if received > max_bytes:
+                raise RequestError(413, f"Request body is larger than {max_bytes} bytes")
+            decoder.receive_data(chunk)
+            if not more_body:
+                decoder.receive_data(None)
+
+            event = decoder.next_event()
+            while not isinstance(event, NeedData):
+                if isinstance(event, File):
+                    part = UploadedFile(event.name, event.filename, directory / f".upload-{uuid.uuid4().hex}.part")
+                    files.append(part)
+                    handle = await asyncio.to_thread(open, part.path, "wb")
+                elif isinstance(event, Field):
+                    part = event.name
+                elif isinstance(event, Data):
+                    buffer += event.data
+                    if isinstance(part, UploadedFile):
+                        part.size += len(event.data)
+                        if len(buffer) >= WRITE_BUFFER_BYTES or not event.more_data:
+                            await asyncio.to_thread(handle.write, bytes(buffer))
+                            buffer.clear()
+                        if not event.more_data:
+                            await asyncio.to_thread(handle.close)
+                            handle = None
+                    elif len(buffer) > MAX_FIELD_BYTES:
+                        raise RequestError(413, f"Form field {part} is too large")
+                    elif not event.more_data:
+                        fields[part] = buffer.decode("utf-8", "replace")
+                        buffer.clear()
+                elif isinstance(event, Epilogue):
+                    finished = True
+                    break
+                event = decoder.next_event()
+        if not finished:
+            raise RequestError(400, "Incomplete multipart body")
+    except ValueError as exc:
+        # 分段头不合法等
+        for upload in files:
+            upload.discard()
+        raise RequestError(400, f"Malformed multipart body: {exc}") from exc
+    except BaseException:
+        for upload in files:
+            upload.discard()
+        raise
+    finally:
+        if handle is not None:
+            handle.close()
+    return fields, files
+
+
+class AsgiApp:
+    """
+    ASGI entry of the web backend. Routes registered with route() run natively on the
+    server's event loop; any other request goes to `fallback` (the Flask app wrapped by
+    asgiref's WsgiToAsgi), so existing routes keep working unchanged.
+    Native routes get the same request metrics and CORS header as the Flask ones.
+    """
+
+    def __init__(self, fallback, on_startup=()):
+        self.fallback = fallback
+        self.on_startup = list(on_startup)
+        self.routes: dict[tuple[str, str], object] = {}
+
+    def route(self, path: str, methods=("GET",)):
+        def decorator(handler):
+            for method in methods:
+                self.routes[(method, path)] = handler
+            return handler
+
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        started = time.perf_counter()
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"access-control-allow-origin", b"*")]}
+                # SSE 接口只算到开始推流
+                metrics.observe("sau_http_request_duration_seconds", time.perf_counter() - started,
+                                route=request.path, method=request.method)
+                metrics.increment("sau_http_requests_total", route=request.path, method=request.method,
+                                  status=message["status"])
+            await send(message)
+
+        try:
+            await handler(request, send_with_metrics)
+        except RequestError as exc:
+            await send_json(send_with_metrics, {"code": exc.status, "msg": exc.msg, "data": None}, exc.status)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                for callback in self.on_startup:
+                    callback()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def move_upload(upload: UploadedFile, target: Path) -> None:
+    """Give a received file its final name (same directory, so this is a rename, not a copy)."""
+    await asyncio.to_thread(os.replace, upload.path, target)
+    upload.path = target
@@ -7,6 +7,7 @@ from xhs import XhsClient
 
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS
 from utils.base_social_media import set_init_script
+from utils.browser_session import launch_browser
 from utils.log import tencent_logger, kuaishou_logger, douyin_logger
 from pathlib import Path
 from uploader.xhs_uploader.main import sign_local
@@ -14,92 +15,104 @@ from uploader.xhs_uploader.main import sign_local
 
 async def cookie_auth_douyin(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload")
+        browser = await launch_browser(playwright.chromium, headless=LOCAL_CHROME_HEADLESS)
         try:
-            await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
-            # 2024.06.17 抖音创作者中心改版
-            # 判断
-            # 等待“扫码登录”元素出现，超时 5 秒（如果 5 秒没出现，说明 cookie 有效）
+            context = await browser.new_context(storage_state=account_file)
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.douyin.com/creator-micro/content/upload")
             try:
-                await page.get_by_text("扫码登录").wait_for(timeout=5000)
-                douyin_logger.error("[+] cookie 失效，需要扫码登录")
-                return False
+                await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=5000)
+                # 2024.06.17 抖音创作者中心改版
+                # 判断
+                # 等待“扫码登录”元素出现，超时 5 秒（如果 5 秒没出现，说明 cookie 有效）
+                try:
+                    await page.get_by_text("扫码登录").wait_for(timeout=5000)
+                    douyin_logger.error("[+] cookie 失效，需要扫码登录")
+                    return False
+                except:
+                    douyin_logger.success("[+]  cookie 有效")
+                    return True
             except:
-                douyin_logger.success("[+]  cookie 有效")
-                return True
-        except:
-            douyin_logger.error("[+] 等待5秒 cookie 失效")
-            await context.close()
+                douyin_logger.error("[+] 等待5秒 cookie 失效")
+                return False
+        finally:
+            # 共享或远程浏览器这里只会关掉本次打开的 context
             await browser.close()
-            return False
 
 
 async def cookie_auth_tencent(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://channels.weixin.qq.com/platform/post/create")
+        browser = await launch_browser(playwright.chromium, headless=LOCAL_CHROME_HEADLESS)
         try:
-            await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
-            tencent_logger.error("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            tencent_logger.success("[+] cookie 有效")
-            return True
+            context = await browser.new_context(storage_state=account_file)
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://channels.weixin.qq.com/platform/post/create")
+            try:
+                await page.wait_for_selector('div.title-name:has-text("微信小店")', timeout=5000)  # 等待5秒
+                tencent_logger.error("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                tencent_logger.success("[+] cookie 有效")
+                return True
+        finally:
+            # 共享或远程浏览器这里只会关掉本次打开的 context
+            await browser.close()
 
 
 async def cookie_auth_ks(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://cp.kuaishou.com/article/publish/video")
+        browser = await launch_browser(playwright.chromium, headless=LOCAL_CHROME_HEADLESS)
         try:
-            await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
+            context = await browser.new_context(storage_state=account_file)
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://cp.kuaishou.com/article/publish/video")
+            try:
+                await page.wait_for_selector("div.names div.container div.name:text('机构服务')", timeout=5000)  # 等待5秒
 
-            kuaishou_logger.info("[+] 等待5秒 cookie 失效")
-            return False
-        except:
-            kuaishou_logger.success("[+] cookie 有效")
-            return True
+                kuaishou_logger.info("[+] 等待5秒 cookie 失效")
+                return False
+            except:
+                kuaishou_logger.success("[+] cookie 有效")
+                return True
+        finally:
+            # 共享或远程浏览器这里只会关掉本次打开的 context
+            await browser.close()
 
 
 async def cookie_auth_xhs(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
-        context = await browser.new_context(storage_state=account_file)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
-        # 访问指定的 URL
-        await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
+        browser = await launch_browser(playwright.chromium, headless=LOCAL_CHROME_HEADLESS)
         try:
-            await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
-        except:
-            print("[+] 等待5秒 cookie 失效")
-            await context.close()
+            context = await browser.new_context(storage_state=account_file)
+            context = await set_init_script(context)
+            # 创建一个新的页面
+            page = await context.new_page()
+            # 访问指定的 URL
+            await page.goto("https://creator.xiaohongshu.com/creator-micro/content/upload")
+            try:
+                await page.wait_for_url("https://creator.xiaohongshu.com/creator-micro/content/upload", timeout=5000)
+            except:
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            # 2024.06.17 抖音创作者中心改版
+            if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
+                print("[+] 等待5秒 cookie 失效")
+                return False
+            else:
+                print("[+] cookie 有效")
+                return True
+        finally:
+            # 共享或远程浏览器这里只会关掉本次打开的 context
             await browser.close()
-            return False
-        # 2024.06.17 抖音创作者中心改版
-        if await page.get_by_text('手机号登录').count() or await page.get_by_text('扫码登录').count():
-            print("[+] 等待5秒 cookie 失效")
-            return False
-        else:
-            print("[+] cookie 有效")
-            return True
 
 
 async def check_cookie(type, file_path):
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from conf import BASE_DIR
+
+DATABASE_PATH = Path(BASE_DIR / "db" / "database.db")
+MAX_PAGE_SIZE = 500
+# 每个进程缓存最近这么多个列表结果，表一变（版本号 +1）自然失效
+CACHE_SIZE = 64
+
+# 前端的 type 编号：1 小红书 2 视频号 3 抖音 4 快手
+PLATFORM_TYPES = {"xiaohongshu": 1, "tencent": 2, "douyin": 3, "kuaishou": 4}
+ACCOUNT_COLUMNS = ("id", "type", "filePath", "userName", "status")
+FILE_COLUMNS = ("id", "filename", "filesize", "upload_time", "file_path", "uuid")
+
+# 对外的排序字段 -> 列名；每个都有 (列, id) 的复合索引，游标分页走索引
+FILE_SORTS = {"upload_time": "upload_time", "name": "filename", "size": "filesize", "id": "id"}
+ACCOUNT_SORTS = {"id": "id", "name": "userName", "platform": "type", "status": "status"}
+
+# uuid 是 file_path 里第一个下划线前面的部分（见 /uploadSave）
+_UUID_EXPR = "CASE WHEN instr({0}, '_') > 0 THEN substr({0}, 1, instr({0}, '_') - 1) ELSE IFNULL({0}, '') END"
+
+SCHEMA_STATEMENTS = (
+    "CREATE INDEX IF NOT EXISTS idx_file_records_upload_time ON file_records (upload_time, id)",
+    "CREATE INDEX IF NOT EXISTS idx_file_records_filename ON file_records (filename, id)",
+    "CREATE INDEX IF NOT EXISTS idx_file_records_filesize ON file_records (filesize, id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_info_type_status ON user_info (type, status)",
+    "CREATE INDEX IF NOT EXISTS idx_user_info_username ON user_info (userName, id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_info_status ON user_info (status, id)",
+    # 每张表一个版本号，任何写入都 +1；ETag 和结果缓存都以它为准，不用先查数据
+    "CREATE TABLE IF NOT EXISTS list_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO list_versions VALUES ('file_records', 0), ('user_info', 0)",
+    f"""CREATE TRIGGER IF NOT EXISTS file_records_fill_uuid AFTER INSERT ON file_records
+    WHEN NEW.uuid IS NULL BEGIN
+        UPDATE file_records SET uuid = {_UUID_EXPR.format('NEW.file_path')} WHERE id = NEW.id;
+    END""",
+)
+VERSIONED_TABLES = ("file_records", "user_info")
+
+_ready: set[str] = set()
+_ready_lock = threading.Lock()
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ListQueryError(ValueError):
+    """Invalid sort field, filter value, page size or cursor in a list request."""
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def ensure_list_schema(conn: sqlite3.Connection, db_path: str | Path = DATABASE_PATH) -> None:
+    """
+    Add the uuid column (backfilled from file_path), the sort indexes and the
+    per-table version counters to an existing database. Runs once per process.
+    """
+    key = str(db_path)
+    if key in _ready:
+        return
+    with _ready_lock:
+        if key in _ready:
+            return
+        if "uuid" not in _columns(conn, "file_records"):
+            conn.execute("ALTER TABLE file_records ADD COLUMN uuid TEXT")
+        conn.execute(f"UPDATE file_records SET uuid = {_UUID_EXPR.format('file_path')} WHERE uuid IS NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_file_records_uuid ON file_records (uuid)")
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(statement)
+        for table in VERSIONED_TABLES:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE list_versions SET version = version + 1 WHERE name = '{table}';
+                END""")
+        conn.commit()
+        _ready.add(key)
+
+
+def _encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ListQueryError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != 2:
+        raise ListQueryError("Invalid cursor")
+    return values
+
+
+@dataclass(frozen=True, slots=True)
+class ListQuery:
+    """One parsed list request: filters, sort order and the page to return."""
+
+    table: str
+    columns: tuple[str, ...]
+    sort_column: str
+    descending: bool
+    where: tuple[tuple[str, object], ...] = ()
+    limit: int | None = None
+    cursor: str | None = None
+
+    @property
+    def cache_key(self) -> str:
+        return json.dumps([self.table, self.sort_column, self.descending, self.where, self.limit, self.cursor])
+
+
+def _parse_sort(args, sorts: dict[str, str], default: str) -> tuple[str, bool]:
+    sort = args.get("sort") or default
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in sorts:
+        raise ListQueryError(f"Unknown sort field {field}, expected one of {', '.join(sorts)}")
+    order = args.get("order")
+    if order:
+        descending = order.lower() == "desc"
+    return sorts[field], descending
+
+
+def _parse_limit(args) -> int | None:
+    value = args.get("limit")
+    if value in (None, ""):
+        return None
+    try:
+        limit = int(value)
+    except ValueError as exc:
+        raise ListQueryError("limit must be an integer") from exc
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _parse_number(args, name: str, cast=float):
+    value = args.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except ValueError as exc:
+        raise ListQueryError(f"{name} must be a number") from exc
+
+
+def _like(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def parse_file_query(args) -> ListQuery:
+    """
+    Query string of /getFiles: name (substring), uploaded_after / uploaded_before
+    ("YYYY-MM-DD[ HH:MM:SS]"), min_size / max_size (MB), sort (upload_time, name,
+    size, id; prefix "-" or order=desc for descending), limit and cursor.
+    """
+    sort_column, descending = _parse_sort(args, FILE_SORTS, "id")
+    where = []
+    if args.get("name"):
+        where.append(("filename LIKE ? ESCAPE '\\'", _like(args["name"])))
+    if args.get("uploaded_after"):
+        where.append(("upload_time >= ?", args["uploaded_after"]))
+    if args.get("uploaded_before"):
+        where.append(("upload_time < ?", args["uploaded_before"]))
+    for name, clause in (("min_size", "filesize >= ?"), ("max_size", "filesize <= ?")):
+        value = _parse_number(args, name)
+        if value is not None:
+            where.append((clause, value))
+    return ListQuery(
+        "file_records", FILE_COLUMNS, sort_column, descending, tuple(where), _parse_limit(args), args.get("cursor")
+    )
+
+
+def parse_account_query(args) -> ListQuery:
+    """
+    Query string of /getAccounts: platform (type number or name), status, name
+    (substring), sort (id, name, platform, status), limit and cursor.
+    """
+    sort_column, descending = _parse_sort(args, ACCOUNT_SORTS, "id")
+    where = []
+    platform = args.get("platform")
+    if platform:
+        platform_type = PLATFORM_TYPES.get(platform) or (int(platform) if platform.isdigit() else None)
+        if platform_type is None:
+            raise ListQueryError(f"Unknown platform {platform}")
+        where.append(("type = ?", platform_type))
+    status = _parse_number(args, "status", int)
+    if status is not None:
+        where.append(("status = ?", status))
+    if args.get("name"):
+        where.append(("userName LIKE ? ESCAPE '\\'", _like(args["name"])))
+    return ListQuery(
+        "user_info", ACCOUNT_COLUMNS, sort_column, descending, tuple(where), _parse_limit(args), args.get("cursor")
+    )
+
+
+def table_version(conn: sqlite3.Connection, table: str) -> int:
+    row = conn.execute("SELECT version FROM list_versions WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def etag_for(query: ListQuery, version: int) -> str:
+    return hashlib.sha1(f"{version}:{query.cache_key}".encode("utf-8")).hexdigest()[:20]
+
+
+def _after_clause(sort: str, descending: bool, last_value, last_id) -> tuple[str, list]:
+    """
+    Keyset predicate for the rows after (last_value, last_id). SQLite sorts NULL before
+    every value, and a row comparison with NULL is never true, so NULL sort values
+    (e.g. filesize of rows saved without one) need their own branch.
+    """
+    op = "<" if descending else ">"
+    if last_value is None:
+        if descending:
+            return f"({sort} IS NULL AND id {op} ?)", [last_id]
+        return f"({sort} IS NOT NULL OR id {op} ?)", [last_id]
+    if descending:
+        return f"(({sort}, id) {op} (?, ?) OR {sort} IS NULL)", [last_value, last_id]
+    return f"({sort}, id) {op} (?, ?)", [last_value, last_id]
+
+
+def fetch_page(conn: sqlite3.Connection, query: ListQuery) -> tuple[list[tuple], str | None]:
+    """
+    Rows matching `query` in sort order, after `query.cursor`. Pages are keyset based
+    ((sort column, id) past the last row), so deep pages cost the same as the first.
+    :returns: (rows, cursor of the next page or None)
+    """
+    clauses = [clause for clause, _ in query.where]
+    params = [value for _, value in query.where]
+    sort, direction = query.sort_column, "DESC" if query.descending else "ASC"
+    if query.cursor:
+        last_value, last_id = _decode_cursor(query.cursor)
+        if sort == "id":
+            clauses.append(f"id {'<' if query.descending else '>'} ?")
+            params.append(last_id)
+        else:
+            clause, values = _after_clause(sort, query.descending, last_value, last_id)
+            clauses.append(clause)
+            params += values
+    sql = f"SELECT {', '.join(query.columns)} FROM {query.table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {sort} {direction}" + (f", id {direction}" if sort != "id" else "")
+    if query.limit is not None:
+        # 多取一行判断是否还有下一页
+        sql += " LIMIT ?"
+        params.append(query.limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    if query.limit is None or len(rows) <= query.limit:
+        return rows, None
+    rows = rows[:query.limit]
+    last = rows[-1]
+    return rows, _encode_cursor([last[query.columns.index(sort)], last[0]])
+
+
+def list_rows(
+    conn: sqlite3.Connection, query: ListQuery, version: int, db_path: str | Path = DATABASE_PATH
+) -> tuple[list[tuple], str | None]:
+    """fetch_page() through a small per-process cache keyed by the table version."""
+    key = (str(db_path), version, query.cache_key)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = fetch_page(conn, query)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -3,6 +3,7 @@ import sqlite3
 
 from playwright.async_api import async_playwright
 
+from myUtils.account_events import publish_account
 from myUtils.auth import check_cookie
 from utils.base_social_media import set_init_script
 import uuid
@@ -87,6 +88,8 @@ async def douyin_cookie_gen(id,status_queue):
                                 ''', (3, f"{uuid_v1}.json", id, 1))
             conn.commit()
             print("✅ 用户状态已记录")
+            # 推给已打开的账号管理页
+            publish_account(cursor.lastrowid, reason="login")
         status_queue.put("200")
 
 
@@ -166,6 +169,8 @@ async def get_tencent_cookie(id,status_queue):
                                 ''', (2, f"{uuid_v1}.json", id, 1))
             conn.commit()
             print("✅ 用户状态已记录")
+            # 推给已打开的账号管理页
+            publish_account(cursor.lastrowid, reason="login")
         status_queue.put("200")
 
 # 快手登录
@@ -240,6 +245,8 @@ async def get_ks_cookie(id,status_queue):
                                         ''', (4, f"{uuid_v1}.json", id, 1))
             conn.commit()
             print("✅ 用户状态已记录")
+            # 推给已打开的账号管理页
+            publish_account(cursor.lastrowid, reason="login")
         status_queue.put("200")
 
 # 小红书登录
@@ -314,6 +321,8 @@ async def xiaohongshu_cookie_gen(id,status_queue):
                            ''', (1, f"{uuid_v1}.json", id, 1))
             conn.commit()
             print("✅ 用户状态已记录")
+            # 推给已打开的账号管理页
+            publish_account(cursor.lastrowid, reason="login")
         status_queue.put("200")
 
 # a = asyncio.run(xiaohongshu_cookie_gen(4,None))
@@ -1,16 +1,82 @@
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from conf import BASE_DIR
+from myUtils.account_events import set_account_status
+from myUtils.auth import check_cookie
 from uploader.douyin_uploader.main import DouYinVideo
 from uploader.ks_uploader.main import KSVideo
 from uploader.tencent_uploader.main import TencentVideo
 from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
+from utils.circuit_breaker import CircuitOpenError, circuit_breakers
 from utils.constant import TencentZoneTypes
+from utils.cookie_keepalive import cookie_keepalive
 from utils.files_times import generate_schedule_time_next_day
+from utils.capacity import PlannedJob, estimate_batch
+from utils.job_history import files_size, job_history
+from utils.job_phase import set_phase
+from utils.job_scheduler import JobScheduler, load_settings as load_scheduler_settings
+from utils.publish_ledger import PublishInProgress, idempotency_key, publish_ledger
+from utils.publish_plan import aggregate_results, normalize_tags, normalize_title, prepare_asset
+from utils.rate_limit import publish_rate_limiter
+from utils.watchdog import run_with_watchdog
 
+# 平台名 -> user_info.type
+PLATFORM_TYPES = {"xiaohongshu": 1, "tencent": 2, "douyin": 3, "kuaishou": 4}
 
-def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, is_draft=False):
+# 所有发布请求共用的调度器：不再按请求到达顺序各跑各的，而是按优先级、定时发布时间和操作者/账号公平排队
+_scheduler_settings = load_scheduler_settings()
+publish_scheduler = JobScheduler(
+    _scheduler_settings.backend_concurrency,
+    default_platform_concurrency=_scheduler_settings.backend_platform_concurrency,
+    settings=_scheduler_settings,
+    history=job_history,
+)
+
+
+def _publish_key(platform, cookie, file, title):
+    # 同一账号发过同一个视频+标题就跳过，避免超时重试时重复发布；返回 None 表示已发布
+    key = idempotency_key(platform, cookie.stem, [file], title)
+    existing = publish_ledger.lookup(key)
+    if existing is not None:
+        print(f"{file} 已由 {cookie.stem} 发布过（{existing.post_url or existing.post_id or '未获取到作品 ID'}），跳过")
+        return None
+    return key
+
+
+async def _run_guarded(platform, upload, key, cookie, title, file=None):
+    # 平台熔断时直接抛 CircuitOpenError，不再为注定失败的任务开浏览器
+    # 看门狗：某个阶段卡住超时就取消任务、强制关掉浏览器并清理残留的 Chromium 进程
+    # 各阶段耗时、文件大小和结果记进任务历史，供发布耗时估算使用
+    # 限流令牌在熔断放行之后才扣：调用方排队前只等到有令牌（spend=False），不占着调度名额等
+    try:
+        with job_history.recording(platform, cookie.stem, [file] if file else []):
+            async with circuit_breakers.guard(platform):
+                set_phase("rate_limit")
+                await publish_rate_limiter.acquire(platform, cookie.stem)
+                set_phase(None)
+                await publish_ledger.publish_once(
+                    key, platform, cookie.stem, title, lambda: run_with_watchdog(upload, platform=platform)
+                )
+    except (CircuitOpenError, PublishInProgress):
+        raise
+    except Exception:
+        # 发布失败时重新校验一次 cookie，确认是掉登录就把账号标成失效并推给账号管理页；
+        # 校验本身出错（开不了浏览器、超时）只记日志，抛出的始终是发布本身的错误
+        try:
+            if not await check_cookie(PLATFORM_TYPES[platform], cookie.name):
+                set_account_status(cookie.name, 0, "logged_out")
+        except Exception as exc:
+            print(f"发布失败后重新校验 {cookie.stem} 的 cookie 出错: {exc}")
+        raise
+    # 刚用这个登录发布成功，推迟它的下一次保活刷新
+    cookie_keepalive.record_use(cookie)
+
+
+def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0, is_draft=False,
+                       priority=None, operator=''):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
@@ -25,13 +91,19 @@ def post_video_tencent(title,files,tags,account_file,category=TencentZoneTypes.L
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category, is_draft)
-            asyncio.run(app.main(), debug=False)
+            key = _publish_key("tencent", cookie, file, title)
+            if key is None:
+                continue
+            publish_rate_limiter.acquire_blocking("tencent", cookie.stem, spend=False)
+            with publish_scheduler.hold("tencent", cookie.stem, priority=priority, operator=operator,
+                                        deadline=publish_datetimes[index], size=files_size([file])):
+                app = TencentVideo(title, str(file), tags, publish_datetimes[index], cookie, category, is_draft)
+                asyncio.run(_run_guarded("tencent", app.main, key, cookie, title, file), debug=False)
 
 
 def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0,
                       thumbnail_path = '',
-                      productLink = '', productTitle = ''):
+                      productLink = '', productTitle = '', priority=None, operator=''):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
@@ -46,11 +118,18 @@ def post_video_DouYin(title,files,tags,account_file,category=TencentZoneTypes.LI
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, thumbnail_path, productLink, productTitle)
-            asyncio.run(app.douyin_upload_video(), debug=False)
+            key = _publish_key("douyin", cookie, file, title)
+            if key is None:
+                continue
+            publish_rate_limiter.acquire_blocking("douyin", cookie.stem, spend=False)
+            with publish_scheduler.hold("douyin", cookie.stem, priority=priority, operator=operator,
+                                        deadline=publish_datetimes[index], size=files_size([file])):
+                app = DouYinVideo(title, str(file), tags, publish_datetimes[index], cookie, thumbnail_path, productLink, productTitle)
+                asyncio.run(_run_guarded("douyin", app.douyin_upload_video, key, cookie, title, file), debug=False)
 
 
-def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
+def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0,
+                  priority=None, operator=''):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
@@ -65,10 +144,17 @@ def post_video_ks(title,files,tags,account_file,category=TencentZoneTypes.LIFEST
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
-            asyncio.run(app.main(), debug=False)
+            key = _publish_key("kuaishou", cookie, file, title)
+            if key is None:
+                continue
+            publish_rate_limiter.acquire_blocking("kuaishou", cookie.stem, spend=False)
+            with publish_scheduler.hold("kuaishou", cookie.stem, priority=priority, operator=operator,
+                                        deadline=publish_datetimes[index], size=files_size([file])):
+                app = KSVideo(title, str(file), tags, publish_datetimes[index], cookie)
+                asyncio.run(_run_guarded("kuaishou", app.main, key, cookie, title, file), debug=False)
 
-def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0):
+def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFESTYLE.value,enableTimer=False,videos_per_day = 1, daily_times=None,start_days = 0,
+                   priority=None, operator=''):
     # 生成文件的完整路径
     account_file = [Path(BASE_DIR / "cookiesFile" / file) for file in account_file]
     files = [Path(BASE_DIR / "videoFile" / file) for file in files]
@@ -83,9 +169,82 @@ def post_video_xhs(title,files,tags,account_file,category=TencentZoneTypes.LIFES
             print(f"视频文件名：{file}")
             print(f"标题：{title}")
             print(f"Hashtag：{tags}")
-            app = XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
-            asyncio.run(app.main(), debug=False)
+            key = _publish_key("xiaohongshu", cookie, file, title)
+            if key is None:
+                continue
+            publish_rate_limiter.acquire_blocking("xiaohongshu", cookie.stem, spend=False)
+            with publish_scheduler.hold("xiaohongshu", cookie.stem, priority=priority, operator=operator,
+                                        deadline=publish_datetimes[index] if enableTimer else 0, size=files_size([file])):
+                app = XiaoHongShuVideo(title, file, tags, publish_datetimes, cookie)
+                asyncio.run(_run_guarded("xiaohongshu", app.main, key, cookie, title, file), debug=False)
+
+
+
+def post_video_plan(file, title, tags, targets, cover=None, enableTimer=False, videos_per_day=1, daily_times=None, start_days=0,
+                    priority=None, operator='', category=None):
+    """
+    一个视频发到多个平台：哈希、探测、封面只做一次，各平台并发发布，返回汇总结果。
+    targets: [{"type": 3, "accountList": [...], "title"/"tags"/"category" 可单独覆盖}, ...]
+    category 同 /postVideo 的 category（视频号分类），0 或不传表示不设分类
+    """
+    asset = prepare_asset(Path(BASE_DIR / "videoFile" / file), cover)
+    platforms = {value: key for key, value in PLATFORM_TYPES.items()}
+    uploads = {"xiaohongshu": post_video_xhs, "tencent": post_video_tencent, "douyin": post_video_DouYin, "kuaishou": post_video_ks}
+    for target in targets:
+        if target.get("type") not in platforms:
+            raise ValueError(f"不支持的平台类型: {target.get('type')}")
+        if not target.get("accountList"):
+            raise ValueError(f"平台类型 {target['type']} 的账号列表不能为空")
+
+    def run(target):
+        platform = platforms[target["type"]]
+        record = {"platform": platform, "type": target["type"], "accounts": target["accountList"]}
+        args = (normalize_title(platform, target.get("title") or title), [file],
+                normalize_tags(platform, target.get("tags") if "tags" in target else tags), target["accountList"],
+                target.get("category", category) or None, enableTimer, videos_per_day, daily_times, start_days)
+        scheduling = {"priority": target.get("priority") or priority, "operator": operator}
+        started_at = time.time()
+        try:
+            if platform == "douyin" and asset.cover:
+                uploads[platform](*args, thumbnail_path=str(asset.cover), **scheduling)
+            else:
+                uploads[platform](*args, **scheduling)
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e) or type(e).__name__
+        record["duration_seconds"] = round(time.time() - started_at, 3)
+        return record
+
+    # 每个平台的发布函数各自 asyncio.run，放进线程里并发跑
+    with ThreadPoolExecutor(max_workers=len(targets) or 1) as executor:
+        results = list(executor.map(run, targets))
+    return aggregate_results(asset, results)
+
 
+def estimate_video_plan(files, targets, concurrency=None, platform_concurrency=None):
+    """
+    按任务历史估算这批发布（每个文件 x 每个目标账号）多久能完成，以及在当前限流下该开多少并发。
+    targets 格式同 post_video_plan；不传并发时按后端调度器的配置估算。
+    """
+    platforms = {value: key for key, value in PLATFORM_TYPES.items()}
+    jobs = []
+    for target in targets:
+        if target.get("type") not in platforms:
+            raise ValueError(f"不支持的平台类型: {target.get('type')}")
+        for file in files:
+            size = files_size([Path(BASE_DIR / "videoFile" / file)])
+            for account in target.get("accountList") or []:
+                jobs.append(PlannedJob(platforms[target["type"]], Path(account).stem, size,
+                                       target.get("priority"), id=f"{file}:{platforms[target['type']]}:{Path(account).stem}"))
+    if not jobs:
+        raise ValueError("没有要估算的发布任务")
+    return estimate_batch(
+        jobs,
+        concurrency or _scheduler_settings.backend_concurrency,
+        platform_concurrency,
+        _scheduler_settings.backend_platform_concurrency,
+    ).as_dict()
 
 
 # post_video("333",["demo.mp4"],"d","d")
@@ -0,0 +1,145 @@
+"""
+Production mode of the web backend on an ASGI server:
+
+    uvicorn sau_asgi:app --host 0.0.0.0 --port 5409
+
+Uploads are written to videoFile/ as they arrive instead of being buffered by Werkzeug.
+The /login and /accountEvents SSE streams and /getValidAccounts run on the server's
+event loop, so all QR code logins share one loop instead of a thread and a loop each.
+Every other route is served by the Flask app in sau_backend.py on a thread pool.
+Run a single worker process: login queues and account events are kept in memory.
+"""
+import asyncio
+import uuid
+from pathlib import Path
+
+from asgiref.wsgi import WsgiToAsgi
+from loguru import logger
+from werkzeug.utils import secure_filename
+
+import sau_backend
+from conf import BASE_DIR
+from myUtils.account_events import account_events, validate_accounts
+from myUtils.asgi import AsgiApp, LoopQueue, RequestError, move_upload, receive_multipart, send_event_stream, send_json
+from myUtils.auth import check_cookie
+from myUtils.login import douyin_cookie_gen, get_ks_cookie, get_tencent_cookie, xiaohongshu_cookie_gen
+from utils import metrics
+
+VIDEO_DIR = Path(BASE_DIR / "videoFile")
+MAX_UPLOAD_BYTES = sau_backend.app.config['MAX_CONTENT_LENGTH']
+
+# 1 小红书 2 视频号 3 抖音 4 快手
+LOGIN_FLOWS = {'1': xiaohongshu_cookie_gen, '2': get_tencent_cookie, '3': douyin_cookie_gen, '4': get_ks_cookie}
+
+app = AsgiApp(WsgiToAsgi(sau_backend.app), on_startup=[sau_backend.start_background_services])
+# 正在进行的扫码登录任务，保留引用免得被回收
+_login_tasks = set()
+
+
+async def _receive_video(request):
+    VIDEO_DIR.mkdir(exist_ok=True)
+    fields, files = await receive_multipart(request, VIDEO_DIR, MAX_UPLOAD_BYTES)
+    upload = next((file for file in files if file.field_name == 'file'), None)
+    for file in files:
+        if file is not upload:
+            file.discard()
+    if upload is None:
+        raise RequestError(400, "No file part in the request")
+    if upload.filename == '':
+        upload.discard()
+        raise RequestError(400, "No selected file")
+    return fields, upload
+
+
+@app.route('/upload', methods=('POST',))
+async def upload_file(request, send):
+    _, upload = await _receive_video(request)
+    safe_name = secure_filename(upload.filename)
+    if not safe_name:
+        upload.discard()
+        raise RequestError(400, "Invalid filename")
+    final_filename = f"{uuid.uuid1()}_{safe_name}"
+    await move_upload(upload, VIDEO_DIR / final_filename)
+    await send_json(send, {"code": 200, "msg": "File uploaded successfully", "data": final_filename})
+
+
+@app.route('/uploadSave', methods=('POST',))
+async def upload_save(request, send):
+    fields, upload = await _receive_video(request)
+    filename = sau_backend.upload_save_filename(upload.filename, fields.get('filename'))
+    if not filename:
+        upload.discard()
+        raise RequestError(400, "Invalid filename")
+    uuid_v1 = uuid.uuid1()
+    final_filename = f"{uuid_v1}_{filename}"
+    filepath = VIDEO_DIR / final_filename
+    try:
+        await move_upload(upload, filepath)
+        await asyncio.to_thread(sau_backend.record_uploaded_file, filename, final_filename, filepath, uuid_v1)
+    except Exception as e:
+        upload.discard()
+        raise RequestError(500, f"upload failed: {e}") from e
+    await send_json(send, {
+        "code": 200,
+        "msg": "File uploaded and saved successfully",
+        "data": {"filename": filename, "filepath": final_filename},
+    })
+
+
+async def _run_login(type, id, status_queue):
+    platform = sau_backend.LOGIN_PLATFORMS.get(type, type)
+    metrics.add_gauge('sau_login_sessions_in_flight', 1, platform=platform)
+    try:
+        await LOGIN_FLOWS[type](id, status_queue)
+    except Exception as e:
+        logger.exception(f"{platform} login for {id} failed: {e}")
+        status_queue.put("500")
+    finally:
+        metrics.add_gauge('sau_login_sessions_in_flight', -1, platform=platform)
+
+
+async def _login_frames(status_queue):
+    while True:
+        yield f"data: {await status_queue.get()}\n\n"
+
+
+# SSE 登录接口：二维码地址、登录结果（200 / 500）依次推给前端
+@app.route('/login')
+async def login(request, send):
+    type = request.args.get('type')
+    id = request.args.get('id')
+    status_queue = LoopQueue()
+    sau_backend.active_queues[id] = status_queue
+    if type in LOGIN_FLOWS:
+        task = asyncio.create_task(_run_login(type, id, status_queue))
+        _login_tasks.add(task)
+        task.add_done_callback(_login_tasks.discard)
+    try:
+        await send_event_stream(request, send, _login_frames(status_queue))
+    finally:
+        # 前端断开后清理队列；登录流程本身继续跑完
+        if sau_backend.active_queues.get(id) is status_queue:
+            del sau_backend.active_queues[id]
+
+
+# 账号状态变化的 SSE 推送，见 sau_backend.account_event_stream
+@app.route('/accountEvents')
+async def account_event_stream(request, send):
+    last_event_id = request.headers.get('last-event-id') or request.args.get('lastEventId')
+    queue = account_events.subscribe(
+        int(last_event_id) if last_event_id and last_event_id.isdigit() else None, queue=LoopQueue()
+    )
+    await send_event_stream(request, send, account_events.astream(queue))
+
+
+@app.route('/getValidAccounts')
+async def get_valid_accounts(request, send):
+    # 逐个校验 cookie，每个结果同时推给 /accountEvents
+    rows_list = await validate_accounts(check_cookie)
+    await send_json(send, {"code": 200, "msg": None, "data": rows_list})
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=5409)
@@ -4,17 +4,37 @@ import sqlite3
 import threading
 import time
 import uuid
+from dataclasses import asdict
 from pathlib import Path
 from queue import Queue
 from flask_cors import CORS
+from myUtils.account_events import account_events, backend_accounts, flag_relogin, publish_account, validate_accounts
 from myUtils.auth import check_cookie
-from flask import Flask, request, jsonify, Response, render_template, send_from_directory
+from flask import Flask, g, request, jsonify, Response, render_template, send_from_directory
 from werkzeug.utils import secure_filename
 from conf import BASE_DIR
+from myUtils.listing import (
+    FILE_COLUMNS,
+    ListQueryError,
+    ensure_list_schema,
+    etag_for,
+    list_rows,
+    parse_account_query,
+    parse_file_query,
+    table_version,
+)
 from myUtils.login import get_tencent_cookie, douyin_cookie_gen, get_ks_cookie, xiaohongshu_cookie_gen
-from myUtils.postVideo import post_video_tencent, post_video_DouYin, post_video_ks, post_video_xhs
+from myUtils.postVideo import post_video_tencent, post_video_DouYin, post_video_ks, post_video_xhs, post_video_plan, estimate_video_plan
+from utils import metrics
+from utils.browser_supervisor import browser_supervisor
+from utils.circuit_breaker import circuit_breakers
+from utils.cookie_keepalive import cookie_keepalive
+from utils.job_history import job_history
+from utils.job_scheduler import PRIORITY_CLASSES, AdmissionRejected
+from utils.publish_ledger import publish_ledger
 
 active_queues = {}
+validation_thread = None
 app = Flask(__name__)
 
 #允许所有来源跨域访问
@@ -23,6 +43,35 @@ CORS(app)
 # 限制上传文件大小为160MB
 app.config['MAX_CONTENT_LENGTH'] = 160 * 1024 * 1024
 
+# 登录类型 -> 平台名，用作指标标签
+LOGIN_PLATFORMS = {'1': 'xiaohongshu', '2': 'tencent', '3': 'douyin', '4': 'kuaishou'}
+
+
+# 每个接口的耗时直方图；SSE 接口只算到开始推流
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_duration(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('sau_http_request_duration_seconds', time.perf_counter() - started,
+                        route=route, method=request.method)
+        metrics.increment('sau_http_requests_total', route=route, method=request.method, status=response.status_code)
+    return response
+
+
+def collect_login_queue_metrics():
+    queues = list(active_queues.values())
+    yield 'sau_login_status_queues', {}, len(queues)
+    yield 'sau_login_status_queue_depth', {}, sum(queue.qsize() for queue in queues)
+
+
+metrics.register_collector(collect_login_queue_metrics)
+
 # 获取当前目录（假设 index.html 和 assets 在这里）
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -92,6 +141,25 @@ def get_file():
     return send_from_directory(file_path,filename)
 
 
+def upload_save_filename(original_filename, custom_filename=None):
+    # 表单里给了自定义文件名就用它加上原文件的扩展名；返回空字符串表示文件名不合法
+    if custom_filename:
+        return secure_filename(custom_filename + "." + original_filename.split('.')[-1])
+    return secure_filename(original_filename)
+
+
+def record_uploaded_file(filename, final_filename, filepath, uuid_v1):
+    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+        cursor = conn.cursor()
+        ensure_list_schema(conn)
+        cursor.execute('''
+                            INSERT INTO file_records (filename, filesize, file_path, uuid)
+        VALUES (?, ?, ?, ?)
+                            ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024),2), final_filename, str(uuid_v1)))
+        conn.commit()
+        print("✅ 上传文件已记录")
+
+
 @app.route('/uploadSave', methods=['POST'])
 def upload_save():
     if 'file' not in request.files:
@@ -110,11 +178,7 @@ def upload_save():
         }), 400
 
     # 获取表单中的自定义文件名（可选）
-    custom_filename = request.form.get('filename', None)
-    if custom_filename:
-        filename = secure_filename(custom_filename + "." + file.filename.split('.')[-1])
-    else:
-        filename = secure_filename(file.filename)
+    filename = upload_save_filename(file.filename, request.form.get('filename', None))
     if not filename:
         return jsonify({"code": 400, "data": None, "msg": "Invalid filename"}), 400
 
@@ -129,15 +193,7 @@ def upload_save():
 
         # 保存文件
         file.save(filepath)
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                                INSERT INTO file_records (filename, filesize, file_path)
-            VALUES (?, ?, ?)
-                                ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024),2), final_filename))
-            conn.commit()
-            print("✅ 上传文件已记录")
+        record_uploaded_file(filename, final_filename, filepath, uuid_v1)
 
         return jsonify({
             "code": 200,
@@ -156,38 +212,35 @@ def upload_save():
             "data": None
         }), 500
 
+def _list_response(query, to_item, msg):
+    """列表接口公共部分：表版本号没变且客户端带了同样的 ETag 时直接 304，不查数据"""
+    db_path = Path(BASE_DIR / "db" / "database.db")
+    with sqlite3.connect(db_path) as conn:
+        ensure_list_schema(conn, db_path)
+        version = table_version(conn, query.table)
+        etag = etag_for(query, version)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            rows, next_cursor = list_rows(conn, query, version, db_path)
+            items = [to_item(row) for row in rows]
+            # 不带 limit 时保持原来的返回格式（整个列表），带 limit 时返回一页和下一页的游标
+            data = items if query.limit is None else {"items": items, "next_cursor": next_cursor}
+            response = jsonify({"code": 200, "msg": msg, "data": data})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# 素材列表：name / uploaded_after / uploaded_before / min_size / max_size 筛选，
+# sort=upload_time|name|size|id（前缀 - 表示倒序），limit + cursor 分页
 @app.route('/getFiles', methods=['GET'])
 def get_all_files():
     try:
-        # 使用 with 自动管理数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row  # 允许通过列名访问结果
-            cursor = conn.cursor()
-
-            # 查询所有记录
-            cursor.execute("SELECT * FROM file_records")
-            rows = cursor.fetchall()
-
-            # 将结果转为字典列表，并提取UUID
-            data = []
-            for row in rows:
-                row_dict = dict(row)
-                # 从 file_path 中提取 UUID (文件名的第一部分，下划线前)
-                if row_dict.get('file_path'):
-                    file_path_parts = row_dict['file_path'].split('_', 1)  # 只分割第一个下划线
-                    if len(file_path_parts) > 0:
-                        row_dict['uuid'] = file_path_parts[0]  # UUID 部分
-                    else:
-                        row_dict['uuid'] = ''
-                else:
-                    row_dict['uuid'] = ''
-                data.append(row_dict)
-
-            return jsonify({
-                "code": 200,
-                "msg": "success",
-                "data": data
-            }), 200
+        query = parse_file_query(request.args)
+        return _list_response(query, lambda row: dict(zip(FILE_COLUMNS, row)), "success")
+    except ListQueryError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -196,28 +249,15 @@ def get_all_files():
         }), 500
 
 
+# 账号列表：platform / status / name 筛选，sort=id|name|platform|status，limit + cursor 分页
 @app.route("/getAccounts", methods=['GET'])
 def getAccounts():
     """快速获取所有账号信息，不进行cookie验证"""
     try:
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-            SELECT * FROM user_info''')
-            rows = cursor.fetchall()
-            rows_list = [list(row) for row in rows]
-
-            print("\n📋 当前数据表内容（快速获取）：")
-            for row in rows:
-                print(row)
-
-            return jsonify(
-                {
-                    "code": 200,
-                    "msg": None,
-                    "data": rows_list
-                }), 200
+        query = parse_account_query(request.args)
+        return _list_response(query, list, None)
+    except ListQueryError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
     except Exception as e:
         print(f"获取账号列表时出错: {str(e)}")
         return jsonify({
@@ -229,34 +269,38 @@ def getAccounts():
 
 @app.route("/getValidAccounts",methods=['GET'])
 async def getValidAccounts():
-    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-        SELECT * FROM user_info''')
-        rows = cursor.fetchall()
-        rows_list = [list(row) for row in rows]
-        print("\n📋 当前数据表内容：")
-        for row in rows:
-            print(row)
-        for row in rows_list:
-            flag = await check_cookie(row[1],row[2])
-            if not flag:
-                row[4] = 0
-                cursor.execute('''
-                UPDATE user_info 
-                SET status = ? 
-                WHERE id = ?
-                ''', (0,row[0]))
-                conn.commit()
-                print("✅ 用户状态已更新")
-        for row in rows:
-            print(row)
-        return jsonify(
-                        {
-                            "code": 200,
-                            "msg": None,
-                            "data": rows_list
-                        }),200
+    # 逐个校验 cookie，每个结果同时推给 /accountEvents
+    rows_list = await validate_accounts(check_cookie)
+    return jsonify(
+                    {
+                        "code": 200,
+                        "msg": None,
+                        "data": rows_list
+                    }),200
+
+
+# 后台校验所有账号，立即返回；结果通过 /accountEvents 逐个推送
+@app.route('/validateAccounts', methods=['POST'])
+def validate_accounts_in_background():
+    global validation_thread
+    started = validation_thread is None or not validation_thread.is_alive()
+    if started:
+        validation_thread = threading.Thread(
+            target=lambda: asyncio.run(validate_accounts(check_cookie)), daemon=True
+        )
+        validation_thread.start()
+    return jsonify({"code": 200, "msg": None, "data": {"started": started}}), 200
+
+
+# 账号状态变化的 SSE 推送：登录完成、校验结果、发布时发现掉登录、编辑和删除
+@app.route('/accountEvents')
+def account_event_stream():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    queue = account_events.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    response = Response(account_events.stream(queue), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/deleteFile', methods=['GET'])
 def delete_file():
@@ -365,6 +409,7 @@ def delete_account():
             # 删除数据库记录
             cursor.execute("DELETE FROM user_info WHERE id = ?", (account_id,))
             conn.commit()
+        account_events.publish("delete", {"id": account_id})
 
         return jsonify({
             "code": 200,
@@ -431,6 +476,8 @@ def postVideo():
     videos_per_day = data.get('videosPerDay')
     daily_times = data.get('dailyTimes')
     start_days = data.get('startDays')
+    # 调度：优先级 urgent / normal / bulk，操作者之间公平分配发布名额（不传时按来源地址区分）
+    scheduling = {"priority": data.get('priority'), "operator": data.get('operator') or request.remote_addr or ''}
 
     # 参数校验
     if not file_list:
@@ -441,6 +488,8 @@ def postVideo():
         return jsonify({"code": 400, "msg": "平台类型不能为空", "data": None}), 400
     if not title:
         return jsonify({"code": 400, "msg": "标题不能为空", "data": None}), 400
+    if scheduling["priority"] and scheduling["priority"] not in PRIORITY_CLASSES:
+        return jsonify({"code": 400, "msg": f"不支持的优先级: {scheduling['priority']}", "data": None}), 400
 
     # 打印获取到的数据（仅作为示例）
     print("File List:", file_list)
@@ -450,16 +499,16 @@ def postVideo():
         match type:
             case 1:
                 post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days)
+                                   start_days, **scheduling)
             case 2:
                 post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days, is_draft)
+                                   start_days, is_draft, **scheduling)
             case 3:
                 post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days, thumbnail_path, productLink, productTitle)
+                          start_days, thumbnail_path, productLink, productTitle, **scheduling)
             case 4:
                 post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
+                          start_days, **scheduling)
             case _:
                 return jsonify({"code": 400, "msg": f"不支持的平台类型: {type}", "data": None}), 400
 
@@ -470,6 +519,9 @@ def postVideo():
                 "msg": "发布任务已提交",
                 "data": None
             }), 200
+    except AdmissionRejected as e:
+        # 排在前面的任务太多，按预计完成时间赶不上定时发布时间
+        return jsonify({"code": 409, "msg": str(e), "data": None}), 409
     except Exception as e:
         print(f"发布视频时出错: {str(e)}")
         return jsonify({
@@ -479,6 +531,34 @@ def postVideo():
         }), 500
 
 
+@app.route('/postVideoPlan', methods=['POST'])
+def postVideoPlan():
+    # 一个视频同时发到多个平台，预处理（哈希、探测、封面）只做一次
+    data = request.get_json()
+    if not data:
+        return jsonify({"code": 400, "msg": "请求数据不能为空", "data": None}), 400
+    if not data.get('file'):
+        return jsonify({"code": 400, "msg": "文件不能为空", "data": None}), 400
+    if not data.get('title'):
+        return jsonify({"code": 400, "msg": "标题不能为空", "data": None}), 400
+    if not data.get('targets'):
+        return jsonify({"code": 400, "msg": "发布目标不能为空", "data": None}), 400
+
+    try:
+        result = post_video_plan(data['file'], data['title'], data.get('tags') or [], data['targets'],
+                                 data.get('cover'), data.get('enableTimer'), data.get('videosPerDay'),
+                                 data.get('dailyTimes'), data.get('startDays'), data.get('priority'),
+                                 data.get('operator') or request.remote_addr or '', data.get('category'))
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    except Exception as e:
+        print(f"发布计划出错: {str(e)}")
+        return jsonify({"code": 500, "msg": f"发布失败: {str(e)}", "data": None}), 500
+    if result["status"] != "ok":
+        return jsonify({"code": 500, "msg": f"{result['failed']} 个平台发布失败", "data": result}), 500
+    return jsonify({"code": 200, "msg": "发布完成", "data": result}), 200
+
+
 @app.route('/updateUserinfo', methods=['POST'])
 def updateUserinfo():
     # 获取JSON数据
@@ -502,6 +582,7 @@ def updateUserinfo():
                            WHERE id = ?;
                            ''', (type, userName, user_id))
             conn.commit()
+        publish_account(user_id, reason="edited")
 
         return jsonify({
             "code": 200,
@@ -540,22 +621,23 @@ def postVideoBatch():
         videos_per_day = data.get('videosPerDay')
         daily_times = data.get('dailyTimes')
         start_days = data.get('startDays')
+        scheduling = {"priority": data.get('priority'), "operator": data.get('operator') or request.remote_addr or ''}
         # 打印获取到的数据（仅作为示例）
         print("File List:", file_list)
         print("Account List:", account_list)
         match type:
             case 1:
                 post_video_xhs(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                               start_days)
+                               start_days, **scheduling)
             case 2:
                 post_video_tencent(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                                   start_days, is_draft)
+                                   start_days, is_draft, **scheduling)
             case 3:
                 post_video_DouYin(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days, productLink, productTitle)
+                          start_days, productLink, productTitle, **scheduling)
             case 4:
                 post_video_ks(title, file_list, tags, account_list, category, enableTimer, videos_per_day, daily_times,
-                          start_days)
+                          start_days, **scheduling)
     # 返回响应给客户端
     return jsonify(
         {
@@ -685,8 +767,96 @@ def download_cookie():
         }), 500
 
 
+# 熔断器状态：某平台连续在同一阶段失败后会被熔断，冷却后放一个探测任务
+@app.route('/getCircuitBreakers', methods=['GET'])
+def get_circuit_breakers():
+    platform = request.args.get('platform')
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": circuit_breakers.status(platform)
+    }), 200
+
+
+@app.route('/resetCircuitBreaker', methods=['POST'])
+def reset_circuit_breaker():
+    data = request.get_json(silent=True) or {}
+    removed = circuit_breakers.reset(data.get('platform'))
+    return jsonify({
+        "code": 200,
+        "msg": f"已重置 {removed} 个熔断器",
+        "data": None
+    }), 200
+
+
+# 已发布记录：同一账号 + 视频内容 + 标题只发一次，重试时直接跳过
+@app.route('/getPublishedPosts', methods=['GET'])
+def get_published_posts():
+    platform = request.args.get('platform')
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": [asdict(post) for post in publish_ledger.recent(platform, limit)]
+    }), 200
+
+
+# 浏览器进程：本项目启动的浏览器的内存 / CPU，以及是否已成孤儿
+@app.route('/getBrowserStatus', methods=['GET'])
+def get_browser_status():
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": browser_supervisor.status()
+    }), 200
+
+
+# 任务耗时历史：每个平台、每个文件大小档成功任务的 p50 / p95 耗时和成功率
+@app.route('/getJobStats', methods=['GET'])
+def get_job_stats():
+    platform = request.args.get('platform')
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": [row.as_dict() for row in job_history.stats(platform)]
+    }), 200
+
+
+# 按任务历史估算一批发布的完成时间，并在当前限流下推荐并发数；请求体同 /postVideoPlan 的 fileList + targets
+@app.route('/estimatePublish', methods=['POST'])
+def estimate_publish():
+    data = request.get_json(silent=True) or {}
+    file_list = data.get('fileList') or ([data['file']] if data.get('file') else [])
+    if not file_list or not data.get('targets'):
+        return jsonify({"code": 400, "msg": "文件列表和发布目标不能为空", "data": None}), 400
+    try:
+        result = estimate_video_plan(file_list, data['targets'], data.get('concurrency'), data.get('platformConcurrency'))
+    except ValueError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    return jsonify({
+        "code": 200,
+        "msg": None,
+        "data": result
+    }), 200
+
+
+# Prometheus 指标：所有 worker / CLI 进程汇总后的计数、耗时直方图和当前状态
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 # 包装函数：在线程中运行异步函数
 def run_async_function(type,id,status_queue):
+    platform = LOGIN_PLATFORMS.get(type, type)
+    metrics.add_gauge('sau_login_sessions_in_flight', 1, platform=platform)
+    try:
+        _run_login(type, id, status_queue)
+    finally:
+        metrics.add_gauge('sau_login_sessions_in_flight', -1, platform=platform)
+
+
+def _run_login(type,id,status_queue):
     match type:
         case '1':
             loop = asyncio.new_event_loop()
@@ -719,5 +889,19 @@ def sse_stream(status_queue):
             # 避免 CPU 占满
             time.sleep(0.1)
 
+def start_background_services():
+    # 启动时清掉崩溃残留的浏览器进程和临时目录，之后定期再清
+    browser_supervisor.start_periodic()
+    # 定期把本进程的指标写到 db/metrics，供其他进程的 /metrics 和 `sau metrics` 汇总
+    metrics.start_flushing()
+    # 后台按到期时间给 cookie 保活，掉登录的账号标成失效并推给账号管理页
+    if backend_accounts not in cookie_keepalive.sources:
+        cookie_keepalive.sources.append(backend_accounts)
+        cookie_keepalive.on_relogin_needed.append(flag_relogin)
+    cookie_keepalive.start_background()
+
+
 if __name__ == '__main__':
+    # 开发用的 Werkzeug 服务器；生产环境用 ASGI 模式：uvicorn sau_asgi:app --host 0.0.0.0 --port 5409
+    start_background_services()
     app.run(host='0.0.0.0' ,port=5409)
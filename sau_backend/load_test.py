@@ -0,0 +1,164 @@
+"""
+Load test for the web backend: holds many SSE streams open while firing JSON requests,
+and optionally uploads a large file, then reports latency percentiles and throughput.
+
+    uvicorn sau_asgi:app --port 5409
+    python sau_backend/load_test.py --streams 500 --requests 5000 --concurrency 100
+
+Run it once against `python sau_backend.py` (Werkzeug, a thread per stream) and once
+against `uvicorn sau_asgi:app` to compare. Only the standard library is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def _open(url):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    return parts, reader, writer
+
+
+async def _read_head(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before a response")
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    return int(status_line.split()[1])
+
+
+async def request(url, method="GET", body=b"", headers=None):
+    parts, reader, writer = await _open(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    lines = [f"{method} {target or '/'} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close",
+             f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    try:
+        status = await _read_head(reader)
+        await reader.read()
+    finally:
+        writer.close()
+    return status
+
+
+async def hold_stream(url, opened: asyncio.Event, ready: list, stop: asyncio.Event):
+    """Open one SSE stream, count it once its first frame arrives, keep it open until `stop`."""
+    parts, reader, writer = await _open(url)
+    writer.write(f"GET {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        if await _read_head(reader) == 200 and await reader.readline():
+            ready.append(time.perf_counter())
+        opened.set()
+        await stop.wait()
+    finally:
+        writer.close()
+
+
+async def upload(url, size_mb):
+    boundary = "sauloadtest"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"load.mp4\"\r\n"
+            f"Content-Type: video/mp4\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    size = size_mb * 1024 * 1024
+    parts, reader, writer = await _open(url)
+    writer.write((f"POST {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n"
+                  f"Content-Type: multipart/form-data; boundary={boundary}\r\n"
+                  f"Content-Length: {len(head) + size + len(tail)}\r\n\r\n").encode() + head)
+    chunk = os.urandom(1024 * 1024)
+    started = time.perf_counter()
+    for _ in range(size_mb):
+        writer.write(chunk)
+        await writer.drain()
+    writer.write(tail)
+    await writer.drain()
+    status = await _read_head(reader)
+    body = await reader.read()
+    writer.close()
+    return status, time.perf_counter() - started, body
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def main(args):
+    base = args.url.rstrip("/")
+    report = {}
+
+    stop = asyncio.Event()
+    ready: list = []
+    stream_tasks = []
+    started = time.perf_counter()
+    for _ in range(args.streams):
+        opened = asyncio.Event()
+        stream_tasks.append(asyncio.create_task(hold_stream(base + args.stream_path, opened, ready, stop)))
+    await asyncio.sleep(0)
+    deadline = time.perf_counter() + args.stream_timeout
+    while len(ready) < args.streams and time.perf_counter() < deadline \
+            and not all(task.done() for task in stream_tasks):
+        await asyncio.sleep(0.1)
+    report["streams_open"] = len(ready)
+    report["streams_requested"] = args.streams
+    report["streams_open_seconds"] = round((max(ready) if ready else time.perf_counter()) - started, 3)
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            begun = time.perf_counter()
+            try:
+                status = await request(base + args.path)
+            except OSError:
+                errors += 1
+                return
+            if status >= 400:
+                errors += 1
+            latencies.append(time.perf_counter() - begun)
+
+    begun = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - begun
+    report.update({
+        "requests": args.requests,
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+    })
+
+    if args.upload_mb:
+        status, seconds, body = await upload(base + "/upload", args.upload_mb)
+        report["upload_status"] = status
+        report["upload_mb_per_second"] = round(args.upload_mb / seconds, 1)
+        if status == 200:
+            report["upload_file"] = json.loads(body or b"{}").get("data")
+
+    stop.set()
+    await asyncio.gather(*stream_tasks, return_exceptions=True)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5409", help="Backend base URL")
+    parser.add_argument("--streams", type=int, default=200, help="SSE streams held open during the test")
+    parser.add_argument("--stream-path", default="/accountEvents", help="SSE route to hold open")
+    parser.add_argument("--stream-timeout", type=float, default=30, help="Seconds to wait for the streams to open")
+    parser.add_argument("--requests", type=int, default=2000, help="JSON requests to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="JSON requests in flight at once")
+    parser.add_argument("--path", default="/getAccounts?limit=50", help="Route the JSON requests go to")
+    parser.add_argument("--upload-mb", type=int, default=0, help="Also upload a file of this many MB to /upload")
+    asyncio.run(main(parser.parse_args()))
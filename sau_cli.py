@@ -2,10 +2,17 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import csv
+import hashlib
+import io
+import json
 import sys
-from dataclasses import dataclass
+import time
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
+from functools import wraps
 from typing import Iterable, Sequence
 
 from conf import BASE_DIR
@@ -20,6 +27,13 @@ from uploader.alipay_uploader.main import (
     cookie_auth as alipay_cookie_auth,
 )
 from uploader.bilibili_uploader.runtime import run_biliup_command
+from uploader.bilibili_uploader.upos import (
+    ENGINE_NATIVE as BILIBILI_ENGINE_NATIVE,
+    ENGINES as BILIBILI_ENGINES,
+    SubmissionStarted as BilibiliSubmissionStarted,
+    load_settings as load_bilibili_upload_settings,
+    upload_video as upload_bilibili_video_native,
+)
 from uploader.douyin_uploader.main import (
     DOUYIN_PUBLISH_STRATEGY_IMMEDIATE,
     DOUYIN_PUBLISH_STRATEGY_SCHEDULED,
@@ -66,8 +80,44 @@ from uploader.youtube_uploader.main import (
     cookie_auth as youtube_cookie_auth,
     youtube_setup,
 )
+from uploader.youtube_uploader.resumable import (
+    ENGINE_RESUMABLE as YOUTUBE_ENGINE_RESUMABLE,
+    ENGINES as YOUTUBE_ENGINES,
+    load_settings as load_youtube_resumable_settings,
+    upload_video as upload_youtube_video_resumable,
+)
+from utils import metrics
+from utils.browser_session import shared_browser_session
+from utils.browser_supervisor import browser_supervisor
+from utils.circuit_breaker import circuit_breakers
+from utils.cookie_check_cache import cookie_check_cache
+from utils.cookie_keepalive import KEEPALIVE_TARGETS, STATUS_EXPIRING, STATUS_RELOGIN, cookie_keepalive
+from utils.capacity import PlannedJob, estimate_batch
+from utils.job_history import files_size, job_history
+from utils.job_phase import set_phase
+from utils.job_scheduler import PRIORITY_CLASSES, AdmissionRejected, JobScheduler
+from utils.publish_ledger import idempotency_key, publish_ledger
+from utils.publish_plan import COVER_AUTO, aggregate_results, plan_rows, prepare_asset
+from utils.rate_limit import publish_rate_limiter
+from utils.watch_folder import (
+    DEFAULT_POLL_SECONDS,
+    DEFAULT_SETTLE_SECONDS,
+    INGEST_DIR,
+    FolderWatcher,
+    VideoMetadata,
+    ingest_file,
+    read_sidecar,
+    record_material,
+)
+from utils.watchdog import run_with_watchdog
 
 SCHEDULE_FORMAT = "%Y-%m-%d %H:%M"
+DEFAULT_BATCH_CONCURRENCY = 4
+DEFAULT_BATCH_PLATFORM_CONCURRENCY = 2
+BATCH_ACTIONS = {"upload-video", "upload-note"}
+BATCH_RESERVED_FIELDS = {"id", "platform", "action", "priority", "operator"}
+BATCH_FLAG_FIELDS = {"draft", "debug", "headed", "headless"}
+BATCH_PATH_FIELDS = {"file", "images", "thumbnail", "thumbnail_landscape", "thumbnail_portrait", "notef"}
 
 
 @dataclass(slots=True)
@@ -169,6 +219,7 @@ class BilibiliVideoUploadRequest:
     tags: list[str]
     publish_date: datetime | int
     thumbnail_file: Path | None = None
+    engine: str | None = None
 
 
 @dataclass(slots=True)
@@ -252,6 +303,7 @@ class YouTubeVideoUploadRequest:
     thumbnail_file: Path | None = None
     playlist: str | None = None
     visibility: str = "public"
+    engine: str | None = None
     debug: bool = True
     headless: bool = False
 
@@ -270,6 +322,62 @@ def resolve_account_file(platform: str, account_name: str) -> Path:
     return account_file
 
 
+async def wait_for_publish_slot(platform: str, account_name: str) -> None:
+    set_phase("rate_limit")
+    waited = await publish_rate_limiter.acquire(platform, account_name)
+    set_phase(None)
+    if waited:
+        print(f"Waited {waited:.0f}s for the {platform} rate limit ({account_name})", file=sys.stderr)
+
+
+def publish_guarded(platform: str):
+    """
+    Run an upload under the platform circuit breaker (utils/circuit_breaker.py) and the
+    publish ledger (utils/publish_ledger.py): content this account already published is
+    skipped instead of being posted twice.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request):
+            files = getattr(request, "image_files", None) or [request.video_file]
+            try:
+                key = await asyncio.to_thread(idempotency_key, platform, request.account_name, files, request.title)
+            except OSError:
+                # 读不到文件就算不出去重 key，交给上传流程自己报错
+                key = None
+            existing = publish_ledger.lookup(key) if key else None
+            if existing is not None:
+                print(
+                    f"Already published on {platform} by {request.account_name}"
+                    f"{f' as {existing.post_id}' if existing.post_id else ''}; skipping. "
+                    f"Run `sau published forget {key}` to publish it again.",
+                    file=sys.stderr,
+                )
+                return resolve_account_file(platform, request.account_name)
+            # 每个任务的各阶段耗时、文件大小和结果记进 utils/job_history.py，供 `sau plan --estimate` 估算
+            with job_history.recording(platform, request.account_name, files):
+                async with circuit_breakers.guard(platform):
+                    if key is None:
+                        result = await run_with_watchdog(lambda: func(request), platform=platform)
+                    else:
+                        result = None
+
+                        async def publish():
+                            nonlocal result
+                            result = await run_with_watchdog(lambda: func(request), platform=platform)
+
+                        post = await publish_ledger.publish_once(key, platform, request.account_name, request.title, publish)
+                        if post.post_url or post.post_id:
+                            print(f"Published {platform} post: {post.post_url or post.post_id}", file=sys.stderr)
+            # 刚用这个登录发布成功，推迟它的下一次保活刷新
+            cookie_keepalive.record_use(resolve_account_file(platform, request.account_name))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
 def parse_tags(raw_tags: str | None) -> list[str]:
     if not raw_tags:
         return []
@@ -382,13 +490,31 @@ async def check_youtube_account(account_name: str) -> bool:
     return await youtube_cookie_auth(str(account_file))
 
 
+@publish_guarded("youtube")
 async def upload_youtube_video(request: YouTubeVideoUploadRequest) -> Path:
     account_file = resolve_account_file("youtube", request.account_name)
-    is_ready = await youtube_setup(str(account_file), handle=False)
+    if (request.engine or load_youtube_resumable_settings().engine) == YOUTUBE_ENGINE_RESUMABLE:
+        await wait_for_publish_slot("youtube", request.account_name)
+        await upload_youtube_video_resumable(
+            request.account_name,
+            request.video_file,
+            request.title,
+            request.description,
+            request.tags,
+            thumbnail_path=str(request.thumbnail_file) if request.thumbnail_file else None,
+            playlist=request.playlist,
+            visibility=request.visibility,
+        )
+        return account_file
+
+    is_ready = await cookie_check_cache.check(
+        "youtube", account_file, lambda: youtube_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"YouTube cookie is missing or expired: {account_file}. Run `sau youtube login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("youtube", request.account_name)
 
     app = YouTubeVideo(
         request.title,
@@ -406,13 +532,17 @@ async def upload_youtube_video(request: YouTubeVideoUploadRequest) -> Path:
     return account_file
 
 
+@publish_guarded("douyin")
 async def upload_video(request: DouyinVideoUploadRequest) -> Path:
     account_file = resolve_account_file("douyin", request.account_name)
-    is_ready = await douyin_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "douyin", account_file, lambda: douyin_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Douyin cookie is missing or expired: {account_file}. Run `sau douyin login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("douyin", request.account_name)
 
     app = DouYinVideo(
         request.title,
@@ -439,13 +569,17 @@ async def upload_video(request: DouyinVideoUploadRequest) -> Path:
     return account_file
 
 
+@publish_guarded("douyin")
 async def upload_note(request: DouyinNoteUploadRequest) -> Path:
     account_file = resolve_account_file("douyin", request.account_name)
-    is_ready = await douyin_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "douyin", account_file, lambda: douyin_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Douyin cookie is missing or expired: {account_file}. Run `sau douyin login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("douyin", request.account_name)
 
     app = DouYinNote(
         image_paths=[str(path) for path in request.image_files],
@@ -463,13 +597,17 @@ async def upload_note(request: DouyinNoteUploadRequest) -> Path:
     return account_file
 
 
+@publish_guarded("kuaishou")
 async def upload_kuaishou_video(request: KuaishouVideoUploadRequest) -> Path:
     account_file = resolve_account_file("kuaishou", request.account_name)
-    is_ready = await ks_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "kuaishou", account_file, lambda: ks_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Kuaishou cookie is missing or expired: {account_file}. Run `sau kuaishou login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("kuaishou", request.account_name)
 
     app = KSVideo(
         title=request.title,
@@ -488,13 +626,17 @@ async def upload_kuaishou_video(request: KuaishouVideoUploadRequest) -> Path:
     return account_file
 
 
+@publish_guarded("kuaishou")
 async def upload_kuaishou_note(request: KuaishouNoteUploadRequest) -> Path:
     account_file = resolve_account_file("kuaishou", request.account_name)
-    is_ready = await ks_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "kuaishou", account_file, lambda: ks_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Kuaishou cookie is missing or expired: {account_file}. Run `sau kuaishou login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("kuaishou", request.account_name)
 
     app = KSNote(
         image_paths=[str(path) for path in request.image_files],
@@ -511,13 +653,17 @@ async def upload_kuaishou_note(request: KuaishouNoteUploadRequest) -> Path:
     return account_file
 
 
+@publish_guarded("xiaohongshu")
 async def upload_xiaohongshu_video(request: XiaohongshuVideoUploadRequest) -> Path:
     account_file = resolve_account_file("xiaohongshu", request.account_name)
-    is_ready = await xiaohongshu_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "xiaohongshu", account_file, lambda: xiaohongshu_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Xiaohongshu cookie is missing or expired: {account_file}. Run `sau xiaohongshu login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("xiaohongshu", request.account_name)
 
     app = XiaoHongShuVideo(
         title=request.title,
@@ -535,13 +681,17 @@ async def upload_xiaohongshu_video(request: XiaohongshuVideoUploadRequest) -> Pa
     return account_file
 
 
+@publish_guarded("xiaohongshu")
 async def upload_xiaohongshu_note(request: XiaohongshuNoteUploadRequest) -> Path:
     account_file = resolve_account_file("xiaohongshu", request.account_name)
-    is_ready = await xiaohongshu_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "xiaohongshu", account_file, lambda: xiaohongshu_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Xiaohongshu cookie is missing or expired: {account_file}. Run `sau xiaohongshu login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("xiaohongshu", request.account_name)
 
     app = XiaoHongShuNote(
         image_paths=[str(path) for path in request.image_files],
@@ -559,12 +709,37 @@ async def upload_xiaohongshu_note(request: XiaohongshuNoteUploadRequest) -> Path
     return account_file
 
 
+@publish_guarded("bilibili")
 async def upload_bilibili_video(request: BilibiliVideoUploadRequest) -> Path:
     account_file = resolve_account_file("bilibili", request.account_name)
     if not account_file.exists():
         raise RuntimeError(
             f"Bilibili account file is missing: {account_file}. Run `sau bilibili login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("bilibili", request.account_name)
+
+    settings = load_bilibili_upload_settings()
+    if (request.engine or settings.engine) == BILIBILI_ENGINE_NATIVE:
+        try:
+            await upload_bilibili_video_native(
+                account_file,
+                request.video_file,
+                request.title,
+                request.description,
+                request.tid,
+                request.tags,
+                cover_path=request.thumbnail_file,
+                publish_date=request.publish_date,
+                settings=settings,
+            )
+            return account_file
+        except BilibiliSubmissionStarted:
+            raise
+        except Exception as exc:
+            # 稿件还没提交，换 biliup 从头传一遍不会重复投稿
+            if not settings.fallback_to_biliup or request.engine == BILIBILI_ENGINE_NATIVE:
+                raise
+            print(f"Bilibili native upload failed before submission, retrying with biliup: {exc}", file=sys.stderr)
 
     arguments = [
         "-u",
@@ -585,20 +760,26 @@ async def upload_bilibili_video(request: BilibiliVideoUploadRequest) -> Path:
     if isinstance(request.publish_date, datetime):
         arguments.extend(["--dtime", str(int(request.publish_date.timestamp()))])
 
-    result = run_biliup_command(arguments)
+    # biliup 是同步子进程，放到线程里跑，批量任务时不阻塞事件循环
+    set_phase("upload_file")
+    result = await asyncio.to_thread(run_biliup_command, arguments)
     if result.returncode != 0:
         raise RuntimeError((result.stderr or result.stdout or "").strip() or "Bilibili upload failed")
     return account_file
 
 
+@publish_guarded("tencent")
 async def upload_tencent_video(request: TencentVideoUploadRequest) -> Path:
     account_file = resolve_account_file("tencent", request.account_name)
-    is_ready = await tencent_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "tencent", account_file, lambda: tencent_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Tencent/WeChat Channels cookie is missing or expired: {account_file}. "
             f"Run `sau tencent login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("tencent", request.account_name)
 
     app = TencentVideo(
         title=request.title,
@@ -638,13 +819,17 @@ async def check_baijiahao_account(account_name: str) -> bool:
     return await baijiahao_cookie_auth(str(account_file))
 
 
+@publish_guarded("baijiahao")
 async def upload_baijiahao_video(request: BaijiahaoVideoUploadRequest) -> Path:
     account_file = resolve_account_file("baijiahao", request.account_name)
-    is_ready = await baijiahao_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "baijiahao", account_file, lambda: baijiahao_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Baijiahao cookie is missing or expired: {account_file}. Run `sau baijiahao login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("baijiahao", request.account_name)
 
     app = BaiJiaHaoVideo(
         title=request.title,
@@ -673,13 +858,17 @@ async def check_alipay_account(account_name: str) -> bool:
     return await alipay_cookie_auth(str(account_file))
 
 
+@publish_guarded("alipay")
 async def upload_alipay_video(request: AlipayVideoUploadRequest) -> Path:
     account_file = resolve_account_file("alipay", request.account_name)
-    is_ready = await alipay_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "alipay", account_file, lambda: alipay_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Alipay cookie is missing or expired: {account_file}. Run `sau alipay login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("alipay", request.account_name)
 
     app = AlipayVideo(
         title=request.title,
@@ -708,13 +897,17 @@ async def check_weibo_account(account_name: str) -> bool:
     return await weibo_cookie_auth(str(account_file))
 
 
+@publish_guarded("weibo")
 async def upload_weibo_video(request: WeiboVideoUploadRequest) -> Path:
     account_file = resolve_account_file("weibo", request.account_name)
-    is_ready = await weibo_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "weibo", account_file, lambda: weibo_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Weibo cookie is missing or expired: {account_file}. Run `sau weibo login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("weibo", request.account_name)
 
     app = WeiBoVideo(
         title=request.title,
@@ -743,13 +936,17 @@ async def check_hupu_account(account_name: str) -> bool:
     return await hupu_cookie_auth(str(account_file))
 
 
+@publish_guarded("hupu")
 async def upload_hupu_video(request: HupuVideoUploadRequest) -> Path:
     account_file = resolve_account_file("hupu", request.account_name)
-    is_ready = await hupu_setup(str(account_file), handle=False)
+    is_ready = await cookie_check_cache.check(
+        "hupu", account_file, lambda: hupu_setup(str(account_file), handle=False)
+    )
     if not is_ready:
         raise RuntimeError(
             f"Hupu cookie is missing or expired: {account_file}. Run `sau hupu login --account {request.account_name}` first."
         )
+    await wait_for_publish_slot("hupu", request.account_name)
 
     app = HuPuVideo(
         title=request.title,
@@ -772,6 +969,13 @@ def existing_file_path(value: str) -> Path:
     return path
 
 
+def existing_dir_path(value: str) -> Path:
+    path = Path(value)
+    if not path.is_dir():
+        raise argparse.ArgumentTypeError(f"Directory not found: {value}")
+    return path
+
+
 def schedule_value(value: str):
     try:
         return parse_schedule(value)
@@ -789,9 +993,20 @@ def add_runtime_flags(parser: argparse.ArgumentParser) -> None:
     parser.set_defaults(headless=True)
 
 
-def build_parser() -> argparse.ArgumentParser:
+def add_scheduling_flags(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--priority",
+        choices=list(PRIORITY_CLASSES),
+        help="Priority class of jobs without their own 'priority' (default from SCHEDULER, normally 'normal')",
+    )
+    parser.add_argument(
+        "--operator", default="", help="Who submitted the jobs; slots are shared fairly between operators"
+    )
+
+
+def build_parser(parser_class: type[argparse.ArgumentParser] = argparse.ArgumentParser) -> argparse.ArgumentParser:
     schedule_help = SCHEDULE_FORMAT.replace("%", "%%")
-    parser = argparse.ArgumentParser(
+    parser = parser_class(
         prog="sau",
         description="CLI for social-auto-upload.",
     )
@@ -909,6 +1124,11 @@ def build_parser() -> argparse.ArgumentParser:
     bilibili_upload_video_parser.add_argument("--tags", default="", help="Comma-separated tags, such as tag1,tag2")
     bilibili_upload_video_parser.add_argument("--thumbnail", type=existing_file_path, help="Optional Bilibili cover image path")
     bilibili_upload_video_parser.add_argument("--schedule", type=schedule_value, help=f"Schedule time in {schedule_help}")
+    bilibili_upload_video_parser.add_argument(
+        "--engine",
+        choices=BILIBILI_ENGINES,
+        help="Upload in-process with parallel chunks, or through the biliup binary (default from BILIBILI_UPLOAD in conf.py)",
+    )
 
     tencent_parser = platform_parsers.add_parser("tencent", help="Tencent/WeChat Channels operations")
     tencent_actions = tencent_parser.add_subparsers(dest="action", required=True)
@@ -1012,6 +1232,11 @@ def build_parser() -> argparse.ArgumentParser:
     youtube_upload_video_parser.add_argument("--playlist", help="Optional playlist name to add the video to (for series)")
     youtube_upload_video_parser.add_argument(
         "--visibility", default="public", choices=["public", "unlisted", "private"], help="Video visibility")
+    youtube_upload_video_parser.add_argument(
+        "--engine",
+        choices=YOUTUBE_ENGINES,
+        help="Upload through YouTube Studio in a browser, or the resumable upload API (default from YT_API in conf.py)",
+    )
     add_runtime_flags(youtube_upload_video_parser)
 
     baijiahao_parser = platform_parsers.add_parser("baijiahao", help="Baidu Baijiahao operations")
@@ -1033,10 +1258,314 @@ def build_parser() -> argparse.ArgumentParser:
     baijiahao_upload_video_parser.add_argument("--collection", default=None, help="Optional collection name")
     add_runtime_flags(baijiahao_upload_video_parser)
 
+    breaker_parser = platform_parsers.add_parser("breaker", help="Inspect or reset publish circuit breakers")
+    breaker_actions = breaker_parser.add_subparsers(dest="action", required=True)
+    breaker_status_parser = breaker_actions.add_parser("status", help="Show circuit breaker state")
+    breaker_status_parser.add_argument("--platform-name", dest="platform_name", help="Only show one platform")
+    breaker_status_parser.add_argument("--json", action="store_true", help="Print raw JSON")
+    breaker_reset_parser = breaker_actions.add_parser("reset", help="Close circuit breakers manually")
+    breaker_reset_parser.add_argument("--platform-name", dest="platform_name", help="Only reset one platform")
+
+    published_parser = platform_parsers.add_parser("published", help="Inspect the record of published posts")
+    published_actions = published_parser.add_subparsers(dest="action", required=True)
+    published_list_parser = published_actions.add_parser("list", help="Show recently published posts")
+    published_list_parser.add_argument("--platform-name", dest="platform_name", help="Only show one platform")
+    published_list_parser.add_argument("--limit", type=int, default=50, help="Maximum rows to show")
+    published_list_parser.add_argument("--json", action="store_true", help="Print raw JSON")
+    published_forget_parser = published_actions.add_parser(
+        "forget", help="Forget one published post so the same content can be published again"
+    )
+    published_forget_parser.add_argument("key", help="Idempotency key shown by `sau published list`")
+
+    browsers_parser = platform_parsers.add_parser("browsers", help="Inspect or clean up launched browsers")
+    browsers_actions = browsers_parser.add_subparsers(dest="action", required=True)
+    browsers_status_parser = browsers_actions.add_parser("status", help="Show memory and CPU of launched browsers")
+    browsers_status_parser.add_argument("--json", action="store_true", help="Print raw JSON")
+    browsers_actions.add_parser("reap", help="Kill orphaned browsers and delete stale temp profiles")
+
+    cookies_parser = platform_parsers.add_parser("cookies", help="Keep account logins alive between uploads")
+    cookies_actions = cookies_parser.add_subparsers(dest="action", required=True)
+    cookies_status_parser = cookies_actions.add_parser(
+        "status", help="Show login expiry, next refresh and accounts that need a QR code re-login"
+    )
+    cookies_status_parser.add_argument("--json", action="store_true", help="Print raw JSON")
+    cookies_keepalive_parser = cookies_actions.add_parser(
+        "keepalive", help="Refresh logins shortly before they expire, one account at a time"
+    )
+    cookies_keepalive_parser.add_argument("--once", action="store_true", help="Refresh at most one due account and exit")
+    cookies_refresh_parser = cookies_actions.add_parser("refresh", help="Refresh one account's login now")
+    cookies_refresh_parser.add_argument("platform_name", choices=sorted(KEEPALIVE_TARGETS), help="Platform")
+    cookies_refresh_parser.add_argument("account", help="Account name used at login")
+
+    metrics_parser = platform_parsers.add_parser(
+        "metrics", help="Dump Prometheus metrics aggregated over the backend, CLI runs and workers"
+    )
+    metrics_parser.add_argument("--json", action="store_true", help="Print raw JSON samples")
+
+    batch_parser = platform_parsers.add_parser("batch", help="Run a manifest of uploads in one process")
+    batch_parser.add_argument("manifest", type=existing_file_path, help="Manifest file (.json, .yaml/.yml or .csv)")
+    batch_parser.add_argument("--results", type=Path, help="Also append JSONL results to this file")
+    batch_parser.add_argument("--resume", action="store_true", help="Skip rows already marked ok in --results")
+    batch_parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY, help="Maximum uploads running at once"
+    )
+    batch_parser.add_argument(
+        "--platform-concurrency",
+        default="",
+        help=f"Per-platform limits such as douyin=1,kuaishou=2 (default {DEFAULT_BATCH_PLATFORM_CONCURRENCY} each)",
+    )
+    batch_parser.add_argument("--validate-only", action="store_true", help="Validate every row and exit")
+    batch_parser.add_argument(
+        "--estimate", action="store_true", help="Predict completion time and concurrency from past jobs, then exit"
+    )
+    add_scheduling_flags(batch_parser)
+    add_runtime_flags(batch_parser)
+
+    plan_parser = platform_parsers.add_parser(
+        "plan", help="Publish one video to several platforms, preparing it only once"
+    )
+    plan_parser.add_argument("file", type=existing_file_path, help="Video file to publish")
+    plan_parser.add_argument("--title", required=True, help="Title; cut to each platform's limit")
+    plan_parser.add_argument("--desc", default="", help="Optional description")
+    plan_parser.add_argument("--tags", default="", help="Comma-separated tags, such as tag1,tag2")
+    plan_parser.add_argument(
+        "--cover", help=f"Cover image path, or '{COVER_AUTO}' to extract one frame of the video for every platform"
+    )
+    plan_parser.add_argument("--cover-at", type=float, help="Second of the video to take the auto cover from")
+    plan_parser.add_argument(
+        "--target",
+        action="append",
+        default=[],
+        metavar="PLATFORM:ACCOUNT",
+        help="Publish to this account; repeat for several",
+    )
+    plan_parser.add_argument(
+        "--template",
+        type=existing_file_path,
+        help="Manifest whose rows (without file) are the targets, with per-platform overrides as in `sau batch`",
+    )
+    plan_parser.add_argument("--results", type=Path, help="Also append JSONL results to this file")
+    plan_parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY, help="Maximum uploads running at once"
+    )
+    plan_parser.add_argument(
+        "--platform-concurrency",
+        default="",
+        help=f"Per-platform limits such as douyin=1,kuaishou=2 (default {DEFAULT_BATCH_PLATFORM_CONCURRENCY} each)",
+    )
+    plan_parser.add_argument("--validate-only", action="store_true", help="Prepare the video, validate every target and exit")
+    plan_parser.add_argument(
+        "--estimate", action="store_true", help="Predict completion time and concurrency from past jobs, then exit"
+    )
+    add_scheduling_flags(plan_parser)
+    add_runtime_flags(plan_parser)
+
+    watch_parser = platform_parsers.add_parser(
+        "watch", help="Watch a folder and publish every video dropped into it"
+    )
+    watch_parser.add_argument("dir", type=existing_dir_path, help="Folder to watch (not recursive)")
+    watch_parser.add_argument(
+        "--target",
+        action="append",
+        default=[],
+        metavar="PLATFORM:ACCOUNT",
+        help="Publish each video to this account; repeat for several",
+    )
+    watch_parser.add_argument(
+        "--template",
+        type=existing_file_path,
+        help="Manifest whose rows (without file/title) are published for each video, as in `sau batch`",
+    )
+    watch_parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=DEFAULT_SETTLE_SECONDS,
+        help="Seconds a video and its .txt must stay unchanged before it is picked up",
+    )
+    watch_parser.add_argument(
+        "--poll-interval", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between scans when polling"
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="Poll instead of inotify (needed for NFS/SMB mounts)"
+    )
+    watch_parser.add_argument(
+        "--require-sidecar", action="store_true", help="Skip videos without a <name>.txt metadata file"
+    )
+    watch_parser.add_argument("--once", action="store_true", help="Handle the videos there now, then exit")
+    watch_parser.add_argument("--results", type=Path, help="Also append JSONL results to this file")
+    watch_parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_BATCH_CONCURRENCY, help="Maximum uploads running at once"
+    )
+    watch_parser.add_argument(
+        "--platform-concurrency",
+        default="",
+        help=f"Per-platform limits such as douyin=1,kuaishou=2 (default {DEFAULT_BATCH_PLATFORM_CONCURRENCY} each)",
+    )
+    add_scheduling_flags(watch_parser)
+    add_runtime_flags(watch_parser)
+
     return parser
 
 
+def print_breaker_status(platform_name: str | None, as_json: bool) -> int:
+    rows = circuit_breakers.status(platform_name)
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    if not rows:
+        print("No circuit breaker has recorded failures.")
+        return 0
+    for row in rows:
+        line = f"{row['platform']:<12} {row['state']:<9} failures={row['consecutive_failures']:<3} phase={row['phase']}"
+        if row["retry_after"]:
+            line += f" retry_in={row['retry_after']:.0f}s"
+        print(line)
+        print(f"    {row['signature']}")
+    return 0
+
+
+def print_published_posts(platform_name: str | None, limit: int, as_json: bool) -> int:
+    posts = publish_ledger.recent(platform_name, limit)
+    if as_json:
+        print(json.dumps([asdict(post) for post in posts], ensure_ascii=False, indent=2))
+        return 0
+    if not posts:
+        print("No published posts recorded.")
+        return 0
+    for post in posts:
+        published_at = datetime.fromtimestamp(post.published_at).strftime(SCHEDULE_FORMAT)
+        print(f"{published_at}  {post.platform:<12} {post.account:<16} {post.post_url or post.post_id or '-'}")
+        print(f"    {post.idempotency_key}  {post.title}")
+    return 0
+
+
+def print_browser_status(as_json: bool) -> int:
+    rows = browser_supervisor.status()
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    if not rows:
+        print("No launched browser is running.")
+        return 0
+    for row in rows:
+        launched_at = datetime.fromtimestamp(row["launched_at"]).strftime(SCHEDULE_FORMAT)
+        line = (
+            f"{row['pid']:<8} {row['platform'] or '-':<12} rss={row['rss_mb']:.0f}MB cpu={row['cpu_percent']:.1f}% "
+            f"processes={row['processes']} launched={launched_at} owner={row['owner_pid']}"
+        )
+        if not row["owner_alive"]:
+            line += " (orphaned)"
+        if row["over_memory_cap"]:
+            line += " (over memory cap)"
+        print(line)
+    return 0
+
+
+def print_cookie_status(as_json: bool) -> int:
+    cookie_keepalive.sync()
+    rows = cookie_keepalive.status()
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    if not rows:
+        print("No account login is tracked yet.")
+        return 0
+
+    def when(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime(SCHEDULE_FORMAT) if timestamp else "-"
+
+    for row in rows:
+        print(
+            f"{row['platform']:<12} {row['account']:<16} {row['status']:<14} expires={when(row['expires_at'])} "
+            f"next_refresh={when(row['next_refresh_at'])}"
+        )
+        if row["message"]:
+            print(f"    {row['message']}")
+    return 0
+
+
+async def run_cookie_keepalive(once: bool) -> int:
+    if once:
+        outcome = await cookie_keepalive.run_once()
+        print(f"Refreshed one account: {outcome}" if outcome else "No account is due for a refresh")
+        return 0
+    print("Keeping logins alive, press Ctrl+C to stop", file=sys.stderr)
+    await cookie_keepalive.run_forever()
+    return 0
+
+
+def warn_accounts_needing_relogin(jobs: list[BatchJob]) -> None:
+    """Point out manifest accounts whose login is gone or about to end before any row runs."""
+    flagged = {row["account_file"]: row for row in cookie_keepalive.status()
+               if row["status"] in (STATUS_RELOGIN, STATUS_EXPIRING)}
+    for platform, account in sorted({(job.platform, job.account) for job in jobs if job.account}):
+        row = flagged.get(str(resolve_account_file(platform, account)))
+        if row is None:
+            continue
+        if row["status"] == STATUS_RELOGIN:
+            print(f"{platform} account {account} is logged out; run `sau {platform} login` first", file=sys.stderr)
+        else:
+            expires_at = datetime.fromtimestamp(row["expires_at"]).strftime(SCHEDULE_FORMAT)
+            print(f"{platform} account {account} login ends at {expires_at}; run `sau {platform} login` again soon",
+                  file=sys.stderr)
+
+
+def print_metrics(as_json: bool) -> int:
+    if as_json:
+        print(json.dumps(metrics.collect(), ensure_ascii=False, indent=2))
+        return 0
+    print(metrics.render_prometheus(), end="")
+    return 0
+
+
 async def dispatch(args: argparse.Namespace) -> int:
+    if args.platform == "batch":
+        return await run_batch_command(args)
+
+    if args.platform == "watch":
+        return await run_watch_command(args)
+
+    if args.platform == "plan":
+        return await run_plan_command(args)
+
+    if args.platform == "breaker":
+        if args.action == "status":
+            return print_breaker_status(args.platform_name, args.json)
+        removed = circuit_breakers.reset(args.platform_name)
+        print(f"Reset {removed} circuit breaker(s)")
+        return 0
+
+    if args.platform == "browsers":
+        if args.action == "status":
+            return print_browser_status(args.json)
+        report = browser_supervisor.reap()
+        print(f"Killed {len(report.killed)} orphaned browser process(es), removed {len(report.removed_dirs)} temp dir(s)")
+        return 0
+
+    if args.platform == "metrics":
+        return print_metrics(args.json)
+
+    if args.platform == "cookies":
+        if args.action == "status":
+            return print_cookie_status(args.json)
+        if args.action == "keepalive":
+            return await run_cookie_keepalive(args.once)
+        cookie_keepalive.sync()
+        account_file = resolve_account_file(args.platform_name, args.account)
+        if not account_file.exists():
+            raise RuntimeError(f"No login found for {args.platform_name} account {args.account}: {account_file}")
+        outcome = await cookie_keepalive.refresh(str(account_file), args.platform_name, args.account)
+        print(f"{args.platform_name} account {args.account}: {outcome}")
+        return 0 if outcome != STATUS_RELOGIN else 1
+
+    if args.platform == "published":
+        if args.action == "list":
+            return print_published_posts(args.platform_name, args.limit, args.json)
+        if not publish_ledger.forget(args.key):
+            raise RuntimeError(f"No published post recorded for key {args.key}")
+        print(f"Forgot published post {args.key}")
+        return 0
+
     if args.platform == "douyin":
         if args.action == "login":
             result = await login_douyin_account(args.account, headless=args.headless)
@@ -1237,6 +1766,7 @@ async def dispatch(args: argparse.Namespace) -> int:
                 tags=parse_tags(args.tags),
                 publish_date=args.schedule or 0,
                 thumbnail_file=args.thumbnail,
+                engine=args.engine,
             )
             await upload_bilibili_video(request)
             print(f"Bilibili video upload submitted: {request.video_file}")
@@ -1399,6 +1929,7 @@ async def dispatch(args: argparse.Namespace) -> int:
                 thumbnail_file=args.thumbnail,
                 playlist=args.playlist,
                 visibility=args.visibility,
+                engine=args.engine,
                 debug=args.debug,
                 headless=args.headless,
             )
@@ -1442,9 +1973,451 @@ async def dispatch(args: argparse.Namespace) -> int:
     raise RuntimeError(f"Unsupported platform: {args.platform}")
 
 
+class ManifestRowError(ValueError):
+    pass
+
+
+class _ManifestArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise ManifestRowError(message)
+
+
+@dataclass(slots=True)
+class BatchJob:
+    row_number: int
+    row_id: str
+    platform: str
+    action: str
+    account: str
+    args: argparse.Namespace
+    priority: str | None = None
+    operator: str = ""
+
+
+def load_manifest(path: Path) -> list[dict]:
+    suffix = path.suffix.lower()
+    text = path.read_text(encoding="utf-8-sig")
+    if suffix == ".json":
+        data = json.loads(text)
+    elif suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise RuntimeError("YAML manifests need PyYAML: pip install pyyaml") from exc
+        data = yaml.safe_load(text)
+    elif suffix == ".csv":
+        data = [
+            {key.strip(): value.strip() for key, value in row.items() if key and value is not None and value.strip()}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        raise RuntimeError(f"Unsupported manifest format '{suffix}'. Use .json, .yaml/.yml or .csv")
+
+    if isinstance(data, dict):
+        data = data.get("jobs")
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise RuntimeError("Manifest must be a list of rows (or an object with a 'jobs' list)")
+    return data
+
+
+def manifest_row_id(row: dict) -> str:
+    if row.get("id") not in (None, ""):
+        return str(row["id"])
+    canonical = json.dumps(row, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def manifest_row_to_argv(row: dict, base_dir: Path) -> list[str]:
+    platform = str(row.get("platform") or "").strip()
+    action = str(row.get("action") or "upload-video").strip()
+    if not platform:
+        raise ManifestRowError("missing 'platform'")
+    if action not in BATCH_ACTIONS:
+        raise ManifestRowError(f"unsupported action '{action}', expected one of {', '.join(sorted(BATCH_ACTIONS))}")
+
+    argv = [platform, action]
+    for key, value in row.items():
+        if key in BATCH_RESERVED_FIELDS or value is None or value == "":
+            continue
+        flag = "--" + key.replace("_", "-")
+        if key in BATCH_FLAG_FIELDS:
+            if str(value).strip().lower() in ("1", "true", "yes"):
+                argv.append(flag)
+            continue
+
+        if isinstance(value, str) and key == "images":
+            values = [item.strip() for item in value.split(";") if item.strip()]
+        elif isinstance(value, (list, tuple)):
+            values = [str(item) for item in value]
+        else:
+            values = [str(value)]
+        if key == "tags":
+            values = [",".join(values)]
+        if key in BATCH_PATH_FIELDS:
+            values = [str(base_dir / item) if not Path(item).is_absolute() else item for item in values]
+        argv.append(flag)
+        argv.extend(values)
+    return argv
+
+
+def build_batch_jobs(
+    rows: list[dict], base_dir: Path, headless: bool, priority: str | None = None, operator: str = ""
+) -> tuple[list[BatchJob], list[str]]:
+    """
+    Parse every row with the regular CLI parser so batch rows get exactly the same validation.
+    `priority` / `operator` apply to rows that do not set their own.
+    """
+    parser = build_parser(_ManifestArgumentParser)
+    jobs: list[BatchJob] = []
+    errors: list[str] = []
+    seen_ids: set[str] = set()
+    for row_number, row in enumerate(rows, start=1):
+        row_id = manifest_row_id(row)
+        try:
+            if row_id in seen_ids:
+                raise ManifestRowError(f"duplicate id '{row_id}'")
+            seen_ids.add(row_id)
+            row_priority = row.get("priority") or priority
+            if row_priority is not None and row_priority not in PRIORITY_CLASSES:
+                raise ManifestRowError(
+                    f"unknown priority '{row_priority}', expected one of {', '.join(PRIORITY_CLASSES)}"
+                )
+            args = parser.parse_args(manifest_row_to_argv(row, base_dir))
+        except ManifestRowError as exc:
+            errors.append(f"row {row_number} ({row_id}): {exc}")
+            continue
+
+        if hasattr(args, "headless") and "headed" not in row and "headless" not in row:
+            args.headless = headless
+        jobs.append(BatchJob(row_number, row_id, args.platform, args.action, args.account, args,
+                             row_priority, str(row.get("operator") or operator)))
+    return jobs, errors
+
+
+def parse_platform_concurrency(raw: str) -> dict[str, int]:
+    limits: dict[str, int] = {}
+    for item in raw.split(","):
+        if not item.strip():
+            continue
+        platform, _, value = item.partition("=")
+        try:
+            limits[platform.strip()] = max(1, int(value))
+        except ValueError as exc:
+            raise RuntimeError(f"Invalid --platform-concurrency entry '{item}', expected platform=N") from exc
+    return limits
+
+
+def load_completed_row_ids(results_path: Path) -> set[str]:
+    completed: set[str] = set()
+    if not results_path.exists():
+        return completed
+    for line in results_path.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("status") == "ok":
+            completed.add(str(record.get("id")))
+    return completed
+
+
+@contextmanager
+def result_writer(results_path: Path | None):
+    """
+    Yield `emit(record)`, which prints one JSONL result to the real stdout and appends it to
+    `results_path` when given. Shared by `sau batch`, `sau watch` and `sau plan`.
+    """
+    stdout = sys.stdout
+    results_file = results_path.open("a", encoding="utf-8") if results_path else None
+
+    def emit(record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        print(line, file=stdout, flush=True)
+        if results_file is not None:
+            results_file.write(line + "\n")
+            results_file.flush()
+
+    try:
+        yield emit
+    finally:
+        if results_file is not None:
+            results_file.close()
+
+
+def raise_for_row_errors(errors: list[str], message: str) -> None:
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        raise RuntimeError(f"{len(errors)} {message}")
+
+
+async def run_batch(
+    jobs: list[BatchJob],
+    concurrency: int,
+    platform_concurrency: dict[str, int],
+    emit,
+) -> list[dict]:
+    """
+    Run jobs in this event loop: at most `concurrency` at once and at most
+    `platform_concurrency[platform]` per platform, sharing browsers between jobs.
+    """
+    results: list[dict] = []
+    run_one = batch_job_runner(concurrency, platform_concurrency, emit, results)
+    async with shared_browser_session():
+        await asyncio.gather(*(run_one(job) for job in jobs))
+    return results
+
+
+def batch_job_size(job: BatchJob) -> int | None:
+    files = getattr(job.args, "images", None) or ([job.args.file] if getattr(job.args, "file", None) else [])
+    return files_size(files) if files else None
+
+
+def print_estimate(jobs: list[BatchJob], concurrency: int, platform_concurrency: dict[str, int]) -> int:
+    """Predict when these jobs finish and how many workers they need, from the job history."""
+    estimate = estimate_batch(
+        [PlannedJob(job.platform, job.account, batch_job_size(job), job.priority, getattr(job.args, "schedule", None),
+                    job.row_id) for job in jobs],
+        concurrency,
+        platform_concurrency,
+        DEFAULT_BATCH_PLATFORM_CONCURRENCY,
+    )
+    result = estimate.as_dict()
+    print(json.dumps(result, ensure_ascii=False))
+    for platform, row in result["platforms"].items():
+        print(f"{platform}: {row['jobs']} job(s), p50 {row['p50_seconds']:.0f}s, p95 {row['p95_seconds']:.0f}s "
+              f"({row['source']}, {row['samples']} sample(s))", file=sys.stderr)
+    print(f"Estimated finish with --concurrency {concurrency}: {result['finish_p50']} (p50), "
+          f"{result['finish_p95']} (p95)", file=sys.stderr)
+    limits = ",".join(f"{platform}={slots}" for platform, slots in result["recommended_platform_concurrency"].items())
+    print(f"Recommended: --concurrency {result['recommended_concurrency']} --platform-concurrency {limits} "
+          f"(p50 {result['recommended_p50_seconds'] / 60:.0f} min)", file=sys.stderr)
+    if result["late_jobs"]:
+        print(f"{len(result['late_jobs'])} job(s) would finish after their schedule: "
+              f"{', '.join(result['late_jobs'][:10])}", file=sys.stderr)
+    return 0
+
+
+def batch_job_runner(concurrency: int, platform_concurrency: dict[str, int], emit, results: list[dict]):
+    """
+    The per-job coroutine of run_batch(), for callers that add jobs as they come (`sau watch`).
+    Jobs wait in utils/job_scheduler.py: priority class, then earliest publish time, then a fair
+    share per operator and account, instead of manifest order.
+    """
+    scheduler = JobScheduler(concurrency, platform_concurrency, DEFAULT_BATCH_PLATFORM_CONCURRENCY, history=job_history)
+
+    async def run_one(job: BatchJob) -> None:
+        metrics.add_gauge("sau_batch_jobs_queued", 1, platform=job.platform)
+        queued = True
+        record = {
+            "id": job.row_id,
+            "row": job.row_number,
+            "platform": job.platform,
+            "action": job.action,
+            "account": job.account,
+        }
+        try:
+            # 限流令牌要等的话在排队前等，不占着名额；令牌在任务校验完 cookie 后才扣（wait_for_publish_slot）
+            await publish_rate_limiter.acquire(job.platform, job.account, spend=False)
+            async with scheduler.slot(job.platform, job.account, priority=job.priority, operator=job.operator,
+                                      deadline=getattr(job.args, "schedule", None), size=batch_job_size(job)) as ticket:
+                metrics.add_gauge("sau_batch_jobs_queued", -1, platform=job.platform)
+                queued = False
+                if ticket.deferred:
+                    record["deferred"] = True
+                started_at = time.time()
+                try:
+                    await dispatch(job.args)
+                    record["status"] = "ok"
+                except Exception as exc:
+                    record["status"] = "error"
+                    record["error"] = str(exc) or type(exc).__name__
+                record["started_at"] = datetime.fromtimestamp(started_at).isoformat(timespec="seconds")
+                record["duration_seconds"] = round(time.time() - started_at, 3)
+                results.append(record)
+                emit(record)
+        except AdmissionRejected as exc:
+            record["status"] = "rejected"
+            record["error"] = str(exc)
+            results.append(record)
+            emit(record)
+        finally:
+            if queued:
+                metrics.add_gauge("sau_batch_jobs_queued", -1, platform=job.platform)
+
+    return run_one
+
+
+async def run_batch_command(args: argparse.Namespace) -> int:
+    manifest_path: Path = args.manifest
+    rows = load_manifest(manifest_path)
+    jobs, errors = build_batch_jobs(rows, manifest_path.parent, args.headless,
+                                    getattr(args, "priority", None), getattr(args, "operator", ""))
+    raise_for_row_errors(errors, "invalid manifest row(s); nothing was run")
+    warn_accounts_needing_relogin(jobs)
+    if args.validate_only:
+        print(f"Manifest OK: {len(jobs)} row(s)", file=sys.stderr)
+        return 0
+    if getattr(args, "estimate", False):
+        return print_estimate(jobs, args.concurrency, parse_platform_concurrency(args.platform_concurrency))
+
+    if args.resume:
+        if not args.results:
+            raise RuntimeError("--resume needs --results pointing at a previous results file")
+        completed = load_completed_row_ids(args.results)
+        skipped = [job for job in jobs if job.row_id in completed]
+        jobs = [job for job in jobs if job.row_id not in completed]
+        print(f"Resuming: {len(skipped)} row(s) already done, {len(jobs)} to run", file=sys.stderr)
+
+    # 先清掉上次崩溃留下的浏览器进程和临时目录，批量运行期间定期再清
+    browser_supervisor.start_periodic()
+
+    # 上传函数自己的提示信息走 stderr，stdout 只留给 JSONL 结果
+    with result_writer(args.results) as emit, redirect_stdout(sys.stderr):
+        results = await run_batch(jobs, args.concurrency, parse_platform_concurrency(args.platform_concurrency), emit)
+
+    failed = sum(1 for record in results if record["status"] != "ok")
+    print(f"Batch finished: {len(results) - failed} ok, {failed} failed", file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+def parse_watch_targets(raw_targets: list[str]) -> list[dict]:
+    rows = []
+    for raw in raw_targets:
+        platform, _, account = raw.partition(":")
+        if not platform.strip() or not account.strip():
+            raise RuntimeError(f"Invalid --target '{raw}', expected platform:account")
+        rows.append({"platform": platform.strip(), "account": account.strip()})
+    return rows
+
+
+def load_targets(args: argparse.Namespace) -> tuple[list[dict], Path]:
+    """
+    Targets of `sau watch` / `sau plan`: the --target platform:account pairs plus the rows
+    of the --template manifest, and the directory relative paths in them resolve against.
+    """
+    targets = parse_watch_targets(args.target)
+    base_dir = Path.cwd()
+    if args.template:
+        targets += load_manifest(args.template)
+        base_dir = args.template.parent
+    if not targets:
+        raise RuntimeError("Give at least one --target platform:account or a --template manifest")
+    return targets, base_dir
+
+
+def watch_rows(targets: list[dict], video: Path, metadata: VideoMetadata) -> list[dict]:
+    """One `sau batch` row per target for an ingested video; the template's own title/tags/desc win."""
+    rows = []
+    for target in targets:
+        row = {"action": "upload-video", **target, "file": str(video)}
+        row.setdefault("title", metadata.title)
+        if metadata.tags:
+            row.setdefault("tags", metadata.tags)
+        if metadata.desc:
+            row.setdefault("desc", metadata.desc)
+        elif row["platform"] == "bilibili":
+            # B 站必须有简介
+            row.setdefault("desc", metadata.title)
+        row["id"] = f"{video.name}:{row['platform']}:{row.get('account', '')}"
+        rows.append(row)
+    return rows
+
+
+async def run_watch_command(args: argparse.Namespace) -> int:
+    targets, base_dir = load_targets(args)
+    # 先拿一个现成文件占位把目标配置校验一遍，免得等到第一个视频进来才报错
+    _, errors = build_batch_jobs(watch_rows(targets, Path(__file__).resolve(), VideoMetadata("check")),
+                                 base_dir, args.headless)
+    raise_for_row_errors(errors, "invalid watch target(s)")
+
+    browser_supervisor.start_periodic()
+    watcher = FolderWatcher(
+        args.dir.resolve(),
+        settle_seconds=args.settle_seconds,
+        poll_seconds=args.poll_interval,
+        poll=args.poll,
+        require_sidecar=args.require_sidecar,
+    )
+    results: list[dict] = []
+    running: set[asyncio.Task] = set()
+
+    async def on_ready(video: Path) -> None:
+        stat = video.stat()
+        ingested, method = await asyncio.to_thread(ingest_file, video, INGEST_DIR)
+        watcher.ledger.add(video, stat, ingested)
+        await asyncio.to_thread(record_material, ingested)
+        print(f"Ingested {video.name} as {ingested.name} ({method})", file=sys.stderr)
+        jobs, errors = build_batch_jobs(watch_rows(targets, ingested, read_sidecar(video)), base_dir, args.headless,
+                                        getattr(args, "priority", None), getattr(args, "operator", ""))
+        for error in errors:
+            record = {"id": ingested.name, "file": video.name, "status": "error", "error": error}
+            results.append(record)
+            emit(record)
+        for job in jobs:
+            task = asyncio.create_task(run_one(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    mode = "polling" if watcher.inotify is None else "inotify"
+    print(f"Watching {watcher.directory} ({mode}), publishing to {len(targets)} target(s)", file=sys.stderr)
+    with result_writer(args.results) as emit, redirect_stdout(sys.stderr):
+        run_one = batch_job_runner(args.concurrency, parse_platform_concurrency(args.platform_concurrency), emit, results)
+        async with shared_browser_session():
+            try:
+                await watcher.run(on_ready, once=args.once)
+            finally:
+                if running:
+                    await asyncio.gather(*running, return_exceptions=True)
+
+    failed = sum(1 for record in results if record["status"] != "ok")
+    print(f"Watch finished: {len(results) - failed} ok, {failed} failed", file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+async def run_plan_command(args: argparse.Namespace) -> int:
+    """
+    Fan one video out to every target: hash, probe, cover and title/tag normalization run once,
+    the platform uploads run concurrently, and one aggregated JSON result closes the output.
+    """
+    targets, base_dir = load_targets(args)
+    if getattr(args, "estimate", False):
+        # 估算只需要文件大小，不必先算哈希、抽封面
+        jobs, errors = build_batch_jobs(
+            watch_rows(targets, args.file.resolve(), VideoMetadata(args.title, parse_tags(args.tags), args.desc)),
+            base_dir, args.headless, getattr(args, "priority", None), getattr(args, "operator", ""),
+        )
+        raise_for_row_errors(errors, "invalid plan target(s)")
+        return print_estimate(jobs, args.concurrency, parse_platform_concurrency(args.platform_concurrency))
+
+    asset = await asyncio.to_thread(prepare_asset, args.file, args.cover, args.cover_at)
+    jobs, errors = build_batch_jobs(plan_rows(asset, targets, args.title, args.desc, parse_tags(args.tags)),
+                                    base_dir, args.headless, getattr(args, "priority", None), getattr(args, "operator", ""))
+    raise_for_row_errors(errors, "invalid plan target(s); nothing was run")
+    for warning in asset.warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    warn_accounts_needing_relogin(jobs)
+    if args.validate_only:
+        print(json.dumps(asset.summary(), ensure_ascii=False))
+        print(f"Plan OK: {len(jobs)} target(s)", file=sys.stderr)
+        return 0
+
+    browser_supervisor.start_periodic()
+    with result_writer(args.results) as emit, redirect_stdout(sys.stderr):
+        results = await run_batch(jobs, args.concurrency, parse_platform_concurrency(args.platform_concurrency), emit)
+
+    summary = aggregate_results(asset, sorted(results, key=lambda record: record["row"]))
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    print(f"Plan finished: {summary['ok']} ok, {summary['failed']} failed", file=sys.stderr)
+    return 0 if summary["status"] == "ok" else 1
+
+
 def main(argv: Sequence[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(list(argv) if argv is not None else None)
+    if args.platform != "metrics":
+        # 运行结束（以及长时间运行期间定期）把本进程的指标写出去，供 `sau metrics` 和后端 /metrics 汇总
+        metrics.start_flushing()
     try:
         return asyncio.run(dispatch(args))
     except Exception as exc:
@@ -7,9 +7,14 @@ export const accountApi = {
     return http.get('/getValidAccounts')
   },
 
+  // 在后台校验所有账号，结果通过 /accountEvents 推送
+  validateAccounts() {
+    return http.post('/validateAccounts')
+  },
+
   // 获取账号列表（不带验证，快速加载）
-  getAccounts() {
-    return http.get('/getAccounts')
+  getAccounts(params) {
+    return http.get('/getAccounts', params)
   },
 
   // 添加账号
@@ -13,6 +13,9 @@ export const useAccountStore = defineStore('account', () => {
     4: '快手'
   }
   
+  // 后端状态码 -> 页面显示
+  const statusText = (status) => status === -1 ? '验证中' : (status === 1 ? '正常' : '异常')
+
   // 设置账号列表
   const setAccounts = (accountsData) => {
     // 转换后端返回的数据格式为前端使用的格式
@@ -22,11 +25,58 @@ export const useAccountStore = defineStore('account', () => {
         type: item[1],
         filePath: item[2],
         name: item[3],
-        status: item[4] === -1 ? '验证中' : (item[4] === 1 ? '正常' : '异常'),
+        status: statusText(item[4]),
         platform: platformTypes[item[1]] || '未知'
       }
     })
   }
+
+  // 应用 /accountEvents 推送的一条变化：upsert / validating 更新或新增，delete 删除
+  const applyEvent = (event) => {
+    const account = event.account
+    if (event.type === 'delete') {
+      deleteAccount(account.id)
+      return
+    }
+    const updated = {
+      id: account.id,
+      type: account.type,
+      filePath: account.filePath,
+      name: account.userName,
+      status: statusText(account.status),
+      platform: platformTypes[account.type] || '未知'
+    }
+    const index = accounts.value.findIndex(acc => acc.id === account.id)
+    if (index === -1) {
+      accounts.value.push(updated)
+    } else {
+      accounts.value[index] = { ...accounts.value[index], ...updated }
+    }
+  }
+
+  // 整个应用只保持一条账号事件连接；断线后浏览器会带 Last-Event-ID 自动重连补发，
+  // 落后太多时后端发 reset，由 onReset 重新拉取列表
+  let eventSource = null
+  const connectEvents = (onReset) => {
+    if (eventSource) return
+    const baseUrl = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5409'
+    eventSource = new EventSource(`${baseUrl}/accountEvents`)
+    eventSource.addEventListener('account', (message) => {
+      const event = JSON.parse(message.data)
+      if (event.type === 'reset') {
+        onReset && onReset()
+      } else {
+        applyEvent(event)
+      }
+    })
+  }
+
+  const disconnectEvents = () => {
+    if (eventSource) {
+      eventSource.close()
+      eventSource = null
+    }
+  }
   
   // 添加账号
   const addAccount = (account) => {
@@ -57,6 +107,9 @@ export const useAccountStore = defineStore('account', () => {
     addAccount,
     updateAccount,
     deleteAccount,
-    getAccountsByPlatform
+    getAccountsByPlatform,
+    applyEvent,
+    connectEvents,
+    disconnectEvents
   }
 })
\ No newline at end of file
@@ -0,0 +1,8 @@
+class FakeClock:
+    """Settable stand-in for time.time / time.monotonic; tests move it by assigning `now`."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
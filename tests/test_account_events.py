@@ -0,0 +1,109 @@
+import asyncio
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from myUtils.account_events import AccountEventBroker, publish_account, set_account_status, validate_accounts
+
+
+def drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+class AccountEventBrokerTests(unittest.TestCase):
+    def test_subscribers_get_events_and_reconnects_replay_missed_ones(self):
+        broker = AccountEventBroker(history_size=3)
+        live = broker.subscribe()
+        for account_id in range(1, 5):
+            broker.publish("upsert", {"id": account_id})
+
+        self.assertEqual([event["id"] for event in drain(live)], [1, 2, 3, 4])
+        # 断线前收到了 2，历史里还有 3、4
+        self.assertEqual([event["id"] for event in drain(broker.subscribe(last_event_id=2))], [3, 4])
+        # 1 之后的 2 已经不在历史里了，只能整表重新拉取
+        self.assertEqual([event["type"] for event in drain(broker.subscribe(last_event_id=0))], ["reset"])
+        # 后端重启过，编号比客户端见过的还小
+        self.assertEqual([event["type"] for event in drain(broker.subscribe(last_event_id=99))], ["reset"])
+
+    def test_stream_formats_sse_frames_and_unsubscribes_on_close(self):
+        broker = AccountEventBroker()
+        queue = broker.subscribe()
+        broker.publish("delete", {"id": 7})
+        stream = broker.stream(queue, heartbeat=0.01)
+
+        self.assertEqual(next(stream), "retry: 3000\n\n")
+        frame = next(stream)
+        self.assertTrue(frame.startswith("id: 1\nevent: account\ndata: "))
+        self.assertEqual(json.loads(frame.split("data: ", 1)[1])["account"], {"id": 7})
+        self.assertEqual(next(stream), ": ping\n\n")
+        stream.close()
+        self.assertEqual(broker._subscribers, set())
+
+
+class AccountStatusTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "database.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''CREATE TABLE user_info (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, type INTEGER NOT NULL, filePath TEXT NOT NULL,
+                userName TEXT NOT NULL, status INTEGER DEFAULT 0)''')
+            conn.executemany(
+                "INSERT INTO user_info (type, filePath, userName, status) VALUES (?, ?, ?, ?)",
+                [(3, "a.json", "alice", 1), (4, "b.json", "bob", 1)],
+            )
+        self.broker = AccountEventBroker()
+        patcher = patch("myUtils.account_events.account_events", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = self.broker.subscribe()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_status_change_is_stored_and_pushed_once(self):
+        self.assertTrue(set_account_status("a.json", 0, "logged_out", self.db_path))
+        self.assertFalse(set_account_status("a.json", 0, "logged_out", self.db_path))
+
+        [event] = drain(self.queue)
+        self.assertEqual(event["account"]["status"], 0)
+        self.assertEqual(event["account"]["reason"], "logged_out")
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT status FROM user_info WHERE id = 1").fetchone()[0], 0)
+
+    def test_publish_account_pushes_the_stored_row(self):
+        publish_account(2, self.db_path, reason="login")
+
+        [event] = drain(self.queue)
+        self.assertEqual(event["account"]["userName"], "bob")
+        self.assertEqual(event["account"]["reason"], "login")
+
+    def test_validation_pushes_progress_and_results(self):
+        async def check(type_, file_path):
+            return file_path == "b.json"
+
+        rows = asyncio.run(validate_accounts(check, self.db_path))
+
+        self.assertEqual(rows, [[1, 3, "a.json", "alice", 0], [2, 4, "b.json", "bob", 1]])
+        events = [(event["type"], event["account"]["id"], event["account"]["status"]) for event in drain(self.queue)]
+        self.assertEqual(events, [("validating", 1, -1), ("upsert", 1, 0), ("validating", 2, -1), ("upsert", 2, 1)])
+
+    def test_a_failing_check_keeps_the_status_and_moves_on(self):
+        async def check(type_, file_path):
+            if file_path == "a.json":
+                raise TimeoutError("page.goto timed out")
+            return False
+
+        rows = asyncio.run(validate_accounts(check, self.db_path))
+
+        self.assertEqual([row[4] for row in rows], [1, 0])
+        events = [(event["type"], event["account"]["id"], event["account"]["status"], event["account"].get("reason"))
+                  for event in drain(self.queue)]
+        self.assertEqual(events[:2], [("validating", 1, -1, None), ("upsert", 1, 1, "error")])
+        self.assertEqual(events[-1], ("upsert", 2, 0, "validated"))
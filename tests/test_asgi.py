@@ -0,0 +1,176 @@
+import asyncio
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from myUtils.account_events import AccountEventBroker
+from myUtils.asgi import (
+    AsgiApp,
+    LoopQueue,
+    Request,
+    RequestError,
+    receive_multipart,
+    send_event_stream,
+    send_json,
+)
+
+BOUNDARY = "sauboundary"
+
+
+def multipart_body(fields, files):
+    body = b""
+    for name, value in fields.items():
+        body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name, (filename, content) in files.items():
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: video/mp4\r\n\r\n').encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class FakeClient:
+    """Plays the ASGI server side of one request: body chunks in, response messages out."""
+
+    def __init__(self, chunks=()):
+        self.chunks = list(chunks)
+        self.sent = []
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        if self.chunks:
+            chunk = self.chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(self.chunks)}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    @property
+    def status(self):
+        return next(message["status"] for message in self.sent if message["type"] == "http.response.start")
+
+    @property
+    def body(self):
+        return b"".join(message.get("body", b"") for message in self.sent if message["type"] == "http.response.body")
+
+
+def scope(path, method="GET", headers=(), query=b""):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "query_string": query}
+
+
+class AsgiTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def upload_request(self, body, chunk_size=7, max_bytes=10 ** 6):
+        client = FakeClient([body[i:i + chunk_size] for i in range(0, len(body), chunk_size)])
+        request = Request(scope("/upload", "POST", [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ]), client.receive)
+        return receive_multipart(request, self.directory, max_bytes)
+
+    def test_multipart_files_are_streamed_to_disk_in_small_chunks(self):
+        content = bytes(range(256)) * 400 + b"\r\n--not-the-boundary\r\n"
+        body = multipart_body({"filename": "我的视频"}, {"file": ("a.mp4", content)})
+
+        fields, files = asyncio.run(self.upload_request(body))
+
+        self.assertEqual(fields, {"filename": "我的视频"})
+        [upload] = files
+        self.assertEqual((upload.field_name, upload.filename, upload.size), ("file", "a.mp4", len(content)))
+        self.assertEqual(upload.path.read_bytes(), content)
+        self.assertEqual(upload.path.parent, self.directory)
+
+    def test_oversized_or_truncated_uploads_leave_no_partial_files(self):
+        body = multipart_body({}, {"file": ("a.mp4", b"x" * 5000)})
+
+        with self.assertRaises(RequestError) as too_large:
+            asyncio.run(self.upload_request(body, max_bytes=1000))
+        with self.assertRaises(RequestError) as truncated:
+            asyncio.run(self.upload_request(body[:3000]))
+
+        self.assertEqual(too_large.exception.status, 413)
+        self.assertEqual(truncated.exception.status, 400)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_native_routes_and_fallback(self):
+        calls = []
+
+        async def fallback(scope, receive, send):
+            calls.append(scope["path"])
+            await send_json(send, {"code": 200, "msg": "flask", "data": None})
+
+        app = AsgiApp(fallback)
+
+        @app.route("/native", methods=("POST",))
+        async def native(request, send):
+            if request.args.get("fail"):
+                raise RequestError(400, "bad")
+            await send_json(send, {"code": 200, "msg": None, "data": request.args["id"]})
+
+        ok, failed, other = FakeClient(), FakeClient(), FakeClient()
+        asyncio.run(app(scope("/native", "POST", query=b"id=7"), ok.receive, ok.send))
+        asyncio.run(app(scope("/native", "POST", query=b"fail=1"), failed.receive, failed.send))
+        asyncio.run(app(scope("/native", "GET"), other.receive, other.send))
+
+        self.assertEqual(json.loads(ok.body)["data"], "7")
+        self.assertIn((b"access-control-allow-origin", b"*"), ok.sent[0]["headers"])
+        self.assertEqual((failed.status, json.loads(failed.body)["msg"]), (400, "bad"))
+        self.assertEqual(calls, ["/native"])
+
+    def test_lifespan_runs_startup_callbacks(self):
+        started = []
+        app = AsgiApp(None, on_startup=[lambda: started.append(True)])
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(app({"type": "lifespan"}, receive, send))
+
+        self.assertEqual(started, [True])
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+    def test_many_event_streams_share_one_loop_without_threads(self):
+        broker = AccountEventBroker()
+        app = AsgiApp(None)
+
+        @app.route("/accountEvents")
+        async def events(request, send):
+            queue = broker.subscribe(queue=LoopQueue())
+            await send_event_stream(request, send, broker.astream(queue))
+
+        async def run():
+            clients = [FakeClient() for _ in range(500)]
+            threads_before = threading.active_count()
+            tasks = [asyncio.create_task(app(scope("/accountEvents"), c.receive, c.send)) for c in clients]
+            while len(broker._subscribers) < len(clients):
+                await asyncio.sleep(0.01)
+            # 从别的线程推送，和后台校验线程一样
+            publisher = threading.Thread(target=broker.publish, args=("upsert", {"id": 1}))
+            publisher.start()
+            publisher.join()
+            await asyncio.sleep(0.05)
+            threads_during = threading.active_count()
+            for client in clients:
+                client.disconnected.set()
+            await asyncio.gather(*tasks)
+            return clients, threads_before, threads_during
+
+        clients, threads_before, threads_during = asyncio.run(run())
+
+        self.assertEqual(threads_during, threads_before)
+        for client in clients:
+            self.assertIn(b'"type": "upsert"', client.body)
+        self.assertEqual(broker._subscribers, set())
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from uploader.bilibili_uploader.upos import (
+    BilibiliUploadSettings,
+    SubmissionStarted,
+    load_cookies,
+    read_chunk,
+    upload_video,
+)
+from utils.job_phase import track_job
+from utils.retry import FatalError, RetryPolicy
+
+CHUNK_SIZE = 64 * 1024
+UPOS_PATH = "/ugcfxboss/n230101abc.mp4"
+
+
+class StandInUpos(BaseHTTPRequestHandler):
+    """member.bilibili.com and an upos node in one server; chunk faults are injected per part number."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body, status=200, headers=None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _parts(self):
+        url = urlsplit(self.path)
+        return url.path, {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+
+    def do_GET(self):
+        path, query = self._parts()
+        if path == "/preupload":
+            self.server.cookies = self.headers.get("Cookie", "")
+            return self._reply({
+                "OK": 1,
+                "auth": "auth-1",
+                "biz_id": 42,
+                "chunk_size": CHUNK_SIZE,
+                "endpoint": f"//127.0.0.1:{self.server.server_port}",
+                "upos_uri": f"upos:/{UPOS_PATH}",
+                "threads": 3,
+            })
+        self._reply({}, 404)
+
+    def do_PUT(self):
+        server = self.server
+        path, query = self._parts()
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        part = int(query["partNumber"])
+        assert self.headers["X-Upos-Auth"] == "auth-1"
+        assert int(query["start"]) == (part - 1) * CHUNK_SIZE and int(query["size"]) == len(body)
+        with server.lock:
+            server.attempts[part] += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+            failing = server.faults.get(part, 0)
+            if failing:
+                server.faults[part] = failing - 1
+        if failing:
+            return self._reply({"error": "busy"}, 503)
+        server.chunks[part] = body
+        self._reply(b"MULTIPART_PUT_SUCCESS", headers={"ETag": f'"etag-{part}"'})
+
+    def do_POST(self):
+        server = self.server
+        path, query = self._parts()
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path == UPOS_PATH and "uploads" in query:
+            return self._reply({"OK": 1, "upload_id": "upload-1"})
+        if path == UPOS_PATH:
+            server.completed = json.loads(body)["parts"]
+            assert query["uploadId"] == "upload-1" and query["biz_id"] == "42"
+            return self._reply({"OK": 1})
+        if path == "/x/vu/web/cover/up":
+            return self._reply({"code": 0, "data": {"url": "https://i0.hdslb.com/cover.jpg"}})
+        if path == "/x/vu/web/add/v3":
+            server.csrf = query["csrf"]
+            server.submission = json.loads(body)
+            if server.reject_submission:
+                return self._reply({"code": 21012, "message": "稿件标题重复"})
+            return self._reply({"code": 0, "data": {"aid": 7, "bvid": "BV1stand1n"}})
+        self._reply({}, 404)
+
+
+class UposUploadTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        self.video = root / "demo.mp4"
+        self.content = os.urandom(5 * CHUNK_SIZE + 321)
+        self.video.write_bytes(self.content)
+        self.cover = root / "cover.jpg"
+        self.cover.write_bytes(b"jpeg")
+        self.account_file = root / "account.json"
+        self.account_file.write_text(json.dumps({
+            "cookie_info": {"cookies": [
+                {"name": "SESSDATA", "value": "sess"},
+                {"name": "bili_jct", "value": "csrf-token"},
+                {"name": "DedeUserID", "value": "1"},
+            ]},
+            "token_info": {"access_token": "unused"},
+        }), encoding="utf-8")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInUpos)
+        self.server.lock = threading.Lock()
+        self.server.attempts = Counter()
+        self.server.chunks = {}
+        self.server.faults = {}
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.reject_submission = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.settings = BilibiliUploadSettings(threads=3, member_url=f"http://127.0.0.1:{self.server.server_port}")
+        self.http = requests.Session()
+        self.http.trust_env = False
+        self.http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=4))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.http.close()
+        self.temp_dir.cleanup()
+
+    def upload(self, **kwargs):
+        return asyncio.run(upload_video(
+            self.account_file, self.video, "标题", "简介", 249, ["a", "b"],
+            settings=self.settings, http=self.http, **kwargs,
+        ))
+
+    def assembled(self):
+        return b"".join(self.server.chunks[part] for part in sorted(self.server.chunks))
+
+    def test_chunks_go_up_in_parallel_and_the_submission_references_the_upload(self):
+        with track_job("bilibili") as tracker:
+            result = self.upload(cover_path=self.cover, publish_date=datetime(2030, 1, 1, 8, 0))
+
+        self.assertEqual(result["bvid"], "BV1stand1n")
+        self.assertEqual(self.assembled(), self.content)
+        self.assertEqual(self.server.max_in_flight, 3)
+        self.assertEqual([part["partNumber"] for part in self.server.completed], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.server.completed[0]["eTag"], "etag-1")
+        self.assertIn("SESSDATA=sess", self.server.cookies)
+        self.assertEqual(self.server.csrf, "csrf-token")
+        submission = self.server.submission
+        self.assertEqual(submission["videos"], [{"filename": "n230101abc", "title": "", "desc": "", "cid": 42}])
+        self.assertEqual((submission["tid"], submission["tag"]), (249, "a,b"))
+        self.assertEqual(submission["cover"], "https://i0.hdslb.com/cover.jpg")
+        self.assertEqual(submission["dtime"], int(datetime(2030, 1, 1, 8, 0).timestamp()))
+        self.assertEqual(tracker.post_url, "https://www.bilibili.com/video/BV1stand1n")
+
+    def test_a_failing_chunk_is_retried_on_its_own(self):
+        self.server.faults = {3: 2}
+        fast = RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.02, max_elapsed=30)
+
+        self.upload(chunk_policy=fast)
+
+        self.assertEqual(self.assembled(), self.content)
+        self.assertEqual(self.server.attempts[3], 3)
+        self.assertEqual({part: count for part, count in self.server.attempts.items() if part != 3},
+                         {1: 1, 2: 1, 4: 1, 5: 1, 6: 1})
+
+    def test_a_refused_submission_is_not_safe_to_retry_elsewhere(self):
+        self.server.reject_submission = True
+
+        with self.assertRaises(SubmissionStarted) as raised:
+            self.upload()
+        self.assertIn("稿件标题重复", str(raised.exception))
+
+    def test_cookie_file_must_hold_the_session_and_csrf_cookies(self):
+        self.assertEqual(load_cookies(self.account_file)["bili_jct"], "csrf-token")
+        self.account_file.write_text("{}", encoding="utf-8")
+        with self.assertRaises(FatalError):
+            load_cookies(self.account_file)
+
+    def test_offset_reads(self):
+        self.assertEqual(read_chunk(self.video, CHUNK_SIZE, 10), self.content[CHUNK_SIZE:CHUNK_SIZE + 10])
+        self.assertEqual(read_chunk(self.video, 5 * CHUNK_SIZE, CHUNK_SIZE), self.content[5 * CHUNK_SIZE:])
+
+
+if __name__ == "__main__":
+    unittest.main()
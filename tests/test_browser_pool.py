@@ -0,0 +1,157 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from tests.helpers import FakeClock
+from utils.browser_pool import (
+    RemoteBrowserEndpoint,
+    RemoteBrowserPool,
+    RemoteLease,
+    _current_lease,
+    stage_files,
+)
+from utils.browser_session import launch_browser
+from utils.retry import TransientError
+
+
+def make_browser_type(fail_urls=()):
+    browser_type = MagicMock()
+    browser_type.name = "chromium"
+
+    async def connect_over_cdp(url):
+        if url in fail_urls:
+            raise ConnectionRefusedError(url)
+        browser = MagicMock()
+        browser.cdp_url = url
+        return browser
+
+    browser_type.connect_over_cdp = AsyncMock(side_effect=connect_over_cdp)
+    return browser_type
+
+
+class RemoteBrowserPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.endpoints = [
+            RemoteBrowserEndpoint("http://a:9222", capacity=4),
+            RemoteBrowserEndpoint("http://b:9222", capacity=4),
+        ]
+        self.pages = {"http://a:9222": 3, "http://b:9222": 1}
+        self.clock = FakeClock()
+        self.pool = RemoteBrowserPool(self.endpoints, probe=self.probe, clock=self.clock)
+
+    def probe(self, endpoint):
+        pages = self.pages[endpoint.cdp_url]
+        if isinstance(pages, Exception):
+            raise pages
+        return pages
+
+    def test_jobs_go_to_the_least_loaded_browser(self):
+        async def scenario():
+            return [(await self.pool.assign()).endpoint.cdp_url for _ in range(4)]
+
+        # b: 1 page + reservations reaches a's load of 3 after two jobs, then they alternate
+        self.assertEqual(asyncio.run(scenario()), ["http://b:9222", "http://b:9222", "http://a:9222", "http://b:9222"])
+
+    def test_unreachable_browser_is_skipped(self):
+        self.pages = {"http://a:9222": 0, "http://b:9222": OSError("connection refused")}
+        lease = asyncio.run(self.pool.assign())
+        self.assertEqual(lease.endpoint.cdp_url, "http://a:9222")
+
+        # b is back, but stays skipped until its down period has passed
+        self.pages["http://b:9222"] = 0
+        self.assertEqual(asyncio.run(self.pool.assign()).endpoint.cdp_url, "http://a:9222")
+        self.clock.now += 60
+        self.assertEqual(asyncio.run(self.pool.assign()).endpoint.cdp_url, "http://b:9222")
+
+    def test_failed_connect_fails_over_to_next_browser(self):
+        browser_type = make_browser_type(fail_urls={"http://b:9222"})
+
+        async def scenario():
+            browser = await self.pool.acquire(browser_type)
+            return browser, _current_lease.get()
+
+        browser, lease = asyncio.run(scenario())
+        self.assertEqual(browser._browser.cdp_url, "http://a:9222")
+        self.assertEqual(lease.endpoint.cdp_url, "http://a:9222")
+
+    def test_no_reachable_browser_is_transient(self):
+        self.pages = {url: OSError("down") for url in self.pages}
+        with self.assertRaises(TransientError):
+            asyncio.run(self.pool.assign())
+
+    def test_closing_releases_the_slot(self):
+        self.endpoints = [RemoteBrowserEndpoint("http://a:9222", capacity=1)]
+        self.pages = {"http://a:9222": 0}
+        pool = RemoteBrowserPool(self.endpoints, probe=self.probe, clock=self.clock)
+        browser_type = make_browser_type()
+
+        async def scenario():
+            first = await pool.acquire(browser_type)
+            await first.close()
+            lease_after_close = _current_lease.get()
+            return lease_after_close, await pool.acquire(browser_type)
+
+        lease_after_close, second = asyncio.run(scenario())
+        self.assertIsNone(lease_after_close)
+        self.assertIsNotNone(second)
+
+    def test_launch_browser_uses_pool_for_chromium_only(self):
+        browser_type = make_browser_type()
+        firefox = MagicMock()
+        firefox.name = "firefox"
+        firefox.launch = AsyncMock(return_value="local")
+
+        async def scenario():
+            with patch("utils.browser_pool.remote_browser_pool", self.pool):
+                return await launch_browser(browser_type, headless=True), await launch_browser(firefox, headless=True)
+
+        remote, local = asyncio.run(scenario())
+        self.assertEqual(remote._browser.cdp_url, "http://b:9222")
+        self.assertEqual(local, "local")
+
+
+class StageFilesTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.video = self.root / "demo.mp4"
+        self.video.write_bytes(b"video")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_local_browser_paths_are_unchanged(self):
+        self.assertEqual(asyncio.run(stage_files(str(self.video))), str(self.video))
+
+    def test_files_are_staged_and_mapped_to_remote_path(self):
+        endpoint = RemoteBrowserEndpoint(
+            "http://a:9222", staging_dir=str(self.root / "stage"), remote_staging_dir="/stage"
+        )
+        lease = RemoteLease(endpoint, 0)
+
+        async def scenario():
+            _current_lease.set(lease)
+            return await stage_files(str(self.video)), await stage_files([self.video])
+
+        single, many = asyncio.run(scenario())
+        self.assertTrue(single.startswith("/stage/") and single.endswith("-demo.mp4"))
+        self.assertEqual(many, [single])
+        staged = self.root / "stage" / Path(single).name
+        self.assertEqual(staged.read_bytes(), b"video")
+
+        lease.cleanup()
+        self.assertFalse(staged.exists())
+
+    def test_each_lease_stages_its_own_copy(self):
+        endpoint = RemoteBrowserEndpoint("http://a:9222", staging_dir=str(self.root / "stage"))
+        first, second = RemoteLease(endpoint, 0), RemoteLease(endpoint, 0)
+
+        first_path, second_path = first.stage(self.video), second.stage(self.video)
+
+        self.assertNotEqual(first_path, second_path)
+        first.cleanup()
+        self.assertFalse(Path(first_path).exists())
+        self.assertEqual(Path(second_path).read_bytes(), b"video")
+        self.assertEqual(sorted(path.name for path in (self.root / "stage").iterdir()), [Path(second_path).name])
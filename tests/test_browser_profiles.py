@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from tests.helpers import FakeClock
+from utils import metrics
+from utils.browser_profiles import (
+    COMPACTED_MARKER,
+    LOCK_FILE,
+    ProfileLock,
+    ProfileSettings,
+    evict_cache,
+    maintain_profile,
+    open_account_context,
+    record_time_to_upload_page,
+)
+
+
+def write_file(path: Path, size: int, mtime: float) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+class ProfileMaintenanceTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.profile = Path(self.temp_dir.name) / "douyin" / "creator"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_lock_is_exclusive_until_released(self):
+        first = ProfileLock(self.profile, stale_seconds=3600)
+        second = ProfileLock(self.profile, stale_seconds=3600)
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+
+    def test_lock_of_dead_process_is_taken_over(self):
+        self.profile.mkdir(parents=True)
+        (self.profile / LOCK_FILE).write_text("999999999", encoding="utf-8")
+
+        self.assertTrue(ProfileLock(self.profile, stale_seconds=3600).acquire())
+        self.assertEqual((self.profile / LOCK_FILE).read_text(encoding="utf-8"), str(os.getpid()))
+
+    def test_oldest_cache_files_are_evicted_over_the_cap(self):
+        mb = 1024 * 1024
+        cookies = self.profile / "Default" / "Cookies"
+        write_file(cookies, mb, 100)
+        for index in range(4):
+            write_file(self.profile / "Default" / "Cache" / "Cache_Data" / f"f_{index}", mb, 200 + index)
+
+        freed = evict_cache(self.profile, max_profile_mb=4)
+
+        # 5 MB over a 4 MB cap is trimmed to 80% of the cap, oldest cache entries first
+        self.assertEqual(freed, 2 * mb)
+        remaining = sorted(path.name for path in (self.profile / "Default" / "Cache" / "Cache_Data").iterdir())
+        self.assertEqual(remaining, ["f_2", "f_3"])
+        self.assertTrue(cookies.exists())
+        self.assertEqual(evict_cache(self.profile, max_profile_mb=4), 0)
+
+    def test_compaction_runs_once_per_interval(self):
+        history = self.profile / "Default" / "History"
+        history.parent.mkdir(parents=True)
+        sqlite3.connect(history).close()
+        write_file(self.profile / "GrShaderCache" / "data_0", 10, 100)
+        clock = FakeClock(now=1_000_000)
+        settings = ProfileSettings(compact_interval_hours=24)
+
+        maintain_profile(self.profile, settings, clock=clock)
+        self.assertFalse((self.profile / "GrShaderCache").exists())
+        self.assertTrue((self.profile / COMPACTED_MARKER).exists())
+
+        write_file(self.profile / "GrShaderCache" / "data_0", 10, 100)
+        os.utime(self.profile / COMPACTED_MARKER, (clock.now, clock.now))
+        clock.now += 3600
+        maintain_profile(self.profile, settings, clock=clock)
+        self.assertTrue((self.profile / "GrShaderCache").exists())
+
+
+class OpenAccountContextTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.account_file = self.root / "creator.json"
+        self.account_file.write_text(
+            json.dumps({"cookies": [{"name": "sessionid", "value": "1", "domain": ".douyin.com", "path": "/"}]}),
+            encoding="utf-8",
+        )
+        self.context = MagicMock()
+        self.context.add_cookies = AsyncMock()
+        self.context.close = AsyncMock()
+        self.browser = MagicMock()
+        self.browser.new_context = AsyncMock(return_value="fresh-context")
+        self.browser_type = MagicMock()
+        self.browser_type.name = "chromium"
+        self.browser_type.launch = AsyncMock(return_value=self.browser)
+        self.browser_type.launch_persistent_context = AsyncMock(return_value=self.context)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        metrics.reset()
+
+    def open(self, profiles):
+        with patch("utils.browser_profiles.PERSISTENT_PROFILES", profiles):
+            return asyncio.run(open_account_context(
+                self.browser_type, "douyin", self.account_file, {"headless": True, "args": ["--no-sandbox"]}
+            ))
+
+    def test_disabled_uses_a_fresh_context(self):
+        browser, context = self.open({})
+
+        self.assertIs(browser, self.browser)
+        self.assertEqual(context, "fresh-context")
+        self.browser.new_context.assert_awaited_once_with(storage_state=str(self.account_file))
+        self.browser_type.launch_persistent_context.assert_not_called()
+
+    def test_persistent_profile_applies_cookies_and_releases_lock_on_close(self):
+        browser, context = self.open({"enabled": True, "root": str(self.root / "profiles"), "max_cache_mb": 8})
+
+        profile_dir = self.root / "profiles" / "douyin" / "creator"
+        args, kwargs = self.browser_type.launch_persistent_context.call_args
+        self.assertEqual(args, (str(profile_dir),))
+        self.assertEqual(kwargs["args"], ["--no-sandbox", f"--disk-cache-size={8 * 1024 * 1024}"])
+        self.assertIs(context, self.context)
+        self.context.add_cookies.assert_awaited_once()
+        self.assertTrue((profile_dir / LOCK_FILE).exists())
+
+        asyncio.run(browser.close())
+        self.context.close.assert_awaited_once()
+        self.assertFalse((profile_dir / LOCK_FILE).exists())
+
+    def test_failed_new_context_closes_the_browser(self):
+        self.browser.new_context = AsyncMock(side_effect=RuntimeError("bad storage state"))
+        self.browser.close = AsyncMock()
+
+        with self.assertRaisesRegex(RuntimeError, "bad storage state"):
+            self.open({})
+        self.browser.close.assert_awaited_once()
+
+    def test_failed_cookie_load_closes_the_persistent_context_and_releases_lock(self):
+        self.context.add_cookies = AsyncMock(side_effect=RuntimeError("bad cookies"))
+
+        with self.assertRaisesRegex(RuntimeError, "bad cookies"):
+            self.open({"enabled": True, "root": str(self.root / "profiles")})
+        self.context.close.assert_awaited_once()
+        self.assertFalse((self.root / "profiles" / "douyin" / "creator" / LOCK_FILE).exists())
+
+    def test_busy_profile_falls_back_to_a_fresh_context(self):
+        profiles = {"enabled": True, "root": str(self.root / "profiles")}
+        ProfileLock(self.root / "profiles" / "douyin" / "creator", stale_seconds=3600).acquire()
+
+        browser, context = self.open(profiles)
+
+        self.assertIs(browser, self.browser)
+        self.browser_type.launch_persistent_context.assert_not_called()
+
+    def test_time_to_upload_page_is_labelled_by_profile_mode(self):
+        async def scenario():
+            with patch("utils.browser_profiles.PERSISTENT_PROFILES", {}):
+                await open_account_context(self.browser_type, "douyin", self.account_file, {})
+            return record_time_to_upload_page("douyin")
+
+        elapsed = asyncio.run(scenario())
+
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertEqual(metrics.get("sau_time_to_upload_page_count", platform="douyin", profile="ephemeral"), 1)
+        self.assertIsNone(record_time_to_upload_page("douyin"))
@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils.browser_session import BorrowedBrowser, launch_browser, shared_browser_session
+
+
+class BrowserSessionTests(unittest.TestCase):
+    def test_launch_browser_without_session_launches_directly(self):
+        browser_type = MagicMock()
+        browser_type.launch = AsyncMock(return_value="browser")
+        result = asyncio.run(launch_browser(browser_type, headless=True))
+        self.assertEqual(result, "browser")
+        browser_type.launch.assert_awaited_once_with(headless=True)
+
+    def test_borrowed_browser_close_only_closes_its_contexts(self):
+        context = MagicMock()
+        context.close = AsyncMock()
+        browser = MagicMock()
+        browser.new_context = AsyncMock(return_value=context)
+        browser.close = AsyncMock()
+
+        async def scenario():
+            borrowed = BorrowedBrowser(browser)
+            await borrowed.new_context(storage_state="cookie.json")
+            await borrowed.close()
+
+        asyncio.run(scenario())
+        context.close.assert_awaited_once()
+        browser.close.assert_not_awaited()
+
+    def test_session_reuses_browser_for_identical_launch_kwargs(self):
+        shared_browser = MagicMock()
+        shared_browser.is_connected.return_value = True
+        shared_browser.close = AsyncMock()
+        driver = MagicMock()
+        driver.chromium.launch = AsyncMock(return_value=shared_browser)
+        driver.stop = AsyncMock()
+        browser_type = MagicMock()
+        browser_type.name = "chromium"
+
+        async def scenario():
+            with patch("utils.browser_session.SharedBrowserSession._driver", new=AsyncMock(return_value=driver)):
+                async with shared_browser_session():
+                    first = await launch_browser(browser_type, headless=True)
+                    second = await launch_browser(browser_type, headless=True)
+                    await launch_browser(browser_type, headless=False)
+                    return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertIs(first._browser, second._browser)
+        self.assertEqual(driver.chromium.launch.await_count, 2)
+        browser_type.launch.assert_not_called()
+        self.assertEqual(shared_browser.close.await_count, 2)
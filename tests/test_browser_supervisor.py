@@ -0,0 +1,161 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.helpers import FakeClock
+from utils.browser_processes import PAGE_SIZE
+from utils.browser_supervisor import BrowserSupervisor, SupervisorSettings, _launch_lock
+
+OWNER_PID = os.getpid()
+
+
+class FakeProc:
+    def __init__(self, root: Path):
+        self.root = root
+
+    def add(self, pid, ppid, cmdline, start_ticks=100, rss_pages=0, cpu_ticks=0):
+        entry = self.root / str(pid)
+        entry.mkdir()
+        fields = ["S", ppid] + [0] * 9 + [cpu_ticks, 0, 0, 0, 0, 0, 1, 0, start_ticks, 0, rss_pages]
+        (entry / "stat").write_text(f"{pid} (proc name) {' '.join(map(str, fields))}", encoding="utf-8")
+        (entry / "cmdline").write_bytes(cmdline.replace(" ", "\0").encode("utf-8"))
+
+    def remove(self, pid):
+        shutil.rmtree(self.root / str(pid))
+
+
+class BrowserSupervisorTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name)
+        (root / "proc").mkdir()
+        (root / "tmp").mkdir()
+        self.proc = FakeProc(root / "proc")
+        self.proc.add(OWNER_PID, 1, "python sau_cli.py batch jobs.csv")
+        self.proc.add(600, OWNER_PID, "node cli.js run-driver")
+        self.proc.add(700, 600, "chrome --remote-debugging-pipe --user-data-dir=/tmp/x", rss_pages=1000, cpu_ticks=300)
+        self.proc.add(701, 700, "chrome --type=renderer", rss_pages=500, cpu_ticks=100)
+        self.clock = FakeClock(1_000_000.0)
+        self.supervisor = BrowserSupervisor(
+            db_path=root / "state.db",
+            settings=SupervisorSettings(max_rss_mb=1, temp_dir_max_age_hours=1),
+            proc_root=self.proc.root,
+            temp_root=root / "tmp",
+            clock=self.clock,
+        )
+        self.kill = patch("utils.browser_supervisor.kill_process_trees", side_effect=lambda pids, root: sorted(pids))
+        self.killed = self.kill.start()
+
+    def tearDown(self):
+        self.kill.stop()
+        self.temp_dir.cleanup()
+
+    def test_status_sums_the_browser_process_tree(self):
+        self.supervisor.register({700}, "douyin")
+        self.clock.now += 100
+
+        [row] = self.supervisor.status()
+
+        self.assertEqual((row["pid"], row["platform"], row["processes"]), (700, "douyin", 2))
+        self.assertEqual(row["rss_mb"], round(1500 * PAGE_SIZE / 1024 / 1024, 1))
+        self.assertTrue(row["owner_alive"])
+        # 400 ticks of CPU over 100 seconds since launch
+        self.assertAlmostEqual(row["cpu_percent"], 400 / os.sysconf("SC_CLK_TCK"), places=1)
+        self.assertEqual(row["over_memory_cap"], 1500 * PAGE_SIZE > 1024 * 1024)
+
+    def test_reading_status_does_not_create_the_database(self):
+        self.assertEqual(self.supervisor.status(), [])
+        self.assertFalse(Path(self.supervisor.db_path).exists())
+
+    def test_reap_kills_browsers_whose_owner_died(self):
+        self.supervisor.register({700}, "douyin")
+        # 启动它的进程被新进程复用了 PID：启动时间对不上就算已经退出
+        self.proc.remove(OWNER_PID)
+        self.proc.add(OWNER_PID, 1, "python other.py", start_ticks=999)
+
+        report = self.supervisor.reap()
+
+        self.assertEqual(report.killed, [700])
+        self.assertEqual(report.forgotten, 1)
+        self.assertEqual(self.supervisor._rows(), [])
+
+    def test_reap_leaves_browsers_it_did_not_launch_alone(self):
+        # 别的工具（Node playwright / puppeteer）开的自动化浏览器，没有登记过
+        self.proc.add(800, 1, "chrome --remote-debugging-pipe --user-data-dir=/tmp/y")
+        self.proc.add(900, 1, "chrome --user-data-dir=/home/me/.config/chrome")
+
+        self.assertEqual(self.supervisor.reap().killed, [])
+
+    def test_reap_removes_only_registered_temp_profiles_left_behind(self):
+        tmp = self.supervisor.temp_root
+        old = self.clock.now - 2 * 3600
+        dirs = {}
+        for pid, name in ((710, "left"), (720, "running"), (730, "fresh"), (740, "foreign")):
+            dirs[name] = tmp / f"playwright_chromiumdev_profile-{name}"
+            dirs[name].mkdir()
+            os.utime(dirs[name], (old, old))
+            self.proc.add(pid, 600, f"chrome --remote-debugging-pipe --user-data-dir={dirs[name]}")
+        os.utime(dirs["fresh"], (self.clock.now, self.clock.now))
+        self.supervisor.register({710, 720, 730}, "douyin")
+        for pid in (710, 730, 740):
+            self.proc.remove(pid)
+
+        report = self.supervisor.reap()
+
+        self.assertEqual(report.removed_dirs, [str(dirs["left"])])
+        self.assertTrue(all(dirs[name].exists() for name in ("running", "fresh", "foreign")))
+        self.assertEqual([row[0] for row in self.supervisor._temp_dir_rows()], [str(dirs["fresh"]), str(dirs["running"])])
+
+    def test_concurrent_launches_from_threads_only_claim_their_own_browser(self):
+        results = {}
+
+        def launch_in_thread(pid):
+            async def launch():
+                self.proc.add(pid, OWNER_PID, f"chrome --remote-debugging-pipe --user-data-dir=/tmp/{pid}")
+                await asyncio.sleep(0.05)
+                return pid
+
+            results[pid] = asyncio.run(self.supervisor.launch(launch, "douyin"))
+
+        threads = [threading.Thread(target=launch_in_thread, args=(pid,)) for pid in (801, 802)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, {801: (801, {801}), 802: (802, {802})})
+
+    def test_cancelled_launch_does_not_keep_the_launch_lock(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow_launch():
+                await release.wait()
+                return "first"
+
+            async def quick_launch():
+                return "third"
+
+            first = asyncio.create_task(self.supervisor.launch(slow_launch, "douyin"))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.create_task(self.supervisor.launch(quick_launch, "douyin"))
+            await asyncio.sleep(0.1)
+            waiter.cancel()
+            release.set()
+            await first
+            return await asyncio.wait_for(self.supervisor.launch(quick_launch, "douyin"), 1)
+
+        self.assertEqual(asyncio.run(scenario()), ("third", set()))
+        self.assertFalse(_launch_lock.locked())
+
+    def test_memory_cap_counts_child_processes(self):
+        settings = SupervisorSettings(max_rss_mb=1500 * PAGE_SIZE / 1024 / 1024 - 0.1)
+        supervisor = BrowserSupervisor(db_path=self.supervisor.db_path, settings=settings, proc_root=self.proc.root)
+
+        self.assertTrue(supervisor.over_memory_cap({700, 701}))
+        self.assertFalse(supervisor.over_memory_cap({701}))
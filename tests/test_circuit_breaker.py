@@ -0,0 +1,120 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.helpers import FakeClock
+from utils.circuit_breaker import (
+    BreakerSettings,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    failure_signature,
+)
+from utils.job_phase import set_phase
+from utils.watchdog import JobTimeoutError
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "state.db"
+        self.clock = FakeClock()
+        self.breakers = CircuitBreakerRegistry(
+            db_path=self.db_path,
+            settings=BreakerSettings(failure_threshold=2, cooldown_seconds=60),
+            clock=self.clock,
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_job(self, platform, phase=None, exc=None):
+        async def job():
+            async with self.breakers.guard(platform):
+                if phase:
+                    set_phase(phase)
+                if exc is not None:
+                    raise exc
+
+        asyncio.run(job())
+
+    def states(self, platform):
+        return {row["state"] for row in self.breakers.status(platform)}
+
+    def test_missing_state_db_admits_without_creating_it(self):
+        self.assertTrue(self.breakers.admit("douyin").allowed)
+        self.breakers.record_success("douyin")
+        self.assertFalse(self.db_path.exists())
+
+    def test_opens_after_consecutive_failures_with_same_signature(self):
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                self.run_job("douyin", "upload_file", TimeoutError("Timeout 60000ms exceeded"))
+        self.assertEqual(self.states("douyin"), {STATE_OPEN})
+        with self.assertRaises(CircuitOpenError):
+            self.run_job("douyin")
+        self.assertTrue(self.breakers.admit("kuaishou").allowed)
+
+    def test_different_phases_do_not_share_a_counter(self):
+        with self.assertRaises(TimeoutError):
+            self.run_job("douyin", "upload_file", TimeoutError("boom"))
+        with self.assertRaises(TimeoutError):
+            self.run_job("douyin", "publish", TimeoutError("boom"))
+        self.assertEqual(self.states("douyin"), {STATE_CLOSED})
+
+    def test_failures_without_phase_or_fatal_errors_are_ignored(self):
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                self.run_job("douyin", None, RuntimeError("cookie expired"))
+            with self.assertRaises(ValueError):
+                self.run_job("douyin", "fill_meta", ValueError("title too long"))
+        self.assertEqual(self.breakers.status("douyin"), [])
+
+    def test_watchdog_timeouts_count_against_the_hung_phase(self):
+        for elapsed in (601, 644):
+            with self.assertRaises(JobTimeoutError):
+                self.run_job("douyin", "fill_meta", JobTimeoutError("douyin", "upload_file", elapsed, 600))
+
+        [row] = self.breakers.status("douyin")
+        self.assertEqual((row["state"], row["phase"]), (STATE_OPEN, "upload_file"))
+
+    def test_half_open_admits_single_probe_then_closes_on_success(self):
+        for _ in range(2):
+            self.breakers.record_failure("tencent", "upload_file", TimeoutError("no file input"))
+        self.clock.now += 61
+
+        probe = self.breakers.admit("tencent")
+        self.assertTrue(probe.allowed and probe.probe)
+        self.assertEqual(self.states("tencent"), {STATE_HALF_OPEN})
+        self.assertFalse(self.breakers.admit("tencent").allowed)
+
+        self.breakers.record_success("tencent")
+        self.assertEqual(self.states("tencent"), {STATE_CLOSED})
+        self.assertTrue(self.breakers.admit("tencent").allowed)
+
+    def test_failed_probe_reopens_with_fresh_cooldown(self):
+        for _ in range(2):
+            self.breakers.record_failure("tencent", "upload_file", TimeoutError("no file input"))
+        self.clock.now += 61
+        self.assertTrue(self.breakers.admit("tencent").probe)
+
+        self.breakers.record_failure("tencent", "upload_file", TimeoutError("no file input"))
+        self.assertEqual(self.states("tencent"), {STATE_OPEN})
+        admission = self.breakers.admit("tencent")
+        self.assertFalse(admission.allowed)
+        self.assertAlmostEqual(admission.retry_after, 60)
+
+    def test_signature_masks_numbers(self):
+        self.assertEqual(
+            failure_signature("publish", TimeoutError("Timeout 3000ms exceeded")),
+            failure_signature("publish", TimeoutError("Timeout 5000ms exceeded")),
+        )
+
+    def test_reset_clears_state(self):
+        for _ in range(2):
+            self.breakers.record_failure("douyin", "publish", TimeoutError("x"))
+        self.assertEqual(self.breakers.reset("douyin"), 1)
+        self.assertTrue(self.breakers.admit("douyin").allowed)
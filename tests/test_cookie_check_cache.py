@@ -0,0 +1,53 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+from tests.helpers import FakeClock
+from utils import metrics
+from utils.cookie_check_cache import CookieCheckCache
+
+
+class CookieCheckCacheTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.account_file = Path(self.temp_dir.name) / "douyin_creator.json"
+        self.account_file.write_text("{}", encoding="utf-8")
+        self.clock = FakeClock()
+        self.cache = CookieCheckCache(ttl=300, clock=self.clock)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        metrics.reset()
+
+    def check(self, result=True):
+        check = AsyncMock(return_value=result)
+        return asyncio.run(self.cache.check("douyin", self.account_file, check)), check.await_count
+
+    def test_valid_result_is_reused_until_ttl_or_file_change(self):
+        self.assertEqual(self.check(), (True, 1))
+        self.assertEqual(self.check(), (True, 0))
+
+        self.clock.now += 301
+        self.assertEqual(self.check(), (True, 1))
+
+        # 重新登录会重写 cookie 文件
+        self.account_file.write_text('{"cookies": []}', encoding="utf-8")
+        self.assertEqual(self.check(), (True, 1))
+        self.assertEqual(metrics.get("sau_cookie_check_cache_total", result="hit"), 1)
+        self.assertEqual(metrics.get("sau_cookie_check_cache_total", result="miss"), 3)
+
+    def test_failed_checks_and_missing_files_are_not_cached(self):
+        self.assertEqual(self.check(False), (False, 1))
+        self.assertEqual(self.check(False), (False, 1))
+
+        os.remove(self.account_file)
+        self.assertEqual(self.check(), (True, 1))
+        self.assertEqual(self.check(), (True, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.helpers import FakeClock
+from utils.cookie_keepalive import (
+    KEEPALIVE_TARGETS,
+    STATUS_ERROR,
+    STATUS_EXPIRING,
+    STATUS_OK,
+    STATUS_RELOGIN,
+    CookieKeepAlive,
+    KeepAliveSettings,
+    cli_accounts,
+    cookie_expiry,
+)
+
+HOUR = 3600.0
+DAY = 24 * HOUR
+
+
+class CookieKeepAliveTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.temp_dir.name)
+        (self.base_dir / "cookies").mkdir()
+        self.clock = FakeClock(1_700_000_000.0)
+        self.refreshed = []
+        self.logged_in = True
+        self.keepalive = CookieKeepAlive(
+            db_path=self.base_dir / "state.db",
+            settings=KeepAliveSettings(min_seconds_between_refreshes=60),
+            refresher=self.refresher,
+            clock=self.clock,
+        )
+        self.keepalive.sources = [lambda: cli_accounts(self.base_dir)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_cookie(self, name, expires):
+        path = self.base_dir / "cookies" / f"{name}.json"
+        state = {"cookies": [
+            {"name": "sessionid", "value": "x", "expires": expires},
+            {"name": "ttwid", "value": "y", "expires": self.clock.now + 60},
+        ], "origins": []}
+        path.write_text(json.dumps(state), encoding="utf-8")
+        os.utime(path, (self.clock.now, self.clock.now))
+        return path
+
+    async def refresher(self, platform, account_file):
+        self.refreshed.append(account_file.stem)
+        if isinstance(self.logged_in, Exception):
+            raise self.logged_in
+        if self.logged_in:
+            # 平台续发登录 cookie
+            self.write_cookie(account_file.stem, self.clock.now + 30 * DAY)
+        return self.logged_in
+
+    def rows(self):
+        return {row["account"]: row for row in self.keepalive.status()}
+
+    def test_expiry_comes_from_persistent_auth_cookies_only(self):
+        state = {"cookies": [
+            {"name": "sessionid", "expires": 5000},
+            {"name": "sid_guard", "expires": 4000},
+            {"name": "sessionid_ss", "expires": -1},
+            {"name": "ttwid", "expires": 100},
+        ]}
+
+        self.assertEqual(cookie_expiry(state, KEEPALIVE_TARGETS["douyin"]), 4000)
+        self.assertIsNone(cookie_expiry({"cookies": [{"name": "ttwid", "expires": 100}]}, KEEPALIVE_TARGETS["douyin"]))
+
+    def test_refreshes_are_spread_and_one_at_a_time(self):
+        for index in range(20):
+            self.write_cookie(f"douyin_user{index}", self.clock.now + 60 * DAY)
+        self.keepalive.sync()
+
+        slots = sorted(row["next_refresh_at"] - self.clock.now for row in self.keepalive.status())
+        # 每个账号在 12~36 小时之间有自己的时间点，不会挤在一起
+        self.assertGreaterEqual(slots[0], 12 * HOUR)
+        self.assertLessEqual(slots[-1], 36 * HOUR)
+        self.assertGreater(len({round(slot / HOUR) for slot in slots}), 10)
+
+        self.clock.now += 40 * HOUR
+        self.assertIsNotNone(asyncio.run(self.keepalive.run_once()))
+        self.assertIsNone(asyncio.run(self.keepalive.run_once()))
+        self.assertEqual(len(self.refreshed), 1)
+
+    def test_refresh_before_expiry_extends_the_login(self):
+        self.write_cookie("douyin_alice", self.clock.now + 50 * HOUR)
+        self.keepalive.sync()
+        self.assertEqual(self.rows()["alice"]["status"], STATUS_EXPIRING)
+        self.assertLessEqual(self.rows()["alice"]["next_refresh_at"], self.clock.now + 6 * HOUR + 1)
+
+        self.clock.now += 6 * HOUR
+        self.assertEqual(asyncio.run(self.keepalive.run_once()), STATUS_OK)
+
+        row = self.rows()["alice"]
+        self.assertEqual(row["status"], STATUS_OK)
+        self.assertAlmostEqual(row["expires_at"], self.clock.now + 30 * DAY)
+        self.assertGreater(row["next_refresh_at"], self.clock.now + 12 * HOUR)
+
+    def test_logged_out_accounts_are_flagged_until_they_log_in_again(self):
+        flagged = []
+        self.keepalive.on_relogin_needed.append(lambda *args: flagged.append(args))
+        self.write_cookie("douyin_alice", self.clock.now + 60 * DAY)
+        self.keepalive.sync()
+        self.logged_in = False
+
+        self.assertEqual(asyncio.run(self.keepalive.refresh(
+            str(self.base_dir / "cookies" / "douyin_alice.json"), "douyin", "alice"
+        )), STATUS_RELOGIN)
+        self.assertEqual(self.rows()["alice"]["status"], STATUS_RELOGIN)
+        self.assertEqual(flagged[0][3], STATUS_RELOGIN)
+        self.clock.now += 90 * DAY
+        self.assertIsNone(asyncio.run(self.keepalive.run_once()))
+
+        # 重新扫码登录改写了 cookie 文件
+        self.clock.now += 1
+        self.write_cookie("douyin_alice", self.clock.now + 60 * DAY)
+        self.keepalive.sync()
+        self.assertEqual(self.rows()["alice"]["status"], STATUS_OK)
+
+    def test_failed_refresh_is_retried_later_and_use_postpones_refresh(self):
+        path = self.write_cookie("douyin_alice", self.clock.now + 60 * DAY)
+        self.keepalive.sync()
+        self.clock.now += 40 * HOUR
+        self.logged_in = TimeoutError("page.goto timed out")
+
+        self.assertEqual(asyncio.run(self.keepalive.run_once()), STATUS_ERROR)
+        self.assertAlmostEqual(self.rows()["alice"]["next_refresh_at"], self.clock.now + 30 * 60)
+
+        self.keepalive.record_use(path)
+        self.assertGreater(self.rows()["alice"]["next_refresh_at"], self.clock.now + 12 * HOUR)
+
+    def test_missing_state_db_is_not_created_without_accounts(self):
+        self.keepalive.sync()
+        self.keepalive.record_use(self.base_dir / "cookies" / "douyin_alice.json")
+
+        self.assertEqual(self.keepalive.status(), [])
+        self.assertFalse((self.base_dir / "state.db").exists())
@@ -94,5 +94,23 @@ class DouyinDeclarationTests(unittest.TestCase):
         browser.close.assert_awaited_once()
 
 
+    def test_setup_failure_closes_browser_and_keeps_the_original_error(self):
+        video = DouYinVideo("标题", "/tmp/demo.mp4", [], 0, "/tmp/cookie.json")
+        video.validate_upload_args = AsyncMock()
+        context = MagicMock()
+        context.close = AsyncMock(side_effect=OSError("close failed"))
+        browser = MagicMock()
+        browser.close = AsyncMock()
+
+        with (
+            patch.object(douyin_main, "open_account_context", AsyncMock(return_value=(browser, context))),
+            patch.object(douyin_main, "install_request_filter", AsyncMock(side_effect=RuntimeError("route failed"))),
+            self.assertRaisesRegex(RuntimeError, "route failed"),
+        ):
+            asyncio.run(video.upload(MagicMock()))
+
+        context.close.assert_awaited_once()
+        browser.close.assert_awaited_once()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import re
+import tempfile
+import time
+import unittest
+import zipfile
+from pathlib import Path
+
+from utils.har_replay import (
+    HAR_MEMBER,
+    UPLOAD_URL_PATTERNS,
+    HarIndex,
+    HarSession,
+    HarSettings,
+    install_replay,
+    load_settings,
+    strip_upload_bodies,
+)
+
+UPLOAD_PATTERN = re.compile("|".join(f"(?:{pattern})" for pattern in UPLOAD_URL_PATTERNS), re.I)
+PAGE_URL = "https://creator.douyin.com/creator-micro/content/upload"
+UPLOAD_URL = "https://tos-d-x-hl.snssdk.com/upload/v1/abc"
+
+
+def entry(method, url, time_ms, body=None, post_file=None):
+    request = {"method": method, "url": url, "headers": []}
+    if post_file:
+        request["postData"] = {"mimeType": "application/octet-stream", "_file": post_file}
+    return {
+        "time": time_ms,
+        "request": request,
+        "response": {"status": 200, "headers": [{"name": "content-type", "value": "application/json"}],
+                     "content": {"text": body or ""}},
+    }
+
+
+def write_recording(path):
+    har = {"log": {"entries": [
+        entry("GET", PAGE_URL, 30, "<html></html>"),
+        entry("POST", UPLOAD_URL + "?partNumber=1", 900, '{"part": 1}', post_file="part1.bin"),
+        entry("POST", UPLOAD_URL + "?partNumber=2", 900, '{"part": 2}', post_file="part2.bin"),
+    ]}}
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(HAR_MEMBER, json.dumps(har))
+        archive.writestr("part1.bin", b"x" * 100_000)
+        archive.writestr("part2.bin", b"y" * 100_000)
+
+
+class FakeRequest:
+    def __init__(self, method, url, body=b""):
+        self.method = method
+        self.url = url
+        self.post_data_buffer = body
+
+    async def all_headers(self):
+        return {"content-length": str(len(self.post_data_buffer))} if self.post_data_buffer else {}
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    async def fulfill(self, **kwargs):
+        self.outcome = ("fulfill", kwargs)
+
+    async def fallback(self):
+        self.outcome = ("fallback",)
+
+    async def abort(self, error_code=None):
+        self.outcome = ("abort", error_code)
+
+
+class FakeContext:
+    def __init__(self, log=None):
+        self.routes = []
+        self.har = None
+        self.handlers = {}
+        self.log = log if log is not None else []
+
+    async def route(self, pattern, handler):
+        self.routes.append(handler)
+
+    async def route_from_har(self, har, not_found=None):
+        self.har = (har, not_found)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def close(self):
+        self.log.append("context")
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.log = []
+        self.context_kwargs = []
+
+    async def new_context(self, **kwargs):
+        self.context_kwargs.append(kwargs)
+        return FakeContext(self.log)
+
+    async def close(self):
+        self.log.append("browser")
+
+
+class HarReplayTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+        self.recording = self.directory / "01.zip"
+        write_recording(self.recording)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_recorded_upload_bodies_are_dropped(self):
+        self.assertEqual(strip_upload_bodies(self.recording, UPLOAD_PATTERN), 2)
+
+        with zipfile.ZipFile(self.recording) as archive:
+            self.assertEqual(archive.namelist(), [HAR_MEMBER])
+            har = json.loads(archive.read(HAR_MEMBER))
+        self.assertEqual(har["log"]["entries"][1]["request"]["postData"]["text"], "")
+        self.assertEqual(strip_upload_bodies(self.recording, UPLOAD_PATTERN), 0)
+
+    def test_index_keeps_latencies_and_upload_answers_in_order(self):
+        index = HarIndex(self.recording, UPLOAD_PATTERN)
+
+        self.assertAlmostEqual(index.next_latency("GET", PAGE_URL + "?from=menu"), 0.03)
+        self.assertEqual(index.next_latency("GET", PAGE_URL), 0.0)
+        self.assertEqual(index.next_upload_response("POST", UPLOAD_URL)["body"], b'{"part": 1}')
+        self.assertEqual(index.next_upload_response("POST", UPLOAD_URL)["body"], b'{"part": 2}')
+        self.assertEqual(index.next_upload_response("POST", UPLOAD_URL)["body"], b'{"part": 2}')
+        self.assertEqual(index.next_upload_response("PUT", "https://ros-upload.xiaohongshu.com/x")["body"], b"{}")
+
+    def test_replay_stubs_uploads_at_the_configured_throughput_and_stays_offline(self):
+        context = FakeContext()
+        settings = HarSettings(mode="replay", upload_mb_per_second=10)
+        asyncio.run(install_replay(context, self.recording, settings))
+        not_recorded, replay = context.routes
+        self.assertEqual(context.har, (str(self.recording), "fallback"))
+
+        upload = FakeRoute(FakeRequest("POST", UPLOAD_URL + "?partNumber=1", b"v" * (1024 * 1024)))
+        started = time.monotonic()
+        asyncio.run(replay(upload))
+        elapsed = time.monotonic() - started
+        page = FakeRoute(FakeRequest("GET", PAGE_URL))
+        asyncio.run(replay(page))
+        unknown = FakeRoute(FakeRequest("GET", "https://example.com/"))
+        asyncio.run(not_recorded(unknown))
+
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertEqual(upload.outcome[0], "fulfill")
+        self.assertEqual(upload.outcome[1]["body"], b'{"part": 1}')
+        self.assertEqual(page.outcome, ("fallback",))
+        self.assertEqual(unknown.outcome, ("abort", "internetdisconnected"))
+
+    def test_contexts_are_numbered_in_the_order_a_run_opens_them(self):
+        browser = FakeBrowser()
+        self.assertIs(HarSession(HarSettings()).wrap(browser), browser)
+
+        recording = HarSession(HarSettings(mode="record", directory=str(self.directory / "new")))
+        wrapped = recording.wrap(browser)
+        asyncio.run(wrapped.new_context(storage_state="cookie.json"))
+        asyncio.run(wrapped.new_context())
+        asyncio.run(wrapped.close())
+
+        self.assertEqual(browser.context_kwargs[0]["storage_state"], "cookie.json")
+        self.assertEqual([Path(kwargs["record_har_path"]).name for kwargs in browser.context_kwargs], ["01.zip", "02.zip"])
+        self.assertEqual(browser.log, ["context", "context", "browser"])
+
+        replaying = HarSession(HarSettings(mode="replay", directory=str(self.directory)))
+        replaying.next_path()
+        with self.assertRaises(RuntimeError):
+            replaying.next_path()
+
+    def test_environment_overrides_conf(self):
+        settings = load_settings({"mode": "record", "directory": "har/a"}, {"SAU_HAR_MODE": "replay", "SAU_HAR_DIR": "/tmp/b"})
+
+        self.assertEqual((settings.mode, settings.path), ("replay", Path("/tmp/b")))
+        with self.assertRaises(RuntimeError):
+            load_settings({"mode": "replay-all"}, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import asyncio
+import io
+import json
+import tempfile
+import time
+import unittest
+from argparse import Namespace
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import sau_cli
+from utils.capacity import PlannedJob, estimate_batch, simulate
+from utils.job_history import MB, HistorySettings, JobHistory, size_bucket
+from utils.job_phase import set_phase
+from utils.job_scheduler import JobScheduler, SchedulerSettings
+
+NO_LIMITS = {"douyin": {"platform": None, "account": None}, "kuaishou": {"platform": None, "account": None}}
+
+
+class JobHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.now = 1_900_000_000.0
+        self.history = JobHistory(self.root / "state.db", HistorySettings(min_samples=3), clock=lambda: self.now)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def add(self, platform, seconds, size=10 * MB, outcome="ok", rate_limit=0.0, count=1):
+        for _ in range(count):
+            self.history.record(platform, "acct", size, outcome, seconds + rate_limit, {"rate_limit": rate_limit})
+
+    def test_recording_times_each_phase_and_keeps_failures(self):
+        video = self.root / "demo.mp4"
+        video.write_bytes(b"x" * 1000)
+
+        with self.history.recording("douyin", "creator", [video]):
+            set_phase("rate_limit")
+            time.sleep(0.03)
+            set_phase("upload")
+            time.sleep(0.05)
+        with self.assertRaises(RuntimeError):
+            with self.history.recording("douyin", "creator", [video]):
+                set_phase("publish")
+                raise RuntimeError("publish button missing")
+
+        conn = self.history._connect()
+        rows = conn.execute("SELECT outcome, file_size, failed_phase, error, duration_seconds, rate_limit_seconds, "
+                            "phases FROM job_history ORDER BY id").fetchall()
+        conn.close()
+        ok, failed = rows
+        phases = json.loads(ok[6])
+        self.assertEqual((ok[0], ok[1], ok[2]), ("ok", 1000, None))
+        self.assertGreaterEqual(phases["upload"], 0.04)
+        self.assertGreaterEqual(ok[5], 0.02)
+        self.assertGreaterEqual(ok[4], phases["upload"] + phases["rate_limit"] - 0.01)
+        self.assertEqual(failed[:4], ("error", 1000, "publish", "publish button missing"))
+
+    def test_percentiles_per_size_bucket_leave_out_rate_limit_waits(self):
+        for seconds in (100, 110, 120, 130, 400):
+            self.add("douyin", seconds, rate_limit=50)
+        self.add("douyin", 900, size=300 * MB)
+        self.add("douyin", 0, outcome="error")
+
+        stats = {(row.platform, row.bucket): row for row in self.history.stats()}
+        small = stats[("douyin", "<50MB")]
+        self.assertEqual((small.samples, small.p50, small.p95), (5, 120, 400))
+        self.assertEqual(small.success_rate, round(5 / 6, 3))
+        self.assertEqual(stats[("douyin", "all")].samples, 6)
+        # 样本不够的分档退回整个平台的统计，没有记录的平台返回 None
+        self.assertEqual(self.history.expected("douyin", 300 * MB).bucket, "all")
+        self.assertEqual(self.history.expected("douyin", 10 * MB).p50, 120)
+        self.assertIsNone(self.history.expected("kuaishou", 10 * MB))
+
+    def test_old_jobs_leave_the_window_and_are_pruned(self):
+        self.add("douyin", 100, count=3)
+        self.now += 100 * 86400
+        self.add("douyin", 200)
+        conn = self.history._connect()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM job_history").fetchone()[0], 1)
+        conn.close()
+        self.assertEqual([row.samples for row in self.history.stats("douyin")], [1, 1])
+
+    def test_size_buckets(self):
+        self.assertEqual(size_bucket(10 * MB), "<50MB")
+        self.assertEqual(size_bucket(50 * MB), "50-200MB")
+        self.assertEqual(size_bucket(5000 * MB), ">=1GB")
+        self.assertEqual(size_bucket(None), "all")
+
+    def test_scheduler_admission_uses_the_history(self):
+        self.add("douyin", 60, count=3)
+        scheduler = JobScheduler(1, settings=SchedulerSettings(default_job_seconds=600), history=self.history)
+        ticket = scheduler._ticket("douyin", "a", None, "", None, 10 * MB)
+        self.assertEqual(scheduler.estimate(ticket), 60)
+        self.assertEqual(scheduler.estimate(scheduler._ticket("kuaishou", "a", None, "", None, None)), 600)
+
+
+class CapacityEstimateTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.history = JobHistory(Path(self.temp_dir.name) / "state.db", HistorySettings(min_samples=1))
+        for seconds in (100, 100, 100, 300):
+            self.history.record("douyin", "acct", 10 * MB, "ok", seconds)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def estimate(self, jobs, concurrency=4, rate_limits=NO_LIMITS, **kwargs):
+        return estimate_batch(jobs, concurrency, {}, 2, history=self.history, settings=SchedulerSettings(),
+                              rate_limits=rate_limits, **kwargs)
+
+    def test_completion_from_history_with_the_given_concurrency(self):
+        jobs = [PlannedJob("douyin", f"a{index}", 10 * MB) for index in range(4)]
+
+        estimate = self.estimate(jobs)
+
+        # 每个平台默认 2 个名额：两轮，每轮 p50 100s / p95 300s
+        self.assertEqual((estimate.p50_seconds, estimate.p95_seconds), (200, 600))
+        self.assertEqual(estimate.platforms["douyin"]["source"], "history:<50MB")
+        self.assertEqual(estimate.recommended_platform_concurrency, {"douyin": 4})
+        self.assertEqual((estimate.recommended_concurrency, estimate.recommended_p50_seconds), (4, 100))
+
+    def test_rate_limited_account_needs_no_more_workers(self):
+        jobs = [PlannedJob("douyin", "same", 10 * MB) for _ in range(4)]
+        limits = {"douyin": {"platform": None, "account": (1, 150)}}
+
+        estimate = self.estimate(jobs, rate_limits=limits)
+
+        self.assertEqual(estimate.p50_seconds, 550)
+        self.assertEqual(estimate.recommended_concurrency, 1)
+        self.assertEqual(estimate.recommended_platform_concurrency, {"douyin": 1})
+
+    def test_missing_history_falls_back_to_configured_seconds_and_flags_late_jobs(self):
+        now = datetime(2030, 1, 1, 12, 0).timestamp()
+        jobs = [
+            PlannedJob("kuaishou", "a", 10 * MB, id="soon", publish_date=now + 500),
+            PlannedJob("kuaishou", "b", 10 * MB, id="bulk", priority="bulk"),
+            PlannedJob("kuaishou", "c", 10 * MB, id="fine", publish_date=now + 5000),
+        ]
+
+        estimate = self.estimate(jobs, concurrency=1, clock=lambda: now)
+
+        self.assertEqual(estimate.platforms["kuaishou"]["source"], "config")
+        self.assertEqual(estimate.p50_seconds, 1800)
+        self.assertEqual(estimate.late_jobs, ["soon"])
+
+    def test_simulation_holds_slots_while_waiting_for_tokens(self):
+        jobs = [PlannedJob("douyin", "a"), PlannedJob("douyin", "a"), PlannedJob("kuaishou", "b")]
+        limits = {"douyin": {"platform": None, "account": (1, 100)}, "kuaishou": {"platform": None, "account": None}}
+        self.assertEqual(simulate(jobs, [10, 10, 10], 1, {}, 2, limits), [10, 110, 120])
+
+
+class EstimateCommandTests(unittest.TestCase):
+    def test_plan_estimate_reports_without_uploading(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            video = Path(temp_dir) / "demo.mp4"
+            video.write_bytes(b"video")
+            args = Namespace(file=video, title="标题", desc="", tags="", cover=None, cover_at=None,
+                             target=["douyin:one", "kuaishou:two"], template=None, results=None, concurrency=2,
+                             platform_concurrency="", validate_only=False, estimate=True, headless=True)
+            stdout = io.StringIO()
+            with patch("sau_cli.dispatch") as dispatch, patch("sau_cli.prepare_asset") as prepare, \
+                    patch("sys.stderr"), redirect_stdout(stdout):
+                exit_code = asyncio.run(sau_cli.run_plan_command(args))
+
+        result = json.loads(stdout.getvalue())
+        self.assertEqual(exit_code, 0)
+        dispatch.assert_not_called()
+        prepare.assert_not_called()
+        self.assertEqual(result["jobs"], 2)
+        self.assertEqual(set(result["platforms"]), {"douyin", "kuaishou"})
+        self.assertIn("recommended_concurrency", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
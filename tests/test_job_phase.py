@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from utils import metrics
+from utils.job_phase import (
+    CHECKPOINT_COVER_SET,
+    CHECKPOINT_METADATA_FILLED,
+    CHECKPOINT_PUBLISHED,
+    CHECKPOINT_UPLOADED,
+    PhaseStep,
+    mark_checkpoint,
+    run_remaining_phases,
+    track_job,
+)
+from utils.retry import FatalError
+
+
+class RecordingStep:
+    def __init__(self, failures=0, exc_type=RuntimeError):
+        self.failures = failures
+        self.exc_type = exc_type
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc_type(f"failure {self.calls}")
+
+
+class RunRemainingPhasesTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.sleep_patch = patch("utils.retry.asyncio.sleep", new=AsyncMock())
+        self.sleep_patch.start()
+
+    def tearDown(self):
+        self.sleep_patch.stop()
+        metrics.reset()
+
+    def test_failed_publish_only_retries_remaining_phases(self):
+        fill_meta = RecordingStep()
+        set_cover = RecordingStep()
+        publish = RecordingStep(failures=2)
+        retried_phases = []
+
+        async def scenario():
+            with track_job("douyin") as tracker:
+                mark_checkpoint(CHECKPOINT_UPLOADED)
+                completed = await run_remaining_phases(
+                    [
+                        PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, fill_meta),
+                        PhaseStep("set_cover", CHECKPOINT_COVER_SET, set_cover),
+                        PhaseStep("publish", CHECKPOINT_PUBLISHED, publish),
+                    ],
+                    platform="douyin",
+                    deadline=60,
+                    on_retry=lambda phase, exc: retried_phases.append(phase),
+                )
+                return completed, tracker
+
+        completed, tracker = asyncio.run(scenario())
+
+        self.assertEqual(completed, [CHECKPOINT_METADATA_FILLED, CHECKPOINT_COVER_SET, CHECKPOINT_PUBLISHED])
+        self.assertEqual((fill_meta.calls, set_cover.calls, publish.calls), (1, 1, 3))
+        self.assertEqual(retried_phases, ["publish", "publish"])
+        self.assertEqual(tracker.checkpoints, [CHECKPOINT_UPLOADED, *completed])
+        self.assertEqual(tracker.phase, "publish")
+
+    def test_fatal_error_is_not_retried(self):
+        fill_meta = RecordingStep(failures=1, exc_type=FatalError)
+        publish = RecordingStep()
+
+        with self.assertRaises(FatalError):
+            asyncio.run(run_remaining_phases(
+                [
+                    PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, fill_meta),
+                    PhaseStep("publish", CHECKPOINT_PUBLISHED, publish),
+                ],
+                platform="douyin",
+                deadline=60,
+            ))
+        self.assertEqual((fill_meta.calls, publish.calls), (1, 0))
+
+    def test_deadline_stops_retrying(self):
+        fill_meta = RecordingStep(failures=1000)
+        clock = iter(range(0, 10_000, 10))
+
+        with patch("utils.retry.time.monotonic", new=lambda: next(clock)), self.assertRaises(RuntimeError):
+            asyncio.run(run_remaining_phases(
+                [PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, fill_meta)],
+                platform="douyin",
+                deadline=60,
+            ))
+        self.assertLess(fill_meta.calls, 10)
+        self.assertEqual(
+            metrics.get("sau_retry_total", platform="douyin", operation="resume_phases", outcome="deadline_exhausted"), 1
+        )
+
+    def test_step_with_its_own_retries_is_not_run_again(self):
+        # 发布按钮自己按 PUBLISH_RETRY_POLICY 重试，外层再重跑会把重试次数相乘
+        fill_meta = RecordingStep()
+        publish = RecordingStep(failures=1)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_remaining_phases(
+                [
+                    PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, fill_meta),
+                    PhaseStep("publish", CHECKPOINT_PUBLISHED, publish, retry=False),
+                ],
+                platform="douyin",
+                deadline=60,
+            ))
+        self.assertEqual((fill_meta.calls, publish.calls), (1, 1))
+
+    def test_publish_is_skipped_once_the_post_id_was_captured(self):
+        publish = RecordingStep()
+
+        async def scenario():
+            with track_job("douyin") as tracker:
+                tracker.post_id = "7300000000000000001"
+                return await run_remaining_phases(
+                    [PhaseStep("publish", CHECKPOINT_PUBLISHED, publish)],
+                    platform="douyin",
+                    deadline=60,
+                )
+
+        self.assertEqual(asyncio.run(scenario()), [CHECKPOINT_PUBLISHED])
+        self.assertEqual(publish.calls, 0)
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from utils.job_scheduler import AdmissionRejected, JobScheduler, SchedulerSettings, load_settings
+
+
+def run_jobs(scheduler: JobScheduler, jobs: list[dict]) -> list[str]:
+    """Hold the only slot with a blocker, queue `jobs`, then let them run and return their start order."""
+    started: list[str] = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("douyin", "blocker"):
+                await release.wait()
+
+        async def job(spec):
+            spec = dict(spec)
+            name = spec.pop("name")
+            async with scheduler.slot(spec.pop("platform", "douyin"), **spec):
+                started.append(name)
+                await asyncio.sleep(0)
+
+        first = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(job(spec)) for spec in jobs]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(main())
+    return started
+
+
+class JobSchedulerTests(unittest.TestCase):
+    def scheduler(self, concurrency=1, clock=time.time, **settings):
+        return JobScheduler(concurrency, settings=SchedulerSettings(**settings), clock=clock)
+
+    def test_priority_class_then_earliest_deadline(self):
+        later, sooner = datetime(2030, 1, 2, 20, 0), datetime(2030, 1, 1, 20, 0)
+        order = run_jobs(self.scheduler(admission="off"), [
+            {"name": "bulk", "account": "a", "priority": "bulk"},
+            {"name": "normal", "account": "b"},
+            {"name": "later", "account": "c", "deadline": later},
+            {"name": "sooner", "account": "d", "deadline": sooner},
+            {"name": "urgent", "account": "e", "priority": "urgent"},
+        ])
+        self.assertEqual(order, ["urgent", "sooner", "later", "normal", "bulk"])
+
+    def test_operators_share_slots_by_weight(self):
+        jobs = [{"name": f"A{index}", "account": f"a{index}", "operator": "A"} for index in range(6)]
+        jobs += [{"name": f"B{index}", "account": f"b{index}", "operator": "B"} for index in range(2)]
+
+        self.assertEqual(run_jobs(self.scheduler(), jobs)[:4], ["A0", "B0", "A1", "B1"])
+        weighted = run_jobs(self.scheduler(operator_weights={"A": 2}), jobs)
+        self.assertEqual(weighted[:6], ["A0", "B0", "A1", "A2", "B1", "A3"])
+
+    def test_accounts_of_one_operator_take_turns(self):
+        jobs = [{"name": f"x{index}", "account": "x"} for index in range(3)]
+        jobs += [{"name": "y0", "account": "y"}]
+        self.assertEqual(run_jobs(self.scheduler(), jobs), ["x0", "y0", "x1", "x2"])
+
+    def test_a_full_platform_does_not_hold_up_other_platforms(self):
+        scheduler = JobScheduler(3, {"douyin": 1}, settings=SchedulerSettings())
+        order = run_jobs(scheduler, [
+            {"name": "douyin", "account": "a", "priority": "urgent"},
+            {"name": "kuaishou", "platform": "kuaishou", "account": "b", "priority": "bulk"},
+        ])
+        # 抖音唯一的名额被占着，快手的低优先级任务先开始
+        self.assertEqual(order, ["kuaishou", "douyin"])
+
+    def test_jobs_that_would_miss_their_publish_time_are_rejected_or_deferred(self):
+        now = datetime(2030, 1, 1, 12, 0).timestamp()
+        rejecting = self.scheduler(clock=lambda: now, admission="reject", default_job_seconds=100)
+        deferring = self.scheduler(clock=lambda: now, admission="defer", default_job_seconds=100)
+
+        async def main(scheduler):
+            async with scheduler.slot("douyin", "a"):
+                # 前面一个在跑、一个更早截止的在等：预计 now+300 完成
+                early = asyncio.create_task(self._enter(scheduler, "b", now + 200))
+                await asyncio.sleep(0)
+                with self.assertRaises(AdmissionRejected):
+                    await asyncio.wait_for(self._enter(scheduler, "c", now + 250), 5)
+                early.cancel()
+
+        asyncio.run(main(rejecting))
+
+        order = run_jobs(deferring, [
+            {"name": "late", "account": "c", "deadline": now + 50},
+            {"name": "bulk", "account": "d", "priority": "bulk"},
+        ])
+        self.assertEqual(order, ["bulk", "late"])
+        self.assertEqual(deferring.status(), {"running": 0, "waiting": 0, "deferred": 0})
+
+    async def _enter(self, scheduler, account, deadline):
+        async with scheduler.slot("douyin", account, deadline=deadline) as ticket:
+            return ticket
+
+    def test_threads_wait_for_their_turn(self):
+        scheduler = self.scheduler(concurrency=2)
+        lock = threading.Lock()
+        running = peak = 0
+
+        def publish(index):
+            nonlocal running, peak
+            with scheduler.hold("douyin" if index % 2 else "kuaishou", f"acct{index}"):
+                with lock:
+                    running += 1
+                    peak = max(peak, running)
+                time.sleep(0.02)
+                with lock:
+                    running -= 1
+
+        threads = [threading.Thread(target=publish, args=(index,)) for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(peak, 2)
+        self.assertEqual(scheduler.status()["running"], 0)
+
+    def test_unknown_settings_are_refused(self):
+        with self.assertRaises(RuntimeError):
+            load_settings({"admission": "maybe"})
+        with self.assertRaises(ValueError):
+            asyncio.run(self._enter_priority(self.scheduler(), "soon"))
+
+    async def _enter_priority(self, scheduler, priority):
+        async with scheduler.slot("douyin", "a", priority=priority):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from myUtils.listing import (
+    ListQueryError,
+    ensure_list_schema,
+    etag_for,
+    fetch_page,
+    list_rows,
+    parse_account_query,
+    parse_file_query,
+    table_version,
+)
+
+
+class ListingTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "database.db"
+        self.conn = sqlite3.connect(self.db_path)
+        # db/createTable.py 原来的表结构，没有 uuid 列
+        self.conn.execute('''CREATE TABLE user_info (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, type INTEGER NOT NULL, filePath TEXT NOT NULL,
+            userName TEXT NOT NULL, status INTEGER DEFAULT 0)''')
+        self.conn.execute('''CREATE TABLE file_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL, filesize REAL,
+            upload_time DATETIME DEFAULT CURRENT_TIMESTAMP, file_path TEXT)''')
+        for index in range(25):
+            self.conn.execute(
+                "INSERT INTO file_records (filename, filesize, upload_time, file_path) VALUES (?, ?, ?, ?)",
+                (f"video_{index % 5}.mp4", float(index % 7), f"2025-01-{index % 10 + 1:02d} 10:00:00",
+                 f"uuid-{index}_video_{index % 5}.mp4"),
+            )
+        for type_, name, status in ((3, "alice", 1), (3, "bob", 0), (4, "carol", 1), (1, "dave", 1)):
+            self.conn.execute(
+                "INSERT INTO user_info (type, filePath, userName, status) VALUES (?, ?, ?, ?)",
+                (type_, f"{name}.json", name, status),
+            )
+        self.conn.commit()
+        ensure_list_schema(self.conn, self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.temp_dir.cleanup()
+
+    def test_uuid_column_is_backfilled_and_filled_on_insert(self):
+        self.conn.execute("INSERT INTO file_records (filename, filesize, file_path) VALUES ('a.mp4', 1, 'new-id_a.mp4')")
+
+        uuids = [row[0] for row in self.conn.execute("SELECT uuid FROM file_records ORDER BY id")]
+
+        self.assertEqual(uuids[0], "uuid-0")
+        self.assertEqual(uuids[-1], "new-id")
+
+    def test_cursor_pages_cover_every_row_once_in_sort_order(self):
+        seen = []
+        cursor = None
+        while True:
+            query = parse_file_query({"sort": "-size", "limit": "7", **({"cursor": cursor} if cursor else {})})
+            rows, cursor = fetch_page(self.conn, query)
+            seen += rows
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len({row[0] for row in seen}), 25)
+        keys = [(row[2], row[0]) for row in seen]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_cursor_pages_include_rows_without_a_size(self):
+        self.conn.executemany("INSERT INTO file_records (filename, filesize, file_path) VALUES (?, NULL, ?)",
+                              [(f"nosize_{index}.mp4", f"n{index}_nosize.mp4") for index in range(4)])
+        self.conn.commit()
+
+        for sort in ("size", "-size"):
+            seen = []
+            cursor = None
+            while True:
+                query = parse_file_query({"sort": sort, "limit": "3", **({"cursor": cursor} if cursor else {})})
+                rows, cursor = fetch_page(self.conn, query)
+                seen += rows
+                if cursor is None:
+                    break
+            expected = self.conn.execute(
+                f"SELECT id FROM file_records ORDER BY filesize {'DESC' if sort.startswith('-') else 'ASC'}, "
+                f"id {'DESC' if sort.startswith('-') else 'ASC'}"
+            ).fetchall()
+            self.assertEqual([row[0] for row in seen], [row[0] for row in expected])
+
+    def test_file_filters(self):
+        query = parse_file_query({"name": "video_1", "min_size": "3", "uploaded_before": "2025-01-05"})
+
+        rows, cursor = fetch_page(self.conn, query)
+
+        self.assertIsNone(cursor)
+        for row in rows:
+            self.assertEqual(row[1], "video_1.mp4")
+            self.assertGreaterEqual(row[2], 3)
+            self.assertLess(row[3], "2025-01-05")
+
+    def test_account_filters_and_legacy_row_shape(self):
+        rows, _ = fetch_page(self.conn, parse_account_query({"platform": "douyin", "status": "1"}))
+
+        self.assertEqual([list(row) for row in rows], [[1, 3, "alice.json", "alice", 1]])
+
+    def test_invalid_requests_are_rejected(self):
+        with self.assertRaises(ListQueryError):
+            parse_file_query({"sort": "filePath"})
+        with self.assertRaises(ListQueryError):
+            parse_account_query({"platform": "myspace"})
+        with self.assertRaises(ListQueryError):
+            fetch_page(self.conn, parse_file_query({"limit": "5", "cursor": "not-a-cursor"}))
+
+    def test_writes_change_the_etag_and_invalidate_the_cache(self):
+        query = parse_account_query({})
+        version = table_version(self.conn, "user_info")
+        rows, _ = list_rows(self.conn, query, version, self.db_path)
+
+        self.conn.execute("UPDATE user_info SET status = 0 WHERE userName = 'alice'")
+
+        new_version = table_version(self.conn, "user_info")
+        self.assertNotEqual(etag_for(query, version), etag_for(query, new_version))
+        new_rows, _ = list_rows(self.conn, query, new_version, self.db_path)
+        self.assertEqual(rows[0][4], 1)
+        self.assertEqual(new_rows[0][4], 0)
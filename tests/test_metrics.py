@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from utils import metrics
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        metrics.reset()
+        self.temp_dir.cleanup()
+
+    def test_counts_from_every_thread_are_summed(self):
+        def work():
+            for _ in range(1000):
+                metrics.increment("sau_test_total", platform="douyin")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.increment("sau_test_total", platform="douyin")
+
+        # 已退出线程的分片也要算进去
+        self.assertEqual(metrics.get("sau_test_total", platform="douyin"), 4001)
+
+    def test_histogram_is_rendered_in_prometheus_format(self):
+        metrics.observe("sau_test_seconds", 0.3, buckets=(0.1, 1), route="/getFiles")
+        metrics.observe("sau_test_seconds", 2, buckets=(0.1, 1), route="/getFiles")
+
+        text = metrics.render_prometheus(metrics.snapshot())
+
+        self.assertIn("# TYPE sau_test_seconds histogram", text)
+        self.assertNotIn('le="0.1"', text)
+        self.assertIn('sau_test_seconds_bucket{le="1.0",route="/getFiles"} 1', text)
+        self.assertIn('sau_test_seconds_bucket{le="+Inf",route="/getFiles"} 2', text)
+        self.assertIn('sau_test_seconds_sum{route="/getFiles"} 2.3', text)
+        self.assertIn('sau_test_seconds_count{route="/getFiles"} 2', text)
+
+    def test_collectors_report_current_values(self):
+        depth = [3]
+        collector = lambda: [("sau_test_queue_depth", {}, depth[0])]
+        metrics.register_collector(collector)
+        self.addCleanup(metrics._collectors.remove, collector)
+        self.assertEqual(metrics.get("sau_test_queue_depth"), 3)
+        depth[0] = 1
+        self.assertEqual(metrics.get("sau_test_queue_depth"), 1)
+
+    def _write_foreign_snapshot(self, pid, start_ticks, samples, written_at=None):
+        path = self.directory / f"{pid}-{start_ticks}.json"
+        path.write_text(json.dumps({
+            "pid": pid,
+            "start_ticks": start_ticks,
+            "written_at": written_at or time.time(),
+            "samples": samples,
+        }), encoding="utf-8")
+        return path
+
+    def test_collect_adds_up_snapshots_of_other_processes(self):
+        metrics.increment("sau_publish_jobs_total", platform="douyin", outcome="success")
+        metrics.add_gauge("sau_login_sessions_in_flight", 1, platform="douyin")
+        success = {"name": "sau_publish_jobs_total", "labels": {"platform": "douyin", "outcome": "success"},
+                   "value": 2, "type": "counter"}
+        in_flight = {"name": "sau_login_sessions_in_flight", "labels": {"platform": "douyin"},
+                     "value": 5, "type": "gauge"}
+        parent = metrics.sample_process(os.getppid())
+        self._write_foreign_snapshot(os.getppid(), parent.start_ticks if parent else 0, [success, in_flight])
+        self._write_foreign_snapshot(2 ** 22 + 17, 1, [success, in_flight])
+
+        samples = {
+            (s["name"], tuple(sorted(s["labels"].items()))): s["value"] for s in metrics.collect(self.directory)
+        }
+
+        # 已退出进程的计数保留，当前值只算还在运行的进程
+        self.assertEqual(samples[("sau_publish_jobs_total", (("outcome", "success"), ("platform", "douyin")))], 5)
+        self.assertEqual(samples[("sau_login_sessions_in_flight", (("platform", "douyin"),))], 6)
+
+    def test_old_snapshots_of_exited_processes_are_deleted(self):
+        path = self._write_foreign_snapshot(2 ** 22 + 17, 1, [], written_at=time.time() - 48 * 3600)
+
+        metrics.collect(self.directory)
+
+        self.assertFalse(path.exists())
+
+    def test_write_snapshot_is_read_back(self):
+        metrics.increment("sau_retry_total", platform="kuaishou", operation="upload", outcome="retry")
+        path = metrics.write_snapshot(self.directory)
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+
+        self.assertEqual(data["pid"], os.getpid())
+        self.assertIn(
+            {"name": "sau_retry_total", "labels": {"operation": "upload", "outcome": "retry", "platform": "kuaishou"},
+             "value": 1.0, "type": "counter"},
+            data["samples"],
+        )
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from utils.page_probe import ElementState, PageProbe, ProbeCheck
+
+
+class FakePage:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append((script, arg))
+        return self.result
+
+
+class PageProbeTests(unittest.TestCase):
+    def test_snapshot_is_one_evaluate_with_every_check(self):
+        probe = PageProbe("douyin", {
+            "sms_input": ProbeCheck('input[type="tel"]'),
+            "get_code_button": ProbeCheck(text="获取验证码"),
+            "publish_button": ProbeCheck("button", "发布", exact=True),
+        }, prelude="document.querySelectorAll('.shepherd-element').forEach(e => e.remove());")
+        page = FakePage({
+            "sms_input": [1, True, True, ""],
+            "get_code_button": [0, False, False, ""],
+            "publish_button": [1, True, False, "发布"],
+        })
+
+        state = asyncio.run(probe.snapshot(page))
+
+        self.assertEqual(len(page.calls), 1)
+        script, spec = page.calls[0]
+        self.assertIn(".shepherd-element", script)
+        self.assertEqual(spec["get_code_button"], {"selector": None, "text": ["获取验证码"], "exact": False})
+        self.assertEqual(spec["publish_button"], {"selector": "button", "text": ["发布"], "exact": True})
+        self.assertTrue(state["sms_input"].visible)
+        self.assertEqual(state["get_code_button"], ElementState())
+        self.assertEqual(state["publish_button"], ElementState(1, True, False, "发布"))
+        self.assertEqual(probe.describe(state), '{"sms_input": {"count": 1, "visible": true, "enabled": true, "text": ""}, '
+                                                '"publish_button": {"count": 1, "visible": true, "enabled": false, "text": "发布"}}')
+
+    def test_checks_missing_from_the_result_read_as_absent(self):
+        probe = PageProbe("kuaishou", {"uploading": ProbeCheck(text="上传中")})
+
+        state = asyncio.run(probe.snapshot(FakePage({})))
+
+        self.assertEqual(state["uploading"].count, 0)
+
+    def test_a_check_needs_a_selector_or_text(self):
+        with self.assertRaises(ValueError):
+            ProbeCheck()
+        self.assertEqual(ProbeCheck(text=("上传成功", "分辨率")).text, ("上传成功", "分辨率"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from tests.helpers import FakeClock
+from utils.job_phase import set_phase, track_job
+from utils.publish_ledger import (
+    CLAIM_LEASE_SECONDS,
+    PublishInProgress,
+    PublishLedger,
+    extract_post_id,
+    idempotency_key,
+    watch_publish_responses,
+)
+
+
+class FakePage:
+    def __init__(self):
+        self.handlers = []
+
+    def on(self, event, handler):
+        self.handlers.append((event, handler))
+
+    def emit_response(self, url, payload, method="POST", status=200):
+        response = MagicMock()
+        response.url = url
+        response.status = status
+        response.request.method = method
+        response.json = AsyncMock(return_value=payload)
+        for event, handler in self.handlers:
+            if event == "response":
+                handler(response)
+
+
+class PublishLedgerTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.video = self.root / "demo.mp4"
+        self.video.write_bytes(b"video-bytes")
+        self.ledger = PublishLedger(self.root / "state.db", clock=FakeClock())
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_account_content_and_title(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+        copy = self.root / "copy.mp4"
+        copy.write_bytes(b"video-bytes")
+
+        self.assertEqual(key, idempotency_key("douyin", "creator", [copy], " 标题 "))
+        self.assertNotEqual(key, idempotency_key("douyin", "other", [self.video], "标题"))
+        self.assertNotEqual(key, idempotency_key("douyin", "creator", [self.video], "新标题"))
+        copy.write_bytes(b"edited")
+        self.assertNotEqual(key, idempotency_key("douyin", "creator", [copy], "标题"))
+
+    def test_extract_post_id_prefers_keys_in_order(self):
+        payload = {"status_code": 0, "data": {"id": "user-1", "note": {"note_id": "n42"}}}
+        self.assertEqual(extract_post_id(payload, ("note_id", "id")), "n42")
+        self.assertEqual(extract_post_id({"item_id": 0, "aweme_id": 7}, ("item_id", "aweme_id")), "7")
+        self.assertIsNone(extract_post_id({"data": []}, ("item_id",)))
+
+    def test_lookup_without_database_does_not_create_it(self):
+        self.assertIsNone(self.ledger.lookup("missing"))
+        self.assertFalse((self.root / "state.db").exists())
+
+    def test_published_content_short_circuits_retry(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+        publish = AsyncMock()
+
+        first = asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", publish))
+        second = asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", publish))
+
+        self.assertEqual(publish.await_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.ledger.recent("douyin"), [first])
+
+    def test_failure_after_post_id_captured_is_still_recorded(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+        page = FakePage()
+
+        async def publish():
+            watch_publish_responses(page, "douyin")
+            page.emit_response(
+                "https://creator.douyin.com/web/api/media/aweme/create_v2/?a=1",
+                {"status_code": 0, "item_id": "7300000000000000001"},
+            )
+            await asyncio.sleep(0)
+            raise TimeoutError("wait_for_url timed out")
+
+        async def scenario():
+            with track_job("douyin"):
+                await self.ledger.publish_once(key, "douyin", "creator", "标题", publish)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(scenario())
+
+        post = self.ledger.lookup(key)
+        self.assertEqual(post.post_id, "7300000000000000001")
+        self.assertEqual(post.post_url, "https://www.douyin.com/video/7300000000000000001")
+
+    def test_failure_without_post_id_is_not_recorded(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+        publish = AsyncMock(side_effect=RuntimeError("boom"))
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", publish))
+        self.assertIsNone(self.ledger.lookup(key))
+
+    def test_identical_job_running_elsewhere_is_rejected(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+        publish = AsyncMock()
+        # 另一个进程（批量任务 / 监听目录）已经认领了同一内容
+        other = PublishLedger(self.ledger.db_path, clock=self.ledger.clock)
+        _, token = other.claim(key, "douyin", "creator")
+
+        with self.assertRaises(PublishInProgress):
+            asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", publish))
+        publish.assert_not_awaited()
+
+        # 对方进程挂了，租约过期后可以接手
+        self.ledger.clock.now += CLAIM_LEASE_SECONDS + 1
+        asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", publish))
+        self.assertEqual(publish.await_count, 1)
+        other.resolve(key, token)
+        self.assertIsNotNone(self.ledger.lookup(key))
+
+    def test_failure_at_publish_step_without_post_id_blocks_retry_until_forgotten(self):
+        key = idempotency_key("douyin", "creator", [self.video], "标题")
+
+        async def publish():
+            set_phase("publish")
+            raise TimeoutError("wait_for_url timed out")
+
+        async def scenario():
+            with track_job("douyin"):
+                await self.ledger.publish_once(key, "douyin", "creator", "标题", publish)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(scenario())
+        with self.assertRaisesRegex(PublishInProgress, "forget"):
+            asyncio.run(scenario())
+        self.assertIsNone(self.ledger.lookup(key))
+
+        self.assertTrue(self.ledger.forget(key))
+        retry = AsyncMock()
+        asyncio.run(self.ledger.publish_once(key, "douyin", "creator", "标题", retry))
+        retry.assert_awaited_once()
+
+    def test_unrelated_responses_are_ignored(self):
+        page = FakePage()
+
+        async def scenario():
+            with track_job("douyin") as tracker:
+                watch_publish_responses(page, "douyin")
+                page.emit_response("https://creator.douyin.com/web/api/media/user/info/", {"item_id": "1"})
+                page.emit_response("https://creator.douyin.com/web/api/media/aweme/create/", {"item_id": "2"}, method="GET")
+                await asyncio.sleep(0)
+                return tracker
+
+        self.assertIsNone(asyncio.run(scenario()).post_id)
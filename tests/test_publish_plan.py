@@ -0,0 +1,140 @@
+import asyncio
+import io
+import json
+import tempfile
+import unittest
+from argparse import Namespace
+from contextlib import asynccontextmanager, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+import sau_cli
+from utils.publish_ledger import idempotency_key
+from utils.publish_plan import aggregate_results, normalize_tags, normalize_title, plan_rows, prepare_asset
+
+
+@asynccontextmanager
+async def no_shared_browser():
+    yield None
+
+
+def write_video(path: Path, width: int, height: int, frames: int = 20, fps: float = 10.0) -> None:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for index in range(frames):
+        writer.write(np.full((height, width, 3), index * 10, dtype=np.uint8))
+    writer.release()
+
+
+class PublishPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.video = self.root / "demo.avi"
+        write_video(self.video, 64, 96)
+        self.cover_dir = self.root / "covers"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_probe_and_auto_cover_are_computed_once_per_video(self):
+        asset = prepare_asset(self.video, "auto", cover_dir=self.cover_dir)
+
+        self.assertEqual((asset.probe.width, asset.probe.height), (64, 96))
+        self.assertAlmostEqual(asset.probe.duration, 2.0, places=1)
+        self.assertEqual(asset.probe.orientation, "portrait")
+        self.assertTrue(asset.cover.name.startswith(asset.digest[:16]))
+        self.assertIsNotNone(cv2.imread(str(asset.cover)))
+
+        written_at = asset.cover.stat().st_mtime_ns
+        again = prepare_asset(self.video, "auto", cover_dir=self.cover_dir)
+        self.assertEqual(again.cover, asset.cover)
+        self.assertEqual(again.cover.stat().st_mtime_ns, written_at)
+
+    def test_unreadable_video_fails_before_any_upload(self):
+        broken = self.root / "broken.mp4"
+        broken.write_bytes(b"not a video")
+        with self.assertRaises(ValueError):
+            prepare_asset(broken)
+
+    def test_title_and_tags_follow_each_platform_limit(self):
+        self.assertEqual(normalize_title("xiaohongshu", "  一二三四五  六七八九十一二三四五六七八九十一二  "),
+                         "一二三四五 六七八九十一二三四五六七八九")
+        self.assertEqual(normalize_title("kuaishou", "x" * 50), "x" * 50)
+        self.assertEqual(normalize_tags("kuaishou", "#a, A ,b,c d,e"), ["a", "b", "cd"])
+        self.assertEqual(normalize_tags("douyin", ["a", "#a", ""]), ["a"])
+
+    def test_rows_carry_the_shared_cover_and_per_target_overrides(self):
+        asset = prepare_asset(self.video, "auto", cover_dir=self.cover_dir)
+        targets = [
+            {"platform": "douyin", "account": "creator"},
+            {"platform": "kuaishou", "account": "creator", "title": "快手专用标题"},
+            {"platform": "bilibili", "account": "creator", "tid": 249, "thumbnail": str(self.video)},
+        ]
+
+        rows = plan_rows(asset, targets, "共同标题" * 10, tags=["a", "b", "c", "d"])
+        jobs, errors = sau_cli.build_batch_jobs(rows, self.root, headless=True)
+
+        self.assertEqual(errors, [])
+        douyin, kuaishou, bilibili = (job.args for job in jobs)
+        self.assertEqual(douyin.thumbnail_portrait, asset.cover)
+        self.assertEqual(len(douyin.title), 30)
+        self.assertEqual((kuaishou.title, kuaishou.tags), ("快手专用标题", "a,b,c"))
+        self.assertEqual(bilibili.thumbnail, self.video)
+        self.assertEqual(bilibili.desc, bilibili.title)
+        self.assertIn("douyin: title cut to 30 characters", asset.warnings)
+
+    def test_publish_ledger_keys_reuse_the_plan_hash(self):
+        asset = prepare_asset(self.video)
+        # 预处理之后各平台的去重键不应再读一遍文件
+        with patch("utils.publish_ledger.open", side_effect=AssertionError("file hashed twice"), create=True):
+            idempotency_key("douyin", "creator", [self.video], "t")
+            idempotency_key("kuaishou", "creator", [str(self.video)], "t")
+        self.assertEqual(asset.size, self.video.stat().st_size)
+
+    def test_plan_command_runs_targets_and_prints_one_summary(self):
+        args = Namespace(
+            file=self.video,
+            title="标题",
+            desc="",
+            tags="a,b",
+            cover=None,
+            cover_at=None,
+            target=["douyin:one", "kuaishou:two"],
+            template=None,
+            results=None,
+            concurrency=2,
+            platform_concurrency="",
+            validate_only=False,
+            headless=True,
+        )
+
+        async def fake_dispatch(job_args):
+            if job_args.platform == "kuaishou":
+                raise RuntimeError("boom")
+            return 0
+
+        stdout = io.StringIO()
+        with patch("sau_cli.dispatch", side_effect=fake_dispatch), \
+                patch("sau_cli.shared_browser_session", new=no_shared_browser), \
+                redirect_stdout(stdout):
+            exit_code = asyncio.run(sau_cli.run_plan_command(args))
+
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(len(lines), 3)
+        summary = lines[-1]
+        self.assertEqual((summary["status"], summary["ok"], summary["failed"]), ("partial", 1, 1))
+        self.assertEqual([record["platform"] for record in summary["results"]], ["douyin", "kuaishou"])
+        self.assertEqual(summary["probe"]["orientation"], "portrait")
+
+    def test_aggregate_status(self):
+        asset = prepare_asset(self.video)
+        self.assertEqual(aggregate_results(asset, [{"status": "ok"}])["status"], "ok")
+        self.assertEqual(aggregate_results(asset, [{"status": "error"}])["status"], "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.helpers import FakeClock
+from utils.rate_limit import RateLimit, RateLimitTimeout, TokenBucketRateLimiter, resolve_limits
+
+
+class TokenBucketRateLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "state.db"
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def build_limiter(self, overrides):
+        return TokenBucketRateLimiter(db_path=self.db_path, overrides=overrides, clock=self.clock)
+
+    def test_account_bucket_blocks_after_burst_and_refills(self):
+        limiter = self.build_limiter({"douyin": {"platform": None, "account": (2, 60)}})
+        self.assertEqual(limiter.try_acquire("douyin", "creator"), 0)
+        self.assertEqual(limiter.try_acquire("douyin", "creator"), 0)
+        self.assertAlmostEqual(limiter.try_acquire("douyin", "creator"), 60)
+
+        self.clock.now += 30
+        self.assertAlmostEqual(limiter.try_acquire("douyin", "creator"), 30)
+        self.clock.now += 30
+        self.assertEqual(limiter.try_acquire("douyin", "creator"), 0)
+
+    def test_platform_bucket_is_shared_between_accounts(self):
+        limiter = self.build_limiter({"xiaohongshu": {"platform": (1, 10), "account": None}})
+        self.assertEqual(limiter.try_acquire("xiaohongshu", "a"), 0)
+        self.assertGreater(limiter.try_acquire("xiaohongshu", "b"), 0)
+
+    def test_denied_acquire_does_not_spend_other_bucket(self):
+        limiter = self.build_limiter({"douyin": {"platform": (5, 10), "account": (1, 100)}})
+        limiter.try_acquire("douyin", "creator")
+        limiter.try_acquire("douyin", "creator")
+        buckets = {item["bucket"]: item["tokens"] for item in limiter.status()}
+        self.assertEqual(buckets["platform:douyin"], 4)
+
+    def test_state_is_shared_between_limiter_instances(self):
+        overrides = {"kuaishou": {"platform": None, "account": (1, 100)}}
+        self.build_limiter(overrides).try_acquire("kuaishou", "creator")
+        self.assertGreater(self.build_limiter(overrides).try_acquire("kuaishou", "creator"), 0)
+
+    def test_checking_without_spending_leaves_the_token(self):
+        limiter = self.build_limiter({"douyin": {"platform": None, "account": (1, 60)}})
+        self.assertEqual(limiter.try_acquire("douyin", "creator", spend=False), 0)
+        # 还没扣过令牌时只检查不建库
+        self.assertFalse(self.db_path.exists())
+        self.assertEqual(limiter.try_acquire("douyin", "creator"), 0)
+        self.assertAlmostEqual(limiter.try_acquire("douyin", "creator", spend=False), 60)
+
+        self.clock.now += 60
+        self.assertEqual(limiter.try_acquire("douyin", "creator", spend=False), 0)
+        self.assertEqual(limiter.try_acquire("douyin", "creator"), 0)
+
+    def test_acquire_raises_when_wait_exceeds_timeout(self):
+        limiter = self.build_limiter({"douyin": {"platform": None, "account": (1, 600)}})
+        limiter.try_acquire("douyin", "creator")
+        with self.assertRaises(RateLimitTimeout):
+            asyncio.run(limiter.acquire("douyin", "creator", timeout=1))
+
+    def test_resolve_limits_uses_defaults_for_unknown_platform(self):
+        platform_limit, account_limit = resolve_limits("weibo", {})
+        self.assertIsInstance(platform_limit, RateLimit)
+        self.assertIsInstance(account_limit, RateLimit)
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from utils import metrics
+from utils.request_filter import ESTIMATED_BYTES, install_request_filter, rule_for
+
+
+class FakeContext:
+    def __init__(self):
+        self.handlers = []
+        self.events = {}
+
+    async def route(self, pattern, handler):
+        self.handlers.append((pattern, handler))
+
+    def on(self, event, handler):
+        self.events[event] = handler
+
+    async def request(self, url, resource_type):
+        route = MagicMock()
+        route.request.url = url
+        route.request.resource_type = resource_type
+        route.abort = AsyncMock()
+        route.fallback = AsyncMock()
+        for _pattern, handler in self.handlers:
+            await handler(route)
+        return "blocked" if route.abort.await_count else "allowed"
+
+
+class RequestFilterTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_filter_is_off_unless_enabled_per_platform(self):
+        config = {"douyin": True, "kuaishou": False, "tencent": {"enabled": False}}
+
+        self.assertIsNotNone(rule_for("douyin", config))
+        self.assertIsNone(rule_for("kuaishou", config))
+        self.assertIsNone(rule_for("tencent", config))
+        self.assertIsNone(rule_for("xiaohongshu", config))
+        self.assertIsNone(asyncio.run(install_request_filter(FakeContext(), "xiaohongshu")))
+
+    def test_default_rule_never_blocks_upload_sign_or_publish(self):
+        rule = rule_for("douyin", {"douyin": True})
+
+        self.assertTrue(rule.should_block("https://mcs.zijieapi.com/list", "fetch"))
+        self.assertTrue(rule.should_block("https://p3.douyinpic.com/avatar/abc.jpeg", "image"))
+        self.assertTrue(rule.should_block("https://v26.douyinvod.com/preview.mp4", "media"))
+        self.assertFalse(rule.should_block("https://creator.douyin.com/web/api/media/aweme/create_v2/", "fetch"))
+        self.assertFalse(rule.should_block("https://vod.bytedanceapi.com/?Action=ApplyUploadInner", "xhr"))
+        self.assertFalse(rule.should_block("https://creator.douyin.com/aweme/sign/report", "xhr"))
+        self.assertFalse(rule.should_block("https://creator.douyin.com/creator-micro/content/upload", "document"))
+        self.assertFalse(rule.should_block("https://p3.douyinpic.com/cover/abc.jpeg", "image"))
+        self.assertFalse(rule.should_block("https://lf3-cdn.bytegoofy.com/main.js", "script"))
+
+    def test_config_overrides_replace_builtin_lists(self):
+        rule = rule_for("xiaohongshu", {"xiaohongshu": {"block_resource_types": ["media"]}})
+
+        self.assertFalse(rule.should_block("https://sns-avatar.xhscdn.com/avatar.jpg", "image"))
+        self.assertTrue(rule.should_block("https://sns-video.xhscdn.com/preview.mp4", "media"))
+        self.assertTrue(rule.should_block("https://t2.xiaohongshu.com/api/v2/collect", "fetch"))
+
+    def test_blocked_requests_and_bytes_are_reported(self):
+        context = FakeContext()
+
+        async def scenario():
+            stats = await install_request_filter(context, "douyin", rule_for("douyin", {"douyin": True}))
+            results = [
+                await context.request("https://p3.douyinpic.com/avatar/abc.jpeg", "image"),
+                await context.request("https://creator.douyin.com/web/api/media/aweme/create_v2/", "fetch"),
+            ]
+            return stats, results
+
+        stats, results = asyncio.run(scenario())
+
+        self.assertEqual(results, ["blocked", "allowed"])
+        self.assertEqual((stats.blocked_requests, stats.estimated_bytes), (1, ESTIMATED_BYTES["image"]))
+        self.assertEqual(metrics.get("sau_request_filter_blocked_total", platform="douyin", resource_type="image"), 1)
+        self.assertEqual(metrics.get("sau_request_filter_estimated_bytes_saved_total", platform="douyin"), ESTIMATED_BYTES["image"])
+        self.assertIn("close", context.events)
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from tests.helpers import FakeClock
+from utils import metrics
+from utils.retry import FatalError, RetryBudget, RetryPolicy, TransientError, is_transient, retry_async
+
+
+class FlakyOperation:
+    def __init__(self, failures, exc_type=RuntimeError):
+        self.failures = failures
+        self.exc_type = exc_type
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc_type(f"failure {self.calls}")
+        return "ok"
+
+
+class RetryAsyncTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.sleep_patch = patch("utils.retry.asyncio.sleep", new=AsyncMock())
+        self.sleep = self.sleep_patch.start()
+
+    def tearDown(self):
+        self.sleep_patch.stop()
+        metrics.reset()
+
+    def run_retry(self, operation_fn, policy, **kwargs):
+        return asyncio.run(retry_async(operation_fn, policy, **kwargs))
+
+    def test_transient_failures_are_retried_until_success(self):
+        operation = FlakyOperation(failures=2)
+        result = self.run_retry(operation, RetryPolicy(max_attempts=5, max_elapsed=None), platform="douyin", operation="publish")
+        self.assertEqual(result, "ok")
+        self.assertEqual(operation.calls, 3)
+        self.assertEqual(metrics.get("sau_retry_total", platform="douyin", operation="publish", outcome="retry"), 2)
+        self.assertEqual(metrics.get("sau_retry_total", platform="douyin", operation="publish", outcome="recovered"), 1)
+
+    def test_fatal_errors_are_raised_without_retry(self):
+        operation = FlakyOperation(failures=3, exc_type=FatalError)
+        with self.assertRaises(FatalError):
+            self.run_retry(operation, RetryPolicy(max_attempts=5, max_elapsed=None))
+        self.assertEqual(operation.calls, 1)
+        self.sleep.assert_not_awaited()
+
+    def test_last_error_is_raised_when_attempts_run_out(self):
+        operation = FlakyOperation(failures=10)
+        with self.assertRaisesRegex(RuntimeError, "failure 3"):
+            self.run_retry(operation, RetryPolicy(max_attempts=3, max_elapsed=None))
+        self.assertEqual(operation.calls, 3)
+
+    def test_elapsed_cap_stops_before_sleeping_past_deadline(self):
+        operation = FlakyOperation(failures=10)
+        policy = RetryPolicy(max_attempts=None, base_delay=100, max_delay=100, max_elapsed=1)
+        with self.assertRaises(RuntimeError):
+            self.run_retry(operation, policy, rng=random.Random(1))
+        self.assertEqual(operation.calls, 1)
+
+    def test_exhausted_budget_fails_fast(self):
+        budget = RetryBudget(max_retries=1, window_seconds=60, clock=FakeClock())
+        operation = FlakyOperation(failures=10)
+        with self.assertRaises(RuntimeError):
+            self.run_retry(operation, RetryPolicy(max_attempts=10, max_elapsed=None), budget=budget)
+        self.assertEqual(operation.calls, 2)
+
+    def test_on_retry_hook_receives_attempt_and_may_be_async(self):
+        seen = []
+
+        async def hook(attempt, exc, delay):
+            seen.append((attempt, str(exc)))
+
+        self.run_retry(FlakyOperation(failures=1), RetryPolicy(max_attempts=3, max_elapsed=None), on_retry=hook)
+        self.assertEqual(seen, [(1, "failure 1")])
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def test_backoff_uses_full_jitter_below_capped_exponential(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+        rng = random.Random(7)
+        for attempt, ceiling in [(1, 1), (2, 2), (3, 4), (4, 8), (5, 10), (9, 10)]:
+            delay = policy.backoff(attempt, rng)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, ceiling)
+
+    def test_classification(self):
+        self.assertTrue(is_transient(TimeoutError("slow page")))
+        self.assertTrue(is_transient(TransientError("try again")))
+        self.assertFalse(is_transient(FileNotFoundError("missing.mp4")))
+        self.assertFalse(is_transient(ValueError("bad title")))
+
+
+class RetryBudgetTests(unittest.TestCase):
+    def test_budget_refills_after_window(self):
+        clock = FakeClock()
+        budget = RetryBudget(max_retries=2, window_seconds=10, clock=clock)
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+        self.assertEqual(budget.remaining(), 0)
+        clock.now += 10
+        self.assertTrue(budget.try_spend())
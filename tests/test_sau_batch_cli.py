@@ -0,0 +1,185 @@
+import asyncio
+import io
+import json
+import tempfile
+import unittest
+from argparse import Namespace
+from contextlib import asynccontextmanager, redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+import sau_cli
+
+
+@asynccontextmanager
+async def no_shared_browser():
+    yield None
+
+
+class BatchManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        (self.root / "a.mp4").write_bytes(b"video")
+        (self.root / "b.mp4").write_bytes(b"video")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_csv_manifest_rows_are_parsed_with_relative_paths(self):
+        manifest = self.root / "jobs.csv"
+        manifest.write_text(
+            "id,platform,account,file,title,tags\n"
+            "r1,douyin,creator,a.mp4,标题一,\"tag1,tag2\"\n"
+            "r2,kuaishou,creator,b.mp4,标题二,\n",
+            encoding="utf-8",
+        )
+        jobs, errors = sau_cli.build_batch_jobs(sau_cli.load_manifest(manifest), self.root, headless=True)
+
+        self.assertEqual(errors, [])
+        self.assertEqual([job.row_id for job in jobs], ["r1", "r2"])
+        self.assertEqual(jobs[0].args.file, self.root / "a.mp4")
+        self.assertEqual(jobs[0].args.tags, "tag1,tag2")
+        self.assertTrue(jobs[1].args.headless)
+
+    def test_all_invalid_rows_are_reported_up_front(self):
+        rows = [
+            {"platform": "douyin", "account": "creator", "file": "a.mp4", "title": "ok"},
+            {"platform": "douyin", "account": "creator", "file": "missing.mp4", "title": "bad file"},
+            {"platform": "douyin", "account": "creator", "file": "a.mp4"},
+            {"platform": "douyin", "action": "login", "account": "creator"},
+        ]
+        jobs, errors = sau_cli.build_batch_jobs(rows, self.root, headless=True)
+
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(errors[0].startswith("row 2"))
+
+    def test_duplicate_ids_are_rejected(self):
+        rows = [
+            {"id": "x", "platform": "douyin", "account": "a", "file": "a.mp4", "title": "t"},
+            {"id": "x", "platform": "douyin", "account": "b", "file": "b.mp4", "title": "t"},
+        ]
+        _, errors = sau_cli.build_batch_jobs(rows, self.root, headless=True)
+        self.assertEqual(len(errors), 1)
+
+    def test_run_batch_respects_platform_concurrency_and_streams_results(self):
+        rows = [
+            {"id": f"r{index}", "platform": "douyin", "account": f"a{index}", "file": "a.mp4", "title": "t"}
+            for index in range(4)
+        ]
+        jobs, _ = sau_cli.build_batch_jobs(rows, self.root, headless=True)
+        running = 0
+        peak = 0
+
+        async def fake_dispatch(args):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if args.account == "a3":
+                raise RuntimeError("boom")
+            return 0
+
+        emitted = []
+        with patch("sau_cli.dispatch", side_effect=fake_dispatch), \
+                patch("sau_cli.shared_browser_session", new=no_shared_browser):
+            results = asyncio.run(sau_cli.run_batch(jobs, 4, {"douyin": 2}, emitted.append))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(emitted), 4)
+        statuses = {record["id"]: record["status"] for record in results}
+        self.assertEqual(statuses["r3"], "error")
+        self.assertEqual(sum(status == "ok" for status in statuses.values()), 3)
+
+    def test_job_waiting_for_its_rate_limit_does_not_hold_a_slot(self):
+        rows = [
+            {"id": account, "platform": "douyin", "account": account, "file": "a.mp4", "title": "t"}
+            for account in ("limited", "free")
+        ]
+        jobs, _ = sau_cli.build_batch_jobs(rows, self.root, headless=True)
+        started = []
+        free_started = asyncio.Event()
+
+        async def acquire(platform, account=None, timeout=None, spend=True):
+            self.assertFalse(spend)
+            if account == "limited":
+                await free_started.wait()
+            return 0.0
+
+        async def fake_dispatch(args):
+            started.append(args.account)
+            free_started.set()
+            return 0
+
+        with patch("sau_cli.dispatch", side_effect=fake_dispatch), \
+                patch("sau_cli.publish_rate_limiter.acquire", side_effect=acquire), \
+                patch("sau_cli.shared_browser_session", new=no_shared_browser):
+            asyncio.run(sau_cli.run_batch(jobs, 1, {"douyin": 1}, lambda record: None))
+
+        self.assertEqual(started, ["free", "limited"])
+
+    def test_manifest_priority_and_schedule_decide_the_order(self):
+        rows = [
+            {"id": f"bulk{index}", "platform": "douyin", "account": f"a{index}", "file": "a.mp4", "title": "t"}
+            for index in range(3)
+        ] + [
+            {"id": "tonight", "platform": "douyin", "account": "b", "file": "b.mp4", "title": "t",
+             "schedule": "2030-01-01 20:00", "priority": "normal"},
+            {"id": "bad", "platform": "douyin", "account": "c", "file": "b.mp4", "title": "t", "priority": "asap"},
+        ]
+        jobs, errors = sau_cli.build_batch_jobs(rows, self.root, headless=True, priority="bulk", operator="ops")
+        self.assertEqual(len(errors), 1)
+        self.assertIn("unknown priority 'asap'", errors[0])
+        self.assertEqual({(job.priority, job.operator) for job in jobs[:3]}, {("bulk", "ops")})
+        ran = []
+
+        async def fake_dispatch(args):
+            ran.append(args.account)
+            await asyncio.sleep(0)
+            return 0
+
+        with patch("sau_cli.dispatch", side_effect=fake_dispatch), \
+                patch("sau_cli.shared_browser_session", new=no_shared_browser):
+            asyncio.run(sau_cli.run_batch(jobs, 1, {}, lambda record: None))
+
+        # 第一行已经拿到名额；之后定时发布的 normal 任务排在剩下的 bulk 前面
+        self.assertEqual(ran, ["a0", "b", "a1", "a2"])
+
+    def test_resume_skips_rows_already_ok(self):
+        manifest = self.root / "jobs.json"
+        manifest.write_text(json.dumps([
+            {"id": "done", "platform": "douyin", "account": "a", "file": "a.mp4", "title": "t"},
+            {"id": "todo", "platform": "douyin", "account": "b", "file": "b.mp4", "title": "t"},
+        ]), encoding="utf-8")
+        results_path = self.root / "results.jsonl"
+        results_path.write_text(
+            json.dumps({"id": "done", "status": "ok"}) + "\n" + json.dumps({"id": "todo", "status": "error"}) + "\n",
+            encoding="utf-8",
+        )
+        args = Namespace(
+            manifest=manifest,
+            results=results_path,
+            resume=True,
+            concurrency=2,
+            platform_concurrency="",
+            validate_only=False,
+            headless=True,
+        )
+        ran = []
+
+        async def fake_dispatch(job_args):
+            ran.append(job_args.account)
+            return 0
+
+        stdout = io.StringIO()
+        with patch("sau_cli.dispatch", side_effect=fake_dispatch), \
+                patch("sau_cli.shared_browser_session", new=no_shared_browser), \
+                redirect_stdout(stdout):
+            exit_code = asyncio.run(sau_cli.run_batch_command(args))
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(ran, ["b"])
+        self.assertEqual(json.loads(stdout.getvalue().strip())["id"], "todo")
+        self.assertIn("todo", sau_cli.load_completed_row_ids(results_path))
@@ -52,7 +52,42 @@ class BilibiliCliTests(unittest.TestCase):
             account_file = Path(temp_dir) / "account.json"
             account_file.write_text("{}", encoding="utf-8")
             request = sau_cli.BilibiliVideoUploadRequest("creator", Path("demo.mp4"), "hello", "hello", 249, ["test"], 0, Path("cover.png"))
-            with patch("sau_cli.resolve_account_file", return_value=account_file), patch("sau_cli.run_biliup_command", return_value=SimpleNamespace(returncode=0, stdout="", stderr="")) as run_biliup:
+            with patch("sau_cli.resolve_account_file", return_value=account_file), patch("sau_cli.wait_for_publish_slot", new=AsyncMock()), patch("sau_cli.run_biliup_command", return_value=SimpleNamespace(returncode=0, stdout="", stderr="")) as run_biliup:
                 asyncio.run(sau_cli.upload_bilibili_video(request))
         self.assertIn("--cover", run_biliup.call_args.args[0])
         self.assertIn("cover.png", run_biliup.call_args.args[0])
+
+    def test_missing_account_file_does_not_spend_a_rate_limit_token(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            account_file = Path(temp_dir) / "missing.json"
+            request = sau_cli.BilibiliVideoUploadRequest("creator", Path("demo.mp4"), "hello", "hello", 249, ["test"], 0)
+            with patch("sau_cli.resolve_account_file", return_value=account_file), \
+                    patch("sau_cli.wait_for_publish_slot", new=AsyncMock()) as wait_for_slot:
+                with self.assertRaisesRegex(RuntimeError, "account file is missing"):
+                    asyncio.run(sau_cli.upload_bilibili_video(request))
+        wait_for_slot.assert_not_awaited()
+
+    def test_native_engine_falls_back_to_biliup_only_before_submission(self):
+        biliup_ok = SimpleNamespace(returncode=0, stdout="", stderr="")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            account_file = Path(temp_dir) / "account.json"
+            account_file.write_text("{}", encoding="utf-8")
+            request = sau_cli.BilibiliVideoUploadRequest("creator", Path("demo.mp4"), "hello", "hello", 249, ["test"], 0)
+            with patch("sau_cli.resolve_account_file", return_value=account_file), \
+                    patch("sau_cli.wait_for_publish_slot", new=AsyncMock()), \
+                    patch("sau_cli.run_biliup_command", return_value=biliup_ok) as run_biliup, \
+                    patch("sau_cli.upload_bilibili_video_native", new=AsyncMock(side_effect=RuntimeError("preupload refused"))), \
+                    patch("sys.stderr"):
+                asyncio.run(sau_cli.upload_bilibili_video(request))
+                self.assertEqual(run_biliup.call_count, 1)
+
+                submitted = sau_cli.BilibiliSubmissionStarted("submission failed")
+                with patch("sau_cli.upload_bilibili_video_native", new=AsyncMock(side_effect=submitted)):
+                    with self.assertRaises(sau_cli.BilibiliSubmissionStarted):
+                        asyncio.run(sau_cli.upload_bilibili_video(request))
+                self.assertEqual(run_biliup.call_count, 1)
+
+                request.engine = "native"
+                with self.assertRaises(RuntimeError):
+                    asyncio.run(sau_cli.upload_bilibili_video(request))
+                self.assertEqual(run_biliup.call_count, 1)
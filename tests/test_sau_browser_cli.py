@@ -213,6 +213,7 @@ class BrowserCliDispatchTests(unittest.TestCase):
         )
 
         with (
+            patch("sau_cli.wait_for_publish_slot", new=AsyncMock()),
             patch("sau_cli.tencent_setup", new=AsyncMock(return_value=True)),
             patch.object(sau_cli.TencentVideo, "tencent_upload_video", new=AsyncMock()) as mock_upload,
         ):
@@ -0,0 +1,105 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from tests.helpers import FakeClock
+from utils.selector_cache import SelectorRegistry
+
+
+class FakeLocator:
+    """Counts queries; `appears_after` seconds after creation the element is on the page."""
+
+    def __init__(self, present=False, appears_after=None, visible=True, reported_after=None):
+        self.present = present
+        self.appears_after = appears_after
+        # wait_for() may return later than the element actually appeared
+        self.reported_after = reported_after if reported_after is not None else appears_after
+        self.visible = visible
+        self.queries = 0
+        self.created = time.monotonic()
+
+    async def count(self):
+        self.queries += 1
+        if self.appears_after is not None and time.monotonic() - self.created >= self.appears_after:
+            return 1
+        return int(self.present)
+
+    async def is_visible(self):
+        self.queries += 1
+        return self.visible
+
+    async def wait_for(self, state="attached", timeout=30000):
+        if self.appears_after is None:
+            await asyncio.sleep(timeout / 1000)
+            raise TimeoutError(f"Timeout {timeout}ms exceeded")
+        await asyncio.sleep(self.reported_after)
+
+
+class SelectorRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "state.db"
+        self.clock = FakeClock(1_700_000_000.0)
+        self.registry = SelectorRegistry(self.db_path, clock=self.clock)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_last_winner_is_tried_first_and_the_ranking_survives_a_restart(self):
+        self.assertEqual(self.registry.ranked("douyin", "upload_input", ["a", "b", "c"]), ["a", "b", "c"])
+        stale, current = FakeLocator(), FakeLocator(present=True)
+
+        found = asyncio.run(self.registry.first_present("douyin", "upload_input", {"a": stale, "b": current}))
+
+        self.assertEqual(found, ("b", current))
+        restarted = SelectorRegistry(self.db_path, clock=self.clock)
+        self.assertEqual(restarted.ranked("douyin", "upload_input", ["a", "b", "c"]), ["b", "a", "c"])
+        self.assertEqual(restarted.ranked("kuaishou", "upload_input", ["a", "b"]), ["a", "b"])
+
+        stale, current = FakeLocator(), FakeLocator(present=True)
+        asyncio.run(restarted.first_present("douyin", "upload_input", {"a": stale, "b": current}))
+        self.assertEqual(stale.queries, 0)
+
+    def test_visible_lookups_skip_hidden_matches(self):
+        hidden, shown = FakeLocator(present=True, visible=False), FakeLocator(present=True)
+
+        found = asyncio.run(self.registry.first_present("douyin", "cover_trigger", {"编辑封面": hidden, "选择封面": shown},
+                                                        visible=True))
+
+        self.assertEqual(found[0], "选择封面")
+
+    def test_race_waits_for_all_variants_at_once(self):
+        candidates = {
+            "stale": FakeLocator(),
+            "slow": FakeLocator(appears_after=0.3),
+            "current": FakeLocator(appears_after=0.05),
+        }
+        started = time.monotonic()
+
+        variant, locator = asyncio.run(self.registry.race("douyin", "upload_input", candidates, timeout=5000))
+
+        self.assertEqual(variant, "current")
+        self.assertIs(locator, candidates["current"])
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.registry.ranked("douyin", "upload_input", candidates)[0], "current")
+
+    def test_race_prefers_the_higher_ranked_variant_once_both_appear(self):
+        candidates = {
+            "precise": FakeLocator(appears_after=0.01, reported_after=0.5),
+            "broad": FakeLocator(appears_after=0.01, reported_after=0.02),
+        }
+
+        variant, _ = asyncio.run(self.registry.race("douyin", "upload_input", candidates, timeout=5000))
+
+        self.assertEqual(variant, "precise")
+
+    def test_race_times_out_when_nothing_appears(self):
+        with self.assertRaises(TimeoutError):
+            asyncio.run(self.registry.race("douyin", "upload_input", {"a": FakeLocator(), "b": FakeLocator()}, timeout=50))
+        self.assertFalse(self.db_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.state_db import StateStore
+
+
+class Notes(StateStore):
+    SCHEMA_STATEMENTS = (
+        "CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, body TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS notes_body ON notes (body)",
+    )
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+
+class StateStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "state.db"
+        self.store = Notes(self.db_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read_only_connect_does_not_create_the_database(self):
+        self.assertIsNone(self.store._connect(create=False))
+        self.assertFalse(self.db_path.exists())
+
+    def test_first_connect_creates_the_schema(self):
+        conn = self.store._connect()
+        try:
+            conn.execute("INSERT INTO notes (body) VALUES ('hi')")
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        finally:
+            conn.close()
+        self.assertTrue({"notes", "notes_body"} <= names)
+
+        conn = Notes(self.db_path)._connect(create=False)
+        try:
+            self.assertEqual(conn.execute("SELECT body FROM notes").fetchall(), [("hi",)])
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
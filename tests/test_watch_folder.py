@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from sau_cli import build_batch_jobs, parse_watch_targets, watch_rows
+from tests.helpers import FakeClock
+from utils.watch_folder import FolderWatcher, IngestLedger, InotifyWatcher, VideoMetadata, ingest_file, read_sidecar
+
+
+class WatchFolderTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.temp_dir.name)
+        self.drop = self.base_dir / "drop"
+        self.drop.mkdir()
+        self.clock = FakeClock()
+        self.ledger = IngestLedger(self.base_dir / "state.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def watcher(self, **kwargs):
+        return FolderWatcher(self.drop, settle_seconds=10, poll=True, ledger=self.ledger, clock=self.clock, **kwargs)
+
+    def test_sidecar_gives_title_tags_and_description(self):
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"video")
+        self.assertEqual(read_sidecar(video), VideoMetadata(title="clip"))
+
+        (self.drop / "clip.txt").write_text("标题\n#美食 #探店\n第一行\n第二行\n", encoding="utf-8")
+
+        self.assertEqual(read_sidecar(video), VideoMetadata("标题", ["美食", "探店"], "第一行\n第二行"))
+
+    def test_ingest_links_instead_of_copying(self):
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"video" * 1000)
+
+        ingested, method = ingest_file(video, self.base_dir / "videoFile")
+
+        self.assertEqual(method, "hardlink")
+        self.assertTrue(ingested.name.endswith("_clip.mp4"))
+        self.assertTrue(os.path.samefile(video, ingested))
+
+    def test_files_are_handed_over_only_after_they_stop_changing(self):
+        watcher = self.watcher()
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"part")
+        watcher.scan()
+
+        self.clock.now += 6
+        with video.open("ab") as handle:
+            handle.write(b"more")
+        os.utime(video, ns=(1, 2))
+        self.assertEqual(watcher.take_ready(), [])
+        self.clock.now += 6
+        self.assertEqual(watcher.take_ready(), [])
+
+        self.clock.now += 10
+        self.assertEqual(watcher.take_ready(), [video])
+        watcher.scan()
+        self.clock.now += 60
+        self.assertEqual(watcher.take_ready(), [])
+
+    def test_sidecar_changes_restart_the_wait_and_can_be_required(self):
+        watcher = self.watcher(require_sidecar=True)
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"video")
+        watcher.scan()
+        self.clock.now += 5
+        (self.drop / "clip.txt").write_text("标题\n", encoding="utf-8")
+        watcher.scan()
+
+        self.clock.now += 6
+        self.assertEqual(watcher.take_ready(), [])
+        self.clock.now += 6
+        self.assertEqual(watcher.take_ready(), [video])
+
+        bare = self.drop / "bare.mp4"
+        bare.write_bytes(b"video")
+        watcher.scan()
+        self.clock.now += 60
+        self.assertEqual(watcher.take_ready(), [])
+
+    def test_ingested_videos_are_not_published_again_after_a_restart(self):
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"video")
+        (self.drop / ".clip.mp4.partial").write_bytes(b"tmp")
+        ready = []
+
+        async def on_ready(path):
+            ready.append(path)
+            self.ledger.add(path, path.stat(), self.base_dir / "ingested.mp4")
+
+        watcher = FolderWatcher(self.drop, settle_seconds=0, poll=True, ledger=self.ledger)
+        asyncio.run(watcher.run(on_ready, once=True))
+        restarted = FolderWatcher(self.drop, settle_seconds=0, poll=True, ledger=self.ledger)
+        asyncio.run(restarted.run(on_ready, once=True))
+
+        self.assertEqual(ready, [video])
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+    def test_inotify_reports_new_files(self):
+        inotify = InotifyWatcher(self.drop)
+        try:
+            (self.drop / "clip.mp4").write_bytes(b"video")
+            names = asyncio.run(inotify.wait(5))
+        finally:
+            inotify.close()
+
+        self.assertEqual(names, {"clip.mp4"})
+
+    def test_each_video_becomes_one_batch_row_per_target(self):
+        video = self.drop / "clip.mp4"
+        video.write_bytes(b"video")
+        # B 站的分区等必填参数写在 --template 里
+        targets = parse_watch_targets(["douyin:creator"]) + [{"platform": "bilibili", "account": "main", "tid": 21}]
+
+        rows = watch_rows(targets, video, VideoMetadata("标题", ["美食"]))
+        jobs, errors = build_batch_jobs(rows, self.base_dir, headless=True)
+
+        self.assertEqual(errors, [])
+        self.assertEqual([(job.platform, job.account) for job in jobs], [("douyin", "creator"), ("bilibili", "main")])
+        self.assertEqual(jobs[0].args.title, "标题")
+        self.assertEqual(jobs[1].args.desc, "标题")
+        with self.assertRaises(RuntimeError):
+            parse_watch_targets(["douyin"])
+
+
+if __name__ == "__main__":
+    unittest.main()
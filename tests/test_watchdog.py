@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from utils import metrics
+from utils.browser_processes import browser_processes, descendants
+from utils.job_phase import set_phase, track_job
+from utils.watchdog import JobTimeoutError, run_with_watchdog, watch_closable, watched_launch
+
+
+def write_proc(root: Path, pid: int, ppid: int, cmdline: str) -> None:
+    entry = root / str(pid)
+    entry.mkdir()
+    (entry / "stat").write_text(f"{pid} (some (name)) S {ppid} 0 0", encoding="utf-8")
+    (entry / "cmdline").write_bytes(cmdline.replace(" ", "\0").encode("utf-8"))
+
+
+class WatchdogTests(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_finished_job_returns_its_result(self):
+        async def job():
+            set_phase("publish")
+            return "done"
+
+        result = asyncio.run(run_with_watchdog(job, platform="douyin", poll_interval=0.01))
+        self.assertEqual(result, "done")
+        self.assertEqual(metrics.get("sau_publish_jobs_total", platform="douyin", outcome="success"), 1)
+        self.assertEqual(metrics.get("sau_publish_job_duration_seconds_count", platform="douyin", outcome="success"), 1)
+
+    def test_stuck_phase_is_cancelled_and_browser_closed(self):
+        browser = MagicMock()
+        browser.close = AsyncMock()
+
+        async def job():
+            watch_closable(browser)
+            set_phase("publish")
+            await asyncio.Event().wait()
+
+        async def scenario():
+            with track_job("douyin") as tracker:
+                with self.assertRaises(JobTimeoutError) as caught:
+                    await run_with_watchdog(job, platform="douyin", deadlines={"publish": 0.05}, poll_interval=0.01)
+                return tracker, caught.exception
+
+        tracker, exc = asyncio.run(scenario())
+
+        self.assertEqual(exc.phase, "publish")
+        self.assertEqual(tracker.phase, "publish")
+        browser.close.assert_awaited_once()
+        self.assertEqual(metrics.get("sau_job_timeout_total", platform="douyin", phase="publish"), 1)
+        self.assertEqual(metrics.get("sau_publish_jobs_total", platform="douyin", outcome="timeout"), 1)
+
+    def test_phase_without_deadline_is_not_interrupted(self):
+        async def job():
+            set_phase("rate_limit")
+            await asyncio.sleep(0.1)
+            set_phase("publish")
+            return "done"
+
+        result = asyncio.run(run_with_watchdog(
+            job, platform="douyin", deadlines={"rate_limit": None, "publish": 5}, poll_interval=0.01
+        ))
+        self.assertEqual(result, "done")
+
+    def test_browser_processes_of_a_hung_job_are_killed(self):
+        browser = MagicMock()
+        browser.close = AsyncMock(side_effect=asyncio.TimeoutError)
+
+        async def job():
+            await watched_launch(AsyncMock(return_value=browser))
+            set_phase("upload_file")
+            await asyncio.Event().wait()
+
+        async def launch_and_attribute(launch, platform):
+            return await launch(), {101, 102}
+
+        supervisor = MagicMock()
+        supervisor.launch = AsyncMock(side_effect=launch_and_attribute)
+
+        with patch("utils.watchdog.browser_supervisor", supervisor), \
+                patch("utils.watchdog.kill_process_trees", return_value=[101, 102]) as kill:
+            with self.assertRaises(JobTimeoutError):
+                asyncio.run(run_with_watchdog(
+                    job, platform="kuaishou", deadlines={"upload_file": 0.05}, poll_interval=0.01
+                ))
+
+        kill.assert_called_once_with({101, 102})
+        self.assertEqual(supervisor.launch.await_args.args[1], "kuaishou")
+
+
+class BrowserProcessesTests(unittest.TestCase):
+    def test_only_browser_descendants_are_listed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            write_proc(root, 10, 1, "python sau_cli.py")
+            write_proc(root, 11, 10, "node driver/package/cli.js run-driver")
+            write_proc(root, 12, 11, "/ms-playwright/chromium-1/chrome-linux/chrome --headless")
+            write_proc(root, 13, 12, "/ms-playwright/chromium-1/chrome-linux/chrome --type=renderer")
+            write_proc(root, 20, 1, "/usr/bin/chromium unrelated")
+
+            self.assertEqual(descendants(10, root), {11, 12, 13})
+            self.assertEqual(browser_processes(10, root), {12, 13})
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+from uploader.youtube_uploader.resumable import (
+    CHUNK_ALIGNMENT,
+    ResumableSettings,
+    ResumableUpload,
+    chunk_size_for,
+    upload_video,
+)
+from utils.job_phase import track_job
+from utils.retry import FatalError, RetryPolicy
+
+FAST_RETRY = RetryPolicy(max_attempts=6, base_delay=0.01, max_delay=0.02, max_elapsed=30)
+
+
+class StandInYouTube(BaseHTTPRequestHandler):
+    """Just enough of the resumable upload protocol: one session, faults injected per chunk PUT."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _persisted(self):
+        data = self.server.data
+        return {"Range": f"bytes=0-{len(data) - 1}"} if data else {}
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        path = urlsplit(self.path).path
+        if path == "/token":
+            server.token_requests += 1
+            return self._reply(200, {"access_token": "token-1", "expires_in": 3600})
+        if path == "/thumbnail":
+            server.thumbnail = body
+            return self._reply(200, {})
+        if path == "/upload":
+            if self.headers.get("Authorization") != "Bearer token-1" or server.reject_start:
+                return self._reply(403, {"error": "forbidden"})
+            server.metadata = json.loads(body)
+            server.size = int(self.headers["X-Upload-Content-Length"])
+            return self._reply(200, None, {"Location": f"http://127.0.0.1:{server.server_port}/session/1"})
+        self._reply(404)
+
+    def do_PUT(self):
+        server = self.server
+        content_range = self.headers["Content-Range"]
+        server.ranges.append(content_range)
+        span, _, total = content_range[len("bytes "):].partition("/")
+        if span == "*":
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if len(server.data) == server.size:
+                return self._reply(200, {"id": "vid-1"})
+            return self._reply(308, None, self._persisted())
+
+        start = int(span.split("-")[0])
+        length = int(self.headers["Content-Length"])
+        assert start == len(server.data), (start, len(server.data))
+        fault = server.faults.pop(0) if server.faults else None
+        if fault == "drop":
+            # 读一半就断开连接，只保留对齐到 256 KiB 的部分
+            received = self.rfile.read(length // 2)
+            keep = (start + len(received)) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT - start
+            server.data.extend(received[:keep])
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        if fault == "503":
+            return self._reply(503, {"error": "backend error"})
+        if fault == "partial":
+            body = body[:CHUNK_ALIGNMENT]
+        server.data.extend(body)
+        if len(server.data) == int(total):
+            return self._reply(201, {"id": "vid-1", "status": server.metadata["status"]})
+        self._reply(308, None, self._persisted())
+
+
+class ResumableUploadTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.video = Path(self.temp_dir.name) / "demo.mp4"
+        self.content = os.urandom(4 * CHUNK_ALIGNMENT + 1000)
+        self.video.write_bytes(self.content)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInYouTube)
+        self.server.data = bytearray()
+        self.server.size = None
+        self.server.faults = []
+        self.server.ranges = []
+        self.server.token_requests = 0
+        self.server.reject_start = False
+        self.server.thumbnail = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.http = requests.Session()
+        self.http.trust_env = False
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.http.close()
+        self.temp_dir.cleanup()
+
+    def upload(self, progress=None):
+        async def token():
+            return "token-1"
+
+        return ResumableUpload(
+            self.http,
+            self.video,
+            {"snippet": {"title": "demo"}, "status": {"privacyStatus": "private"}},
+            token=token,
+            upload_url=self.base_url + "/upload",
+            chunk_size=CHUNK_ALIGNMENT,
+            timeout=10,
+            policy=FAST_RETRY,
+            on_progress=progress,
+        )
+
+    def test_file_is_streamed_in_chunks_with_byte_accurate_progress(self):
+        progress = []
+        upload = self.upload(lambda sent, total: progress.append((sent, total)))
+
+        video = asyncio.run(upload.run())
+
+        self.assertEqual(video["id"], "vid-1")
+        self.assertEqual(bytes(self.server.data), self.content)
+        self.assertEqual(len(self.server.ranges), 5)
+        self.assertEqual(self.server.ranges[-1], f"bytes {4 * CHUNK_ALIGNMENT}-{len(self.content) - 1}/{len(self.content)}")
+        sent = [value for value, _ in progress]
+        self.assertEqual(sent, sorted(sent))
+        self.assertEqual(progress[-1], (len(self.content), len(self.content)))
+
+    def test_dropped_connections_resume_from_the_acknowledged_offset(self):
+        self.server.faults = [None, "drop", "503", "partial"]
+        progress = []
+        upload = self.upload(lambda sent, total: progress.append(sent))
+
+        asyncio.run(upload.run())
+
+        self.assertEqual(bytes(self.server.data), self.content)
+        self.assertEqual(upload.resumes, 2)
+        # 断线后先查询进度，再从服务端确认的位置续传，不从头开始
+        self.assertIn(f"bytes */{len(self.content)}", self.server.ranges)
+        starts = [int(item.split(" ")[1].split("-")[0]) for item in self.server.ranges if "*" not in item]
+        self.assertEqual(starts[0], 0)
+        self.assertNotIn(0, starts[1:])
+        self.assertIn(CHUNK_ALIGNMENT, progress)
+
+    def test_rejected_session_fails_without_retrying(self):
+        self.server.reject_start = True
+
+        with self.assertRaises(FatalError):
+            asyncio.run(self.upload().run())
+        self.assertEqual(self.server.ranges, [])
+
+    def test_upload_video_publishes_and_records_the_post(self):
+        thumbnail = Path(self.temp_dir.name) / "cover.jpg"
+        thumbnail.write_bytes(b"jpeg")
+        settings = ResumableSettings(
+            engine="resumable",
+            client_id="client",
+            client_secret="secret",
+            refresh_tokens={"creator": "refresh"},
+            chunk_mb=0.5,
+            token_url=self.base_url + "/token",
+            upload_url=self.base_url + "/upload",
+            thumbnail_url=self.base_url + "/thumbnail",
+        )
+
+        with track_job("youtube") as tracker:
+            asyncio.run(upload_video("creator", self.video, "标题", "简介", ["a", "b"], thumbnail_path=str(thumbnail),
+                                     visibility="unlisted", settings=settings))
+
+        self.assertEqual(bytes(self.server.data), self.content)
+        self.assertEqual(self.server.metadata["snippet"]["tags"], ["a", "b"])
+        self.assertEqual(self.server.metadata["status"]["privacyStatus"], "unlisted")
+        self.assertEqual(self.server.token_requests, 1)
+        self.assertEqual(self.server.thumbnail, b"jpeg")
+        self.assertEqual(tracker.post_url, "https://www.youtube.com/watch?v=vid-1")
+        with self.assertRaises(RuntimeError):
+            asyncio.run(upload_video("other", self.video, "标题", settings=settings))
+
+    def test_chunk_size_is_a_multiple_of_256_kib(self):
+        self.assertEqual(chunk_size_for(1), 1024 * 1024)
+        self.assertEqual(chunk_size_for(0.3), CHUNK_ALIGNMENT)
+        self.assertEqual(chunk_size_for(0), CHUNK_ALIGNMENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
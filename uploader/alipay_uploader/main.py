@@ -14,6 +14,8 @@ from playwright.async_api import Page, Playwright, TimeoutError as PWTimeoutErro
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.log import alipay_logger
 from utils.login_qrcode import build_login_qrcode_path
 from utils.login_qrcode import decode_qrcode_from_path
@@ -145,7 +147,7 @@ async def alipay_cookie_gen(account_file, qrcode_callback=None, poll_interval: i
     qrcode_path = None
     result = _build_login_result(False, "failed", "支付宝登录失败", account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=headless))
         context = await browser.new_context()
         try:
             page = await context.new_page()
@@ -226,7 +228,7 @@ async def _is_alipay_login_completed(page: Page, login_iframe) -> bool:
 async def cookie_auth(account_file):
     account_file = _resolve_account_file(account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=True))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=True))
         try:
             context = await browser.new_context(storage_state=account_file)
             page = await context.new_page()
@@ -322,7 +324,7 @@ class AlipayVideo(BaseVideoUploader):
     async def upload_video_file(self, page: Page, file_path: str) -> None:
         file_input = page.locator('input[type="file"]').first
         await file_input.wait_for(state="attached", timeout=30000)
-        await file_input.set_input_files(file_path)
+        await file_input.set_input_files(await stage_files(file_path))
         alipay_logger.info(_msg("🏃", f"已选择视频文件: {file_path}"))
 
     async def fill_title_and_tags(self, page: Page) -> None:
@@ -366,7 +368,7 @@ class AlipayVideo(BaseVideoUploader):
             # 4) 设置图片到新出现的图片 file input
             img_input = page.locator('input[type="file"][accept*="jpg"], input[type="file"][accept*="png"]').first
             await img_input.wait_for(state="attached", timeout=10000)
-            await img_input.set_input_files(self.thumbnail_path)
+            await img_input.set_input_files(await stage_files(self.thumbnail_path))
             await page.wait_for_timeout(3000)
 
             # 5) 裁剪弹窗里点"完 成"
@@ -674,7 +676,7 @@ class AlipayVideo(BaseVideoUploader):
         await self.validate_upload_args()
         alipay_logger.info(_msg("🥳", "上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=self.headless))
         context = await browser.new_context(storage_state=self.account_file)
         await context.grant_permissions(["geolocation"])
         # 注意：不能用 set_init_script(stealth) —— 会阻止支付宝内容创作平台(qiankun 微应用)渲染
@@ -20,8 +20,11 @@ from playwright.async_api import Page, Playwright, TimeoutError as PWTimeoutErro
 
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.log import baijiahao_logger
 from utils.login_qrcode import build_login_qrcode_path, decode_qrcode_from_path, print_terminal_qrcode, remove_qrcode_file
+from utils.publish_ledger import watch_publish_responses
 
 
 BAIJIAHAO_LOGIN_URL = "https://baijiahao.baidu.com/builder/theme/bjh/login"
@@ -129,7 +132,7 @@ async def baijiahao_cookie_gen(account_file, qrcode_callback=None, poll_interval
     result = _build_login_result(False, "failed", "百家号登录失败", account_file)
 
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=headless))
         context = await browser.new_context()
         try:
             page = await context.new_page()
@@ -187,7 +190,7 @@ async def cookie_auth(account_file):
     """验证百家号 cookie 是否有效。访问后台首页，检测是否出现登录提示。"""
     account_file = _resolve_account_file(account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=True))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=True))
         try:
             context = await browser.new_context(storage_state=account_file)
             page = await context.new_page()
@@ -271,12 +274,13 @@ class BaiJiaHaoVideo(BaseVideoUploader):
         await self.validate_upload_args()
         baijiahao_logger.info(_msg("🥳", "上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=self.headless))
         context = await browser.new_context(storage_state=self.account_file)
         await context.grant_permissions(["geolocation"])
 
         try:
             page = await context.new_page()
+            watch_publish_responses(page, "baijiahao")
             await page.goto(BAIJIAHAO_PUBLISH_URL, timeout=120000, wait_until="domcontentloaded")
             baijiahao_logger.info(_msg("🏃", f"开始上传视频: {self.title}"))
 
@@ -290,7 +294,7 @@ class BaiJiaHaoVideo(BaseVideoUploader):
             if not await file_input.count():
                 file_input = page.locator('input[type="file"]').first
             await file_input.wait_for(state="attached", timeout=30000)
-            await file_input.set_input_files(self.file_path)
+            await file_input.set_input_files(await stage_files(self.file_path))
             baijiahao_logger.info(_msg("🏃", f"已选择视频文件: {self.file_path}"))
 
             # 2) 等待进入表单页面（contenteditable 标题区出现即表单渲染完毕）
@@ -426,7 +430,7 @@ class BaiJiaHaoVideo(BaseVideoUploader):
             if not await img_input.count():
                 # 通用 fallback：弹窗内最新出现的 file input
                 img_input = page.locator('input[type="file"]').last
-            await img_input.set_input_files(self.thumbnail_path)
+            await img_input.set_input_files(await stage_files(self.thumbnail_path))
             baijiahao_logger.info(_msg("🏃", f"已选择封面图片: {self.thumbnail_path}"))
 
             # 4) 等待并点击确认/完成按钮（如有裁剪弹窗）。
@@ -0,0 +1,394 @@
+"""Bilibili upload engine in Python: the web uploader's upos protocol, no biliup binary.
+
+It reuses the cookie file `sau bilibili login` (biliup) writes. The video is cut into the
+chunk size the preupload step hands out, each chunk read with an offset read, `threads`
+chunks in flight at a time over one connection pool and each retried on its own; then
+the parts are committed and the submission is sent with the account's CSRF token.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import mimetypes
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urljoin
+
+import requests
+
+from utils import metrics
+from utils.job_phase import CHECKPOINT_PUBLISHED, CHECKPOINT_UPLOADED, mark_checkpoint, set_phase
+from utils.log import bilibili_logger
+from utils.network import pooled_http_session
+from utils.publish_ledger import record_post_id
+from utils.retry import FatalError, RetryPolicy, TransientError, retry_async
+
+try:
+    # 在 conf.py 里用 BILIBILI_UPLOAD 选择上传引擎和并发分片数，见 conf.example.py
+    from conf import BILIBILI_UPLOAD
+except ImportError:
+    BILIBILI_UPLOAD = {}
+
+ENGINE_NATIVE = "native"
+ENGINE_BILIUP = "biliup"
+ENGINES = (ENGINE_NATIVE, ENGINE_BILIUP)
+
+MEMBER_URL = "https://member.bilibili.com"
+UPLOAD_PROFILE = "ugcfx/bup"
+REQUIRED_COOKIES = ("SESSDATA", "bili_jct")
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+# 单个分片失败只重传这一片
+CHUNK_RETRY_POLICY = RetryPolicy(max_attempts=8, base_delay=1.0, max_delay=30.0, max_elapsed=900)
+# preupload / 建分片任务 / 合并分片：都是幂等的小请求
+STEP_RETRY_POLICY = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=15.0, max_elapsed=120)
+
+
+@dataclass(frozen=True, slots=True)
+class BilibiliUploadSettings:
+    engine: str = ENGINE_NATIVE
+    # 本引擎在提交稿件之前失败时，改用 biliup 重新上传
+    fallback_to_biliup: bool = True
+    threads: int = 3
+    upcdn: str = "bda2"
+    timeout_seconds: float = 120
+    member_url: str = MEMBER_URL
+
+
+def load_settings(config: dict | None = None) -> BilibiliUploadSettings:
+    settings = BilibiliUploadSettings(**(BILIBILI_UPLOAD if config is None else config))
+    if settings.engine not in ENGINES:
+        raise RuntimeError(f"Unknown Bilibili engine '{settings.engine}', expected one of {', '.join(ENGINES)}")
+    return settings
+
+
+def load_cookies(account_file: str | Path) -> dict[str, str]:
+    """Cookies from a biliup cookie file (`cookie_info.cookies` is a list of name/value pairs)."""
+    try:
+        data = json.loads(Path(account_file).read_text(encoding="utf-8"))
+        cookies = {item["name"]: item["value"] for item in data["cookie_info"]["cookies"]}
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        raise FatalError(f"Unreadable Bilibili cookie file {account_file}: {exc}") from exc
+    missing = [name for name in REQUIRED_COOKIES if not cookies.get(name)]
+    if missing:
+        raise FatalError(f"Bilibili cookie file {account_file} has no {', '.join(missing)}")
+    return cookies
+
+
+def read_chunk(path: Path, offset: int, length: int) -> bytes:
+    """Offset read that leaves no shared file position behind, so chunks can be read in parallel."""
+    if hasattr(os, "pread"):
+        descriptor = os.open(path, os.O_RDONLY)
+        try:
+            return os.pread(descriptor, length, offset)
+        finally:
+            os.close(descriptor)
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        return handle.read(length)
+
+
+def _json(response: requests.Response, action: str) -> dict:
+    if response.status_code in RETRYABLE_STATUSES:
+        raise TransientError(f"Bilibili {action} answered {response.status_code}")
+    if response.status_code >= 400:
+        raise FatalError(f"Bilibili {action} failed ({response.status_code}): {response.text[:200]}")
+    try:
+        return response.json()
+    except ValueError as exc:
+        raise TransientError(f"Bilibili {action} answered non-JSON: {response.text[:200]}") from exc
+
+
+class UposUpload:
+    """
+    One video through the upos protocol: preupload -> multipart init -> parallel chunk
+    PUTs -> complete. run() returns what the submission needs to reference the video.
+    `on_progress(done, total)` is called with acknowledged bytes as chunks finish.
+    """
+
+    def __init__(
+        self,
+        http: requests.Session,
+        file_path: str | Path,
+        cookies: dict[str, str],
+        settings: BilibiliUploadSettings,
+        *,
+        chunk_policy: RetryPolicy = CHUNK_RETRY_POLICY,
+        step_policy: RetryPolicy = STEP_RETRY_POLICY,
+        on_progress: Callable[[int, int], None] | None = None,
+    ):
+        self.http = http
+        self.file_path = Path(file_path)
+        self.cookies = cookies
+        self.settings = settings
+        self.chunk_policy = chunk_policy
+        self.step_policy = step_policy
+        self.on_progress = on_progress
+        self.size = self.file_path.stat().st_size
+        self.retried_chunks = 0
+        if self.size == 0:
+            raise ValueError(f"Video file is empty: {self.file_path}")
+
+    async def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        headers = {"User-Agent": USER_AGENT, "Referer": "https://member.bilibili.com/", **kwargs.pop("headers", {})}
+        return await asyncio.to_thread(
+            self.http.request,
+            method,
+            url,
+            headers=headers,
+            cookies=self.cookies,
+            timeout=self.settings.timeout_seconds,
+            **kwargs,
+        )
+
+    async def preupload(self) -> dict:
+        response = await self._request(
+            "GET",
+            urljoin(self.settings.member_url, "/preupload"),
+            params={
+                "name": self.file_path.name,
+                "size": self.size,
+                "r": "upos",
+                "profile": UPLOAD_PROFILE,
+                "ssl": 0,
+                "version": "2.14.0",
+                "build": 2140000,
+                "upcdn": self.settings.upcdn,
+            },
+        )
+        payload = _json(response, "preupload")
+        if payload.get("OK") != 1:
+            # 多数是 cookie 失效或被风控，重试没用
+            raise FatalError(f"Bilibili preupload refused: {json.dumps(payload, ensure_ascii=False)[:200]}")
+        return payload
+
+    async def init_multipart(self, url: str, auth: str) -> str:
+        response = await self._request("POST", url, params={"uploads": "", "output": "json"}, headers={"X-Upos-Auth": auth})
+        payload = _json(response, "multipart init")
+        if not payload.get("upload_id"):
+            raise TransientError(f"Bilibili multipart init answered without upload_id: {payload}")
+        return payload["upload_id"]
+
+    async def put_chunk(self, url: str, auth: str, upload_id: str, index: int, chunks: int, chunk_size: int) -> dict:
+        start = index * chunk_size
+        length = min(chunk_size, self.size - start)
+        body = await asyncio.to_thread(read_chunk, self.file_path, start, length)
+        response = await self._request(
+            "PUT",
+            url,
+            params={
+                "partNumber": index + 1,
+                "uploadId": upload_id,
+                "chunk": index,
+                "chunks": chunks,
+                "size": length,
+                "start": start,
+                "end": start + length,
+                "total": self.size,
+            },
+            data=body,
+            headers={"X-Upos-Auth": auth, "Content-Type": "application/octet-stream"},
+        )
+        if response.status_code in RETRYABLE_STATUSES:
+            raise TransientError(f"Bilibili chunk {index + 1}/{chunks} answered {response.status_code}")
+        if response.status_code >= 400:
+            raise FatalError(f"Bilibili chunk {index + 1}/{chunks} failed ({response.status_code}): {response.text[:200]}")
+        return {"partNumber": index + 1, "eTag": response.headers.get("ETag", "etag").strip('"')}
+
+    async def complete(self, url: str, auth: str, upload_id: str, biz_id, parts: list[dict]) -> None:
+        response = await self._request(
+            "POST",
+            url,
+            params={
+                "output": "json",
+                "name": self.file_path.name,
+                "profile": UPLOAD_PROFILE,
+                "uploadId": upload_id,
+                "biz_id": biz_id,
+            },
+            json={"parts": parts},
+            headers={"X-Upos-Auth": auth},
+        )
+        payload = _json(response, "multipart complete")
+        if payload.get("OK") != 1:
+            raise TransientError(f"Bilibili multipart complete answered {payload}")
+
+    async def run(self) -> dict:
+        """Upload every chunk and commit them; returns {"filename", "biz_id"} for the submission."""
+        pre = await retry_async(self.preupload, self.step_policy, platform="bilibili", operation="upos_preupload")
+        # endpoint 是 //host 形式，按 member_url 的协议补全
+        url = urljoin(self.settings.member_url, pre["endpoint"]) + "/" + pre["upos_uri"].removeprefix("upos://")
+        auth = pre["auth"]
+        chunk_size = int(pre["chunk_size"])
+        chunks = -(-self.size // chunk_size)
+        upload_id = await retry_async(
+            lambda: self.init_multipart(url, auth), self.step_policy, platform="bilibili", operation="upos_init"
+        )
+
+        slots = asyncio.Semaphore(max(1, self.settings.threads))
+        done = 0
+
+        async def upload_one(index: int) -> dict:
+            nonlocal done
+
+            def before_retry(attempt, exc, delay):
+                self.retried_chunks += 1
+                bilibili_logger.warning(f"⚠️ 分片 {index + 1}/{chunks} 上传失败，{delay:.1f}s 后只重传这一片: {exc}")
+
+            async with slots:
+                part = await retry_async(
+                    lambda: self.put_chunk(url, auth, upload_id, index, chunks, chunk_size),
+                    self.chunk_policy,
+                    platform="bilibili",
+                    operation="upos_chunk",
+                    on_retry=before_retry,
+                )
+            length = min(chunk_size, self.size - index * chunk_size)
+            done += length
+            metrics.increment("sau_bilibili_upload_bytes_total", length)
+            if self.on_progress is not None:
+                self.on_progress(done, self.size)
+            return part
+
+        tasks = [asyncio.create_task(upload_one(index)) for index in range(chunks)]
+        try:
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        await retry_async(
+            lambda: self.complete(url, auth, upload_id, pre["biz_id"], parts),
+            self.step_policy,
+            platform="bilibili",
+            operation="upos_complete",
+        )
+        return {"filename": Path(pre["upos_uri"]).stem, "biz_id": pre["biz_id"]}
+
+
+def _progress_logger(step: float = 0.1) -> Callable[[int, int], None]:
+    reported = -1
+
+    def on_progress(done: int, total: int):
+        nonlocal reported
+        bucket = int(done / total / step)
+        if bucket != reported:
+            reported = bucket
+            bilibili_logger.info(f"⏳ 上传中: {done * 100 // total}% ({done}/{total} 字节)")
+
+    return on_progress
+
+
+async def upload_cover(http: requests.Session, cookies: dict[str, str], settings: BilibiliUploadSettings,
+                       cover_path: str | Path) -> str:
+    data = await asyncio.to_thread(Path(cover_path).read_bytes)
+    mime = mimetypes.guess_type(str(cover_path))[0] or "image/jpeg"
+    response = await asyncio.to_thread(
+        http.post,
+        urljoin(settings.member_url, "/x/vu/web/cover/up"),
+        data={"cover": f"data:{mime};base64,{base64.b64encode(data).decode()}", "csrf": cookies["bili_jct"]},
+        headers={"User-Agent": USER_AGENT, "Referer": "https://member.bilibili.com/"},
+        cookies=cookies,
+        timeout=settings.timeout_seconds,
+    )
+    payload = _json(response, "cover upload")
+    if payload.get("code") != 0:
+        raise FatalError(f"Bilibili cover upload refused: {payload.get('message')}")
+    return payload["data"]["url"]
+
+
+async def submit(http: requests.Session, cookies: dict[str, str], settings: BilibiliUploadSettings, video: dict,
+                 *, title: str, description: str, tid: int, tags: list[str], cover_url: str = "",
+                 publish_date: datetime | int = 0) -> dict:
+    """Create the post for an uploaded video. Not retried: a lost response may still have created it."""
+    body = {
+        "copyright": 1,
+        "source": "",
+        "tid": tid,
+        "cover": cover_url,
+        "title": title,
+        "desc": description,
+        "tag": ",".join(tags),
+        "dynamic": "",
+        "videos": [{"filename": video["filename"], "title": "", "desc": "", "cid": video["biz_id"]}],
+    }
+    if isinstance(publish_date, datetime):
+        body["dtime"] = int(publish_date.timestamp())
+    response = await asyncio.to_thread(
+        http.post,
+        urljoin(settings.member_url, "/x/vu/web/add/v3"),
+        params={"t": int(time.time() * 1000), "csrf": cookies["bili_jct"]},
+        json=body,
+        headers={"User-Agent": USER_AGENT, "Referer": "https://member.bilibili.com/"},
+        cookies=cookies,
+        timeout=settings.timeout_seconds,
+    )
+    payload = _json(response, "submission")
+    if payload.get("code") != 0:
+        raise FatalError(f"Bilibili submission refused ({payload.get('code')}): {payload.get('message')}")
+    return payload.get("data") or {}
+
+
+class SubmissionStarted(RuntimeError):
+    """A failure raised once the submission request was sent; falling back to biliup could post twice."""
+
+
+async def upload_video(
+    account_file: str | Path,
+    file_path: str | Path,
+    title: str,
+    description: str,
+    tid: int,
+    tags: list[str],
+    *,
+    cover_path: str | Path | None = None,
+    publish_date: datetime | int = 0,
+    settings: BilibiliUploadSettings | None = None,
+    http: requests.Session | None = None,
+    chunk_policy: RetryPolicy = CHUNK_RETRY_POLICY,
+) -> dict:
+    """
+    Upload and submit one video with the native engine.
+    :returns: the submission result (`aid`, `bvid`); the bvid is recorded as the job's post ID
+    :raises SubmissionStarted: when the failure happened after the submission was sent
+    """
+    settings = settings or load_settings()
+    http = http or pooled_http_session(max(4, settings.threads))
+    cookies = load_cookies(account_file)
+    upload = UposUpload(http, file_path, cookies, settings, chunk_policy=chunk_policy, on_progress=_progress_logger())
+
+    bilibili_logger.info(f"🎬 开始上传（{settings.threads} 路并发分片）: {Path(file_path).name}, {upload.size} 字节")
+    set_phase("upload_file")
+    video = await upload.run()
+    mark_checkpoint(CHECKPOINT_UPLOADED)
+
+    cover_url = ""
+    if cover_path:
+        set_phase("set_cover")
+        try:
+            cover_url = await upload_cover(http, cookies, settings, cover_path)
+        except Exception as exc:
+            bilibili_logger.warning(f"⚠️ 封面上传跳过（不影响投稿，由 B 站自动截取）: {exc}")
+
+    set_phase("publish")
+    try:
+        result = await submit(http, cookies, settings, video, title=title, description=description, tid=tid,
+                              tags=tags, cover_url=cover_url, publish_date=publish_date)
+    except Exception as exc:
+        raise SubmissionStarted(f"Bilibili submission failed after the video was uploaded: {exc}") from exc
+    mark_checkpoint(CHECKPOINT_PUBLISHED)
+    record_post_id("bilibili", result.get("bvid") or result.get("aid"))
+    bilibili_logger.success(
+        f"🥳 投稿完成 {result.get('bvid') or result.get('aid') or ''}"
+        f"{f'，重传分片 {upload.retried_chunks} 次' if upload.retried_chunks else ''}"
+    )
+    return result
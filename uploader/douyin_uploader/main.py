@@ -14,15 +14,57 @@ from patchright.async_api import async_playwright
 from conf import BASE_DIR, DEBUG_MODE, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_profiles import close_account_context, open_account_context, record_time_to_upload_page
+from utils.browser_session import launch_browser
 from utils.login_qrcode import build_login_qrcode_path
 from utils.login_qrcode import decode_qrcode_from_path
 from utils.login_qrcode import print_terminal_qrcode
 from utils.login_qrcode import remove_qrcode_file
 from utils.login_qrcode import save_data_url_image
+from utils.job_phase import (
+    CHECKPOINT_COVER_SET,
+    CHECKPOINT_METADATA_FILLED,
+    CHECKPOINT_PUBLISHED,
+    CHECKPOINT_UPLOADED,
+    PhaseStep,
+    mark_checkpoint,
+    run_remaining_phases,
+    set_phase,
+)
 from utils.log import douyin_logger
+from utils.page_probe import PageProbe, ProbeCheck
+from utils.publish_ledger import watch_publish_responses
+from utils.request_filter import install_request_filter
+from utils.retry import (
+    PAGE_WAIT_RETRY_POLICY,
+    PUBLISH_RETRY_POLICY,
+    UPLOAD_WAIT_RETRY_POLICY,
+    FatalError,
+    TransientError,
+    retry_async,
+)
+from utils.selector_cache import selector_registry
 
 DOUYIN_PUBLISH_STRATEGY_IMMEDIATE = "immediate"
 DOUYIN_PUBLISH_STRATEGY_SCHEDULED = "scheduled"
+# 上传页的视频 input，按写法的精确程度排列
+UPLOAD_INPUT_SELECTORS = (
+    "input.upload-btn-input, div[class^='container'] input[accept]",
+    "div[class^='container'] input[type='file'], div[class^='container'] input.upload-input",
+    "div[class^='container'] input",
+)
+SMS_INPUT_SELECTOR = 'input[placeholder*="验证码"], input[type="tel"], input[placeholder*="短信"], input[placeholder*="手机号"]'
+# 上传等待和发布重试循环里每轮要看的页面状态，各一次 evaluate 读完
+UPLOAD_PAGE_PROBE = PageProbe("douyin", {
+    "upload_done": ProbeCheck('[class^="long-card"] div', "重新上传"),
+    "upload_failed": ProbeCheck("div.progress-div > div", "上传失败"),
+})
+PUBLISH_PAGE_PROBE = PageProbe("douyin", {
+    "sms_input": ProbeCheck(SMS_INPUT_SELECTOR),
+    "get_code_button": ProbeCheck(text="获取验证码"),
+    "publish_button": ProbeCheck('button, [role="button"]', "发布", exact=True),
+}, prelude="document.querySelectorAll('.shepherd-element, .shepherd-modal-overlay-container, [class*=\"mention-wrapper\"]').forEach(e => e.remove());")
 
 
 def _msg(emoji: str, text: str) -> str:
@@ -117,7 +159,7 @@ async def cookie_auth(account_file):
     launch_kwargs = {"headless": use_headless, "channel": "chromium", "args": ["--no-sandbox", "--disable-blink-features=AutomationControlled"]}
     for _attempt in range(3):
         async with async_playwright() as playwright:
-            browser = await playwright.chromium.launch(**launch_kwargs)
+            browser = await launch_browser(playwright.chromium, **launch_kwargs)
             try:
                 context = await browser.new_context(storage_state=account_file)
                 context = await set_init_script(context)
@@ -242,7 +284,7 @@ async def _wait_for_douyin_login(page: Page, account_file: str, qrcode_info: dic
 
         # URL 变化 + sessionid 未到位 → 二验流程，继续等
         if page.url != original_url and not await _is_douyin_login_completed(page):
-            sms_input = page.locator('input[placeholder*="验证码"], input[type="tel"], input[placeholder*="短信"], input[placeholder*="手机号"]')
+            sms_input = page.locator(SMS_INPUT_SELECTOR)
             if await sms_input.count() > 0:
                 if not saw_2fa:
                     douyin_logger.warning(_msg("⚠️", f"检测到抖音短信/安全二次验证，请在弹出的浏览器中手动输入。等待 sessionid ({_}/{max_checks})"))
@@ -276,7 +318,7 @@ async def douyin_cookie_gen(
             context = browser.contexts[0] if browser.contexts else await browser.new_context()
             should_close_context = False
         else:
-            browser = await playwright.chromium.launch(headless=headless, channel="chromium")
+            browser = await launch_browser(playwright.chromium, headless=headless, channel="chromium")
             context = await browser.new_context()
             should_close_context = True
         context = await set_init_script(context)
@@ -666,7 +708,7 @@ class DouYinVideo(DouYinBaseUploader):
         if not self.declaration:
             return
         if not await self.set_self_declaration(page, self.declaration):
-            raise RuntimeError(f"自主声明「{self.declaration}」设置失败，拒绝继续发布")
+            raise FatalError(f"自主声明「{self.declaration}」设置失败，拒绝继续发布")
 
     async def _clear_blocking_overlays(self, page: Page) -> None:
         """清除会拦截点击的浮层：填完话题后残留的话题/@提及下拉(publish-mention-wrapper)
@@ -790,7 +832,7 @@ class DouYinVideo(DouYinBaseUploader):
 
     async def handle_upload_error(self, page):
         douyin_logger.warning(_msg("😵", "视频上传摔了一跤，小人马上重新上传"))
-        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
+        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(await stage_files(self.file_path))
 
     async def handle_auto_video_cover(self, page):
         if await page.get_by_text("请设置封面后再发布").first.is_visible():
@@ -848,12 +890,11 @@ class DouYinVideo(DouYinBaseUploader):
                     await page.wait_for_timeout(600)
                 except Exception:
                     pass
-                for txt in ["编辑封面", "选择封面", "设置封面"]:
-                    t = page.get_by_text(txt, exact=True).first
-                    if await t.count() and await t.is_visible():
-                        trigger, trigger_txt = t, txt
-                        break
-                if trigger is not None:
+                found = await selector_registry.first_present("douyin", "cover_trigger", {
+                    txt: page.get_by_text(txt, exact=True).first for txt in ["编辑封面", "选择封面", "设置封面"]
+                }, visible=True)
+                if found is not None:
+                    trigger_txt, trigger = found
                     break
             if trigger is None:
                 trigger = cover_area
@@ -891,7 +932,7 @@ class DouYinVideo(DouYinBaseUploader):
                 await page.wait_for_timeout(800)
             except Exception:
                 pass
-            await cover_upload.set_input_files(self.thumbnail_portrait_path)
+            await cover_upload.set_input_files(await stage_files(self.thumbnail_portrait_path))
             await page.wait_for_timeout(3000)
             douyin_logger.info(_msg("🖼️", "竖版封面已上传到预览"))
         elif self.thumbnail_landscape_path:
@@ -900,7 +941,7 @@ class DouYinVideo(DouYinBaseUploader):
                 await page.wait_for_timeout(800)
             except Exception:
                 pass
-            await cover_upload.set_input_files(self.thumbnail_landscape_path)
+            await cover_upload.set_input_files(await stage_files(self.thumbnail_landscape_path))
             await page.wait_for_timeout(3000)
             douyin_logger.info(_msg("🖼️", "横版封面已上传到预览"))
 
@@ -968,79 +1009,7 @@ class DouYinVideo(DouYinBaseUploader):
             douyin_logger.warning(_msg("⚠️", "封面弹窗未能关闭，可能挡住自主声明/发布"))
 
 
-    async def upload(self, playwright: Playwright) -> None:
-        douyin_logger.info(_msg("🧍", "小人先检查 cookie、视频文件、封面和发布时间"))
-        await self.validate_upload_args()
-        douyin_logger.info(_msg("🥳", "上传前检查通过"))
-
-        browser = await playwright.chromium.launch(headless=self.headless, channel="chromium", args=["--no-sandbox", "--disable-blink-features=AutomationControlled"])
-        context = await browser.new_context(
-            storage_state=f"{self.account_file}",
-            permissions=["geolocation"],
-        )
-        context = await set_init_script(context)
-
-        page = await context.new_page()
-        await page.goto("https://creator.douyin.com/creator-micro/content/upload", wait_until="domcontentloaded", timeout=90000)
-        douyin_logger.info(_msg("🏃", f"小人开始搬运视频: {self.title}.mp4"))
-        douyin_logger.info(_msg("🧭", "小人正在赶往上传主页"))
-        await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=90000)
-
-        # ── 进入页面后可能弹身份验证（短信验证码）或被踢到登录页 ──
-        await page.wait_for_timeout(2000)
-
-        # 确认已经在上传页（非登录页），再找上传 input
-        # 用更精确的选择器避免匹配到登录表单的 input
-        upload_input = page.locator("input.upload-btn-input, div[class^='container'] input[accept]").first
-        if not await upload_input.count():
-            # 兜底：排除登录页的 input
-            upload_input = page.locator("div[class^='container'] input[type='file'], div[class^='container'] input.upload-input").first
-        if not await upload_input.count():
-            # 最终兜底
-            upload_input = page.locator("div[class^='container'] input").first
-        await upload_input.wait_for(state="attached", timeout=60000)
-        await upload_input.set_input_files(self.file_path)
-
-        while True:
-            try:
-                await page.wait_for_url(
-                    "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page",
-                    timeout=3000,
-                )
-                douyin_logger.info(_msg("🥳", "已经进入 version_1 发布页面"))
-                break
-            except Exception:
-                try:
-                    await page.wait_for_url(
-                        "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page",
-                        timeout=3000,
-                    )
-                    douyin_logger.info(_msg("🥳", "已经进入 version_2 发布页面"))
-                    break
-                except Exception:
-                    douyin_logger.debug(_msg("🧍", "还没进到视频发布页面，小人继续等一会"))
-                    await asyncio.sleep(0.5)
-
-        await asyncio.sleep(1)
-        douyin_logger.info(_msg("✍️", "小人开始填标题、描述和话题"))
-        await self.fill_title_and_description(page, self.title, self.desc, self.tags)
-        douyin_logger.info(_msg("🏷️", f"小人一共贴了 {len(self.tags)} 个话题"))
-
-        while True:
-            try:
-                number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-                if number > 0:
-                    douyin_logger.success(_msg("🥳", "视频已经传完啦"))
-                    break
-                douyin_logger.info(_msg("🏃", "小人正在努力上传视频"))
-                await asyncio.sleep(2)
-                if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-                    douyin_logger.error(_msg("😵", "检测到上传失败，小人准备重试"))
-                    await self.handle_upload_error(page)
-            except Exception:
-                douyin_logger.debug(_msg("🧍", "小人还在等视频上传完成"))
-                await asyncio.sleep(2)
-
+    async def fill_post_upload_meta(self, page: Page) -> None:
         if self.productLink and self.productTitle:
             douyin_logger.info(_msg("🛒", "小人正在设置商品链接"))
             await self.set_product_link(page, self.productLink, self.productTitle)
@@ -1056,9 +1025,6 @@ class DouYinVideo(DouYinBaseUploader):
         # （实测：封面弹窗在 headless 下常滞留"检测中"未关闭，会盖住"添加合集"下拉）
         await self.apply_collection(page)
 
-        # 再设封面（放最后，关掉弹窗，避免残留浮层挡住发布按钮）
-        await self.set_thumbnail(page)
-
         third_part_element = '[class^="info"] > [class^="first-part"] div div.semi-switch'
         if await page.locator(third_part_element).count():
             if "semi-switch-checked" not in await page.eval_on_selector(third_part_element, "div => div.className"):
@@ -1067,53 +1033,172 @@ class DouYinVideo(DouYinBaseUploader):
         if self.publish_strategy == DOUYIN_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
             await self.set_schedule_time_douyin(page, self.publish_date)
 
+    async def recover_page_for_retry(self, page: Page) -> None:
+        # 关掉残留弹窗和新手引导浮层，再从失败的那一步继续
+        try:
+            await page.keyboard.press("Escape")
+            await page.evaluate(
+                "() => { document.querySelectorAll('.shepherd-element, .shepherd-modal-overlay-container, [class*=\"mention-wrapper\"]').forEach(e => e.remove()); }"
+            )
+        except Exception as exc:
+            douyin_logger.debug(_msg("🧹", f"清理页面浮层失败: {exc}"))
+
+    async def publish_video(self, page: Page) -> None:
         sms_prompt_logged = False
-        while True:
-            try:
-                # 移除会拦截发布按钮点击的新手引导/话题下拉浮层
-                await page.evaluate(
-                    "() => { document.querySelectorAll('.shepherd-element, .shepherd-modal-overlay-container, [class*=\"mention-wrapper\"]').forEach(e => e.remove()); }"
-                )
-                # 检测并处理短信验证码弹窗
-                sms_input = page.locator('input[placeholder*="验证码"], input[type="tel"], input[placeholder*="短信"], input[placeholder*="手机号"]').first
-                if await sms_input.count() and await sms_input.is_visible():
-                    douyin_logger.warning(_msg("📱", "检测到短信验证码弹窗"))
-                    # 点击「获取验证码」按钮（仅首次）
-                    get_code_btn = page.get_by_text("获取验证码").first
-                    if await get_code_btn.count() and await get_code_btn.is_visible():
-                        await get_code_btn.click()
-                        douyin_logger.info(_msg("📤", "已点击「获取验证码」，请查看手机短信"))
-                    code_file = os.path.join(BASE_DIR, "verify_code.txt")
-                    code = await _read_verify_code(code_file)
-                    if code:
-                        sms_prompt_logged = False
-                        await self._submit_sms_verify_code(page, sms_input, code, code_file)
-                    elif not sms_prompt_logged:
-                        douyin_logger.warning(_msg("⏳", f"等待验证码输入；可在交互终端直接输入，或写入文件: {code_file}"))
-                        sms_prompt_logged = True
-
-                # ── 正常发布流程 ──
-                publish_button = page.get_by_role("button", name="发布", exact=True)
-                if await publish_button.count():
-                    await publish_button.click(force=True)
-                await page.wait_for_url(
-                    "https://creator.douyin.com/creator-micro/content/manage**",
-                    timeout=3000,
-                )
-                douyin_logger.success(_msg("🥳", "视频发布成功，小人开心收工"))
-                break
-            except Exception:
-                await self.handle_auto_video_cover(page)
-                douyin_logger.info(_msg("🏃", "小人正在冲刺发布视频"))
-                if self.debug:
-                    await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
-
-        await context.storage_state(path=self.account_file)
-        douyin_logger.success(_msg("🥳", "cookie 更新完毕"))
-        await asyncio.sleep(2)
-        await context.close()
-        await browser.close()
+
+        async def publish_once():
+            nonlocal sms_prompt_logged
+            # 一次往返：移除会拦截发布按钮点击的新手引导/话题下拉浮层，同时读出弹窗和按钮状态
+            state = await PUBLISH_PAGE_PROBE.snapshot(page)
+            # 检测并处理短信验证码弹窗
+            if state["sms_input"].visible:
+                sms_input = page.locator(SMS_INPUT_SELECTOR).first
+                douyin_logger.warning(_msg("📱", "检测到短信验证码弹窗"))
+                # 点击「获取验证码」按钮（仅首次）
+                if state["get_code_button"].visible:
+                    await page.get_by_text("获取验证码").first.click()
+                    douyin_logger.info(_msg("📤", "已点击「获取验证码」，请查看手机短信"))
+                code_file = os.path.join(BASE_DIR, "verify_code.txt")
+                code = await _read_verify_code(code_file)
+                if code:
+                    sms_prompt_logged = False
+                    await self._submit_sms_verify_code(page, sms_input, code, code_file)
+                elif not sms_prompt_logged:
+                    douyin_logger.warning(_msg("⏳", f"等待验证码输入；可在交互终端直接输入，或写入文件: {code_file}"))
+                    sms_prompt_logged = True
+
+            # ── 正常发布流程 ──
+            if state["publish_button"].count:
+                await page.get_by_role("button", name="发布", exact=True).click(force=True)
+            await page.wait_for_url(
+                "https://creator.douyin.com/creator-micro/content/manage**",
+                timeout=3000,
+            )
+
+        async def before_publish_retry(attempt, exc, delay):
+            await self.handle_auto_video_cover(page)
+            douyin_logger.info(_msg("🏃", f"小人正在冲刺发布视频（第 {attempt} 次未成功）"))
+            if self.debug:
+                await page.screenshot(full_page=True)
+
+        # 发布重试有上限：等短信验证码最多约 10 分钟，超过就抛错，不再死循环
+        await retry_async(
+            publish_once,
+            PUBLISH_RETRY_POLICY,
+            platform="douyin",
+            operation="publish",
+            on_retry=before_publish_retry,
+        )
+        douyin_logger.success(_msg("🥳", "视频发布成功，小人开心收工"))
+
+    async def upload(self, playwright: Playwright) -> None:
+        douyin_logger.info(_msg("🧍", "小人先检查 cookie、视频文件、封面和发布时间"))
+        await self.validate_upload_args()
+        douyin_logger.info(_msg("🥳", "上传前检查通过"))
+
+        browser = context = None
+        upload_success = False
+        try:
+            browser, context = await open_account_context(
+                playwright.chromium,
+                "douyin",
+                self.account_file,
+                dict(headless=self.headless, channel="chromium", args=["--no-sandbox", "--disable-blink-features=AutomationControlled"]),
+                permissions=["geolocation"],
+            )
+            await install_request_filter(context, "douyin")
+            context = await set_init_script(context)
+
+            set_phase("open_page")
+            page = await context.new_page()
+            watch_publish_responses(page, "douyin")
+            await page.goto("https://creator.douyin.com/creator-micro/content/upload", wait_until="domcontentloaded", timeout=90000)
+            douyin_logger.info(_msg("🏃", f"小人开始搬运视频: {self.title}.mp4"))
+            douyin_logger.info(_msg("🧭", "小人正在赶往上传主页"))
+            await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=90000)
+            record_time_to_upload_page("douyin")
+
+            # ── 进入页面后可能弹身份验证（短信验证码）或被踢到登录页 ──
+            await page.wait_for_timeout(2000)
+
+            # 确认已经在上传页（非登录页），再找上传 input
+            set_phase("upload_file")
+            # 用更精确的选择器避免匹配到登录表单的 input；后两个是兜底（排除登录页的 input / 最终兜底）。
+            # 上次命中的写法先试，都还没渲染出来时同时等，不再只等最后一个兜底
+            _, upload_input = await selector_registry.race("douyin", "upload_input", {
+                selector: page.locator(selector).first for selector in UPLOAD_INPUT_SELECTORS
+            }, timeout=60000)
+            await upload_input.set_input_files(await stage_files(self.file_path))
+
+            async def wait_for_publish_page():
+                try:
+                    await page.wait_for_url(
+                        "https://creator.douyin.com/creator-micro/content/publish?enter_from=publish_page",
+                        timeout=3000,
+                    )
+                    douyin_logger.info(_msg("🥳", "已经进入 version_1 发布页面"))
+                except Exception:
+                    await page.wait_for_url(
+                        "https://creator.douyin.com/creator-micro/content/post/video?enter_from=publish_page",
+                        timeout=3000,
+                    )
+                    douyin_logger.info(_msg("🥳", "已经进入 version_2 发布页面"))
+
+            await retry_async(
+                wait_for_publish_page,
+                PAGE_WAIT_RETRY_POLICY,
+                platform="douyin",
+                operation="enter_publish_page",
+                on_retry=lambda *_: douyin_logger.debug(_msg("🧍", "还没进到视频发布页面，小人继续等一会")),
+            )
+
+            await asyncio.sleep(1)
+            set_phase("fill_meta")
+            douyin_logger.info(_msg("✍️", "小人开始填标题、描述和话题"))
+            await self.fill_title_and_description(page, self.title, self.desc, self.tags)
+            douyin_logger.info(_msg("🏷️", f"小人一共贴了 {len(self.tags)} 个话题"))
+
+            # 标题填完后回到等待视频传完
+            set_phase("upload_file")
+
+            async def wait_for_upload_done():
+                state = await UPLOAD_PAGE_PROBE.snapshot(page)
+                if state["upload_done"].count:
+                    return
+                if state["upload_failed"].count:
+                    douyin_logger.error(_msg("😵", "检测到上传失败，小人准备重试"))
+                    await self.handle_upload_error(page)
+                raise TransientError("视频还没传完")
+
+            await retry_async(
+                wait_for_upload_done,
+                UPLOAD_WAIT_RETRY_POLICY,
+                platform="douyin",
+                operation="wait_upload",
+                on_retry=lambda *_: douyin_logger.info(_msg("🏃", "小人正在努力上传视频")),
+            )
+            douyin_logger.success(_msg("🥳", "视频已经传完啦"))
+
+            mark_checkpoint(CHECKPOINT_UPLOADED)
+            # 视频已经传完：之后任何一步失败都在当前页面里只重跑剩下的步骤，不重新上传
+            await run_remaining_phases(
+                [
+                    PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, lambda: self.fill_post_upload_meta(page)),
+                    # 封面放最后，关掉弹窗，避免残留浮层挡住发布按钮
+                    PhaseStep("set_cover", CHECKPOINT_COVER_SET, lambda: self.set_thumbnail(page)),
+                    PhaseStep("publish", CHECKPOINT_PUBLISHED, lambda: self.publish_video(page), retry=False),
+                ],
+                platform="douyin",
+                on_retry=lambda phase, exc: self.recover_page_for_retry(page),
+            )
+
+            upload_success = True
+        finally:
+            if upload_success:
+                await context.storage_state(path=self.account_file)
+                douyin_logger.success(_msg("🥳", "cookie 更新完毕"))
+                await asyncio.sleep(2)
+            await close_account_context(browser, context)
 
     async def douyin_upload_video(self):
         async with async_playwright() as playwright:
@@ -1182,22 +1267,21 @@ class DouYinNote(DouYinBaseUploader):
         await page.get_by_text("发布图文", exact=True).click()
         await page.wait_for_timeout(1000)
 
+        set_phase("upload_file")
         douyin_logger.info(_msg("📤", "小人正在上传图片"))
-        await page.locator("div[class^='container'] input[accept*='image']").set_input_files(self.image_paths)
-
-        while True:
-            try:
-                await page.wait_for_url(
-                    "**/creator-micro/content/post/image?**",
-                    timeout=3000,
-                )
-                douyin_logger.info(_msg("🥳", "已经进入图文发布页面"))
-                break
-            except Exception:
-                douyin_logger.debug(_msg("🧍", "小人还在等图片上传完成"))
-                await asyncio.sleep(0.5)
+        await page.locator("div[class^='container'] input[accept*='image']").set_input_files(await stage_files(self.image_paths))
+
+        await retry_async(
+            lambda: page.wait_for_url("**/creator-micro/content/post/image?**", timeout=3000),
+            PAGE_WAIT_RETRY_POLICY,
+            platform="douyin",
+            operation="enter_note_page",
+            on_retry=lambda *_: douyin_logger.debug(_msg("🧍", "小人还在等图片上传完成")),
+        )
+        douyin_logger.info(_msg("🥳", "已经进入图文发布页面"))
 
         await asyncio.sleep(1)
+        set_phase("fill_meta")
         douyin_logger.info(_msg("✍️", "小人开始填标题、描述和话题"))
         await self.fill_title_and_description(page, self.title, self.note, self.tags)
         title_len = len(self.title) if self.title else 0
@@ -1212,39 +1296,51 @@ class DouYinNote(DouYinBaseUploader):
         if self.publish_strategy == DOUYIN_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
             await self.set_schedule_time_douyin(page, self.publish_date)
 
-        while True:
-            try:
-                publish_button = page.get_by_role("button", name="发布", exact=True)
-                if await publish_button.count():
-                    await publish_button.click()
-                await page.wait_for_url(
-                    "**/creator-micro/content/manage?enter_from=publish**",
-                    timeout=3000,
-                )
-                douyin_logger.success(_msg("🥳", "图文发布成功，小人开心收工"))
-                break
-            except Exception:
-                douyin_logger.info(_msg("🏃", "小人正在冲刺发布图文"))
-                await asyncio.sleep(0.5)
+        set_phase("publish")
+
+        async def publish_once():
+            publish_button = page.get_by_role("button", name="发布", exact=True)
+            if await publish_button.count():
+                await publish_button.click()
+            await page.wait_for_url(
+                "**/creator-micro/content/manage?enter_from=publish**",
+                timeout=3000,
+            )
+
+        await retry_async(
+            publish_once,
+            PUBLISH_RETRY_POLICY,
+            platform="douyin",
+            operation="publish_note",
+            on_retry=lambda *_: douyin_logger.info(_msg("🏃", "小人正在冲刺发布图文")),
+        )
+        douyin_logger.success(_msg("🥳", "图文发布成功，小人开心收工"))
 
     async def upload(self, playwright: Playwright) -> None:
         douyin_logger.info(_msg("🧍", "小人先检查 cookie、图片和发布时间"))
         await self.validate_upload_args()
         douyin_logger.info(_msg("🥳", "图文上传前检查通过"))
 
-        browser = await playwright.chromium.launch(headless=self.headless, channel="chromium", args=["--no-sandbox", "--disable-blink-features=AutomationControlled"])
-        context = await browser.new_context(
-            storage_state=f"{self.account_file}",
-            permissions=["geolocation"],
-        )
-        context = await set_init_script(context)
-
+        browser = context = None
         upload_success = False
         try:
+            browser, context = await open_account_context(
+                playwright.chromium,
+                "douyin",
+                self.account_file,
+                dict(headless=self.headless, channel="chromium", args=["--no-sandbox", "--disable-blink-features=AutomationControlled"]),
+                permissions=["geolocation"],
+            )
+            await install_request_filter(context, "douyin")
+            context = await set_init_script(context)
+
+            set_phase("open_page")
             page = await context.new_page()
+            watch_publish_responses(page, "douyin")
             await page.goto("https://creator.douyin.com/creator-micro/content/upload", wait_until="domcontentloaded", timeout=90000)
             douyin_logger.info(_msg("🧭", "小人正在赶往图文发布页"))
             await page.wait_for_url("https://creator.douyin.com/creator-micro/content/upload", timeout=90000)
+            record_time_to_upload_page("douyin")
 
             await self.upload_note_content(page)
             upload_success = True
@@ -1253,8 +1349,7 @@ class DouYinNote(DouYinBaseUploader):
                 await context.storage_state(path=self.account_file)
                 douyin_logger.success(_msg("🥳", "cookie 更新完毕"))
                 await asyncio.sleep(2)
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def douyin_upload_note(self):
         async with async_playwright() as playwright:
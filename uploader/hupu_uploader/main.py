@@ -26,6 +26,8 @@ from playwright.async_api import BrowserContext, Page, Playwright, async_playwri
 
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.log import hupu_logger
 
 
@@ -116,7 +118,7 @@ async def hupu_cookie_gen(account_file, qrcode_callback=None, poll_interval: int
     result = _build_login_result(False, "failed", "虎扑登录失败", account_file)
 
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=headless))
         context = await _create_stealth_context(browser)
         try:
             page = await _new_stealth_page(context)
@@ -243,7 +245,7 @@ async def cookie_auth(account_file):
     """验证虎扑 cookie 是否有效。访问发布页，检测是否能正常加载。"""
     account_file = _resolve_account_file(account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=True))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=True))
         try:
             context = await _create_stealth_context(browser, account_file)
             page = await _new_stealth_page(context)
@@ -342,7 +344,7 @@ class HuPuVideo(BaseVideoUploader):
         await self.validate_upload_args()
         hupu_logger.info(_msg("🥳", "上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=self.headless))
         context = await _create_stealth_context(browser, self.account_file)
 
         try:
@@ -390,7 +392,7 @@ class HuPuVideo(BaseVideoUploader):
         async with page.expect_file_chooser(timeout=10000) as fc_info:
             await upload_btn.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
         hupu_logger.info(_msg("🏃", f"已选择视频文件: {self.file_path}"))
 
         # 等待视频上传就绪（标题输入框出现即可填写）
@@ -435,7 +437,7 @@ class HuPuVideo(BaseVideoUploader):
             async with page.expect_file_chooser(timeout=10000) as fc_info:
                 await cover_span.click()
             file_chooser = await fc_info.value
-            await file_chooser.set_files(self.thumbnail_path)
+            await file_chooser.set_files(await stage_files(self.thumbnail_path))
             hupu_logger.info(_msg("🏃", f"已选择封面图片: {self.thumbnail_path}"))
             await page.wait_for_timeout(3000)
             hupu_logger.success(_msg("🖼️", "封面已上传"))
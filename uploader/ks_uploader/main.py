@@ -14,13 +14,30 @@ from patchright.async_api import async_playwright
 from conf import DEBUG_MODE, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_profiles import close_account_context, open_account_context, record_time_to_upload_page
+from utils.browser_session import launch_browser
 from utils.files_times import get_absolute_path
 from utils.login_qrcode import build_login_qrcode_path
 from utils.login_qrcode import decode_qrcode_from_path
 from utils.login_qrcode import print_terminal_qrcode
 from utils.login_qrcode import remove_qrcode_file
 from utils.login_qrcode import save_data_url_image
+from utils.job_phase import (
+    CHECKPOINT_COVER_SET,
+    CHECKPOINT_METADATA_FILLED,
+    CHECKPOINT_PUBLISHED,
+    CHECKPOINT_UPLOADED,
+    PhaseStep,
+    mark_checkpoint,
+    run_remaining_phases,
+    set_phase,
+)
 from utils.log import kuaishou_logger
+from utils.page_probe import PageProbe, ProbeCheck
+from utils.publish_ledger import watch_publish_responses
+from utils.request_filter import install_request_filter
+from utils.retry import PUBLISH_RETRY_POLICY, retry_async
 
 KUAISHOU_UPLOAD_URL = "https://cp.kuaishou.com/article/publish/video"
 KUAISHOU_MANAGE_URL = "https://cp.kuaishou.com/article/manage/video?status=2&from=publish"
@@ -30,6 +47,11 @@ KUAISHOU_MANAGE_URL_PATTERN = "**/article/manage/video?status=2&from=publish**"
 KUAISHOU_COOKIE_INVALID_SELECTOR = "div.names div.container div.name:text('机构服务')"
 KUAISHOU_PUBLISH_STRATEGY_IMMEDIATE = "immediate"
 KUAISHOU_PUBLISH_STRATEGY_SCHEDULED = "scheduled"
+# 上传等待循环每轮的「上传中」「上传失败」两处文字，一次 evaluate 读完
+UPLOAD_PAGE_PROBE = PageProbe("kuaishou", {
+    "uploading": ProbeCheck(text="上传中"),
+    "upload_failed": ProbeCheck(text="上传失败"),
+})
 
 
 def _msg(emoji: str, text: str) -> str:
@@ -209,9 +231,9 @@ async def _is_ks_login_page_gone(page: Page) -> bool:
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
         if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
+            browser = await launch_browser(playwright.chromium, headless=True, executable_path=LOCAL_CHROME_PATH)
         else:
-            browser = await playwright.chromium.launch(headless=True, channel="chromium")
+            browser = await launch_browser(playwright.chromium, headless=True, channel="chromium")
         try:
             context = await browser.new_context(storage_state=account_file)
             context = await set_init_script(context)
@@ -283,9 +305,9 @@ async def get_ks_cookie(
             should_close_context = False
         else:
             if LOCAL_CHROME_PATH:
-                browser = await playwright.chromium.launch(headless=headless, executable_path=LOCAL_CHROME_PATH)
+                browser = await launch_browser(playwright.chromium, headless=headless, executable_path=LOCAL_CHROME_PATH)
             else:
-                browser = await playwright.chromium.launch(headless=headless, channel="chromium")
+                browser = await launch_browser(playwright.chromium, headless=headless, channel="chromium")
             context = await browser.new_context()
             should_close_context = True
         context = await set_init_script(context)
@@ -490,6 +512,35 @@ class KSBaseUploader(BaseVideoUploader):
         else:
             await asyncio.sleep(0.5)
 
+    async def click_publish_until_success(self, page: Page, label: str) -> None:
+        set_phase("publish")
+
+        async def publish_once():
+            publish_button = page.get_by_text("发布", exact=True)
+            if await publish_button.count() > 0:
+                await publish_button.click()
+
+            await asyncio.sleep(1)
+            confirm_button = page.get_by_text("确认发布")
+            if await confirm_button.count() > 0:
+                await confirm_button.click()
+
+            await page.wait_for_url(KUAISHOU_MANAGE_URL_PATTERN, timeout=5000)
+
+        async def before_retry(attempt, exc, delay):
+            kuaishou_logger.info(_msg("🏃", f"小人正在冲刺发布{label}: {exc}"))
+            if self.debug:
+                await page.screenshot(full_page=True)
+
+        await retry_async(
+            publish_once,
+            PUBLISH_RETRY_POLICY,
+            platform="kuaishou",
+            operation="publish",
+            on_retry=before_retry,
+        )
+        kuaishou_logger.success(_msg("🥳", f"{label}发布成功，小人开心收工"))
+
 
 class KSVideo(KSBaseUploader):
     def __init__(
@@ -569,7 +620,7 @@ class KSVideo(KSBaseUploader):
 
     async def handle_upload_error(self, page: Page):
         kuaishou_logger.warning(_msg("😵", "视频上传摔了一跤，小人马上重新上传"))
-        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
+        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(await stage_files(self.file_path))
 
     async def set_thumbnail(self, page: Page):
         if not self.thumbnail_path:
@@ -590,7 +641,7 @@ class KSVideo(KSBaseUploader):
 
         file_input = modal.locator('input[type="file"]')
         await file_input.wait_for(state="attached", timeout=30000)
-        await file_input.set_input_files(self.thumbnail_path)
+        await file_input.set_input_files(await stage_files(self.thumbnail_path))
         await asyncio.sleep(1)
 
         confirm_button = modal.get_by_role("button", name="确认", exact=True)
@@ -600,39 +651,47 @@ class KSVideo(KSBaseUploader):
         await modal.wait_for(state="hidden", timeout=30000)
         kuaishou_logger.success(_msg("🥳", "封面已经设置完成"))
 
+    async def fill_post_upload_meta(self, page: Page) -> None:
+        await self.apply_collection(page)
+
+        if self.publish_strategy == KUAISHOU_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
+            await self.set_schedule_time(page, self.publish_date)
+
     async def upload(self, playwright: Playwright) -> None:
         kuaishou_logger.info(_msg("🧍", "小人先检查 cookie、视频文件、封面和发布时间"))
         await self.validate_upload_args()
         kuaishou_logger.info(_msg("🥳", "上传前检查通过"))
 
         if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path,
-            )
+            launch_kwargs = dict(headless=self.headless, executable_path=self.local_executable_path)
         else:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                channel="chromium",
-            )
-        context = await browser.new_context(storage_state=self.account_file)
-        context = await set_init_script(context)
-
+            launch_kwargs = dict(headless=self.headless, channel="chromium")
+        browser = context = None
         upload_success = False
         try:
+            browser, context = await open_account_context(
+                playwright.chromium, "kuaishou", self.account_file, launch_kwargs
+            )
+            await install_request_filter(context, "kuaishou")
+            context = await set_init_script(context)
+
+            set_phase("open_page")
             page = await context.new_page()
+            watch_publish_responses(page, "kuaishou")
             await page.goto(KUAISHOU_UPLOAD_URL)
             kuaishou_logger.info(_msg("🏃", f"小人开始搬运视频: {self.title}.mp4"))
             kuaishou_logger.info(_msg("🧭", "小人正在赶往快手上传主页"))
             await page.wait_for_url(KUAISHOU_UPLOAD_URL_PATTERN)
+            record_time_to_upload_page("kuaishou")
 
+            set_phase("upload_file")
             upload_button = page.locator("button[class^='_upload-btn']")
             await upload_button.wait_for(state="visible", timeout=10000)
 
             async with page.expect_file_chooser() as fc_info:
                 await upload_button.click()
             file_chooser = await fc_info.value
-            await file_chooser.set_files(self.file_path)
+            await file_chooser.set_files(await stage_files(self.file_path))
 
             await asyncio.sleep(2)
 
@@ -645,6 +704,7 @@ class KSVideo(KSBaseUploader):
 
             await self.close_guide_overlay(page)
 
+            set_phase("fill_meta")
             kuaishou_logger.info(_msg("✍️", "小人开始填描述和话题"))
             # 再次检查并关闭 Joyride（可能在文件上传后才弹出）
             await self.close_guide_overlay(page)
@@ -660,19 +720,21 @@ class KSVideo(KSBaseUploader):
                 await page.keyboard.type(f"#{tag} ")
                 await asyncio.sleep(2)
 
+            # 话题填完后回到等待视频传完
+            set_phase("upload_file")
             max_retries = 60
             retry_count = 0
             while retry_count < max_retries:
                 try:
-                    number = await page.locator("text=上传中").count()
-                    if number == 0:
+                    state = await UPLOAD_PAGE_PROBE.snapshot(page)
+                    if state["uploading"].count == 0:
                         kuaishou_logger.success(_msg("🥳", "视频已经传完啦"))
                         break
 
                     if retry_count % 5 == 0:
                         kuaishou_logger.info(_msg("🏃", "小人正在努力上传视频"))
 
-                    if await page.locator("text=上传失败").count():
+                    if state["upload_failed"].count:
                         await self.handle_upload_error(page)
 
                     await asyncio.sleep(2)
@@ -684,32 +746,17 @@ class KSVideo(KSBaseUploader):
             if retry_count == max_retries:
                 kuaishou_logger.warning(_msg("😵", "超过最大重试次数，视频上传可能未完成"))
 
-            await self.set_thumbnail(page)
-
-            await self.apply_collection(page)
-
-            if self.publish_strategy == KUAISHOU_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
-                await self.set_schedule_time(page, self.publish_date)
-
-            while True:
-                try:
-                    publish_button = page.get_by_text("发布", exact=True)
-                    if await publish_button.count() > 0:
-                        await publish_button.click()
-
-                    await asyncio.sleep(1)
-                    confirm_button = page.get_by_text("确认发布")
-                    if await confirm_button.count() > 0:
-                        await confirm_button.click()
-
-                    await page.wait_for_url(KUAISHOU_MANAGE_URL_PATTERN, timeout=5000)
-                    kuaishou_logger.success(_msg("🥳", "视频发布成功，小人开心收工"))
-                    break
-                except Exception as exc:
-                    kuaishou_logger.info(_msg("🏃", f"小人正在冲刺发布视频: {exc}"))
-                    if self.debug:
-                        await page.screenshot(full_page=True)
-                    await asyncio.sleep(1)
+            mark_checkpoint(CHECKPOINT_UPLOADED)
+            # 视频已经传完：之后任何一步失败都在当前页面里只重跑剩下的步骤，不重新上传
+            await run_remaining_phases(
+                [
+                    PhaseStep("set_cover", CHECKPOINT_COVER_SET, lambda: self.set_thumbnail(page)),
+                    PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, lambda: self.fill_post_upload_meta(page)),
+                    PhaseStep("publish", CHECKPOINT_PUBLISHED, lambda: self.click_publish_until_success(page, "视频"), retry=False),
+                ],
+                platform="kuaishou",
+                on_retry=lambda phase, exc: self.close_guide_overlay(page),
+            )
 
             upload_success = True
         finally:
@@ -717,8 +764,7 @@ class KSVideo(KSBaseUploader):
                 await context.storage_state(path=self.account_file)
                 kuaishou_logger.success(_msg("🥳", "cookie 更新完毕"))
                 await asyncio.sleep(2)
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def main(self):
         async with async_playwright() as playwright:
@@ -771,6 +817,7 @@ class KSNote(KSBaseUploader):
         await page.locator('div[role="tablist"] div[role="tab"]:has-text("图文")').click()
         await page.wait_for_timeout(1000)
 
+        set_phase("upload_file")
         kuaishou_logger.info(_msg("📤", "小人正在上传图片"))
         upload_button = page.locator("button[class^='_upload-btn']").filter(has_text="上传图片")
         await upload_button.wait_for(state="visible", timeout=10000)
@@ -778,7 +825,7 @@ class KSNote(KSBaseUploader):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.image_paths)
+        await file_chooser.set_files(await stage_files(self.image_paths))
 
         know_button = page.locator('button[type="button"] span:text("我知道了")').first
         try:
@@ -789,6 +836,7 @@ class KSNote(KSBaseUploader):
 
         await self.close_guide_overlay(page)
 
+        set_phase("fill_meta")
         kuaishou_logger.info(_msg("✍️", "小人开始填写图文内容和话题"))
         await _focus_desc_editor(page)
         await page.keyboard.press("Backspace")
@@ -806,17 +854,17 @@ class KSNote(KSBaseUploader):
         retry_count = 0
         while retry_count < max_retries:
             try:
-                number = await page.locator("text=上传中").count()
-                if number == 0:
+                state = await UPLOAD_PAGE_PROBE.snapshot(page)
+                if state["uploading"].count == 0:
                     kuaishou_logger.success(_msg("🥳", "图文素材已经传完啦"))
                     break
 
                 if retry_count % 5 == 0:
                     kuaishou_logger.info(_msg("🏃", "小人正在努力上传图文素材"))
 
-                if await page.locator("text=上传失败").count():
+                if state["upload_failed"].count:
                     kuaishou_logger.warning(_msg("😵", "图文素材上传摔了一跤，小人马上重新上传"))
-                    await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.image_paths)
+                    await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(await stage_files(self.image_paths))
 
                 await asyncio.sleep(2)
             except Exception as exc:
@@ -830,25 +878,7 @@ class KSNote(KSBaseUploader):
         if self.publish_strategy == KUAISHOU_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
             await self.set_schedule_time(page, self.publish_date)
 
-        while True:
-            try:
-                publish_button = page.get_by_text("发布", exact=True)
-                if await publish_button.count() > 0:
-                    await publish_button.click()
-
-                await asyncio.sleep(1)
-                confirm_button = page.get_by_text("确认发布")
-                if await confirm_button.count() > 0:
-                    await confirm_button.click()
-
-                await page.wait_for_url(KUAISHOU_MANAGE_URL_PATTERN, timeout=5000)
-                kuaishou_logger.success(_msg("🥳", "图文发布成功，小人开心收工"))
-                break
-            except Exception as exc:
-                kuaishou_logger.info(_msg("🏃", f"小人正在冲刺发布图文: {exc}"))
-                if self.debug:
-                    await page.screenshot(full_page=True)
-                await asyncio.sleep(1)
+        await self.click_publish_until_success(page, "图文")
 
     async def upload(self, playwright: Playwright) -> None:
         kuaishou_logger.info(_msg("🧍", "小人先检查 cookie、图片和发布时间"))
@@ -856,24 +886,25 @@ class KSNote(KSBaseUploader):
         kuaishou_logger.info(_msg("🥳", "图文上传前检查通过"))
 
         if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path,
-            )
+            launch_kwargs = dict(headless=self.headless, executable_path=self.local_executable_path)
         else:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                channel="chromium",
-            )
-        context = await browser.new_context(storage_state=self.account_file)
-        context = await set_init_script(context)
-
+            launch_kwargs = dict(headless=self.headless, channel="chromium")
+        browser = context = None
         upload_success = False
         try:
+            browser, context = await open_account_context(
+                playwright.chromium, "kuaishou", self.account_file, launch_kwargs
+            )
+            await install_request_filter(context, "kuaishou")
+            context = await set_init_script(context)
+
+            set_phase("open_page")
             page = await context.new_page()
+            watch_publish_responses(page, "kuaishou")
             await page.goto(KUAISHOU_UPLOAD_URL)
             kuaishou_logger.info(_msg("🧭", "小人正在赶往快手图文发布页"))
             await page.wait_for_url(KUAISHOU_UPLOAD_URL_PATTERN)
+            record_time_to_upload_page("kuaishou")
 
             await self.upload_note_content(page)
             upload_success = True
@@ -882,8 +913,7 @@ class KSNote(KSBaseUploader):
                 await context.storage_state(path=self.account_file)
                 kuaishou_logger.success(_msg("🥳", "cookie 更新完毕"))
                 await asyncio.sleep(2)
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def main(self):
         async with async_playwright() as playwright:
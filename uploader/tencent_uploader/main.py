@@ -17,7 +17,23 @@ from patchright.async_api import async_playwright
 from conf import BASE_DIR, DEBUG_MODE, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_profiles import close_account_context, open_account_context, record_time_to_upload_page
+from utils.browser_session import launch_browser
+from utils.job_phase import (
+    CHECKPOINT_COVER_SET,
+    CHECKPOINT_METADATA_FILLED,
+    CHECKPOINT_PUBLISHED,
+    CHECKPOINT_UPLOADED,
+    PhaseStep,
+    mark_checkpoint,
+    run_remaining_phases,
+    set_phase,
+)
 from utils.log import tencent_logger
+from utils.publish_ledger import watch_publish_responses
+from utils.request_filter import install_request_filter
+from utils.selector_cache import selector_registry
 
 TENCENT_LOGIN_URL = "https://channels.weixin.qq.com"
 TENCENT_HOME_URL = "https://channels.weixin.qq.com/platform"
@@ -114,7 +130,7 @@ def format_str_for_short_title(origin_title: str) -> str:
 async def cookie_auth(account_file):
     account_file = _resolve_account_file(account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=True))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=True))
         try:
             context = await browser.new_context(storage_state=account_file)
             context = await set_init_script(context)
@@ -392,7 +408,7 @@ async def tencent_cookie_gen(
     Path(account_file).parent.mkdir(parents=True, exist_ok=True)
 
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=headless))
         context = await browser.new_context()
         qrcode_path = None
         result = _build_login_result(False, "failed", "视频号登录失败", account_file)
@@ -623,14 +639,13 @@ class TencentBaseUploader(BaseVideoUploader):
 
     async def upload_video_file(self, page: Page, file_path: str) -> None:
         async def find_file_input():
-            for fr in page.frames:  # 主 frame + 所有 iframe（视频号编辑器可能在 iframe 内）
-                try:
-                    fi = fr.locator('input[type="file"]')
-                    if await fi.count():
-                        return fi.first
-                except Exception:
-                    continue
-            return None
+            # 主 frame + 所有 iframe（视频号编辑器可能在 iframe 内），上次找到上传框的 frame 先查。
+            # 用 frame 名字/序号而不是 URL 做 key：URL 每次可能不同，会在 selector_ranks 里越积越多
+            candidates = {"main": page.main_frame.locator('input[type="file"]').first}
+            for index, fr in enumerate(fr for fr in page.frames if fr != page.main_frame):
+                candidates.setdefault(f"iframe:{fr.name or index}", fr.locator('input[type="file"]').first)
+            found = await selector_registry.first_present("tencent", "file_input_frame", candidates)
+            return found[1] if found else None
 
         fi = await find_file_input()
         clicked_publish = False
@@ -671,7 +686,7 @@ class TencentBaseUploader(BaseVideoUploader):
             except Exception:
                 pass
             raise RuntimeError("未找到视频号文件上传框")
-        await fi.set_input_files(file_path)
+        await fi.set_input_files(await stage_files(file_path))
 
     async def set_short_title(self, page: Page, title: str, short_title: str | None = None) -> None:
         # 视频号「短标题」即界面上要求填写的“标题”（那个大编辑区其实是“视频描述”）。
@@ -880,6 +895,7 @@ class TencentBaseUploader(BaseVideoUploader):
                 await asyncio.sleep(2)
 
     async def submit_publish(self, page: Page) -> None:
+        set_phase("publish")
         is_draft = getattr(self, "is_draft", False)
         # 先等待并清理遮罩/弹窗,再等发表按钮出现
         for wait_round in range(60):
@@ -1032,7 +1048,7 @@ class TencentVideo(TencentBaseUploader):
         await cover_dialog.wait_for(state="visible", timeout=5000)
         file_input = cover_dialog.locator('.single-cover-uploader-wrap input[type="file"]').first
         await file_input.wait_for(state="attached", timeout=10000)
-        await file_input.set_input_files(thumbnail_path)
+        await file_input.set_input_files(await stage_files(thumbnail_path))
         await page.wait_for_timeout(2000)
 
         confirm_button = cover_dialog.locator(
@@ -1103,38 +1119,59 @@ class TencentVideo(TencentBaseUploader):
         # 上传中选的合集会被重置/不绑定（"日志说选了、后台没加"的根因）。
         # 改到 wait_for_upload_complete 之后再选，见 upload()。
 
+    async def fill_post_upload_meta(self, page: Page) -> None:
+        # 上传完成、表单稳定后再选合集（否则上传中选的会被重置）
+        await self.apply_collection(page)
+        await self.apply_original_statement(page)
+
+        if self.publish_strategy == TENCENT_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
+            await self.set_schedule_time_tencent(page, self.publish_date)
+
+        await self.set_short_title(page, self.title, self.short_title)
+
     async def upload(self, playwright: Playwright) -> None:
         tencent_logger.info(_msg("🧍", "小人先检查 cookie、视频文件和发布时间"))
         await self.validate_upload_args()
         tencent_logger.info(_msg("🥳", "上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
-        context = await browser.new_context(storage_state=self.account_file)
-
+        browser = context = None
         try:
+            browser, context = await open_account_context(
+                playwright.chromium, "tencent", self.account_file, _build_launch_kwargs(headless=self.headless)
+            )
+            await install_request_filter(context, "tencent")
+
+            set_phase("open_page")
             page = await context.new_page()
+            watch_publish_responses(page, "tencent")
             await self.open_upload_page(page)
+            record_time_to_upload_page("tencent")
             tencent_logger.info(_msg("🏃", f"小人开始搬运视频: {self.title}"))
 
+            set_phase("upload_file")
             await self.upload_video_file(page, self.file_path)
+            set_phase("fill_meta")
             await self.prepare_video_for_publish(page)
+            # 标题填完后回到等待视频传完
+            set_phase("upload_file")
             await self.wait_for_upload_complete(page)
-            # 上传完成、表单稳定后再选合集（否则上传中选的会被重置）
-            await self.apply_collection(page)
-            await self.apply_original_statement(page)
-            await self.set_thumbnail(page)
-
-            if self.publish_strategy == TENCENT_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
-                await self.set_schedule_time_tencent(page, self.publish_date)
-
-            await self.set_short_title(page, self.title, self.short_title)
-            await self.submit_publish(page)
+            mark_checkpoint(CHECKPOINT_UPLOADED)
+            # 视频已经传完：之后任何一步失败都在当前页面里只重跑剩下的步骤，不重新上传
+            await run_remaining_phases(
+                [
+                    # 原流程里封面在定时发布、短标题之前设置：先设封面，再填合集、定时和短标题
+                    PhaseStep("set_cover", CHECKPOINT_COVER_SET, lambda: self.set_thumbnail(page)),
+                    PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, lambda: self.fill_post_upload_meta(page)),
+                    PhaseStep("publish", CHECKPOINT_PUBLISHED, lambda: self.submit_publish(page), retry=False),
+                ],
+                platform="tencent",
+                on_retry=lambda phase, exc: self._dismiss_switch_account_dialog(page),
+            )
 
             await context.storage_state(path=self.account_file)
             tencent_logger.success(_msg("🥳", "cookie 更新完毕"))
         finally:
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def tencent_upload_video(self):
         async with async_playwright() as playwright:
@@ -1214,15 +1251,22 @@ class TencentNote(TencentBaseUploader):
         await self.validate_upload_args()
         tencent_logger.info(_msg("🥳", "图文上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
-        context = await browser.new_context(storage_state=self.account_file)
-        context = await set_init_script(context)
-
+        browser = context = None
         try:
+            browser, context = await open_account_context(
+                playwright.chromium, "tencent", self.account_file, _build_launch_kwargs(headless=self.headless)
+            )
+            await install_request_filter(context, "tencent")
+            context = await set_init_script(context)
+
+            set_phase("open_page")
             page = await context.new_page()
+            watch_publish_responses(page, "tencent")
             await self.open_upload_page(page)
+            record_time_to_upload_page("tencent")
             tencent_logger.info(_msg("🏃", f"小人开始搬运图文，共 {len(self.image_paths)} 张图片"))
 
+            set_phase("upload_file")
             await self.upload_note_content(page)
 
             if self.publish_strategy == TENCENT_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
@@ -1233,8 +1277,7 @@ class TencentNote(TencentBaseUploader):
             await context.storage_state(path=self.account_file)
             tencent_logger.success(_msg("🥳", "cookie 更新完毕"))
         finally:
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def tencent_upload_note(self):
         async with async_playwright() as playwright:
@@ -7,14 +7,19 @@ import os
 import asyncio
 from uploader.tk_uploader.tk_config import Tk_Locator
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.files_times import get_absolute_path
+from utils.job_phase import set_phase
 from utils.log import tiktok_logger
+from utils.publish_ledger import watch_publish_responses
+from utils.retry import PUBLISH_RETRY_POLICY, UPLOAD_WAIT_RETRY_POLICY, TransientError, retry_async
 from conf import LOCAL_CHROME_HEADLESS
 
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.firefox.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_browser(playwright.firefox, headless=LOCAL_CHROME_HEADLESS)
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
         # 创建一个新的页面
@@ -57,7 +62,7 @@ async def get_tiktok_cookie(account_file):
             'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
         }
         # Make sure to run headed.
-        browser = await playwright.firefox.launch(**options)
+        browser = await launch_browser(playwright.firefox, **options)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         context = await set_init_script(context)
@@ -139,15 +144,17 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await select_file_button.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
 
     async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.firefox.launch(headless=self.headless)
+        browser = await launch_browser(playwright.firefox, headless=self.headless)
         context = await browser.new_context(storage_state=f"{self.account_file}")
         context = await set_init_script(context)
         page = await context.new_page()
+        watch_publish_responses(page, "tiktok")
 
         await page.goto("https://www.tiktok.com/creator-center/upload")
+        set_phase("open_page")
         tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
 
         await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
@@ -158,6 +165,7 @@ class TiktokVideo(object):
         except Exception as e:
             tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
 
+        set_phase("upload_file")
         await self.choose_base_locator(page)
 
         upload_button = self.locator_base.locator(
@@ -167,14 +175,16 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
 
+        set_phase("fill_meta")
         await self.add_title_tags(page)
         # detact upload status
         await self.detect_upload_status(page)
         if self.publish_date != 0:
             await self.set_schedule_time(page, self.publish_date)
 
+        set_phase("publish")
         await self.click_publish(page)
 
         await context.storage_state(path=f"{self.account_file}")  # save cookie
@@ -219,40 +229,42 @@ class TiktokVideo(object):
 
     async def click_publish(self, page):
         success_flag_div = '#\\:r9\\:'
-        while True:
-            try:
-                publish_button = self.locator_base.locator('div.btn-post')
-                if await publish_button.count():
-                    await publish_button.click()
 
+        async def publish_once():
+            publish_button = self.locator_base.locator('div.btn-post')
+            if await publish_button.count():
+                await publish_button.click()
+            try:
                 await self.locator_base.locator(success_flag_div).wait_for(state="visible", timeout=3000)
-                tiktok_logger.success("  [-] video published success")
-                break
-            except Exception as e:
-                if await self.locator_base.locator(success_flag_div).count():
-                    tiktok_logger.success("  [-]video published success")
-                    break
-                else:
-                    tiktok_logger.exception(f"  [-] Exception: {e}")
-                    tiktok_logger.info("  [-] video publishing")
-                    await page.screenshot(full_page=True)
-                    await asyncio.sleep(0.5)
+            except Exception:
+                if not await self.locator_base.locator(success_flag_div).count():
+                    raise
+
+        async def before_retry(attempt, exc, delay):
+            tiktok_logger.warning(f"  [-] Exception: {exc}")
+            tiktok_logger.info("  [-] video publishing")
+            await page.screenshot(full_page=True)
+
+        await retry_async(publish_once, PUBLISH_RETRY_POLICY, platform="tiktok", operation="publish", on_retry=before_retry)
+        tiktok_logger.success("  [-] video published success")
 
     async def detect_upload_status(self, page):
-        while True:
-            try:
-                if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
-                    tiktok_logger.info("  [-]video uploaded.")
-                    break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator('button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-            except:
-                tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+        async def upload_done():
+            if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
+                return
+            if await self.locator_base.locator('button[aria-label="Select file"]').count():
+                tiktok_logger.info("  [-] found some error while uploading now retry...")
+                await self.handle_upload_error(page)
+            raise TransientError("video still uploading")
+
+        await retry_async(
+            upload_done,
+            UPLOAD_WAIT_RETRY_POLICY,
+            platform="tiktok",
+            operation="wait_upload",
+            on_retry=lambda *_: tiktok_logger.info("  [-] video uploading..."),
+        )
+        tiktok_logger.info("  [-]video uploaded.")
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
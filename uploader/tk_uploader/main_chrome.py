@@ -9,13 +9,18 @@ import asyncio
 from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
 from uploader.tk_uploader.tk_config import Tk_Locator
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.files_times import get_absolute_path
+from utils.job_phase import set_phase
 from utils.log import tiktok_logger
+from utils.publish_ledger import record_post_id, watch_publish_responses
+from utils.retry import PUBLISH_RETRY_POLICY, UPLOAD_WAIT_RETRY_POLICY, TransientError, retry_async
 
 
 async def cookie_auth(account_file):
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=LOCAL_CHROME_HEADLESS)
+        browser = await launch_browser(playwright.chromium, headless=LOCAL_CHROME_HEADLESS)
         context = await browser.new_context(storage_state=account_file)
         context = await set_init_script(context)
         # 创建一个新的页面
@@ -58,7 +63,7 @@ async def get_tiktok_cookie(account_file):
             'headless': LOCAL_CHROME_HEADLESS,  # Set headless option here
         }
         # Make sure to run headed.
-        browser = await playwright.chromium.launch(**options)
+        browser = await launch_browser(playwright.chromium, **options)
         # Setup context however you like.
         context = await browser.new_context()  # Pass any options
         context = await set_init_script(context)
@@ -144,17 +149,19 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await select_file_button.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
 
     async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
+        browser = await launch_browser(playwright.chromium, headless=self.headless, executable_path=self.local_executable_path)
         context = await browser.new_context(storage_state=f"{self.account_file}")
         # context = await set_init_script(context)
         page = await context.new_page()
+        watch_publish_responses(page, "tiktok")
 
         # change language to eng first
         await self.change_language(page)
         await page.goto("https://www.tiktok.com/tiktokstudio/upload")
+        set_phase("open_page")
         tiktok_logger.info(f'[+]Uploading-------{self.title}.mp4')
 
         await page.wait_for_url("https://www.tiktok.com/tiktokstudio/upload", timeout=10000)
@@ -165,6 +172,7 @@ class TiktokVideo(object):
         except Exception as e:
             tiktok_logger.error("Neither iframe nor div appeared within the timeout.")
 
+        set_phase("upload_file")
         await self.choose_base_locator(page)
 
         upload_button = self.locator_base.locator(
@@ -174,8 +182,9 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await upload_button.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
 
+        set_phase("fill_meta")
         await self.add_title_tags(page)
         # detect upload status
         await self.detect_upload_status(page)
@@ -186,8 +195,11 @@ class TiktokVideo(object):
         if self.publish_date != 0:
             await self.set_schedule_time(page, self.publish_date)
 
+        set_phase("publish")
         await self.click_publish(page)
-        tiktok_logger.success(f"video_id: {await self.get_last_video_id(page)}")
+        video_id = await self.get_last_video_id(page)
+        record_post_id("tiktok", video_id)
+        tiktok_logger.success(f"video_id: {video_id}")
 
         await context.storage_state(path=f"{self.account_file}")  # save cookie
         tiktok_logger.info('  [-] update cookie！')
@@ -235,7 +247,7 @@ class TiktokVideo(object):
         async with page.expect_file_chooser() as fc_info:
             await self.locator_base.locator(".upload-image-upload-area").click()
             file_chooser = await fc_info.value
-            await file_chooser.set_files(self.thumbnail_path)
+            await file_chooser.set_files(await stage_files(self.thumbnail_path))
         await self.locator_base.locator('div.cover-edit-panel:not(.hide-panel)').get_by_role(
             "button", name="Confirm").click()
         await page.wait_for_timeout(3000)  # wait 3s, fix it later
@@ -254,20 +266,19 @@ class TiktokVideo(object):
         await page.locator('#creator-tools-selection-menu-header >> text=English (US)').click()
 
     async def click_publish(self, page):
-        success_flag_div = 'div.common-modal-confirm-modal'
-        while True:
-            try:
-                publish_button = self.locator_base.locator('div.button-group button').nth(0)
-                if await publish_button.count():
-                    await publish_button.click()
-
-                await page.wait_for_url("https://www.tiktok.com/tiktokstudio/content",  timeout=3000)
-                tiktok_logger.success("  [-] video published success")
-                break
-            except Exception as e:
-                tiktok_logger.exception(f"  [-] Exception: {e}")
-                tiktok_logger.info("  [-] video publishing")
-                await asyncio.sleep(0.5)
+        async def publish_once():
+            publish_button = self.locator_base.locator('div.button-group button').nth(0)
+            if await publish_button.count():
+                await publish_button.click()
+
+            await page.wait_for_url("https://www.tiktok.com/tiktokstudio/content",  timeout=3000)
+
+        def before_retry(attempt, exc, delay):
+            tiktok_logger.warning(f"  [-] Exception: {exc}")
+            tiktok_logger.info("  [-] video publishing")
+
+        await retry_async(publish_once, PUBLISH_RETRY_POLICY, platform="tiktok", operation="publish", on_retry=before_retry)
+        tiktok_logger.success("  [-] video published success")
 
     async def get_last_video_id(self, page):
         await page.wait_for_selector('div[data-tt="components_PostTable_Container"]')
@@ -279,23 +290,25 @@ class TiktokVideo(object):
 
 
     async def detect_upload_status(self, page):
-        while True:
-            try:
-                # if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
-                if await self.locator_base.locator(
-                        'div.button-group > button >> text=Post').get_attribute("disabled") is None:
-                    tiktok_logger.info("  [-]video uploaded.")
-                    break
-                else:
-                    tiktok_logger.info("  [-] video uploading...")
-                    await asyncio.sleep(2)
-                    if await self.locator_base.locator(
-                            'button[aria-label="Select file"]').count():
-                        tiktok_logger.info("  [-] found some error while uploading now retry...")
-                        await self.handle_upload_error(page)
-            except:
-                tiktok_logger.info("  [-] video uploading...")
-                await asyncio.sleep(2)
+        async def upload_done():
+            # if await self.locator_base.locator('div.btn-post > button').get_attribute("disabled") is None:
+            if await self.locator_base.locator(
+                    'div.button-group > button >> text=Post').get_attribute("disabled") is None:
+                return
+            if await self.locator_base.locator(
+                    'button[aria-label="Select file"]').count():
+                tiktok_logger.info("  [-] found some error while uploading now retry...")
+                await self.handle_upload_error(page)
+            raise TransientError("video still uploading")
+
+        await retry_async(
+            upload_done,
+            UPLOAD_WAIT_RETRY_POLICY,
+            platform="tiktok",
+            operation="wait_upload",
+            on_retry=lambda *_: tiktok_logger.info("  [-] video uploading..."),
+        )
+        tiktok_logger.info("  [-]video uploaded.")
 
     async def choose_base_locator(self, page):
         # await page.wait_for_selector('div.upload-container')
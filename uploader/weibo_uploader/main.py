@@ -24,8 +24,11 @@ from playwright.async_api import Page, Playwright, TimeoutError as PWTimeoutErro
 
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.log import weibo_logger
 from utils.login_qrcode import build_login_qrcode_path, remove_qrcode_file
+from utils.publish_ledger import watch_publish_responses
 
 
 WEIBO_HOME_URL = "https://weibo.com/"
@@ -165,7 +168,7 @@ async def weibo_cookie_gen(account_file, qrcode_callback=None, poll_interval: in
     result = _build_login_result(False, "failed", "微博登录失败", account_file)
 
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=headless))
         context = await browser.new_context()
         try:
             page = await context.new_page()
@@ -223,7 +226,7 @@ async def cookie_auth(account_file):
     """验证微博 cookie 是否有效。访问首页，检测是否出现登录提示。"""
     account_file = _resolve_account_file(account_file)
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=True))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=True))
         try:
             context = await browser.new_context(storage_state=account_file)
             page = await context.new_page()
@@ -320,7 +323,7 @@ class WeiBoVideo(BaseVideoUploader):
         await self.validate_upload_args()
         weibo_logger.info(_msg("🥳", "上传前检查通过"))
 
-        browser = await playwright.chromium.launch(**_build_launch_kwargs(headless=self.headless))
+        browser = await launch_browser(playwright.chromium, **_build_launch_kwargs(headless=self.headless))
         context = await browser.new_context(
             storage_state=self.account_file,
             viewport={"width": 1280, "height": 2000},  # 高视口，确保发布按钮等在可视区
@@ -328,6 +331,7 @@ class WeiBoVideo(BaseVideoUploader):
 
         try:
             page = await context.new_page()
+            watch_publish_responses(page, "weibo")
             await page.goto(WEIBO_HOME_URL, timeout=60000, wait_until="domcontentloaded")
             await page.wait_for_timeout(3000)
             weibo_logger.info(_msg("🏃", f"开始上传视频: {self.title}"))
@@ -392,7 +396,7 @@ class WeiBoVideo(BaseVideoUploader):
         async with page.expect_file_chooser(timeout=10000) as fc_info:
             await upload_btn.click()
         file_chooser = await fc_info.value
-        await file_chooser.set_files(self.file_path)
+        await file_chooser.set_files(await stage_files(self.file_path))
         weibo_logger.info(_msg("🏃", f"已选择视频文件: {self.file_path}"))
 
     async def _wait_upload_complete(self, page: Page, timeout: int = 900) -> None:
@@ -477,7 +481,7 @@ class WeiBoVideo(BaseVideoUploader):
         # 导致"裁切处理中"永久卡住、发不出 picupload 请求）
         file_input = page.locator('input[type="file"][accept*="jpg"]').first
         await file_input.wait_for(state="attached", timeout=15000)
-        await file_input.set_input_files(self.thumbnail_path)
+        await file_input.set_input_files(await stage_files(self.thumbnail_path))
         weibo_logger.info(_msg("🏃", f"已选择封面图片: {self.thumbnail_path}"))
 
         # cropper 本地出图（秒级）
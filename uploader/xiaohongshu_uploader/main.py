@@ -14,12 +14,35 @@ from patchright.async_api import async_playwright
 from conf import DEBUG_MODE, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_profiles import close_account_context, open_account_context, record_time_to_upload_page
+from utils.browser_session import launch_browser
 from utils.login_qrcode import build_login_qrcode_path
 from utils.login_qrcode import decode_qrcode_from_path
 from utils.login_qrcode import print_terminal_qrcode
 from utils.login_qrcode import remove_qrcode_file
 from utils.login_qrcode import save_data_url_image
+from utils.job_phase import (
+    CHECKPOINT_COVER_SET,
+    CHECKPOINT_METADATA_FILLED,
+    CHECKPOINT_PUBLISHED,
+    CHECKPOINT_UPLOADED,
+    PhaseStep,
+    mark_checkpoint,
+    run_remaining_phases,
+    set_phase,
+)
 from utils.log import xiaohongshu_logger
+from utils.page_probe import PageProbe, ProbeCheck
+from utils.publish_ledger import watch_publish_responses
+from utils.request_filter import install_request_filter
+from utils.retry import (
+    PAGE_WAIT_RETRY_POLICY,
+    PUBLISH_RETRY_POLICY,
+    UPLOAD_WAIT_RETRY_POLICY,
+    TransientError,
+    retry_async,
+)
 
 XHS_DEFAULT_CREATOR_BASE_URL = "https://creator.xiaohongshu.com"
 XHS_CREATOR_BASE_URL_ENV = "SAU_XHS_CREATOR_BASE_URL"
@@ -28,6 +51,13 @@ XHS_LOGIN_BOX_SELECTOR = "div[class*='login-box']"
 XHS_LOGIN_SWITCH_SELECTOR = "img.css-wemwzq"
 XIAOHONGSHU_PUBLISH_STRATEGY_IMMEDIATE = "immediate"
 XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED = "scheduled"
+UPLOAD_DONE_KEYWORDS = ('上传成功', '分辨率', '重新上传', '编辑封面', '已上传', '已选择', '100%')
+# 上传等待循环每轮要看的：上传框后面的预览区、预览区里的上传阶段、标题框
+UPLOAD_PAGE_PROBE = PageProbe("xiaohongshu", {
+    "preview": ProbeCheck('input.upload-input ~ div[class*="preview-new"]'),
+    "stage_done": ProbeCheck('input.upload-input ~ div[class*="preview-new"] div.stage', ("上传成功", "分辨率")),
+    "title_input": ProbeCheck('input[placeholder*="填写标题"]'),
+})
 
 
 def _build_xhs_creator_url(path: str) -> str:
@@ -180,9 +210,9 @@ async def cookie_auth(account_file):
 
     async with async_playwright() as playwright:
         if LOCAL_CHROME_PATH:
-            browser = await playwright.chromium.launch(headless=True, executable_path=LOCAL_CHROME_PATH)
+            browser = await launch_browser(playwright.chromium, headless=True, executable_path=LOCAL_CHROME_PATH)
         else:
-            browser = await playwright.chromium.launch(headless=True, channel="chromium")
+            browser = await launch_browser(playwright.chromium, headless=True, channel="chromium")
         try:
             context = await browser.new_context(storage_state=account_file)
             context = await set_init_script(context)
@@ -253,7 +283,7 @@ async def xiaohongshu_cookie_gen(
     account_path.parent.mkdir(parents=True, exist_ok=True)
 
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=headless, channel="chromium")
+        browser = await launch_browser(playwright.chromium, headless=headless, channel="chromium")
         context = await browser.new_context()
         context = await set_init_script(context)
         qrcode_path = None
@@ -520,6 +550,33 @@ class XiaoHongShuBaseUploader(BaseVideoUploader):
             except Exception:
                 pass
 
+    async def click_publish_until_success(self, page: Page, label: str) -> None:
+        set_phase("publish")
+
+        async def publish_once():
+            if self.publish_strategy == XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED:
+                await page.locator('button:has-text("定时发布")').click()
+            else:
+                await page.locator('button:has-text("发布")').click()
+            await page.wait_for_url(
+                XHS_PUBLISH_SUCCESS_URL_PATTERN,
+                timeout=3000
+            )
+
+        async def before_retry(attempt, exc, delay):
+            xiaohongshu_logger.info(_msg("🏃", f"小人正在冲刺发布{label}"))
+            if self.debug:
+                await page.screenshot(full_page=True)
+
+        await retry_async(
+            publish_once,
+            PUBLISH_RETRY_POLICY,
+            platform="xiaohongshu",
+            operation="publish",
+            on_retry=before_retry,
+        )
+        xiaohongshu_logger.success(_msg("🥳", f"{label}发布成功，小人开心收工"))
+
 
 class XiaoHongShuVideo(XiaoHongShuBaseUploader):
     def __init__(
@@ -559,7 +616,7 @@ class XiaoHongShuVideo(XiaoHongShuBaseUploader):
 
     async def handle_upload_error(self, page: Page):
         xiaohongshu_logger.warning(_msg("😵", "视频上传摔了一跤，小人马上重新上传"))
-        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
+        await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(await stage_files(self.file_path))
 
     async def set_thumbnail(self, page: Page, thumbnail_path: str):
         if not thumbnail_path:
@@ -594,7 +651,7 @@ class XiaoHongShuVideo(XiaoHongShuBaseUploader):
             file_input = page.locator('div.upload-wrapper input[type="file"][accept*="image"]').first
             if not await file_input.count():
                 file_input = page.locator('input[type="file"][accept*="image"]').last
-            await file_input.set_input_files(thumbnail_path)
+            await file_input.set_input_files(await stage_files(thumbnail_path))
             await page.wait_for_timeout(4000)  # 等图片加载+裁剪渲染
 
             # 4. 点「确定」按钮
@@ -622,57 +679,63 @@ class XiaoHongShuVideo(XiaoHongShuBaseUploader):
 
     async def upload_video_content(self, page: Page) -> None:
         xiaohongshu_logger.info(_msg("🏃", f"小人开始搬运视频: {self.title}.mp4"))
+        set_phase("open_page")
         xiaohongshu_logger.info(_msg("🧭", "小人正在赶往视频发布页"))
         publish_url = _build_xhs_creator_url(
             "/publish/publish?from=homepage&target=video"
         )
         await page.goto(publish_url)
         await page.wait_for_url(publish_url)
-        await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
+        record_time_to_upload_page("xiaohongshu")
+        set_phase("upload_file")
+        await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(await stage_files(self.file_path))
+
+        async def wait_for_upload_done():
+            # 预览区文字、上传阶段和标题框一次 evaluate 读完
+            state = await UPLOAD_PAGE_PROBE.snapshot(page)
+            preview = state["preview"]
+            if preview.count:
+                # 获取整个预览区域的文本，更鲁棒地判断上传状态；再看特定的上传阶段
+                upload_success = any(keyword in preview.text for keyword in UPLOAD_DONE_KEYWORDS) \
+                    or state["stage_done"].count > 0
+
+                if upload_success:
+                    xiaohongshu_logger.success(_msg("🥳", "视频已经传完啦"))
+                    return
 
-        while True:
-            try:
-                upload_input = await page.wait_for_selector('input.upload-input', timeout=3000)
-                preview_new = await upload_input.query_selector(
-                    'xpath=following-sibling::div[contains(@class, "preview-new")]')
-                if preview_new:
-                    # 获取整个预览区域的文本，更鲁棒地判断上传状态
-                    all_text = await preview_new.inner_text()
-                    upload_success = any(keyword in all_text for keyword in ['上传成功', '分辨率', '重新上传', '编辑封面', '已上传', '已选择', '100%'])
-                    
-                    if not upload_success:
-                        # 检查是否有特定的状态码或百分比
-                        stage_elements = await preview_new.query_selector_all('div.stage')
-                        for stage in stage_elements:
-                            text_content = await page.evaluate('(element) => element.textContent', stage)
-                            if '上传成功' in text_content or '分辨率' in text_content:
-                                upload_success = True
-                                break
-                    
-                    if upload_success:
-                        xiaohongshu_logger.success(_msg("🥳", "视频已经传完啦"))
-                        break
-                    
-                    if self.debug:
-                        normalized_text = all_text.strip().replace("\n", " ")
-                        xiaohongshu_logger.debug(_msg("🧍", f"预览区域内容: {normalized_text}"))
-                    xiaohongshu_logger.debug(_msg("🧍", "还没看到上传成功标识，小人继续等一会"))
-                else:
-                    # 尝试检查标题输入框是否已经出现，如果是，说明已经进入编辑状态
-                    title_container = page.locator('input[placeholder*="填写标题"]')
-                    if await title_container.count() > 0 and await title_container.is_visible():
-                        xiaohongshu_logger.success(_msg("🥳", "虽然没看到预览区，但标题框出来了，小人继续"))
-                        break
-                    xiaohongshu_logger.debug(_msg("🧍", "还没拿到预览区域，小人继续等一会"))
-            except Exception as e:
-                xiaohongshu_logger.debug(_msg("😵", f"上传状态还没稳定下来，小人继续观察: {e}"))
-            await asyncio.sleep(2)
+                if self.debug:
+                    xiaohongshu_logger.debug(_msg("🧍", f"预览区域内容: {preview.text}"))
+                raise TransientError("还没看到上传成功标识")
+            if state["title_input"].visible:
+                # 标题输入框已经出现，说明已经进入编辑状态
+                xiaohongshu_logger.success(_msg("🥳", "虽然没看到预览区，但标题框出来了，小人继续"))
+                return
+            raise TransientError("还没拿到预览区域")
+
+        await retry_async(
+            wait_for_upload_done,
+            UPLOAD_WAIT_RETRY_POLICY,
+            platform="xiaohongshu",
+            operation="wait_upload",
+            on_retry=lambda attempt, exc, delay: xiaohongshu_logger.debug(_msg("🧍", f"{exc}，小人继续等一会")),
+        )
 
+        mark_checkpoint(CHECKPOINT_UPLOADED)
+        # 视频已经传完：之后任何一步失败都在当前页面里只重跑剩下的步骤，不重新上传
+        await run_remaining_phases(
+            [
+                PhaseStep("fill_meta", CHECKPOINT_METADATA_FILLED, lambda: self.fill_post_upload_meta(page)),
+                PhaseStep("set_cover", CHECKPOINT_COVER_SET, lambda: self.set_thumbnail(page, self.thumbnail_path)),
+                PhaseStep("publish", CHECKPOINT_PUBLISHED, lambda: self.click_publish_until_success(page, "视频"), retry=False),
+            ],
+            platform="xiaohongshu",
+            on_retry=lambda phase, exc: page.keyboard.press("Escape"),
+        )
+
+    async def fill_post_upload_meta(self, page: Page) -> None:
         xiaohongshu_logger.info(_msg("✍️", "小人开始填标题、描述和话题"))
         await self.fill_meta(page)
 
-        await self.set_thumbnail(page, self.thumbnail_path)
-
         # await self.set_location(page, "青岛市")
 
         await self.check_original_declaration(page)
@@ -680,43 +743,29 @@ class XiaoHongShuVideo(XiaoHongShuBaseUploader):
         if self.publish_strategy == XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
             await self.set_schedule_time_xiaohongshu(page, self.publish_date)
 
-        while True:
-            try:
-                if self.publish_strategy == XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED:
-                    await page.locator('button:has-text("定时发布")').click()
-                else:
-                    await page.locator('button:has-text("发布")').click()
-                await page.wait_for_url(
-                    XHS_PUBLISH_SUCCESS_URL_PATTERN,
-                    timeout=3000
-                )
-                xiaohongshu_logger.success(_msg("🥳", "视频发布成功，小人开心收工"))
-                break
-            except Exception:
-                xiaohongshu_logger.info(_msg("🏃", "小人正在冲刺发布视频"))
-                if self.debug:
-                    await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
-
     async def upload(self, playwright: Playwright) -> None:
         xiaohongshu_logger.info(_msg("🧍", "小人先检查 cookie、视频文件、封面和发布时间"))
         await self.validate_upload_args()
         xiaohongshu_logger.info(_msg("🥳", "上传前检查通过"))
-        browser = await playwright.chromium.launch(headless=self.headless, channel="chromium")
-        context = await browser.new_context(
-            permissions=["geolocation"],
-            storage_state=self.account_file,
-        )
-        context = await set_init_script(context)
-
+        browser = context = None
         try:
+            browser, context = await open_account_context(
+                playwright.chromium,
+                "xiaohongshu",
+                self.account_file,
+                dict(headless=self.headless, channel="chromium"),
+                permissions=["geolocation"],
+            )
+            await install_request_filter(context, "xiaohongshu")
+            context = await set_init_script(context)
+
             page = await context.new_page()
+            watch_publish_responses(page, "xiaohongshu")
             await self.upload_video_content(page)
             await context.storage_state(path=self.account_file)
             xiaohongshu_logger.success(_msg("🥳", "cookie 更新完毕"))
         finally:
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def xiaohongshu_upload_video(self):
         async with async_playwright() as playwright:
@@ -770,31 +819,34 @@ class XiaoHongShuNote(XiaoHongShuBaseUploader):
 
     async def upload_note_content(self, page: Page) -> None:
         xiaohongshu_logger.info(_msg("🏃", f"小人开始搬运图文，共 {len(self.image_paths)} 张图片"))
+        set_phase("open_page")
         xiaohongshu_logger.info(_msg("🧭", "小人正在赶往图文发布页"))
         publish_url = _build_xhs_creator_url(
             "/publish/publish?from=homepage&target=image"
         )
         await page.goto(publish_url)
         await page.wait_for_url(publish_url)
+        record_time_to_upload_page("xiaohongshu")
 
+        set_phase("upload_file")
         upload_input = page.locator('input[type="file"][accept*="image"]').first
         if not await upload_input.count():
             upload_input = page.locator("div[class^='upload-content'] input[class='upload-input']").first
 
         await upload_input.wait_for(state="attached", timeout=30000)
         xiaohongshu_logger.info(_msg("📤", "小人正在上传图片"))
-        await upload_input.set_input_files(self.image_paths)
-
-        while True:
-            try:
-                title_container = page.locator('input[placeholder*="填写标题"]').first
-                await title_container.wait_for(state="visible", timeout=3000)
-                xiaohongshu_logger.success(_msg("🥳", "图文素材已经传完，可以开始填写内容了"))
-                break
-            except Exception:
-                xiaohongshu_logger.debug(_msg("🧍", "图文素材还在上传，小人继续等一会"))
-                await asyncio.sleep(1)
+        await upload_input.set_input_files(await stage_files(self.image_paths))
+
+        await retry_async(
+            lambda: page.locator('input[placeholder*="填写标题"]').first.wait_for(state="visible", timeout=3000),
+            PAGE_WAIT_RETRY_POLICY,
+            platform="xiaohongshu",
+            operation="wait_upload",
+            on_retry=lambda *_: xiaohongshu_logger.debug(_msg("🧍", "图文素材还在上传，小人继续等一会")),
+        )
+        xiaohongshu_logger.success(_msg("🥳", "图文素材已经传完，可以开始填写内容了"))
 
+        set_phase("fill_meta")
         xiaohongshu_logger.info(_msg("✍️", "小人开始填标题、描述和话题"))
         await self.fill_meta(page)
 
@@ -803,43 +855,31 @@ class XiaoHongShuNote(XiaoHongShuBaseUploader):
         if self.publish_strategy == XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED and self.publish_date != 0:
             await self.set_schedule_time_xiaohongshu(page, self.publish_date)
 
-        while True:
-            try:
-                if self.publish_strategy == XIAOHONGSHU_PUBLISH_STRATEGY_SCHEDULED:
-                    await page.locator('button:has-text("定时发布")').click()
-                else:
-                    await page.locator('button:has-text("发布")').click()
-                await page.wait_for_url(
-                    XHS_PUBLISH_SUCCESS_URL_PATTERN,
-                    timeout=3000
-                )
-                xiaohongshu_logger.success(_msg("🥳", "图文发布成功，小人开心收工"))
-                break
-            except Exception:
-                xiaohongshu_logger.info(_msg("🏃", "小人正在冲刺发布图文"))
-                if self.debug:
-                    await page.screenshot(full_page=True)
-                await asyncio.sleep(0.5)
+        await self.click_publish_until_success(page, "图文")
 
     async def upload(self, playwright: Playwright) -> None:
         xiaohongshu_logger.info(_msg("🧍", "小人先检查 cookie、图片和发布时间"))
         await self.validate_upload_args()
         xiaohongshu_logger.info(_msg("🥳", "图文上传前检查通过"))
-        browser = await playwright.chromium.launch(headless=self.headless, channel="chromium")
-        context = await browser.new_context(
-            permissions=["geolocation"],
-            storage_state=self.account_file,
-        )
-        context = await set_init_script(context)
-
+        browser = context = None
         try:
+            browser, context = await open_account_context(
+                playwright.chromium,
+                "xiaohongshu",
+                self.account_file,
+                dict(headless=self.headless, channel="chromium"),
+                permissions=["geolocation"],
+            )
+            await install_request_filter(context, "xiaohongshu")
+            context = await set_init_script(context)
+
             page = await context.new_page()
+            watch_publish_responses(page, "xiaohongshu")
             await self.upload_note_content(page)
             await context.storage_state(path=self.account_file)
             xiaohongshu_logger.success(_msg("🥳", "cookie 更新完毕"))
         finally:
-            await context.close()
-            await browser.close()
+            await close_account_context(browser, context)
 
     async def xiaohongshu_upload_note(self):
         async with async_playwright() as playwright:
@@ -10,6 +10,9 @@ used by every other uploader in this project.
 
 Login is interactive (Google account, no QR code): the browser opens, the user signs in, and
 the storage_state is saved. Reuse it afterwards for fully unattended uploads.
+
+Where the API restriction does not matter (audited project, private uploads), resumable.py
+is an alternative engine that uploads through the API's resumable protocol, no browser.
 """
 import asyncio
 from pathlib import Path
@@ -19,7 +22,11 @@ from patchright.async_api import Page, Playwright, async_playwright
 from conf import DEBUG_MODE
 from uploader.base_video import BaseVideoUploader
 from utils.base_social_media import set_init_script
+from utils.browser_pool import stage_files
+from utils.browser_session import launch_browser
 from utils.log import youtube_logger
+from utils.publish_ledger import watch_publish_responses
+from utils.selector_cache import selector_registry
 
 try:
     # 国内直连 youtube.com 会超时，且 patchright 启的 chromium 不吃系统代理。
@@ -31,6 +38,7 @@ except Exception:
 STUDIO_URL = "https://studio.youtube.com"
 UPLOAD_URL = "https://www.youtube.com/upload"
 VISIBILITY = {"public": "PUBLIC", "unlisted": "UNLISTED", "private": "PRIVATE"}
+UPLOAD_PROGRESS_SELECTORS = (".progress-label", "span.progress-label", "ytcp-video-upload-progress")
 
 
 def _msg(emoji: str, text: str) -> str:
@@ -50,7 +58,7 @@ def _build_login_result(success, status, message, account_file, current_url=""):
 async def cookie_auth(account_file) -> bool:
     """登录态是否仍有效：带 cookie 打开 Studio，没被踢到 Google 登录页且进入了频道页即有效。"""
     async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True, channel="chrome")
+        browser = await launch_browser(playwright.chromium, headless=True, channel="chrome")
         try:
             context = await browser.new_context(storage_state=account_file)
             context = await set_init_script(context)
@@ -71,7 +79,7 @@ async def youtube_cookie_gen(account_file, headless: bool = False):
     """交互式登录：开浏览器让用户登录 Google/YouTube，进入频道页后保存 storage_state。"""
     async with async_playwright() as playwright:
         # 登录必须显形，让用户输账号密码/二步验证
-        browser = await playwright.chromium.launch(headless=False, channel="chrome")
+        browser = await launch_browser(playwright.chromium, headless=False, channel="chrome")
         context = await browser.new_context()
         context = await set_init_script(context)
         page = await context.new_page()
@@ -159,14 +167,21 @@ async def _wait_upload_complete(page: Page, max_polls: int = 360) -> bool:
     若上传到一半就点发布并关闭浏览器，上传会被掐断卡在中途（如 76%）。
     出现“处理/检查/上传完成”或不再“正在上传”即视为传完。max_polls*5s=30min 上限。"""
     last = ""
+    # 上次读到进度的写法排在前面，每轮只为它发一次查询
+    selectors = selector_registry.ranked("youtube", "upload_progress", UPLOAD_PROGRESS_SELECTORS)
+    matched = None
     for _ in range(max_polls):
         txt = ""
-        for sel in (".progress-label", "span.progress-label", "ytcp-video-upload-progress"):
+        for sel in selectors:
             loc = page.locator(sel).first
             try:
                 if await loc.count():
                     txt = (await loc.inner_text()).strip()
                     if txt:
+                        if matched is None:
+                            matched = sel
+                            selector_registry.record("youtube", "upload_progress", sel, selectors[0])
+                            selectors = [sel] + [other for other in selectors if other != sel]
                         break
             except Exception:
                 pass
@@ -198,13 +213,15 @@ class YouTubeVideo(BaseVideoUploader):
         self.headless = headless
 
     async def upload(self, playwright: Playwright) -> None:
-        browser = await playwright.chromium.launch(
+        browser = await launch_browser(
+            playwright.chromium,
             headless=self.headless, channel="chrome",
             proxy={"server": YT_PROXY} if YT_PROXY else None,
         )
         context = await browser.new_context(storage_state=self.account_file)
         context = await set_init_script(context)
         page = await context.new_page()
+        watch_publish_responses(page, "youtube")
         page.set_default_timeout(60000)
 
         youtube_logger.info(_msg("🎬", f"开始上传: {Path(self.file_path).name}"))
@@ -217,7 +234,7 @@ class YouTubeVideo(BaseVideoUploader):
         # 1) 选择视频文件
         file_input = page.locator('input[type="file"]').first
         await file_input.wait_for(state="attached", timeout=60000)
-        await file_input.set_input_files(self.file_path)
+        await file_input.set_input_files(await stage_files(self.file_path))
 
         # 2) 等详情对话框
         await page.locator("#title-textarea").wait_for(state="visible", timeout=120000)
@@ -238,7 +255,7 @@ class YouTubeVideo(BaseVideoUploader):
                     "#file-loader input[type='file'], ytcp-thumbnail-uploader input[type='file']"
                 ).first
                 await thumb_input.wait_for(state="attached", timeout=20000)
-                await thumb_input.set_input_files(self.thumbnail_path)
+                await thumb_input.set_input_files(await stage_files(self.thumbnail_path))
                 await page.wait_for_timeout(2000)
                 youtube_logger.info(_msg("🖼️", "封面已上传"))
             except Exception as exc:
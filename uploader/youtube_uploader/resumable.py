@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""YouTube upload engine without a browser: the Data API resumable upload protocol.
+
+The file is streamed from disk in chunks over a pooled HTTP connection; after a dropped
+connection or a 5xx the engine asks the server how many bytes it has and continues from
+there instead of starting over. Unlike the browser engine it does not need a window kept
+open for the whole upload, nor YT_PROXY for a browser that ignores the system proxy.
+
+It authenticates with OAuth (YT_API in conf.py), not the account cookie. Keep in mind the
+caveat in main.py: videos uploaded through an unaudited API project are locked to private.
+"""
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import requests
+
+from utils import metrics
+from utils.job_phase import CHECKPOINT_PUBLISHED, CHECKPOINT_UPLOADED, mark_checkpoint, set_phase
+from utils.log import youtube_logger
+from utils.network import pooled_http_session
+from utils.publish_ledger import record_post_id
+from utils.retry import FatalError, RetryPolicy, TransientError, retry_async
+
+try:
+    # 在 conf.py 里用 YT_API 配置 OAuth 凭据和分片大小，见 conf.example.py
+    from conf import YT_API
+except ImportError:
+    YT_API = {}
+
+try:
+    from conf import YT_PROXY
+except ImportError:
+    YT_PROXY = None
+
+ENGINE_BROWSER = "browser"
+ENGINE_RESUMABLE = "resumable"
+ENGINES = (ENGINE_BROWSER, ENGINE_RESUMABLE)
+
+TOKEN_URL = "https://oauth2.googleapis.com/token"
+UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+THUMBNAIL_URL = "https://www.googleapis.com/upload/youtube/v3/thumbnails/set"
+# 除最后一片外，每片必须是 256 KiB 的整数倍
+CHUNK_ALIGNMENT = 256 * 1024
+# 每次从文件读、往 socket 写的块大小：分片再大，内存里也只有这么多
+STREAM_BLOCK_SIZE = 64 * 1024
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+# 单个分片（含断线后查询进度）的重试：按总时长封顶，网络抖动一阵也能接着传
+CHUNK_RETRY_POLICY = RetryPolicy(max_attempts=None, base_delay=1.0, max_delay=60.0, max_elapsed=1800)
+
+
+@dataclass(frozen=True, slots=True)
+class ResumableSettings:
+    engine: str = ENGINE_BROWSER
+    client_id: str = ""
+    client_secret: str = ""
+    # account_name -> 该频道授权得到的 refresh token
+    refresh_tokens: dict[str, str] = field(default_factory=dict)
+    chunk_mb: float = 16
+    pool_size: int = 4
+    timeout_seconds: float = 60
+    category_id: str = "22"
+    token_url: str = TOKEN_URL
+    upload_url: str = UPLOAD_URL
+    thumbnail_url: str = THUMBNAIL_URL
+
+    @property
+    def chunk_size(self) -> int:
+        return chunk_size_for(self.chunk_mb)
+
+
+def load_settings(config: dict | None = None) -> ResumableSettings:
+    settings = ResumableSettings(**(YT_API if config is None else config))
+    if settings.engine not in ENGINES:
+        raise RuntimeError(f"Unknown YouTube engine '{settings.engine}', expected one of {', '.join(ENGINES)}")
+    return settings
+
+
+def chunk_size_for(chunk_mb: float) -> int:
+    """Chunk size in bytes, rounded down to the 256 KiB multiple the protocol requires."""
+    size = int(chunk_mb * 1024 * 1024) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT
+    return max(size, CHUNK_ALIGNMENT)
+
+
+class OAuthToken:
+    """Access token for one refresh token, refreshed a minute before it expires."""
+
+    def __init__(self, http: requests.Session, settings: ResumableSettings, refresh_token: str, clock=time.monotonic):
+        self.http = http
+        self.settings = settings
+        self.refresh_token = refresh_token
+        self.clock = clock
+        self._token = ""
+        self._expires_at = 0.0
+
+    def invalidate(self) -> None:
+        self._expires_at = 0.0
+
+    async def get(self) -> str:
+        if self._token and self.clock() < self._expires_at:
+            return self._token
+        response = await asyncio.to_thread(
+            self.http.post,
+            self.settings.token_url,
+            data={
+                "grant_type": "refresh_token",
+                "client_id": self.settings.client_id,
+                "client_secret": self.settings.client_secret,
+                "refresh_token": self.refresh_token,
+            },
+            timeout=self.settings.timeout_seconds,
+        )
+        if response.status_code in RETRYABLE_STATUSES:
+            raise TransientError(f"YouTube token endpoint answered {response.status_code}")
+        if response.status_code != 200:
+            raise FatalError(f"YouTube OAuth refresh failed ({response.status_code}): {response.text[:200]}")
+        payload = response.json()
+        self._token = payload["access_token"]
+        self._expires_at = self.clock() + float(payload.get("expires_in", 3600)) - 60
+        return self._token
+
+
+class _FileSlice:
+    """
+    File-like view of `length` bytes of `handle` starting at `offset`. requests streams it
+    block by block, so memory stays at one block whatever the chunk size.
+    """
+
+    def __init__(self, handle, offset: int, length: int, on_read: Callable[[int], None]):
+        self._handle = handle
+        self._remaining = length
+        self._length = length
+        self._on_read = on_read
+        handle.seek(offset)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > STREAM_BLOCK_SIZE:
+            size = STREAM_BLOCK_SIZE
+        data = self._handle.read(min(size, self._remaining))
+        self._remaining -= len(data)
+        if data:
+            self._on_read(len(data))
+        return data
+
+
+def _acknowledged_offset(response: requests.Response) -> int:
+    """Bytes the server has persisted, from the `Range: bytes=0-N` header of a 308."""
+    value = response.headers.get("Range", "")
+    _, _, last = value.partition("-")
+    return int(last) + 1 if last.strip().isdigit() else 0
+
+
+def _raise_for_status(response: requests.Response, action: str) -> None:
+    if response.status_code in RETRYABLE_STATUSES:
+        raise TransientError(f"YouTube {action} answered {response.status_code}")
+    if response.status_code in (404, 410):
+        raise FatalError(f"YouTube upload session expired during {action} ({response.status_code})")
+    if response.status_code >= 400:
+        raise FatalError(f"YouTube {action} failed ({response.status_code}): {response.text[:200]}")
+
+
+class ResumableUpload:
+    """
+    One video's resumable upload session: start() creates it, run() sends the file chunk by
+    chunk. A chunk that fails is retried from the offset the server acknowledged, so a
+    dropped connection costs at most one chunk. `on_progress(sent, total)` is called as
+    bytes leave the process, and goes back to the acknowledged offset after a resume.
+    """
+
+    def __init__(
+        self,
+        http: requests.Session,
+        file_path: str | Path,
+        metadata: dict,
+        *,
+        token: Callable[[], Awaitable[str]],
+        upload_url: str = UPLOAD_URL,
+        chunk_size: int = 16 * 1024 * 1024,
+        timeout: float = 60,
+        policy: RetryPolicy = CHUNK_RETRY_POLICY,
+        on_progress: Callable[[int, int], None] | None = None,
+        on_unauthorized: Callable[[], None] | None = None,
+    ):
+        self.http = http
+        self.file_path = Path(file_path)
+        self.metadata = metadata
+        self.token = token
+        self.upload_url = upload_url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.policy = policy
+        self.on_progress = on_progress
+        self.on_unauthorized = on_unauthorized
+        self.size = self.file_path.stat().st_size
+        self.session_uri: str | None = None
+        self.resumes = 0
+        if self.size == 0:
+            raise ValueError(f"Video file is empty: {self.file_path}")
+
+    async def _request(self, method: str, url: str, action: str, **kwargs) -> requests.Response:
+        headers = {"Authorization": f"Bearer {await self.token()}", **kwargs.pop("headers", {})}
+        response = await asyncio.to_thread(self.http.request, method, url, headers=headers, timeout=self.timeout, **kwargs)
+        if response.status_code == 401 and self.on_unauthorized is not None:
+            self.on_unauthorized()
+            raise TransientError(f"YouTube {action} answered 401, refreshing the access token")
+        return response
+
+    async def start(self) -> str:
+        content_type = mimetypes.guess_type(self.file_path.name)[0] or "video/*"
+        response = await self._request(
+            "POST",
+            self.upload_url,
+            "upload session",
+            params={"uploadType": "resumable", "part": ",".join(self.metadata)},
+            json=self.metadata,
+            headers={"X-Upload-Content-Length": str(self.size), "X-Upload-Content-Type": content_type},
+        )
+        _raise_for_status(response, "upload session")
+        location = response.headers.get("Location")
+        if not location:
+            raise FatalError("YouTube upload session answered without a Location header")
+        self.session_uri = location
+        return location
+
+    async def query_offset(self) -> tuple[int, dict | None]:
+        """Ask the server how far the upload got: (offset, None), or (size, video) when it already finished."""
+        response = await self._request(
+            "PUT", self.session_uri, "upload status", headers={"Content-Range": f"bytes */{self.size}"}
+        )
+        if response.status_code in (200, 201):
+            return self.size, response.json()
+        if response.status_code == 308:
+            return _acknowledged_offset(response), None
+        _raise_for_status(response, "upload status")
+        raise TransientError(f"YouTube upload status answered {response.status_code}")
+
+    async def send_chunk(self, offset: int) -> tuple[int, dict | None]:
+        length = min(self.chunk_size, self.size - offset)
+        sent = offset
+
+        def on_read(count: int):
+            nonlocal sent
+            sent += count
+            if self.on_progress is not None:
+                self.on_progress(sent, self.size)
+
+        with self.file_path.open("rb") as handle:
+            response = await self._request(
+                "PUT",
+                self.session_uri,
+                "chunk upload",
+                data=_FileSlice(handle, offset, length, on_read),
+                headers={"Content-Range": f"bytes {offset}-{offset + length - 1}/{self.size}"},
+            )
+        if response.status_code in (200, 201):
+            return self.size, response.json()
+        if response.status_code == 308:
+            # 服务端可能只确认了这一片的一部分，从确认的位置接着传
+            return _acknowledged_offset(response), None
+        _raise_for_status(response, "chunk upload")
+        raise TransientError(f"YouTube chunk upload answered {response.status_code}")
+
+    async def run(self) -> dict:
+        """Upload the whole file and return the created video resource."""
+        if self.session_uri is None:
+            await retry_async(self.start, self.policy, platform="youtube", operation="resumable_start")
+        offset, video, resync = 0, None, False
+
+        async def attempt():
+            nonlocal resync
+            if resync:
+                position, done = await self.query_offset()
+                resync = False
+                if done is not None:
+                    return position, done
+                self.resumes += 1
+                metrics.increment("sau_youtube_upload_resumes_total")
+                youtube_logger.info(f"🔁 从服务端确认的 {position}/{self.size} 字节处继续上传")
+                if self.on_progress is not None:
+                    self.on_progress(position, self.size)
+                return await self.send_chunk(position)
+            return await self.send_chunk(offset)
+
+        def before_retry(attempt_number, exc, delay):
+            nonlocal resync
+            resync = True
+            youtube_logger.warning(f"⚠️ 分片上传中断，{delay:.1f}s 后查询进度并续传: {exc}")
+
+        while video is None:
+            previous = offset
+            offset, video = await retry_async(
+                attempt, self.policy, platform="youtube", operation="resumable_chunk", on_retry=before_retry
+            )
+            metrics.increment("sau_youtube_upload_bytes_total", max(0, offset - previous))
+        return video
+
+
+def _progress_logger(step: float = 0.1) -> Callable[[int, int], None]:
+    reported = -1
+
+    def on_progress(sent: int, total: int):
+        nonlocal reported
+        bucket = int(sent / total / step)
+        if bucket != reported:
+            reported = bucket
+            youtube_logger.info(f"⏳ 上传中: {sent * 100 // total}% ({sent}/{total} 字节)")
+
+    return on_progress
+
+
+def build_metadata(title: str, description: str, tags: list[str], visibility: str, category_id: str) -> dict:
+    return {
+        "snippet": {
+            "title": title[:100],
+            "description": description or "",
+            "tags": list(tags or []),
+            "categoryId": category_id,
+        },
+        # 与网页端一样：声明非儿童向内容
+        "status": {"privacyStatus": visibility, "selfDeclaredMadeForKids": False},
+    }
+
+
+async def _set_thumbnail(http: requests.Session, token: OAuthToken, settings: ResumableSettings, video_id: str,
+                         thumbnail_path: str) -> None:
+    body = await asyncio.to_thread(Path(thumbnail_path).read_bytes)
+    response = await asyncio.to_thread(
+        http.post,
+        settings.thumbnail_url,
+        params={"videoId": video_id},
+        data=body,
+        headers={
+            "Authorization": f"Bearer {await token.get()}",
+            "Content-Type": mimetypes.guess_type(thumbnail_path)[0] or "image/jpeg",
+        },
+        timeout=settings.timeout_seconds,
+    )
+    _raise_for_status(response, "thumbnail upload")
+
+
+async def upload_video(
+    account_name: str,
+    file_path: str | Path,
+    title: str,
+    description: str = "",
+    tags: list[str] | None = None,
+    *,
+    thumbnail_path: str | None = None,
+    playlist: str | None = None,
+    visibility: str = "public",
+    settings: ResumableSettings | None = None,
+) -> dict:
+    """
+    Upload and publish one video with the resumable engine.
+    :param account_name: Account whose refresh token is in YT_API["refresh_tokens"]
+    :returns: the created video resource (its `id` is also recorded as the job's post ID)
+    """
+    settings = settings or load_settings()
+    refresh_token = settings.refresh_tokens.get(account_name)
+    if not refresh_token or not settings.client_id:
+        raise RuntimeError(
+            f"YouTube resumable engine needs YT_API client_id, client_secret and refresh_tokens['{account_name}'] in conf.py"
+        )
+    http = pooled_http_session(settings.pool_size, YT_PROXY)
+    token = OAuthToken(http, settings, refresh_token)
+    upload = ResumableUpload(
+        http,
+        file_path,
+        build_metadata(title, description, tags or [], visibility, settings.category_id),
+        token=token.get,
+        upload_url=settings.upload_url,
+        chunk_size=settings.chunk_size,
+        timeout=settings.timeout_seconds,
+        on_progress=_progress_logger(),
+        on_unauthorized=token.invalidate,
+    )
+
+    youtube_logger.info(f"🎬 开始上传（resumable）: {Path(file_path).name}, {upload.size} 字节")
+    set_phase("upload_file")
+    video = await upload.run()
+    mark_checkpoint(CHECKPOINT_UPLOADED)
+    mark_checkpoint(CHECKPOINT_PUBLISHED)
+    record_post_id("youtube", video.get("id"))
+
+    if thumbnail_path and os.path.exists(thumbnail_path):
+        set_phase("set_cover")
+        try:
+            await _set_thumbnail(http, token, settings, video["id"], thumbnail_path)
+            youtube_logger.info("🖼️ 封面已上传")
+        except Exception as exc:
+            youtube_logger.warning(f"⚠️ 封面上传跳过（不影响发布）: {exc}")
+    if playlist:
+        youtube_logger.warning(f"⚠️ resumable 引擎不处理播放列表，请在 Studio 里把视频加入「{playlist}」")
+    youtube_logger.success(
+        f"🥳 发布完成（{visibility}）https://www.youtube.com/watch?v={video.get('id')}"
+        f"{f'，断线续传 {upload.resumes} 次' if upload.resumes else ''}"
+    )
+    return video
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.request
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from utils import metrics
+from utils.browser_session import BorrowedBrowser
+from utils.retry import TransientError
+
+try:
+    # 在 conf.py 里用 REMOTE_BROWSERS 配置常驻的远程 Chromium（CDP），见 conf.example.py
+    from conf import REMOTE_BROWSERS
+except ImportError:
+    REMOTE_BROWSERS = []
+
+# 探测失败的远程浏览器在这段时间内不再分配任务
+ENDPOINT_DOWN_SECONDS = 30
+# 已分配但页面还没出现在 /json/list 里的任务，最多按这么久计入负载
+RESERVATION_TTL_SECONDS = 120
+# 所有远程浏览器都满载时，最多等这么久
+ACQUIRE_TIMEOUT_SECONDS = 600
+ACQUIRE_POLL_SECONDS = 2
+PROBE_TIMEOUT_SECONDS = 5
+
+_current_lease: ContextVar[RemoteLease | None] = ContextVar("sau_remote_browser_lease", default=None)
+
+
+@dataclass(frozen=True, slots=True)
+class RemoteBrowserEndpoint:
+    """
+    One long-lived Chromium reachable over CDP, e.g. a container started with
+    `--remote-debugging-port=9222`.
+    `staging_dir` is a local directory that is also mounted on the browser host, where
+    it is visible as `remote_staging_dir`; files handed to set_input_files are staged
+    there. Leave both unset when the browser host sees the same paths as this machine.
+    """
+
+    cdp_url: str
+    capacity: int = 4
+    staging_dir: str | None = None
+    remote_staging_dir: str | None = None
+
+    @classmethod
+    def from_config(cls, value) -> RemoteBrowserEndpoint:
+        if isinstance(value, str):
+            return cls(cdp_url=value)
+        return cls(**value)
+
+    @property
+    def http_url(self) -> str:
+        parts = urlsplit(self.cdp_url)
+        scheme = {"ws": "http", "wss": "https"}.get(parts.scheme, parts.scheme)
+        return f"{scheme}://{parts.netloc}"
+
+
+class RemoteLease:
+    """
+    One job's use of a remote browser: its endpoint and the files staged for it.
+    Staged names are unique per lease, so jobs publishing the same video through one
+    browser never read, or delete, each other's copy.
+    """
+
+    def __init__(self, endpoint: RemoteBrowserEndpoint, reserved_at: float):
+        self.endpoint = endpoint
+        self.reserved_at = reserved_at
+        self.staged: list[Path] = []
+        self._id = uuid.uuid4().hex[:8]
+
+    def stage(self, path: str | Path) -> str:
+        if not self.endpoint.staging_dir:
+            return str(path)
+        source = Path(path).resolve()
+        stat = source.stat()
+        tag = hashlib.sha1(f"{source}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+        target = Path(self.endpoint.staging_dir) / f"{tag}-{self._id}-{source.name}"
+        if target not in self.staged:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(f".{target.name}.partial")
+            try:
+                os.link(source, partial)
+            except OSError:
+                # 跨文件系统不能硬链接，退回复制；写完再改名，浏览器不会读到半个文件
+                shutil.copy2(source, partial)
+            os.replace(partial, target)
+            self.staged.append(target)
+        remote_dir = self.endpoint.remote_staging_dir or self.endpoint.staging_dir
+        return str(PurePosixPath(remote_dir) / target.name)
+
+    def cleanup(self) -> None:
+        staged, self.staged = self.staged, []
+        for path in staged:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+class RemoteBrowser(BorrowedBrowser):
+    """A remote browser handed to one job; `close()` also frees its slot and staged files."""
+
+    def __init__(self, browser, pool: RemoteBrowserPool, lease: RemoteLease):
+        super().__init__(browser)
+        self._pool = pool
+        self._lease = lease
+
+    async def close(self, **kwargs) -> None:
+        await super().close(**kwargs)
+        if _current_lease.get() is self._lease:
+            # 之后同一任务里启动的本地浏览器不能再把文件放进这个已释放的租约
+            _current_lease.set(None)
+        self._lease.cleanup()
+        self._pool.release(self._lease)
+        metrics.add_gauge("sau_remote_browser_in_use", -1, endpoint=self._lease.endpoint.cdp_url)
+
+
+def _count_open_pages(endpoint: RemoteBrowserEndpoint) -> int:
+    with urllib.request.urlopen(f"{endpoint.http_url}/json/list", timeout=PROBE_TIMEOUT_SECONDS) as response:
+        targets = json.loads(response.read().decode("utf-8"))
+    # 新起的浏览器自带一个 about:blank 标签页，不算负载
+    return sum(1 for target in targets if target.get("type") == "page" and target.get("url") != "about:blank")
+
+
+class RemoteBrowserPool:
+    """
+    Assigns jobs to the least loaded remote browser.
+    Load is read from each browser's `/json/list` (open pages), so it reflects jobs
+    from every process driving the same hosts; jobs assigned here but not yet showing
+    a page are added on top. Unreachable browsers are skipped for ENDPOINT_DOWN_SECONDS
+    and a failed connect fails over to the next browser.
+    """
+
+    def __init__(self, endpoints: list[RemoteBrowserEndpoint], probe=_count_open_pages, clock=time.monotonic):
+        self.endpoints = endpoints
+        self.probe = probe
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._reservations: dict[str, list[RemoteLease]] = {}
+        self._down_until: dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.endpoints)
+
+    def _active_reservations(self, endpoint: RemoteBrowserEndpoint, now: float) -> list[RemoteLease]:
+        leases = [
+            lease for lease in self._reservations.get(endpoint.cdp_url, [])
+            if now - lease.reserved_at < RESERVATION_TTL_SECONDS
+        ]
+        self._reservations[endpoint.cdp_url] = leases
+        return leases
+
+    def mark_down(self, endpoint: RemoteBrowserEndpoint, exc: BaseException) -> None:
+        logger.warning(f"Remote browser {endpoint.cdp_url} unavailable for {ENDPOINT_DOWN_SECONDS}s: {exc}")
+        metrics.increment("sau_remote_browser_down_total", endpoint=endpoint.cdp_url)
+        with self._lock:
+            self._down_until[endpoint.cdp_url] = self.clock() + ENDPOINT_DOWN_SECONDS
+
+    def release(self, lease: RemoteLease) -> None:
+        with self._lock:
+            leases = self._reservations.get(lease.endpoint.cdp_url, [])
+            if lease in leases:
+                leases.remove(lease)
+
+    async def _loads(self, excluded: set[str]) -> list[tuple[float, int, RemoteBrowserEndpoint]]:
+        now = self.clock()
+        candidates = [
+            endpoint for endpoint in self.endpoints
+            if endpoint.cdp_url not in excluded and self._down_until.get(endpoint.cdp_url, 0) <= now
+        ]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.probe, endpoint) for endpoint in candidates), return_exceptions=True
+        )
+        loads = []
+        for index, (endpoint, pages) in enumerate(zip(candidates, results)):
+            if isinstance(pages, BaseException):
+                self.mark_down(endpoint, pages)
+                continue
+            loads.append((pages, index, endpoint))
+        return loads
+
+    async def assign(self, excluded: set[str] | None = None) -> RemoteLease:
+        """
+        Reserve a slot on the least loaded reachable browser, waiting while all are full.
+        :raises TransientError: when no browser is reachable or none frees up in time
+        """
+        excluded = excluded or set()
+        deadline = self.clock() + ACQUIRE_TIMEOUT_SECONDS
+        while True:
+            loads = await self._loads(excluded)
+            if not loads:
+                raise TransientError("No remote browser is reachable")
+            with self._lock:
+                now = self.clock()
+                ranked = []
+                for pages, index, endpoint in loads:
+                    used = max(pages, 0) + len(self._active_reservations(endpoint, now))
+                    if used < endpoint.capacity:
+                        ranked.append((used / endpoint.capacity, index, endpoint))
+                if ranked:
+                    _, _, endpoint = min(ranked)
+                    lease = RemoteLease(endpoint, now)
+                    self._reservations.setdefault(endpoint.cdp_url, []).append(lease)
+                    return lease
+            if self.clock() >= deadline:
+                raise TransientError(f"All remote browsers stayed busy for {ACQUIRE_TIMEOUT_SECONDS}s")
+            await asyncio.sleep(ACQUIRE_POLL_SECONDS)
+
+    async def acquire(self, browser_type, session=None) -> RemoteBrowser:
+        """
+        Connect to the assigned browser over CDP, failing over to the next one when the
+        connection is refused. Inside shared_browser_session() connections are reused.
+        """
+        failed: set[str] = set()
+        while True:
+            lease = await self.assign(failed)
+            endpoint = lease.endpoint
+            try:
+                if session is not None:
+                    browser = await session.connect_over_cdp(browser_type, endpoint.cdp_url)
+                else:
+                    browser = await browser_type.connect_over_cdp(endpoint.cdp_url)
+            except Exception as exc:
+                self.release(lease)
+                self.mark_down(endpoint, exc)
+                failed.add(endpoint.cdp_url)
+                continue
+            _current_lease.set(lease)
+            metrics.increment("sau_remote_browser_assigned_total", endpoint=endpoint.cdp_url)
+            metrics.add_gauge("sau_remote_browser_in_use", 1, endpoint=endpoint.cdp_url)
+            return RemoteBrowser(browser, self, lease)
+
+    def collect_metrics(self):
+        """Capacity of every configured remote browser, for the /metrics pool usage gauges."""
+        for endpoint in self.endpoints:
+            yield "sau_remote_browser_capacity", {"endpoint": endpoint.cdp_url}, endpoint.capacity
+
+
+async def stage_files(files):
+    """
+    Make files passed to set_input_files / set_files readable by the browser.
+    With a local browser, or a remote one sharing this machine's paths, the input is
+    returned unchanged; otherwise each file is linked into the browser's staging
+    directory and its remote path is returned. Accepts a path or a list of paths.
+    """
+    lease = _current_lease.get()
+    if lease is None or not lease.endpoint.staging_dir:
+        return files
+    if isinstance(files, (str, Path)):
+        return await asyncio.to_thread(lease.stage, files)
+    return [await asyncio.to_thread(lease.stage, path) for path in files]
+
+
+remote_browser_pool = RemoteBrowserPool([RemoteBrowserEndpoint.from_config(value) for value in REMOTE_BROWSERS])
+metrics.register_collector(remote_browser_pool.collect_metrics)
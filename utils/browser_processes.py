@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import signal
+from dataclasses import dataclass
+from pathlib import Path
+
+# 命令行里带这些名字的子进程算作浏览器进程（Chromium / Chrome / headless shell / Firefox）
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell", "firefox")
+
+PROC_ROOT = Path("/proc")
+# Windows 没有 SIGKILL
+KILL_SIGNAL = getattr(signal, "SIGKILL", signal.SIGTERM)
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _stat_fields(pid: int, proc_root: Path = PROC_ROOT) -> list[str] | None:
+    """Fields of /proc/<pid>/stat after the command name (state, ppid, ...), or None."""
+    try:
+        stat = (proc_root / str(pid) / "stat").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return None
+    # comm 里可能有空格和括号，从最后一个 ")" 往后取字段
+    return stat[stat.rfind(")") + 2:].split()
+
+
+def _parent_map(proc_root: Path = PROC_ROOT) -> dict[int, int]:
+    """pid -> parent pid for every process visible in /proc; empty where /proc is missing."""
+    parents = {}
+    try:
+        entries = list(proc_root.iterdir())
+    except OSError:
+        return parents
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+        fields = _stat_fields(int(entry.name), proc_root)
+        if fields and len(fields) > 1:
+            parents[int(entry.name)] = int(fields[1])
+    return parents
+
+
+def _cmdline(pid: int, proc_root: Path = PROC_ROOT) -> str:
+    try:
+        raw = (proc_root / str(pid) / "cmdline").read_bytes()
+    except OSError:
+        return ""
+    return raw.replace(b"\0", b" ").decode("utf-8", errors="replace")
+
+
+def descendants(pid: int, proc_root: Path = PROC_ROOT) -> set[int]:
+    parents = _parent_map(proc_root)
+    found: set[int] = set()
+    frontier = [pid]
+    while frontier:
+        current = frontier.pop()
+        for child, parent in parents.items():
+            if parent == current and child not in found:
+                found.add(child)
+                frontier.append(child)
+    return found
+
+
+def is_browser_process(pid: int, proc_root: Path = PROC_ROOT) -> bool:
+    cmdline = _cmdline(pid, proc_root).lower()
+    return any(name in cmdline for name in BROWSER_PROCESS_NAMES)
+
+
+def browser_processes(root_pid: int | None = None, proc_root: Path = PROC_ROOT) -> set[int]:
+    """Browser processes started (directly or via the playwright driver) by `root_pid`."""
+    root_pid = os.getpid() if root_pid is None else root_pid
+    return {pid for pid in descendants(root_pid, proc_root) if is_browser_process(pid, proc_root)}
+
+
+def kill_process_trees(pids, proc_root: Path = PROC_ROOT) -> list[int]:
+    """
+    Kill each pid and everything below it (renderer, GPU and zygote processes).
+    :returns: pids a kill was sent to
+    """
+    targets: set[int] = set()
+    for pid in pids:
+        targets.add(pid)
+        targets |= descendants(pid, proc_root)
+    killed = []
+    for pid in sorted(targets):
+        try:
+            os.kill(pid, KILL_SIGNAL)
+        except (ProcessLookupError, PermissionError):
+            continue
+        killed.append(pid)
+    return killed
+
+
+@dataclass(frozen=True, slots=True)
+class ProcessSample:
+    pid: int
+    start_ticks: int
+    rss_bytes: int
+    cpu_seconds: float
+
+
+def sample_process(pid: int, proc_root: Path = PROC_ROOT) -> ProcessSample | None:
+    """RSS and total CPU time of one process; None when it is gone or /proc is missing."""
+    fields = _stat_fields(pid, proc_root)
+    # 字段下标 = stat 里的字段序号 - 3：utime 14, stime 15, starttime 22, rss 24
+    if not fields or len(fields) < 22:
+        return None
+    return ProcessSample(
+        pid=pid,
+        start_ticks=int(fields[19]),
+        rss_bytes=int(fields[21]) * PAGE_SIZE,
+        cpu_seconds=(int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+    )
+
+
+def sample_tree(pid: int, proc_root: Path = PROC_ROOT) -> tuple[int, float, int]:
+    """
+    Summed RSS and CPU time of a browser and all its child processes.
+    :returns: (rss_bytes, cpu_seconds, process_count)
+    """
+    samples = [sample_process(child, proc_root) for child in {pid} | descendants(pid, proc_root)]
+    samples = [sample for sample in samples if sample is not None]
+    return sum(s.rss_bytes for s in samples), sum(s.cpu_seconds for s in samples), len(samples)
+
+
+def user_data_dirs(pids, proc_root: Path = PROC_ROOT) -> set[str]:
+    """Profile directories the given browser processes were started with (Chromium and Firefox)."""
+    dirs = set()
+    for pid in pids:
+        try:
+            args = (proc_root / str(pid) / "cmdline").read_bytes().decode("utf-8", errors="replace").split("\0")
+        except OSError:
+            continue
+        for index, arg in enumerate(args):
+            if arg.startswith("--user-data-dir="):
+                dirs.add(arg.split("=", 1)[1])
+            elif arg == "-profile" and index + 1 < len(args):
+                dirs.add(args[index + 1])
+    return dirs
+
+
+def live_command_lines(proc_root: Path = PROC_ROOT) -> list[str]:
+    return [_cmdline(pid, proc_root) for pid in _parent_map(proc_root)]
+
+
+def process_roots(pids, proc_root: Path = PROC_ROOT) -> set[int]:
+    """The pids in `pids` whose parent is not in `pids` (the browser, not its renderers)."""
+    pids = set(pids)
+    roots = set()
+    for pid in pids:
+        fields = _stat_fields(pid, proc_root)
+        if fields and len(fields) > 1 and int(fields[1]) not in pids:
+            roots.add(pid)
+    return roots
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from conf import BASE_DIR
+from utils import metrics
+from utils.browser_session import launch_browser
+from utils.har_replay import har_session
+from utils.watchdog import watch_closable, watched_launch
+
+try:
+    # 在 conf.py 里用 PERSISTENT_PROFILES 开启按账号持久化的浏览器 profile，见 conf.example.py
+    from conf import PERSISTENT_PROFILES
+except ImportError:
+    PERSISTENT_PROFILES = {}
+
+# Chromium profile 里可以随时删掉、下次会自动重建的缓存目录（按淘汰优先级排列）
+CACHE_DIRS = (
+    "Default/Service Worker/CacheStorage",
+    "Default/Code Cache",
+    "Default/Cache",
+)
+# 压缩时整个删掉的临时目录
+TRANSIENT_DIRS = (
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "ShaderCache",
+    "Crashpad",
+    "Default/GPUCache",
+    "Default/DawnCache",
+    "Default/blob_storage",
+)
+# 压缩时 VACUUM 的 SQLite 文件
+SQLITE_FILES = ("Default/History", "Default/Favicons", "Default/Web Data", "Default/Top Sites")
+LOCK_FILE = ".sau-profile.lock"
+COMPACTED_MARKER = ".sau-compacted"
+
+_opened: ContextVar[tuple[float, str] | None] = ContextVar("sau_context_opened", default=None)
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileSettings:
+    enabled: bool = False
+    platforms: tuple[str, ...] = ("douyin", "tencent", "kuaishou", "xiaohongshu")
+    root: str = str(Path(BASE_DIR) / "browser_profiles")
+    max_cache_mb: int = 512
+    max_profile_mb: int = 1024
+    compact_interval_hours: float = 24
+    lock_stale_seconds: float = 6 * 3600
+
+    def applies_to(self, platform: str) -> bool:
+        return self.enabled and platform in self.platforms
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class ProfileLock:
+    """
+    Exclusive lock on one profile directory, shared by every process on this machine.
+    Chromium refuses to open a profile twice, so a second job for the same account
+    must not start on it; a lock left by a crashed process is taken over once the
+    owning PID is gone or the lock is older than `stale_seconds`.
+    """
+
+    def __init__(self, profile_dir: Path, stale_seconds: float, clock=time.time):
+        self.path = profile_dir / LOCK_FILE
+        self.stale_seconds = stale_seconds
+        self.clock = clock
+        self.held = False
+
+    def _is_stale(self) -> bool:
+        try:
+            pid = int(self.path.read_text(encoding="utf-8").strip() or 0)
+            age = self.clock() - self.path.stat().st_mtime
+        except (OSError, ValueError):
+            return True
+        if age > self.stale_seconds:
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except (PermissionError, OSError):
+            return False
+        return False
+
+    def acquire(self) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale():
+                    return False
+                logger.warning(f"Taking over stale browser profile lock {self.path}")
+                self.path.unlink(missing_ok=True)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(str(os.getpid()))
+            self.held = True
+            return True
+        return False
+
+    def release(self) -> None:
+        if self.held:
+            self.path.unlink(missing_ok=True)
+            self.held = False
+
+
+def profile_dir_for(platform: str, account_file, settings: ProfileSettings) -> Path:
+    return Path(settings.root) / platform / Path(account_file).stem
+
+
+def evict_cache(profile_dir: Path, max_profile_mb: float) -> int:
+    """
+    Delete the oldest cache files until the profile is below 80% of `max_profile_mb`.
+    Only directories Chromium rebuilds on demand are touched; cookies, local storage
+    and IndexedDB stay.
+    :returns: bytes freed
+    """
+    limit = max_profile_mb * 1024 * 1024
+    size = _directory_size(profile_dir)
+    if size <= limit:
+        return 0
+    target = limit * 0.8
+    freed = 0
+    for cache_dir in CACHE_DIRS:
+        files = []
+        for root, _dirs, names in os.walk(profile_dir / cache_dir):
+            for name in names:
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        for _mtime, file_size, path in sorted(files):
+            if size - freed <= target:
+                return freed
+            try:
+                path.unlink()
+                freed += file_size
+            except OSError:
+                pass
+    return freed
+
+
+def compact_profile(profile_dir: Path) -> None:
+    """Drop transient GPU / crash dirs and VACUUM Chromium's SQLite files."""
+    for name in TRANSIENT_DIRS:
+        shutil.rmtree(profile_dir / name, ignore_errors=True)
+    for name in SQLITE_FILES:
+        path = profile_dir / name
+        if not path.exists():
+            continue
+        try:
+            conn = sqlite3.connect(path, timeout=5)
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            logger.debug(f"Skipping VACUUM of {path}: {exc}")
+    (profile_dir / COMPACTED_MARKER).touch()
+
+
+def maintain_profile(profile_dir: Path, settings: ProfileSettings, clock=time.time) -> None:
+    """Run after the browser closed, while the profile lock is still held."""
+    freed = evict_cache(profile_dir, settings.max_profile_mb)
+    if freed:
+        logger.info(f"Evicted {freed / 1024 / 1024:.1f} MB of cache from {profile_dir}")
+    marker = profile_dir / COMPACTED_MARKER
+    last = marker.stat().st_mtime if marker.exists() else 0
+    if clock() - last >= settings.compact_interval_hours * 3600:
+        compact_profile(profile_dir)
+
+
+class PersistentProfile:
+    """
+    Stand-in for the browser of a persistent context: uploaders call `close()` on it
+    like on a browser, which also runs cache eviction / compaction and frees the lock.
+    """
+
+    def __init__(self, context, profile_dir: Path, lock: ProfileLock, settings: ProfileSettings):
+        self.context = context
+        self.profile_dir = profile_dir
+        self._lock = lock
+        self._settings = settings
+        self._closed = False
+
+    @property
+    def contexts(self):
+        return [self.context]
+
+    def is_connected(self) -> bool:
+        return not self._closed
+
+    async def close(self, **_kwargs) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+        try:
+            await asyncio.to_thread(maintain_profile, self.profile_dir, self._settings)
+        finally:
+            self._lock.release()
+
+
+def _load_cookies(account_file) -> list[dict]:
+    try:
+        with open(account_file, encoding="utf-8") as handle:
+            return json.load(handle).get("cookies", [])
+    except (OSError, ValueError):
+        return []
+
+
+async def open_account_context(browser_type, platform: str, account_file, launch_kwargs: dict, **context_kwargs):
+    """
+    Open the browser and context an upload runs in.
+    With PERSISTENT_PROFILES enabled for `platform`, this is a persistent context on the
+    account's own profile directory, so the creator center's JS bundles, fonts and
+    images come from a warm disk cache; the cookie file is still applied on top, as it
+    is the source of truth after a re-login. Otherwise, or while another job holds the
+    profile, it is a fresh context from launch_browser() as before.
+    :returns: (browser, context); close both when done
+    """
+    from utils.browser_pool import remote_browser_pool
+
+    settings = ProfileSettings(**PERSISTENT_PROFILES)
+    started = time.monotonic()
+    # 录制 / 回放 HAR 时不用持久化 profile，两边的网络请求才对得上
+    if settings.applies_to(platform) and not remote_browser_pool.enabled and not har_session.active:
+        profile_dir = profile_dir_for(platform, account_file, settings)
+        lock = ProfileLock(profile_dir, settings.lock_stale_seconds)
+        if lock.acquire():
+            args = [*launch_kwargs.get("args", []), f"--disk-cache-size={settings.max_cache_mb * 1024 * 1024}"]
+            context = None
+            try:
+                context = await watched_launch(lambda: browser_type.launch_persistent_context(
+                    str(profile_dir), **{**launch_kwargs, "args": args}, **context_kwargs
+                ))
+                await context.add_cookies(_load_cookies(account_file))
+            except BaseException:
+                await close_account_context(None, context)
+                lock.release()
+                raise
+            _opened.set((started, "persistent"))
+            return watch_closable(PersistentProfile(context, profile_dir, lock, settings)), context
+        logger.info(f"Browser profile {profile_dir} is in use by another job, using a fresh context")
+
+    browser = await launch_browser(browser_type, **launch_kwargs)
+    try:
+        context = await browser.new_context(storage_state=str(account_file), **context_kwargs)
+    except BaseException:
+        # 调用方拿不到 browser，这里不关就会留下一个孤儿浏览器进程
+        await close_account_context(browser, None)
+        raise
+    _opened.set((started, "ephemeral"))
+    return browser, context
+
+
+async def close_account_context(browser, context) -> None:
+    """
+    Close what open_account_context() returned. Either may be None when opening failed
+    part way; a close error is only logged so it never replaces the job's own error.
+    """
+    for name, closable in (("context", context), ("browser", browser)):
+        if closable is None:
+            continue
+        try:
+            await closable.close()
+        except Exception as exc:
+            logger.warning(f"Could not close the upload {name}: {exc}")
+
+def record_time_to_upload_page(platform: str) -> float | None:
+    """
+    Record how long it took from opening the browser to the creator center's upload
+    page, labelled by profile mode, to compare persistent and fresh contexts.
+    """
+    opened = _opened.get()
+    if opened is None:
+        return None
+    started, mode = opened
+    elapsed = time.monotonic() - started
+    metrics.increment("sau_time_to_upload_page_seconds_total", elapsed, platform=platform, profile=mode)
+    metrics.increment("sau_time_to_upload_page_count", platform=platform, profile=mode)
+    logger.info(f"{platform} upload page ready after {elapsed:.1f}s ({mode} profile)")
+    return elapsed
+
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from loguru import logger
+
+from utils import metrics
+from utils.browser_supervisor import browser_supervisor
+from utils.har_replay import har_session
+from utils.watchdog import watch_closable, watched_launch
+
+_shared_session: ContextVar[SharedBrowserSession | None] = ContextVar("sau_shared_browser_session", default=None)
+
+
+def _library_of(browser_type) -> str:
+    # uploader 里 patchright 和 playwright 混用（tk_uploader 用的是 playwright）
+    return "playwright" if type(browser_type).__module__.startswith("playwright") else "patchright"
+
+
+def _launch_key(library: str, browser_name: str, kwargs: dict) -> str:
+    return json.dumps([library, browser_name, kwargs], sort_keys=True, default=str)
+
+
+class BorrowedBrowser:
+    """
+    A shared browser handed to one uploader run.
+    Contexts and pages opened through it are tracked and closed by `close()`, which
+    leaves the underlying browser running for the next job.
+    """
+
+    def __init__(self, browser, on_close=None):
+        self._browser = browser
+        self._contexts = []
+        self._on_close = on_close
+
+    async def new_context(self, *args, **kwargs):
+        context = await self._browser.new_context(*args, **kwargs)
+        self._contexts.append(context)
+        return context
+
+    async def new_page(self, *args, **kwargs):
+        page = await self._browser.new_page(*args, **kwargs)
+        self._contexts.append(page.context)
+        return page
+
+    async def close(self, **_kwargs) -> None:
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class SharedBrowserSession:
+    """
+    Keeps one browser per distinct launch configuration alive for many uploads.
+    The session owns its own playwright drivers, because a browser dies together with
+    the driver that launched it and each uploader exits its own `async_playwright()`.
+    """
+
+    def __init__(self):
+        self._drivers: dict[str, object] = {}
+        self._browsers: dict[str, object] = {}
+        self._pids: dict[str, set[int]] = {}
+        self._borrowed: dict[str, int] = {}
+        self._lock = asyncio.Lock()
+
+    async def _driver(self, library: str):
+        if library not in self._drivers:
+            if library == "playwright":
+                from playwright.async_api import async_playwright
+            else:
+                from patchright.async_api import async_playwright
+            self._drivers[library] = await async_playwright().start()
+        return self._drivers[library]
+
+    async def acquire(self, browser_type, kwargs: dict) -> BorrowedBrowser:
+        library = _library_of(browser_type)
+        key = _launch_key(library, browser_type.name, kwargs)
+        async with self._lock:
+            browser = self._browsers.get(key)
+            if browser is not None and browser.is_connected() and await self._over_memory_cap(key):
+                # 长时间复用的浏览器内存涨过上限，没有任务在用时关掉重开
+                logger.warning(f"Shared {browser_type.name} browser exceeded its memory cap, recycling it")
+                metrics.increment("sau_browser_recycled_total", browser=browser_type.name)
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+                browser = None
+            if browser is None or not browser.is_connected():
+                if browser is not None:
+                    logger.warning(f"Shared {browser_type.name} browser disconnected, relaunching")
+                driver = await self._driver(library)
+                browser, self._pids[key] = await browser_supervisor.launch(
+                    lambda: getattr(driver, browser_type.name).launch(**kwargs)
+                )
+                self._browsers[key] = browser
+            self._borrowed[key] = self._borrowed.get(key, 0) + 1
+        metrics.add_gauge("sau_shared_browsers_in_use", 1, browser=browser_type.name)
+        return watch_closable(BorrowedBrowser(browser, on_close=lambda: self._release(key, browser_type.name)))
+
+    def _release(self, key: str, browser_name: str) -> None:
+        self._borrowed[key] = max(0, self._borrowed.get(key, 0) - 1)
+        metrics.add_gauge("sau_shared_browsers_in_use", -1, browser=browser_name)
+
+    async def _over_memory_cap(self, key: str) -> bool:
+        pids = self._pids.get(key)
+        if not pids or self._borrowed.get(key, 0):
+            return False
+        return await asyncio.to_thread(browser_supervisor.over_memory_cap, pids)
+
+    async def connect_over_cdp(self, browser_type, cdp_url: str):
+        """Reuse one CDP connection per remote browser, reconnecting if it dropped."""
+        library = _library_of(browser_type)
+        key = _launch_key(library, "cdp", {"cdp_url": cdp_url})
+        async with self._lock:
+            browser = self._browsers.get(key)
+            if browser is None or not browser.is_connected():
+                if browser is not None:
+                    logger.warning(f"Connection to remote browser {cdp_url} dropped, reconnecting")
+                driver = await self._driver(library)
+                browser = await driver.chromium.connect_over_cdp(cdp_url)
+                self._browsers[key] = browser
+        return browser
+
+    async def close(self) -> None:
+        async with self._lock:
+            for browser in self._browsers.values():
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            self._browsers.clear()
+            for driver in self._drivers.values():
+                try:
+                    await driver.stop()
+                except Exception:
+                    pass
+            self._drivers.clear()
+
+
+@asynccontextmanager
+async def shared_browser_session():
+    """Share browsers between every upload started inside this block (and its tasks)."""
+    session = SharedBrowserSession()
+    token = _shared_session.set(session)
+    try:
+        yield session
+    finally:
+        _shared_session.reset(token)
+        await session.close()
+
+
+async def launch_browser(browser_type, **kwargs):
+    """
+    Drop-in replacement for `browser_type.launch(**kwargs)` in uploaders.
+    When REMOTE_BROWSERS is configured, Chromium jobs run on the least busy remote
+    browser (see utils/browser_pool.py). Inside `shared_browser_session()` it borrows a
+    long-lived browser instead of starting a new one; otherwise it launches normally.
+    With HAR_SESSIONS on, the browser records or replays every context it opens.
+    """
+    from utils.browser_pool import remote_browser_pool
+
+    session = _shared_session.get()
+    if remote_browser_pool.enabled and browser_type.name == "chromium":
+        browser = watch_closable(await remote_browser_pool.acquire(browser_type, session))
+    elif session is None:
+        browser = await watched_launch(lambda: browser_type.launch(**kwargs))
+    else:
+        browser = await session.acquire(browser_type, kwargs)
+    # 开了 HAR_SESSIONS 时每个 context 都录制或回放，见 utils/har_replay.py
+    return har_session.wrap(browser)
@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+
+from utils import metrics
+from utils.browser_processes import (
+    PROC_ROOT,
+    browser_processes,
+    kill_process_trees,
+    live_command_lines,
+    process_roots,
+    sample_process,
+    sample_tree,
+    user_data_dirs,
+)
+from utils.state_db import StateStore
+
+try:
+    # 在 conf.py 里用 BROWSER_SUPERVISOR 调整浏览器内存上限和清理周期，见 conf.example.py
+    from conf import BROWSER_SUPERVISOR
+except ImportError:
+    BROWSER_SUPERVISOR = {}
+
+T = TypeVar("T")
+
+# playwright 在系统临时目录下给每个浏览器建的 profile 目录
+TEMP_DIR_PATTERNS = ("playwright_chromiumdev_profile-*", "playwright_firefoxdev_profile-*")
+# 启动前后对比子进程来认领浏览器：整个进程内（所有线程、所有事件循环）一次只启动一个
+_launch_lock = threading.Lock()
+LAUNCH_LOCK_POLL_SECONDS = 0.05
+
+
+@dataclass(frozen=True, slots=True)
+class SupervisorSettings:
+    max_rss_mb: float = 2048
+    reap_interval_seconds: float = 600
+    temp_dir_max_age_hours: float = 6
+
+
+@dataclass(slots=True)
+class ReapReport:
+    killed: list[int] = field(default_factory=list)
+    removed_dirs: list[str] = field(default_factory=list)
+    forgotten: int = 0
+
+
+async def _acquire_launch_lock() -> None:
+    """
+    Take _launch_lock without blocking the event loop. Polled instead of acquired in a
+    worker thread: a waiter cancelled while sleeping never holds the lock, and waiting
+    launches don't tie up default-executor threads.
+    """
+    while not _launch_lock.acquire(blocking=False):
+        await asyncio.sleep(LAUNCH_LOCK_POLL_SECONDS)
+
+
+class BrowserSupervisor(StateStore):
+    """
+    Keeps a registry of the browser processes this project launches, in the shared
+    state database so every worker, the backend and `sau browsers status` see them.
+    Each entry is keyed by (pid, process start time), so a recycled PID is never
+    mistaken for an old browser, together with the playwright temp profile it was
+    started with. `reap()` only touches what is registered: browsers whose launching
+    process is gone, and temp profiles their browser left behind. Browsers and temp
+    directories of other tools and users on the host are never touched.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS browser_processes (
+            pid INTEGER NOT NULL,
+            start_ticks INTEGER NOT NULL,
+            owner_pid INTEGER NOT NULL,
+            owner_start_ticks INTEGER NOT NULL,
+            platform TEXT,
+            launched_at REAL NOT NULL,
+            PRIMARY KEY (pid, start_ticks)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS browser_temp_dirs (
+            path TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            start_ticks INTEGER NOT NULL
+        )''',
+    )
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        settings: SupervisorSettings | None = None,
+        proc_root: Path = PROC_ROOT,
+        temp_root: str | Path | None = None,
+        clock=time.time,
+    ):
+        self.db_path = db_path
+        self.settings = settings or SupervisorSettings(**BROWSER_SUPERVISOR)
+        self.proc_root = proc_root
+        self.temp_root = Path(temp_root or tempfile.gettempdir())
+        self.clock = clock
+        self._cpu_samples: dict[tuple[int, int], tuple[float, float]] = {}
+        self._periodic: threading.Thread | None = None
+
+    def _is_alive(self, pid: int, start_ticks: int) -> bool:
+        sample = sample_process(pid, self.proc_root)
+        return sample is not None and sample.start_ticks == start_ticks
+
+    def _own_temp_dirs(self, pid: int) -> list[str]:
+        """The playwright temp profile(s) in temp_root that browser `pid` was started with."""
+        return [
+            path for path in user_data_dirs([pid], self.proc_root)
+            if Path(path).parent == self.temp_root
+            and any(fnmatch.fnmatch(Path(path).name, pattern) for pattern in TEMP_DIR_PATTERNS)
+        ]
+
+    def register(self, pids, platform: str | None = None) -> None:
+        owner = sample_process(os.getpid(), self.proc_root)
+        rows, dirs = [], []
+        for pid in pids:
+            sample = sample_process(pid, self.proc_root)
+            if sample is not None:
+                rows.append((pid, sample.start_ticks, os.getpid(), owner.start_ticks if owner else 0, platform, self.clock()))
+                dirs += [(path, pid, sample.start_ticks) for path in self._own_temp_dirs(pid)]
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany('INSERT OR REPLACE INTO browser_processes VALUES (?, ?, ?, ?, ?, ?)', rows)
+            conn.executemany('INSERT OR REPLACE INTO browser_temp_dirs VALUES (?, ?, ?)', dirs)
+        finally:
+            conn.close()
+
+    async def launch(self, launch: Callable[[], Awaitable[T]], platform: str | None = None) -> tuple[T, set[int]]:
+        """
+        Run `launch` and register the browser it started. Processes are attributed by
+        diffing this process's browser children before and after, so launches are
+        serialized across every thread and event loop of the process (the backend
+        launches from several request threads, each with its own loop).
+        :returns: (browser, pids of every new browser process)
+        """
+        await _acquire_launch_lock()
+        try:
+            before = await asyncio.to_thread(browser_processes, None, self.proc_root)
+            browser = await launch()
+            after = await asyncio.to_thread(browser_processes, None, self.proc_root)
+        finally:
+            _launch_lock.release()
+        pids = after - before
+        if pids:
+            try:
+                await asyncio.to_thread(self.register, process_roots(pids, self.proc_root), platform)
+            except Exception as exc:
+                logger.debug(f"Could not register browser processes {sorted(pids)}: {exc}")
+        return browser, pids
+
+    def _rows(self) -> list[tuple]:
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            return conn.execute('SELECT * FROM browser_processes ORDER BY launched_at').fetchall()
+        finally:
+            conn.close()
+
+    def _temp_dir_rows(self) -> list[tuple]:
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            return conn.execute('SELECT path, pid, start_ticks FROM browser_temp_dirs ORDER BY path').fetchall()
+        finally:
+            conn.close()
+
+    def _forget(self, keys: list[tuple[int, int]], temp_dirs: list[str] = ()) -> None:
+        if not keys and not temp_dirs:
+            return
+        conn = self._connect(create=False)
+        if conn is None:
+            return
+        try:
+            conn.executemany('DELETE FROM browser_processes WHERE pid = ? AND start_ticks = ?', keys)
+            conn.executemany('DELETE FROM browser_temp_dirs WHERE path = ?', [(path,) for path in temp_dirs])
+        finally:
+            conn.close()
+
+    def _cpu_percent(self, key: tuple[int, int], cpu_seconds: float, launched_at: float) -> float:
+        now = self.clock()
+        previous = self._cpu_samples.get(key)
+        self._cpu_samples[key] = (cpu_seconds, now)
+        # 第一次采样没有上一次的值，用启动以来的平均值
+        since_cpu, since = previous if previous else (0.0, launched_at)
+        elapsed = now - since
+        return round(100 * (cpu_seconds - since_cpu) / elapsed, 1) if elapsed > 0 else 0.0
+
+    def status(self) -> list[dict]:
+        """RSS, CPU and owner of every live registered browser, including its child processes."""
+        rows = []
+        for pid, start_ticks, owner_pid, owner_start_ticks, platform, launched_at in self._rows():
+            if not self._is_alive(pid, start_ticks):
+                continue
+            rss_bytes, cpu_seconds, processes = sample_tree(pid, self.proc_root)
+            rss_mb = round(rss_bytes / 1024 / 1024, 1)
+            rows.append({
+                "pid": pid,
+                "platform": platform,
+                "owner_pid": owner_pid,
+                "owner_alive": self._is_alive(owner_pid, owner_start_ticks),
+                "launched_at": launched_at,
+                "processes": processes,
+                "rss_mb": rss_mb,
+                "cpu_seconds": round(cpu_seconds, 1),
+                "cpu_percent": self._cpu_percent((pid, start_ticks), cpu_seconds, launched_at),
+                "over_memory_cap": rss_mb > self.settings.max_rss_mb,
+            })
+        return rows
+
+    def over_memory_cap(self, pids) -> bool:
+        rss_bytes = sum(sample_tree(pid, self.proc_root)[0] for pid in process_roots(pids, self.proc_root))
+        return rss_bytes > self.settings.max_rss_mb * 1024 * 1024
+
+    def _stale_temp_dirs(self) -> tuple[list[Path], list[str]]:
+        """
+        Registered temp profiles whose browser is gone, older than temp_dir_max_age_hours
+        and not named on any live command line.
+        :returns: (directories to delete, rows to forget)
+        """
+        cutoff = self.clock() - self.settings.temp_dir_max_age_hours * 3600
+        in_use = None
+        stale, forget = [], []
+        for path, pid, start_ticks in self._temp_dir_rows():
+            if self._is_alive(pid, start_ticks):
+                continue
+            directory = Path(path)
+            try:
+                if directory.stat().st_mtime >= cutoff:
+                    continue
+            except OSError:
+                # 浏览器正常关闭时 playwright 自己删掉了
+                forget.append(path)
+                continue
+            if in_use is None:
+                in_use = "\n".join(live_command_lines(self.proc_root))
+            if path not in in_use:
+                stale.append(directory)
+                forget.append(path)
+        return stale, forget
+
+    def reap(self) -> ReapReport:
+        """
+        Kill registered browsers whose launching process died and delete the temp
+        profiles registered browsers left behind.
+        """
+        report = ReapReport()
+        gone = []
+        for pid, start_ticks, owner_pid, owner_start_ticks, _platform, _launched_at in self._rows():
+            if not self._is_alive(pid, start_ticks):
+                gone.append((pid, start_ticks))
+            elif not self._is_alive(owner_pid, owner_start_ticks):
+                report.killed += kill_process_trees([pid], self.proc_root)
+                gone.append((pid, start_ticks))
+
+        stale, forget_dirs = self._stale_temp_dirs()
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+            report.removed_dirs.append(str(path))
+        self._forget(gone, forget_dirs)
+        report.forgotten = len(gone)
+
+        if report.killed:
+            logger.warning(f"Reaped {len(report.killed)} orphaned browser processes")
+            metrics.increment("sau_browser_processes_reaped_total", len(report.killed))
+        if report.removed_dirs:
+            logger.info(f"Removed {len(report.removed_dirs)} stale browser temp directories")
+            metrics.increment("sau_browser_temp_dirs_removed_total", len(report.removed_dirs))
+        return report
+
+    def start_periodic(self) -> None:
+        """Reap now and then every `reap_interval_seconds` in a daemon thread (idempotent)."""
+        if self._periodic is not None and self._periodic.is_alive():
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.reap()
+                except Exception as exc:
+                    logger.warning(f"Browser reaper failed: {exc}")
+                time.sleep(self.settings.reap_interval_seconds)
+
+        self._periodic = threading.Thread(target=loop, name="sau-browser-reaper", daemon=True)
+        self._periodic.start()
+
+
+browser_supervisor = BrowserSupervisor()
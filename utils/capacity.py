@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from utils.job_history import JobHistory, job_history
+from utils.job_scheduler import PRIORITY_CLASSES, PRIORITY_NORMAL, SchedulerSettings, deadline_from, load_settings
+from utils.rate_limit import RateLimit, resolve_limits
+
+# 推荐并发的上限：再往上浏览器内存先撑不住
+MAX_RECOMMENDED_CONCURRENCY = 16
+# 比最快方案慢不超过 5% 就算够用，取其中并发最小的
+GOOD_ENOUGH = 1.05
+
+
+@dataclass(frozen=True, slots=True)
+class PlannedJob:
+    platform: str
+    account: str = ""
+    size: int | None = None
+    priority: str | None = None
+    publish_date: object = None
+    id: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class JobDuration:
+    p50: float
+    p95: float
+    samples: int
+    source: str
+
+
+@dataclass(slots=True)
+class CapacityEstimate:
+    jobs: int
+    concurrency: int
+    platform_concurrency: dict[str, int]
+    started_at: float
+    p50_seconds: float
+    p95_seconds: float
+    recommended_concurrency: int
+    recommended_platform_concurrency: dict[str, int]
+    recommended_p50_seconds: float
+    platforms: dict[str, dict] = field(default_factory=dict)
+    late_jobs: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        def at(seconds: float) -> str:
+            return datetime.fromtimestamp(self.started_at + seconds).isoformat(timespec="seconds")
+
+        return {
+            "jobs": self.jobs,
+            "concurrency": self.concurrency,
+            "platform_concurrency": self.platform_concurrency,
+            "p50_seconds": self.p50_seconds,
+            "p95_seconds": self.p95_seconds,
+            "finish_p50": at(self.p50_seconds),
+            "finish_p95": at(self.p95_seconds),
+            "recommended_concurrency": self.recommended_concurrency,
+            "recommended_platform_concurrency": self.recommended_platform_concurrency,
+            "recommended_p50_seconds": self.recommended_p50_seconds,
+            "platforms": self.platforms,
+            "late_jobs": self.late_jobs,
+        }
+
+
+def job_duration(job: PlannedJob, history: JobHistory, settings: SchedulerSettings) -> JobDuration:
+    """History of this platform and size bucket when there is enough of it, else SCHEDULER's job_seconds."""
+    stats = history.expected(job.platform, job.size)
+    if stats is not None:
+        return JobDuration(stats.p50, stats.p95, stats.samples, f"history:{stats.bucket}")
+    seconds = float(settings.job_seconds.get(job.platform, settings.default_job_seconds))
+    return JobDuration(seconds, seconds, 0, "config")
+
+
+class _Bucket:
+    """Token bucket replayed on the simulated clock, full at the start like an idle limiter."""
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = limit.capacity
+        self.updated = 0.0
+
+    def ready_at(self, t: float) -> float:
+        tokens = min(self.limit.capacity, self.tokens + (t - self.updated) * self.limit.refill_rate)
+        return t if tokens >= 1 else t + (1 - tokens) / self.limit.refill_rate
+
+    def take(self, t: float) -> None:
+        self.tokens = min(self.limit.capacity, self.tokens + (t - self.updated) * self.limit.refill_rate) - 1
+        self.updated = t
+
+
+def simulate(
+    jobs: list[PlannedJob],
+    seconds: list[float],
+    concurrency: int,
+    platform_concurrency: dict[str, int],
+    default_platform_concurrency: int,
+    rate_limits: dict | None = None,
+) -> list[float]:
+    """
+    Replay the jobs in the order given the way the batch runner runs them: a job takes a
+    free global slot and a free platform slot, then waits (holding them) for the platform
+    and account rate-limit tokens, then runs for its duration.
+    :returns: finish time of each job, in seconds from the start
+    """
+    global_free = [0.0] * max(1, concurrency)
+    platform_free: dict[str, list[float]] = {}
+    buckets: dict[str, _Bucket] = {}
+    finishes = []
+    for job, duration in zip(jobs, seconds):
+        if job.platform not in platform_free:
+            slots = max(1, platform_concurrency.get(job.platform, default_platform_concurrency))
+            platform_free[job.platform] = [0.0] * slots
+            platform_limit, _ = resolve_limits(job.platform, rate_limits)
+            if platform_limit is not None:
+                buckets[f"platform:{job.platform}"] = _Bucket(platform_limit)
+        account_key = f"account:{job.platform}:{job.account}"
+        if job.account and account_key not in buckets:
+            _, account_limit = resolve_limits(job.platform, rate_limits)
+            if account_limit is not None:
+                buckets[account_key] = _Bucket(account_limit)
+        job_buckets = [buckets[key] for key in (f"platform:{job.platform}", account_key) if key in buckets]
+
+        start = max(global_free[0], platform_free[job.platform][0])
+        start = max([start] + [bucket.ready_at(start) for bucket in job_buckets])
+        for bucket in job_buckets:
+            bucket.take(start)
+        finish = start + duration
+        heapq.heapreplace(global_free, finish)
+        heapq.heapreplace(platform_free[job.platform], finish)
+        finishes.append(finish)
+    return finishes
+
+
+def _makespan(finishes: list[float]) -> float:
+    return round(max(finishes, default=0.0), 1)
+
+
+def _smallest_sufficient(low: int, high: int, makespan_at) -> int:
+    """Smallest concurrency in [low, high] whose makespan is within GOOD_ENOUGH of the one at `high`."""
+    target = makespan_at(high) * GOOD_ENOUGH
+    while low < high:
+        middle = (low + high) // 2
+        if makespan_at(middle) <= target:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def estimate_batch(
+    jobs: list[PlannedJob],
+    concurrency: int,
+    platform_concurrency: dict[str, int] | None = None,
+    default_platform_concurrency: int = 2,
+    *,
+    history: JobHistory = job_history,
+    settings: SchedulerSettings | None = None,
+    rate_limits: dict | None = None,
+    max_concurrency: int = MAX_RECOMMENDED_CONCURRENCY,
+    clock=time.time,
+) -> CapacityEstimate:
+    """
+    Predict when a batch finishes (p50 and p95 job durations from the job history) with the
+    given concurrency, and the smallest concurrency, overall and per platform, past which
+    the rate limits keep more workers from finishing noticeably sooner.
+    """
+    settings = settings or load_settings()
+    platform_concurrency = dict(platform_concurrency or {})
+    # 和调度器一样：先优先级，再按定时发布时间
+    order = sorted(range(len(jobs)), key=lambda index: (
+        PRIORITY_CLASSES.get(jobs[index].priority or settings.default_priority, PRIORITY_CLASSES[PRIORITY_NORMAL]),
+        deadline_from(jobs[index].publish_date) or math.inf,
+        index,
+    ))
+    jobs = [jobs[index] for index in order]
+    durations = [job_duration(job, history, settings) for job in jobs]
+    p50 = [duration.p50 for duration in durations]
+    p95 = [duration.p95 for duration in durations]
+
+    def run(seconds, total, per_platform, subset=None):
+        chosen = [index for index, job in enumerate(jobs) if subset is None or job.platform == subset]
+        return simulate([jobs[index] for index in chosen], [seconds[index] for index in chosen], total,
+                        per_platform, default_platform_concurrency, rate_limits)
+
+    finishes = run(p50, concurrency, platform_concurrency)
+    platforms: dict[str, dict] = {}
+    recommended_platform: dict[str, int] = {}
+    for platform in sorted({job.platform for job in jobs}):
+        indexes = [index for index, job in enumerate(jobs) if job.platform == platform]
+        high = max(1, min(len(indexes), max_concurrency))
+        recommended_platform[platform] = _smallest_sufficient(
+            1, high, lambda slots: _makespan(run(p50, slots, {platform: slots}, platform))
+        )
+        sources = sorted({durations[index].source for index in indexes})
+        platforms[platform] = {
+            "jobs": len(indexes),
+            "p50_seconds": round(sorted(p50[index] for index in indexes)[len(indexes) // 2], 1),
+            "p95_seconds": round(max(p95[index] for index in indexes), 1),
+            "samples": max(durations[index].samples for index in indexes),
+            "source": ",".join(sources),
+        }
+
+    high = max(1, min(len(jobs), max_concurrency, sum(recommended_platform.values())))
+    recommended = _smallest_sufficient(
+        1, high, lambda slots: _makespan(run(p50, slots, recommended_platform))
+    )
+    late = []
+    started_at = clock()
+    for job, finish in zip(jobs, finishes):
+        deadline = deadline_from(job.publish_date)
+        if deadline is not None and started_at + finish > deadline - settings.deadline_margin_seconds:
+            late.append(job.id or f"{job.platform}:{job.account}")
+    return CapacityEstimate(
+        jobs=len(jobs),
+        concurrency=concurrency,
+        platform_concurrency=platform_concurrency,
+        started_at=started_at,
+        p50_seconds=_makespan(finishes),
+        p95_seconds=_makespan(run(p95, concurrency, platform_concurrency)),
+        recommended_concurrency=recommended,
+        recommended_platform_concurrency=recommended_platform,
+        recommended_p50_seconds=_makespan(run(p50, recommended, recommended_platform)),
+        platforms=platforms,
+        late_jobs=late,
+    )
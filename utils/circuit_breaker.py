@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from utils import metrics
+from utils.job_phase import current_tracker, track_job
+from utils.retry import is_transient
+from utils.state_db import StateStore
+from utils.watchdog import JobTimeoutError
+
+try:
+    # 在 conf.py 里用 CIRCUIT_BREAKER 覆盖默认熔断参数，见 conf.example.py
+    from conf import CIRCUIT_BREAKER
+except ImportError:
+    CIRCUIT_BREAKER = {}
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+ON_OPEN_FAIL = "fail"
+ON_OPEN_PARK = "park"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class BreakerSettings:
+    failure_threshold: int = 3
+    cooldown_seconds: float = 900
+    on_open: str = ON_OPEN_FAIL
+    park_timeout_seconds: float = 3600
+    # 探测任务最长占用时间，超时视为探测进程已崩溃，允许下一个任务接着探测
+    probe_lease_seconds: float = 1800
+
+
+@dataclass(frozen=True, slots=True)
+class Admission:
+    allowed: bool
+    probe: bool = False
+    retry_after: float = 0.0
+    reason: str = ""
+
+
+def failure_signature(phase: str, exc: BaseException) -> str:
+    """
+    Collapse an exception into a stable signature: same phase, same error type and the
+    same message with numbers masked (timeouts, ids) map to the same breaker.
+    """
+    message = re.sub(r"\s+", " ", str(exc)).strip()
+    message = re.sub(r"\d+", "#", message)[:200]
+    return f"{phase}:{type(exc).__name__}:{message}"
+
+
+class CircuitBreakerRegistry(StateStore):
+    """
+    Per-platform circuit breakers keyed by (platform, failure signature), persisted in
+    the shared state database so the backend, CLI runs and batch workers all see the
+    same state.
+
+    closed -> open after `failure_threshold` consecutive failures with one signature;
+    open -> half_open once `cooldown_seconds` passed, letting exactly one probe job run;
+    half_open -> closed when the probe succeeds, or back to open when it fails again.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS circuit_breakers (
+            platform TEXT NOT NULL,
+            signature TEXT NOT NULL,
+            phase TEXT NOT NULL,
+            state TEXT NOT NULL,
+            consecutive_failures INTEGER NOT NULL,
+            opened_at REAL,
+            probe_started_at REAL,
+            last_error TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (platform, signature)
+        )''',
+    )
+
+    def __init__(self, db_path: str | Path | None = None, settings: BreakerSettings | None = None, clock=time.time):
+        self.db_path = db_path
+        self.settings = settings or BreakerSettings(**CIRCUIT_BREAKER)
+        self.clock = clock
+
+    def admit(self, platform: str) -> Admission:
+        """
+        Decide whether a new job for `platform` may start.
+        Claims the half-open probe slot atomically when the cool-down has passed.
+        """
+        conn = self._connect(create=False)
+        if conn is None:
+            return Admission(allowed=True)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            rows = conn.execute(
+                "SELECT signature, state, opened_at, probe_started_at FROM circuit_breakers "
+                "WHERE platform = ? AND state != ?",
+                (platform, STATE_CLOSED),
+            ).fetchall()
+            if not rows:
+                conn.execute("COMMIT")
+                return Admission(allowed=True)
+
+            retry_after = 0.0
+            reason = ""
+            for signature, state, opened_at, probe_started_at in rows:
+                if state == STATE_HALF_OPEN and probe_started_at is not None \
+                        and now - probe_started_at < self.settings.probe_lease_seconds:
+                    retry_after = max(retry_after, min(30.0, self.settings.cooldown_seconds))
+                    reason = f"probe job in flight for {signature}"
+                elif state == STATE_OPEN and now - (opened_at or 0) < self.settings.cooldown_seconds:
+                    remaining = self.settings.cooldown_seconds - (now - opened_at)
+                    if remaining > retry_after:
+                        retry_after = remaining
+                        reason = f"open on {signature}"
+            if retry_after > 0:
+                conn.execute("COMMIT")
+                return Admission(allowed=False, retry_after=retry_after, reason=reason)
+
+            conn.execute(
+                "UPDATE circuit_breakers SET state = ?, probe_started_at = ?, updated_at = ? "
+                "WHERE platform = ? AND state != ?",
+                (STATE_HALF_OPEN, now, now, platform, STATE_CLOSED),
+            )
+            conn.execute("COMMIT")
+            logger.info(f"Circuit breaker for {platform} is half-open, letting one probe job through")
+            return Admission(allowed=True, probe=True)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def record_success(self, platform: str) -> None:
+        conn = self._connect(create=False)
+        if conn is None:
+            return
+        try:
+            cursor = conn.execute(
+                "UPDATE circuit_breakers SET state = ?, consecutive_failures = 0, opened_at = NULL, "
+                "probe_started_at = NULL, updated_at = ? WHERE platform = ? "
+                "AND (state != ? OR consecutive_failures > 0)",
+                (STATE_CLOSED, self.clock(), platform, STATE_CLOSED),
+            )
+            if cursor.rowcount:
+                logger.info(f"Circuit breaker for {platform} closed after a successful job")
+        finally:
+            conn.close()
+
+    def record_failure(self, platform: str, phase: str, exc: BaseException) -> str:
+        """
+        Count one failure against the (platform, signature) breaker.
+        :returns: the breaker state after recording
+        """
+        signature = failure_signature(phase, exc)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            row = conn.execute(
+                "SELECT consecutive_failures FROM circuit_breakers WHERE platform = ? AND signature = ?",
+                (platform, signature),
+            ).fetchone()
+            failures = (row[0] if row else 0) + 1
+            probe_failed = conn.execute(
+                "SELECT 1 FROM circuit_breakers WHERE platform = ? AND state = ? LIMIT 1",
+                (platform, STATE_HALF_OPEN),
+            ).fetchone() is not None
+            state = STATE_OPEN if probe_failed or failures >= self.settings.failure_threshold else STATE_CLOSED
+            conn.execute(
+                "INSERT OR REPLACE INTO circuit_breakers "
+                "(platform, signature, phase, state, consecutive_failures, opened_at, probe_started_at, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)",
+                (platform, signature, phase, state, failures, now if state == STATE_OPEN else None, str(exc)[:1000], now),
+            )
+            if probe_failed:
+                # 探测失败：其余半开的熔断器一起回到 open，重新计冷却时间
+                conn.execute(
+                    "UPDATE circuit_breakers SET state = ?, opened_at = ?, probe_started_at = NULL, updated_at = ? "
+                    "WHERE platform = ? AND state = ?",
+                    (STATE_OPEN, now, now, platform, STATE_HALF_OPEN),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        if state == STATE_OPEN:
+            metrics.increment("sau_circuit_breaker_open_total", platform=platform, phase=phase)
+            logger.warning(f"Circuit breaker for {platform} opened after {failures} failure(s) at {phase}: {signature}")
+        return state
+
+    def release_probe(self, platform: str) -> None:
+        """Give the probe slot back when the probe ended for a reason unrelated to the breaker."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "UPDATE circuit_breakers SET state = ?, probe_started_at = NULL, updated_at = ? WHERE platform = ? AND state = ?",
+                (STATE_OPEN, self.clock(), platform, STATE_HALF_OPEN),
+            )
+        finally:
+            conn.close()
+
+    def status(self, platform: str | None = None) -> list[dict]:
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            query = (
+                "SELECT platform, signature, phase, state, consecutive_failures, opened_at, "
+                "probe_started_at, last_error, updated_at FROM circuit_breakers"
+            )
+            params: tuple = ()
+            if platform:
+                query += " WHERE platform = ?"
+                params = (platform,)
+            rows = conn.execute(query + " ORDER BY platform, updated_at DESC", params).fetchall()
+        finally:
+            conn.close()
+
+        now = self.clock()
+        result = []
+        for row in rows:
+            opened_at = row[5]
+            result.append({
+                "platform": row[0],
+                "signature": row[1],
+                "phase": row[2],
+                "state": row[3],
+                "consecutive_failures": row[4],
+                "opened_at": opened_at,
+                "probe_started_at": row[6],
+                "last_error": row[7],
+                "updated_at": row[8],
+                "retry_after": max(0.0, self.settings.cooldown_seconds - (now - opened_at))
+                if row[3] == STATE_OPEN and opened_at else 0.0,
+            })
+        return result
+
+    def reset(self, platform: str | None = None) -> int:
+        conn = self._connect(create=False)
+        if conn is None:
+            return 0
+        try:
+            if platform:
+                cursor = conn.execute("DELETE FROM circuit_breakers WHERE platform = ?", (platform,))
+            else:
+                cursor = conn.execute("DELETE FROM circuit_breakers")
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    async def wait_for_admission(self, platform: str) -> Admission:
+        """Fast-fail or park according to `on_open` until the platform accepts a job."""
+        started = time.monotonic()
+        while True:
+            admission = self.admit(platform)
+            if admission.allowed:
+                return admission
+            if self.settings.on_open != ON_OPEN_PARK:
+                metrics.increment("sau_circuit_breaker_rejected_total", platform=platform)
+                raise CircuitOpenError(
+                    f"Circuit breaker for {platform} is open ({admission.reason}); retry in {admission.retry_after:.0f}s"
+                )
+            waited = time.monotonic() - started
+            if waited + admission.retry_after > self.settings.park_timeout_seconds:
+                metrics.increment("sau_circuit_breaker_rejected_total", platform=platform)
+                raise CircuitOpenError(
+                    f"Circuit breaker for {platform} stayed open for {waited:.0f}s ({admission.reason})"
+                )
+            logger.info(f"Circuit breaker for {platform} is open, parking job for {admission.retry_after:.0f}s")
+            await asyncio.sleep(admission.retry_after)
+
+    @asynccontextmanager
+    async def guard(self, platform: str):
+        """
+        Wrap one publish job. Failures count against the breaker only when the uploader
+        had reached a phase (see utils.job_phase.set_phase) and the error is transient,
+        so expired cookies or bad input never open a platform-wide breaker. A job the
+        watchdog tore down in a hung phase counts too, against that phase: a changed page
+        that a wait loop never sees finish is the failure the breaker exists for.
+        """
+        admission = await self.wait_for_admission(platform)
+        tracker = current_tracker()
+        with nullcontext(tracker) if tracker is not None else track_job(platform) as tracker:
+            try:
+                yield tracker
+            except Exception as exc:
+                if isinstance(exc, JobTimeoutError):
+                    self.record_failure(platform, exc.phase, exc)
+                elif tracker.phase is not None and is_transient(exc):
+                    self.record_failure(platform, tracker.phase, exc)
+                elif admission.probe:
+                    self.release_probe(platform)
+                raise
+            except BaseException:
+                if admission.probe:
+                    self.release_probe(platform)
+                raise
+        self.record_success(platform)
+
+
+circuit_breakers = CircuitBreakerRegistry()
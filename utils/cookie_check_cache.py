@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from utils import metrics
+
+try:
+    # 在 conf.py 里用 COOKIE_CHECK_CACHE_SECONDS 调整 cookie 校验结果的缓存时间，见 conf.example.py
+    from conf import COOKIE_CHECK_CACHE_SECONDS
+except ImportError:
+    COOKIE_CHECK_CACHE_SECONDS = 300
+
+
+class CookieCheckCache:
+    """
+    Recent successful cookie checks, per (platform, cookie file), for the pre-publish
+    check: a batch publishing several jobs for one account opens one browser to check
+    its login instead of one per job. An entry is reused for `ttl` seconds while the
+    cookie file is unchanged; a re-login rewrites the file and drops it. Failed checks
+    are never cached, since a timeout is not proof the login is gone.
+    Hits and misses are counted in sau_cookie_check_cache_total.
+    """
+
+    def __init__(self, ttl: float = COOKIE_CHECK_CACHE_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (平台, 文件路径) -> (文件 mtime, 文件大小, 校验时间)
+        self._valid: dict[tuple[str, str], tuple[int, int, float]] = {}
+
+    @staticmethod
+    def _stamp(account_file: str | Path) -> tuple[int, int] | None:
+        try:
+            stat = Path(account_file).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def check(self, platform: str, account_file: str | Path, check: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Run `check` unless this cookie file passed it within `ttl` seconds.
+        :param check: Zero-argument coroutine factory returning whether the cookie is valid
+        """
+        key = (platform, str(account_file))
+        stamp = self._stamp(account_file)
+        with self._lock:
+            entry = self._valid.get(key)
+            hit = stamp is not None and entry is not None and entry[:2] == stamp \
+                and self.clock() - entry[2] < self.ttl
+        metrics.increment("sau_cookie_check_cache_total", result="hit" if hit else "miss")
+        if hit:
+            return True
+        valid = await check()
+        with self._lock:
+            if valid and stamp is not None:
+                self._valid[key] = (*stamp, self.clock())
+            else:
+                self._valid.pop(key, None)
+        return valid
+
+
+cookie_check_cache = CookieCheckCache()
@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from conf import BASE_DIR
+from utils import metrics
+from utils.state_db import StateStore
+
+try:
+    # 在 conf.py 里用 COOKIE_KEEPALIVE 覆盖默认保活参数，见 conf.example.py
+    from conf import COOKIE_KEEPALIVE
+except ImportError:
+    COOKIE_KEEPALIVE = {}
+
+STATUS_OK = "ok"
+STATUS_EXPIRING = "expiring"
+STATUS_RELOGIN = "needs_relogin"
+STATUS_ERROR = "error"
+
+
+@dataclass(frozen=True, slots=True)
+class KeepAliveSettings:
+    enabled: bool = True
+    # 每个账号至少这么久做一次保活访问；各账号在周期内的时间点按文件名散开
+    refresh_interval_hours: float = 24
+    # 登录 cookie 到期前多久开始刷新
+    refresh_before_expiry_hours: float = 48
+    # 到期时间落在这个范围内且刷新也延不了期，就提前提示扫码重新登录
+    relogin_warning_hours: float = 72
+    # 两次刷新之间至少间隔，避免一批账号同时开浏览器
+    min_seconds_between_refreshes: float = 120
+    retry_minutes: float = 30
+    poll_seconds: float = 60
+
+
+@dataclass(frozen=True, slots=True)
+class KeepAliveTarget:
+    """
+    The page one authenticated load goes to. The session is alive when the page ends on
+    `logged_in_prefix` without a `logged_out_markers` redirect; `auth_cookies` name the
+    cookies whose `expires` end the login.
+    """
+
+    url: str
+    logged_in_prefix: str
+    auth_cookies: tuple[str, ...]
+    logged_out_markers: tuple[str, ...] = ("login", "passport")
+
+
+# bilibili 用 biliup 的 cookie 格式、虎扑未登录不跳转，都判断不了，不做保活
+KEEPALIVE_TARGETS = {
+    "douyin": KeepAliveTarget(
+        "https://creator.douyin.com/creator-micro/home", "https://creator.douyin.com/creator-micro/",
+        ("sessionid", "sessionid_ss", "sid_guard"),
+    ),
+    "kuaishou": KeepAliveTarget(
+        "https://cp.kuaishou.com/profile", "https://cp.kuaishou.com/",
+        ("kuaishou.web.cp.api_st", "kuaishou.web.cp.api_ph"),
+    ),
+    "xiaohongshu": KeepAliveTarget(
+        "https://creator.xiaohongshu.com/new/home", "https://creator.xiaohongshu.com/",
+        ("galaxy_creator_session_id", "web_session"),
+    ),
+    "tencent": KeepAliveTarget(
+        "https://channels.weixin.qq.com/platform", "https://channels.weixin.qq.com/platform",
+        ("sessionid", "wxuin"),
+    ),
+    "youtube": KeepAliveTarget(
+        "https://studio.youtube.com", "https://studio.youtube.com/",
+        ("SID", "__Secure-3PSID", "LOGIN_INFO"), ("accounts.google.com", "ServiceLogin"),
+    ),
+    "baijiahao": KeepAliveTarget(
+        "https://baijiahao.baidu.com/builder/rc/home", "https://baijiahao.baidu.com/builder/rc/",
+        ("BDUSS", "BDUSS_BFESS"),
+    ),
+    "weibo": KeepAliveTarget("https://weibo.com/", "https://weibo.com/", ("SUB", "SUBP")),
+    "alipay": KeepAliveTarget(
+        "https://c.alipay.com/page/portal/home", "https://c.alipay.com/page/", ("ALIPAYJSESSIONID", "ctoken"),
+        ("login", "auth.alipay.com"),
+    ),
+}
+
+
+def cookie_expiry(state: dict, target: KeepAliveTarget) -> float | None:
+    """
+    When the login in a storage_state ends: the earliest `expires` of the platform's
+    auth cookies. Session cookies (-1) and other cookies are ignored.
+    :returns: Unix time, or None when the file has no persistent auth cookie
+    """
+    expires = [
+        cookie["expires"] for cookie in state.get("cookies", [])
+        if cookie.get("name") in target.auth_cookies and (cookie.get("expires") or -1) > 0
+    ]
+    return min(expires) if expires else None
+
+
+def refresh_phase(account_file: str | Path) -> float:
+    """Stable offset in [0, 1) of one account inside the refresh interval, so accounts don't refresh together."""
+    digest = hashlib.sha1(str(account_file).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") / 2 ** 32
+
+
+def cli_accounts(base_dir: str | Path = BASE_DIR):
+    """Accounts logged in through `sau`: cookies/<platform>_<account>.json."""
+    for path in sorted(Path(base_dir, "cookies").glob("*.json")):
+        platform, _, account = path.stem.partition("_")
+        if platform in KEEPALIVE_TARGETS and account:
+            yield platform, account, path
+
+
+async def refresh_session(platform: str, account_file: Path) -> bool:
+    """
+    Load the creator home page once with the stored cookies, without images, media or
+    fonts. While still logged in, the platform re-issues its session cookies and the
+    storage_state is written back.
+    :returns: False when the page redirected to the login page
+    """
+    from patchright.async_api import async_playwright
+
+    from utils.base_social_media import set_init_script
+    from utils.browser_profiles import open_account_context
+    from utils.request_filter import RequestFilterRule, install_request_filter
+
+    target = KEEPALIVE_TARGETS[platform]
+    async with async_playwright() as playwright:
+        browser, context = await open_account_context(
+            playwright.chromium,
+            platform,
+            account_file,
+            dict(headless=True, args=["--no-sandbox", "--disable-blink-features=AutomationControlled"]),
+        )
+        try:
+            await install_request_filter(context, platform, RequestFilterRule())
+            context = await set_init_script(context)
+            page = await context.new_page()
+            await page.goto(target.url, wait_until="domcontentloaded", timeout=60000)
+            # 登录失效时页面会在加载后再跳到登录页，等它跳完
+            await page.wait_for_timeout(3000)
+            url = page.url
+            logged_in = url.startswith(target.logged_in_prefix) and not any(
+                marker in url for marker in target.logged_out_markers
+            )
+            if logged_in:
+                await context.storage_state(path=str(account_file))
+            return logged_in
+        finally:
+            await context.close()
+            await browser.close()
+
+
+class CookieKeepAlive(StateStore):
+    """
+    Keeps logins alive between uploads. Each account's login expiry comes from the
+    `expires` of its auth cookies; an account is refreshed with one authenticated page
+    load refresh_before_expiry_hours before that, and at least every
+    refresh_interval_hours after its last upload or refresh. Accounts refresh one at a
+    time, each at its own offset in the interval, so a hundred accounts don't all open a
+    browser at once.
+
+    Accounts the refresh finds logged out, or whose login still ends within
+    relogin_warning_hours, are flagged for a manual QR re-login; listeners in
+    `on_relogin_needed` get (platform, account, cookie file, status) when an account
+    gets flagged.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS cookie_keepalive (
+            account_file TEXT PRIMARY KEY,
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            file_mtime REAL,
+            expires_at REAL,
+            last_used_at REAL,
+            last_refreshed_at REAL,
+            next_refresh_at REAL,
+            status TEXT NOT NULL,
+            message TEXT,
+            updated_at REAL NOT NULL
+        )''',
+    )
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        settings: KeepAliveSettings | None = None,
+        refresher=refresh_session,
+        clock=time.time,
+    ):
+        self.db_path = db_path
+        self.settings = settings or KeepAliveSettings(**COOKIE_KEEPALIVE)
+        self.refresher = refresher
+        self.clock = clock
+        # 账号来源：callable -> [(platform, account, cookie 文件)]；后端会加上 cookiesFile 里的账号
+        self.sources = [cli_accounts]
+        self.on_relogin_needed: list = []
+        self._last_refresh_started = 0.0
+        self._thread: threading.Thread | None = None
+
+    def next_refresh_at(self, account_file: str, expires_at: float | None, last_active: float,
+                        last_refreshed_at: float | None) -> float:
+        """
+        The account's next slot (k * interval + its own offset) at least half an interval
+        after it was last active, or earlier when its login is about to expire.
+        """
+        interval = self.settings.refresh_interval_hours * 3600
+        offset = refresh_phase(account_file) * interval
+        slot = math.ceil((last_active + interval / 2 - offset) / interval) * interval + offset
+        if expires_at is not None:
+            # 刷新也延不了期的平台，不要每轮都去刷
+            slot = min(slot, max(expires_at - self.settings.refresh_before_expiry_hours * 3600,
+                                 (last_refreshed_at or 0) + interval / 4))
+        return slot
+
+    def sync(self) -> None:
+        """Pick up new, re-logged-in and deleted cookie files from every account source."""
+        accounts = {}
+        for source in self.sources:
+            for platform, account, path in source():
+                if platform in KEEPALIVE_TARGETS:
+                    accounts[str(path)] = (platform, account, Path(path))
+        conn = self._connect(create=bool(accounts))
+        if conn is None:
+            return
+        try:
+            now = self.clock()
+            rows = {
+                row[0]: row[1:] for row in conn.execute(
+                    "SELECT account_file, file_mtime, last_used_at, last_refreshed_at FROM cookie_keepalive"
+                )
+            }
+            for key in rows.keys() - accounts.keys():
+                conn.execute("DELETE FROM cookie_keepalive WHERE account_file = ?", (key,))
+            for key, (platform, account, path) in accounts.items():
+                try:
+                    mtime = path.stat().st_mtime
+                except OSError:
+                    continue
+                file_mtime, last_used_at, last_refreshed_at = rows.get(key, (None, None, None))
+                if file_mtime == mtime:
+                    continue
+                # 新账号，或者 cookie 文件被重新登录 / 刷新改写过：重新读到期时间，清掉失效标记
+                expires_at = self._read_expiry(platform, path)
+                last_active = max(mtime, last_used_at or 0, last_refreshed_at or 0)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cookie_keepalive (account_file, platform, account, file_mtime, expires_at, "
+                    "last_used_at, last_refreshed_at, next_refresh_at, status, message, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '', ?)",
+                    (key, platform, account, mtime, expires_at, last_used_at, last_refreshed_at,
+                     self.next_refresh_at(key, expires_at, last_active, last_refreshed_at),
+                     self._expiry_status(expires_at, now), now),
+                )
+        finally:
+            conn.close()
+
+    def _read_expiry(self, platform: str, path: Path) -> float | None:
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return cookie_expiry(state, KEEPALIVE_TARGETS[platform])
+
+    def _expiry_status(self, expires_at: float | None, now: float) -> str:
+        if expires_at is not None and expires_at - now < self.settings.relogin_warning_hours * 3600:
+            return STATUS_EXPIRING
+        return STATUS_OK
+
+    def record_use(self, account_file: str | Path) -> None:
+        """An upload with this account succeeded, so its login was just used; push its next refresh back."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return
+        key = str(account_file)
+        try:
+            row = conn.execute(
+                "SELECT expires_at, last_refreshed_at FROM cookie_keepalive WHERE account_file = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return
+            now = self.clock()
+            conn.execute(
+                "UPDATE cookie_keepalive SET last_used_at = ?, next_refresh_at = ?, updated_at = ? "
+                "WHERE account_file = ? AND status != ?",
+                (now, self.next_refresh_at(key, row[0], now, row[1]), now, key, STATUS_RELOGIN),
+            )
+        finally:
+            conn.close()
+
+    def _claim_due(self) -> tuple | None:
+        """Take the most overdue account, leasing it so another process running the scheduler skips it."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            row = conn.execute(
+                "SELECT account_file, platform, account FROM cookie_keepalive "
+                "WHERE next_refresh_at <= ? AND status != ? ORDER BY next_refresh_at LIMIT 1",
+                (now, STATUS_RELOGIN),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE cookie_keepalive SET next_refresh_at = ? WHERE account_file = ?",
+                    (now + self.settings.retry_minutes * 60, row[0]),
+                )
+            conn.execute("COMMIT")
+            return row
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    async def run_once(self) -> str | None:
+        """
+        Refresh at most one due account, keeping min_seconds_between_refreshes between
+        refreshes of this process.
+        :returns: the refresh outcome, or None when nothing ran
+        """
+        if self.clock() - self._last_refresh_started < self.settings.min_seconds_between_refreshes:
+            return None
+        await asyncio.to_thread(self.sync)
+        claimed = await asyncio.to_thread(self._claim_due)
+        if claimed is None:
+            return None
+        self._last_refresh_started = self.clock()
+        account_file, platform, account = claimed
+        return await self.refresh(account_file, platform, account)
+
+    async def refresh(self, account_file: str, platform: str, account: str) -> str:
+        path = Path(account_file)
+        try:
+            logged_in = await self.refresher(platform, path)
+        except Exception as exc:
+            logger.warning(f"Cookie refresh for {platform} account {account} failed: {exc}")
+            self._store_result(account_file, STATUS_ERROR, str(exc)[:500],
+                               next_refresh_at=self.clock() + self.settings.retry_minutes * 60)
+            metrics.increment("sau_cookie_refresh_total", platform=platform, outcome="error")
+            return STATUS_ERROR
+
+        now = self.clock()
+        if not logged_in:
+            self._store_result(account_file, STATUS_RELOGIN, "logged out, scan the QR code again", refreshed_at=now)
+            metrics.increment("sau_cookie_refresh_total", platform=platform, outcome="logged_out")
+            self._flag(platform, account, path, STATUS_RELOGIN)
+            return STATUS_RELOGIN
+
+        expires_at = self._read_expiry(platform, path)
+        status = self._expiry_status(expires_at, now)
+        message = "" if status == STATUS_OK else "refresh did not extend the login, scan the QR code again before it ends"
+        mtime = path.stat().st_mtime if path.exists() else None
+        previous = self._store_result(
+            account_file, status, message, refreshed_at=now, expires_at=expires_at, file_mtime=mtime
+        )
+        metrics.increment("sau_cookie_refresh_total", platform=platform, outcome="ok")
+        if status == STATUS_EXPIRING and previous != STATUS_EXPIRING:
+            self._flag(platform, account, path, status)
+        return status
+
+    def _store_result(self, account_file: str, status: str, message: str, refreshed_at: float | None = None,
+                      expires_at: float | None = None, file_mtime: float | None = None,
+                      next_refresh_at: float | None = None) -> str | None:
+        """:returns: the status the account had before"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status, expires_at, last_used_at, last_refreshed_at, file_mtime FROM cookie_keepalive "
+                "WHERE account_file = ?", (account_file,)
+            ).fetchone()
+            if row is None:
+                return None
+            previous, old_expires_at, last_used_at, last_refreshed_at, old_mtime = row
+            expires_at = expires_at if expires_at is not None else old_expires_at
+            last_refreshed_at = refreshed_at or last_refreshed_at
+            if next_refresh_at is None and status != STATUS_RELOGIN:
+                last_active = max(last_used_at or 0, last_refreshed_at or 0, old_mtime or 0)
+                next_refresh_at = self.next_refresh_at(account_file, expires_at, last_active, last_refreshed_at)
+            conn.execute(
+                "UPDATE cookie_keepalive SET status = ?, message = ?, expires_at = ?, last_refreshed_at = ?, "
+                "next_refresh_at = ?, file_mtime = ?, updated_at = ? WHERE account_file = ?",
+                (status, message, expires_at, last_refreshed_at, next_refresh_at,
+                 file_mtime if file_mtime is not None else old_mtime, self.clock(), account_file),
+            )
+            return previous
+        finally:
+            conn.close()
+
+    def _flag(self, platform: str, account: str, path: Path, status: str) -> None:
+        logger.warning(f"{platform} account {account} needs a QR code re-login ({status}, {path})")
+        for listener in self.on_relogin_needed:
+            try:
+                listener(platform, account, path, status)
+            except Exception as exc:
+                logger.warning(f"Re-login listener failed: {exc}")
+
+    def status(self) -> list[dict]:
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            rows = conn.execute(
+                "SELECT account_file, platform, account, expires_at, last_used_at, last_refreshed_at, "
+                "next_refresh_at, status, message FROM cookie_keepalive ORDER BY platform, account"
+            ).fetchall()
+        finally:
+            conn.close()
+        now = self.clock()
+        result = []
+        for row in rows:
+            status = row[7]
+            if status == STATUS_OK:
+                # 表里存的是上次刷新时的判断，到期时间临近后这里要及时变成 expiring
+                status = self._expiry_status(row[3], now)
+            result.append({
+                "account_file": row[0],
+                "platform": row[1],
+                "account": row[2],
+                "expires_at": row[3],
+                "last_used_at": row[4],
+                "last_refreshed_at": row[5],
+                "next_refresh_at": row[6],
+                "status": status,
+                "message": row[8],
+            })
+        return result
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.warning(f"Cookie keep-alive pass failed: {exc}")
+            await asyncio.sleep(self.settings.poll_seconds)
+
+    def start_background(self) -> None:
+        """Run the scheduler in a daemon thread with its own event loop (idempotent, off when disabled)."""
+        if not self.settings.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self.run_forever()), name="sau-cookie-keepalive", daemon=True
+        )
+        self._thread.start()
+
+
+cookie_keepalive = CookieKeepAlive()
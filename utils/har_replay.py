@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import re
+import zipfile
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from conf import BASE_DIR
+from utils import metrics
+
+try:
+    # 在 conf.py 里用 HAR_SESSIONS 录制 / 回放创作者中心的网络会话，见 conf.example.py
+    from conf import HAR_SESSIONS
+except ImportError:
+    HAR_SESSIONS = {}
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+HAR_MEMBER = "har.har"
+
+# 视频分片上传接口：录制时不保存请求体，回放时按设定的速度收下字节后直接应答
+UPLOAD_URL_PATTERNS = (
+    r"tos-[\w.-]*\.(?:snssdk|bytedance|byteimg|volces)\.com",
+    r"/upload/v\d|/uploadpart|/upload/fragment|/upload/resume|/api/upload",
+    r"snsuploadbig|finder[\w.-]*/upload",
+    r"upload\.kuaishouzt\.com",
+    r"ros-upload\.xiaohongshu\.com|ros-upload\.rednote\.com",
+    r"\.myqcloud\.com/|/cos/",
+)
+UPLOAD_METHODS = ("POST", "PUT", "PATCH")
+
+
+@dataclass(frozen=True, slots=True)
+class HarSettings:
+    mode: str = ""
+    directory: str = "har"
+    upload_mb_per_second: float = 20.0
+    # 回放时按录制下来的耗时延迟每个响应，基准测试才有意义；只测功能时关掉更快
+    replay_latency: bool = True
+    upload_url_patterns: tuple[str, ...] = UPLOAD_URL_PATTERNS
+
+    @property
+    def path(self) -> Path:
+        path = Path(self.directory)
+        return path if path.is_absolute() else Path(BASE_DIR) / path
+
+
+def load_settings(config: dict | None = None, environ=os.environ) -> HarSettings:
+    """HAR_SESSIONS from conf.py; SAU_HAR_MODE / SAU_HAR_DIR override mode and directory (for CI)."""
+    config = dict(HAR_SESSIONS if config is None else config)
+    if environ.get("SAU_HAR_MODE"):
+        config["mode"] = environ["SAU_HAR_MODE"]
+    if environ.get("SAU_HAR_DIR"):
+        config["directory"] = environ["SAU_HAR_DIR"]
+    if "upload_url_patterns" in config:
+        config["upload_url_patterns"] = tuple(config["upload_url_patterns"])
+    settings = HarSettings(**config)
+    if settings.mode not in ("", MODE_RECORD, MODE_REPLAY):
+        raise RuntimeError(f"Unknown HAR mode '{settings.mode}', expected '{MODE_RECORD}' or '{MODE_REPLAY}'")
+    return settings
+
+
+def _read_har(path: Path) -> tuple[dict, zipfile.ZipFile | None]:
+    if path.suffix == ".zip":
+        archive = zipfile.ZipFile(path)
+        return json.loads(archive.read(HAR_MEMBER)), archive
+    return json.loads(path.read_text(encoding="utf-8")), None
+
+
+def strip_upload_bodies(path: Path, upload_pattern: re.Pattern) -> int:
+    """
+    Drop the request bodies of upload requests from a recorded HAR (.har or .zip), so a
+    recording of a 2 GB upload stays a few MB. Their size is kept in `bodySize`.
+    :returns: number of entries stripped
+    """
+    har, archive = _read_har(path)
+    stripped = 0
+    dropped_members = set()
+    for entry in har["log"]["entries"]:
+        request = entry["request"]
+        post_data = request.get("postData")
+        if post_data and (post_data.get("_file") or post_data.get("text")) and upload_pattern.search(request["url"]):
+            if "_file" in post_data:
+                dropped_members.add(post_data["_file"])
+            request["postData"] = {"mimeType": post_data.get("mimeType", ""), "text": ""}
+            stripped += 1
+    if not stripped:
+        if archive is not None:
+            archive.close()
+        return 0
+    if archive is None:
+        path.write_text(json.dumps(har, ensure_ascii=False), encoding="utf-8")
+        return stripped
+    temporary = path.with_suffix(".tmp")
+    with archive, zipfile.ZipFile(temporary, "w", zipfile.ZIP_DEFLATED) as target:
+        for member in archive.namelist():
+            if member == HAR_MEMBER:
+                target.writestr(HAR_MEMBER, json.dumps(har, ensure_ascii=False))
+            elif member not in dropped_members:
+                target.writestr(member, archive.read(member))
+    os.replace(temporary, path)
+    return stripped
+
+
+def _url_key(method: str, url: str) -> tuple[str, str]:
+    parts = urlsplit(url)
+    return method, f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class HarIndex:
+    """What replay needs besides route_from_har: recorded latencies, and recorded answers to upload requests."""
+
+    def __init__(self, path: Path, upload_pattern: re.Pattern):
+        har, archive = _read_har(path)
+        self.latency: dict[tuple[str, str], deque[float]] = defaultdict(deque)
+        self.uploads: dict[tuple[str, str], deque[dict]] = defaultdict(deque)
+        try:
+            for entry in har["log"]["entries"]:
+                request, response = entry["request"], entry["response"]
+                key = _url_key(request["method"], request["url"])
+                self.latency[key].append(max(0.0, float(entry.get("time") or 0)) / 1000)
+                if request["method"] in UPLOAD_METHODS and upload_pattern.search(request["url"]):
+                    self.uploads[key].append({
+                        "status": response.get("status") or 200,
+                        "headers": {header["name"]: header["value"] for header in response.get("headers", [])
+                                    if header["name"].lower() not in ("content-length", "content-encoding")},
+                        "body": self._body(response.get("content", {}), archive),
+                    })
+        finally:
+            if archive is not None:
+                archive.close()
+
+    @staticmethod
+    def _body(content: dict, archive: zipfile.ZipFile | None) -> bytes:
+        if "_file" in content and archive is not None:
+            return archive.read(content["_file"])
+        text = content.get("text") or ""
+        return base64.b64decode(text) if content.get("encoding") == "base64" else text.encode("utf-8")
+
+    def next_latency(self, method: str, url: str) -> float:
+        delays = self.latency.get(_url_key(method, url))
+        return delays.popleft() if delays else 0.0
+
+    def next_upload_response(self, method: str, url: str) -> dict:
+        """Recorded answers to this upload URL in order, repeating the last; `{}` when none was recorded."""
+        responses = self.uploads.get(_url_key(method, url))
+        if not responses:
+            return {"status": 200, "headers": {"content-type": "application/json"}, "body": b"{}"}
+        return responses.popleft() if len(responses) > 1 else responses[0]
+
+
+async def _upload_size(request) -> int:
+    length = (await request.all_headers()).get("content-length")
+    if length and length.isdigit():
+        return int(length)
+    return len(request.post_data_buffer or b"")
+
+
+async def install_replay(context, path: Path, settings: HarSettings) -> None:
+    """
+    Serve `context` from a recorded HAR, fully offline:
+    recorded requests come from route_from_har, delayed by their recorded time when
+    `replay_latency` is on; upload requests are taken in at `upload_mb_per_second` and
+    answered with what the platform answered during recording; anything else is aborted.
+    """
+    upload_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in settings.upload_url_patterns), re.I)
+    index = await asyncio.to_thread(HarIndex, path, upload_pattern)
+    bytes_per_second = max(settings.upload_mb_per_second, 0.001) * 1024 * 1024
+
+    async def not_recorded(route):
+        metrics.increment("sau_har_replay_requests_total", outcome="miss")
+        logger.debug(f"HAR replay has no response for {route.request.method} {route.request.url}")
+        await route.abort("internetdisconnected")
+
+    async def replay(route):
+        request = route.request
+        if request.method in UPLOAD_METHODS and upload_pattern.search(request.url):
+            size = await _upload_size(request)
+            await asyncio.sleep(size / bytes_per_second)
+            metrics.increment("sau_har_replay_requests_total", outcome="upload")
+            metrics.increment("sau_har_replay_upload_bytes_total", size)
+            response = index.next_upload_response(request.method, request.url)
+            await route.fulfill(status=response["status"], headers=response["headers"], body=response["body"])
+            return
+        delay = index.next_latency(request.method, request.url)
+        if settings.replay_latency and delay:
+            await asyncio.sleep(delay)
+        await route.fallback()
+
+    # 后注册的路由先处理：replay -> route_from_har -> not_recorded
+    await context.route("**/*", not_recorded)
+    await context.route_from_har(str(path), not_found="fallback")
+    await context.route("**/*", replay)
+
+
+class HarBrowser:
+    """
+    Browser wrapper handed to uploaders while HAR mode is on. The n-th context opened in
+    this process is recorded to, or replayed from, `<directory>/<n>.zip`, so a recorded
+    run (cookie check, upload page, ...) replays context by context in the same order.
+    """
+
+    def __init__(self, browser, session: HarSession):
+        self._browser = browser
+        self._session = session
+        self._contexts = []
+
+    async def new_context(self, *args, **kwargs):
+        path = self._session.next_path()
+        context = await self._browser.new_context(*args, **{**kwargs, **self._session.context_kwargs(path)})
+        self._contexts.append(context)
+        await self._session.attach(context, path)
+        return context
+
+    async def new_page(self, *args, **kwargs):
+        context = await self.new_context(**kwargs)
+        return await context.new_page()
+
+    async def close(self, **kwargs) -> None:
+        # HAR 只在 context.close() 时写出，直接关浏览器会丢掉录制
+        contexts, self._contexts = self._contexts, []
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        await self._browser.close(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class HarSession:
+    def __init__(self, settings: HarSettings | None = None):
+        self.settings = settings or load_settings()
+        self._sequence = 0
+        self._upload_pattern = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in self.settings.upload_url_patterns), re.I
+        )
+
+    @property
+    def active(self) -> bool:
+        return bool(self.settings.mode)
+
+    def wrap(self, browser):
+        return HarBrowser(browser, self) if self.active else browser
+
+    def next_path(self) -> Path:
+        self._sequence += 1
+        path = self.settings.path / f"{self._sequence:02d}.zip"
+        if self.settings.mode == MODE_REPLAY and not path.exists():
+            raise RuntimeError(
+                f"No HAR recording {path}: this run opened more browser contexts than the recorded one. "
+                f"Record it again with SAU_HAR_MODE={MODE_RECORD}"
+            )
+        return path
+
+    def context_kwargs(self, path: Path) -> dict:
+        if self.settings.mode != MODE_RECORD:
+            # 回放时不受 service worker 缓存干扰
+            return {"service_workers": "block"}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return {"record_har_path": str(path), "record_har_content": "attach", "record_har_mode": "full"}
+
+    async def attach(self, context, path: Path) -> None:
+        if self.settings.mode == MODE_REPLAY:
+            await install_replay(context, path, self.settings)
+            return
+
+        def finish(_context):
+            # close() 返回前 HAR 已经写完
+            stripped = strip_upload_bodies(path, self._upload_pattern) if path.exists() else 0
+            logger.info(f"HAR recorded to {path} ({stripped} upload request bodies dropped)")
+
+        context.on("close", finish)
+
+
+har_session = HarSession()
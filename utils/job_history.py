@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from loguru import logger
+
+from utils.job_phase import current_tracker, track_job
+from utils.state_db import StateStore
+
+try:
+    # 在 conf.py 里用 JOB_HISTORY 调整任务耗时记录的保留和统计窗口，见 conf.example.py
+    from conf import JOB_HISTORY
+except ImportError:
+    JOB_HISTORY = {}
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+
+BUCKET_ALL = "all"
+MB = 1024 * 1024
+# (上限, 名称)：按文件大小分桶统计耗时，上传时间主要取决于文件大小
+SIZE_BUCKETS = ((50 * MB, "<50MB"), (200 * MB, "50-200MB"), (1024 * MB, "200MB-1GB"), (None, ">=1GB"))
+# 限流等待不算任务本身的耗时，单独扣掉
+RATE_LIMIT_PHASE = "rate_limit"
+
+
+@dataclass(frozen=True, slots=True)
+class HistorySettings:
+    enabled: bool = True
+    window_days: float = 30
+    retention_days: float = 90
+    # 一个分桶至少有这么多条成功记录才用它，否则退回整个平台的统计
+    min_samples: int = 5
+    cache_seconds: float = 300
+
+
+@dataclass(frozen=True, slots=True)
+class DurationStats:
+    platform: str
+    bucket: str
+    samples: int
+    p50: float
+    p95: float
+    success_rate: float
+
+    def as_dict(self) -> dict:
+        return {
+            "platform": self.platform,
+            "bucket": self.bucket,
+            "samples": self.samples,
+            "p50_seconds": self.p50,
+            "p95_seconds": self.p95,
+            "success_rate": self.success_rate,
+        }
+
+
+def size_bucket(size: int | None) -> str:
+    if size is None:
+        return BUCKET_ALL
+    for limit, name in SIZE_BUCKETS:
+        if limit is None or size < limit:
+            return name
+    return SIZE_BUCKETS[-1][1]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return round(values[index], 3)
+
+
+def files_size(files: Iterable[str | Path]) -> int | None:
+    try:
+        return sum(Path(file).stat().st_size for file in files)
+    except OSError:
+        return None
+
+
+class JobHistory(StateStore):
+    """
+    Every finished publish job: platform, account, file size, outcome, total seconds and
+    seconds per phase (utils.job_phase.set_phase). Stored in the shared state database so
+    the backend, CLI runs and batch workers all add to, and estimate from, one history.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS job_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            file_size INTEGER,
+            size_bucket TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            failed_phase TEXT,
+            error TEXT,
+            duration_seconds REAL NOT NULL,
+            rate_limit_seconds REAL NOT NULL,
+            phases TEXT NOT NULL,
+            finished_at REAL NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS job_history_platform ON job_history (platform, finished_at)",
+        "CREATE INDEX IF NOT EXISTS job_history_finished ON job_history (finished_at)",
+    )
+
+    def __init__(self, db_path: str | Path | None = None, settings: HistorySettings | None = None, clock=time.time):
+        self.db_path = db_path
+        self.settings = settings or HistorySettings(**JOB_HISTORY)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._cache: tuple[float, dict[tuple[str, str], DurationStats]] | None = None
+
+    def record(
+        self,
+        platform: str,
+        account: str,
+        file_size: int | None,
+        outcome: str,
+        duration_seconds: float,
+        phases: dict[str, float] | None = None,
+        failed_phase: str | None = None,
+        error: str | None = None,
+    ) -> None:
+        if not self.settings.enabled:
+            return
+        phases = phases or {}
+        now = self.clock()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO job_history (platform, account, file_size, size_bucket, outcome, failed_phase, error, "
+                "duration_seconds, rate_limit_seconds, phases, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (platform, account or "", file_size, size_bucket(file_size), outcome, failed_phase,
+                 (error or "")[:500] or None, round(duration_seconds, 3), phases.get(RATE_LIMIT_PHASE, 0.0),
+                 json.dumps(phases, sort_keys=True), now),
+            )
+            conn.execute("DELETE FROM job_history WHERE finished_at < ?", (now - self.settings.retention_days * 86400,))
+        finally:
+            conn.close()
+
+    @contextmanager
+    def recording(self, platform: str, account: str, files: Iterable[str | Path]):
+        """
+        Time one publish job and record it when it ends, whatever the outcome. Reuses the
+        job tracker of the enclosing context, or opens one, so the phases the uploader
+        sets are timed. Jobs whose files cannot be read are not recorded: they fail before
+        any upload starts and would only skew the estimates.
+        """
+        file_size = files_size(files)
+        if file_size is None:
+            yield current_tracker()
+            return
+        tracker = current_tracker()
+        with nullcontext(tracker) if tracker is not None else track_job(platform) as tracker:
+            started_at = time.monotonic()
+            outcome, error = OUTCOME_CANCELLED, None
+            try:
+                yield tracker
+                outcome = OUTCOME_OK
+            except Exception as exc:
+                outcome, error = OUTCOME_ERROR, str(exc) or type(exc).__name__
+                raise
+            finally:
+                try:
+                    self.record(platform, account, file_size, outcome, time.monotonic() - started_at,
+                                tracker.phase_durations(), None if outcome == OUTCOME_OK else tracker.phase, error)
+                except sqlite3.Error as exc:
+                    # 记录失败不能影响发布本身
+                    logger.warning(f"Could not record {platform} job timing: {exc}")
+
+    def stats(self, platform: str | None = None) -> list[DurationStats]:
+        """
+        p50 / p95 of successful jobs' working seconds (rate-limit waits excluded) per platform
+        and size bucket, plus one BUCKET_ALL row per platform, over the last window_days.
+        """
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            query = ("SELECT platform, size_bucket, outcome, duration_seconds - rate_limit_seconds "
+                     "FROM job_history WHERE finished_at >= ?")
+            params: list = [self.clock() - self.settings.window_days * 86400]
+            if platform:
+                query += " AND platform = ?"
+                params.append(platform)
+            rows = conn.execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            # 还没有记录过任务，表不存在
+            return []
+        finally:
+            conn.close()
+
+        groups: dict[tuple[str, str], tuple[list[float], list[int]]] = {}
+        for row_platform, bucket, outcome, seconds in rows:
+            for key in ((row_platform, bucket), (row_platform, BUCKET_ALL)):
+                durations, counts = groups.setdefault(key, ([], [0, 0]))
+                counts[0] += 1
+                if outcome == OUTCOME_OK:
+                    counts[1] += 1
+                    durations.append(max(0.0, seconds))
+        result = []
+        for (row_platform, bucket), (durations, (total, succeeded)) in sorted(groups.items()):
+            if not durations:
+                continue
+            durations.sort()
+            result.append(DurationStats(row_platform, bucket, len(durations), percentile(durations, 0.5),
+                                        percentile(durations, 0.95), round(succeeded / total, 3)))
+        return result
+
+    def expected(self, platform: str, file_size: int | None = None) -> DurationStats | None:
+        """
+        Stats for a job of this size: its size bucket when that has min_samples successful
+        jobs, else the platform as a whole, else None. Cached for cache_seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._cache is None or now - self._cache[0] > self.settings.cache_seconds:
+                self._cache = (now, {(row.platform, row.bucket): row for row in self.stats()})
+            table = self._cache[1]
+        for bucket in (size_bucket(file_size), BUCKET_ALL):
+            row = table.get((platform, bucket))
+            if row is not None and row.samples >= self.settings.min_samples:
+                return row
+        return None
+
+
+job_history = JobHistory()
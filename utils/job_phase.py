@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from utils.retry import RetryPolicy, is_transient, retry_async
+
+try:
+    # 在 conf.py 里用 PHASE_RESUME_DEADLINE 调整上传完成后补跑剩余阶段的总时限（秒）
+    from conf import PHASE_RESUME_DEADLINE
+except ImportError:
+    PHASE_RESUME_DEADLINE = 900
+
+# 上传完成之后的检查点；到达 CHECKPOINT_UPLOADED 之后的失败只重跑剩余阶段，不再重新传文件
+CHECKPOINT_UPLOADED = "uploaded"
+CHECKPOINT_METADATA_FILLED = "metadata_filled"
+CHECKPOINT_COVER_SET = "cover_set"
+CHECKPOINT_PUBLISHED = "published"
+
+
+@dataclass(slots=True)
+class JobTracker:
+    platform: str
+    phase: str | None = None
+    checkpoints: list[str] = field(default_factory=list)
+    # 从平台发布接口响应里抓到的作品 ID / 链接，见 utils.publish_ledger
+    post_id: str | None = None
+    post_url: str | None = None
+    # 每个阶段累计耗时（秒），供 utils.job_history 记录
+    phase_seconds: dict[str, float] = field(default_factory=dict)
+    phase_started_at: float | None = None
+
+    def enter_phase(self, phase: str | None) -> None:
+        now = time.monotonic()
+        if self.phase is not None and self.phase_started_at is not None:
+            self.phase_seconds[self.phase] = self.phase_seconds.get(self.phase, 0.0) + now - self.phase_started_at
+        self.phase = phase
+        self.phase_started_at = now if phase is not None else None
+
+    def phase_durations(self) -> dict[str, float]:
+        """Seconds spent per phase so far, including the phase still running."""
+        durations = dict(self.phase_seconds)
+        if self.phase is not None and self.phase_started_at is not None:
+            durations[self.phase] = durations.get(self.phase, 0.0) + time.monotonic() - self.phase_started_at
+        return {phase: round(seconds, 3) for phase, seconds in durations.items()}
+
+
+_current_job: ContextVar[JobTracker | None] = ContextVar("sau_current_job", default=None)
+
+
+@contextmanager
+def track_job(platform: str):
+    """
+    Track which phase the publish job running in this context has reached.
+    The tracker is a mutable object, so phases set inside `asyncio.run` or child tasks
+    (which copy the context) are still visible to the caller.
+    """
+    tracker = JobTracker(platform=platform)
+    token = _current_job.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_job.reset(token)
+
+
+def current_tracker() -> JobTracker | None:
+    return _current_job.get()
+
+
+def set_phase(phase: str) -> None:
+    """Record the phase the current job is entering; no-op outside track_job."""
+    tracker = _current_job.get()
+    if tracker is not None:
+        tracker.enter_phase(phase)
+
+
+def current_phase() -> str | None:
+    tracker = _current_job.get()
+    return tracker.phase if tracker is not None else None
+
+
+def mark_checkpoint(checkpoint: str) -> None:
+    """Record that the current job finished `checkpoint`; no-op outside track_job."""
+    tracker = _current_job.get()
+    if tracker is not None and checkpoint not in tracker.checkpoints:
+        tracker.checkpoints.append(checkpoint)
+
+
+def reached_checkpoints() -> list[str]:
+    tracker = _current_job.get()
+    return list(tracker.checkpoints) if tracker is not None else []
+
+
+def _post_captured() -> bool:
+    tracker = _current_job.get()
+    return tracker is not None and tracker.post_id is not None
+
+
+@dataclass(frozen=True, slots=True)
+class PhaseStep:
+    phase: str
+    checkpoint: str
+    run: Callable[[], Awaitable[object]]
+    # 步骤自己带重试（比如发布按钮的 PUBLISH_RETRY_POLICY）时设为 False，失败后不再整体重跑，避免重试次数相乘
+    retry: bool = True
+
+
+async def run_remaining_phases(
+    steps: list[PhaseStep],
+    *,
+    platform: str,
+    deadline: float | None = None,
+    on_retry: Callable[[str, BaseException], object] | None = None,
+) -> list[str]:
+    """
+    Run the post-upload steps in order on the same page. A step that completes is
+    checkpointed and never run again; when a later step fails, only the steps that
+    have not completed are retried (after `on_retry` had a chance to clean the page),
+    until `deadline` seconds have passed in total. A step with retry=False owns its
+    retries: its failure is raised as is. A phase that hangs is cancelled by the
+    watchdog's per-phase deadline (utils/watchdog.py), not here.
+    :param steps: Steps to run after the file finished uploading
+    :param platform: Platform name for metrics and retry budgets
+    :param deadline: Total seconds of retrying allowed, defaults to PHASE_RESUME_DEADLINE
+    :param on_retry: Hook (failed_phase, exc) run before retrying, may be async
+    :returns: checkpoints completed, in order
+    """
+    deadline = PHASE_RESUME_DEADLINE if deadline is None else deadline
+    completed: list[str] = []
+    failed_phase = steps[0].phase if steps else ""
+    failed_step_retries = True
+
+    async def run_pending():
+        nonlocal failed_phase, failed_step_retries
+        for step in steps:
+            if step.checkpoint in completed:
+                continue
+            if step.checkpoint == CHECKPOINT_PUBLISHED and _post_captured():
+                # 发布接口已经返回了作品 ID，说明上一次点击其实发出去了，不再重复点发布
+                logger.info(f"{platform} publish already returned post {current_tracker().post_id}, not clicking publish again")
+                completed.append(step.checkpoint)
+                mark_checkpoint(step.checkpoint)
+                continue
+            failed_phase, failed_step_retries = step.phase, step.retry
+            set_phase(step.phase)
+            await step.run()
+            completed.append(step.checkpoint)
+            mark_checkpoint(step.checkpoint)
+
+    async def before_retry(attempt, exc, delay):
+        logger.warning(f"{platform} {failed_phase} failed after {', '.join(completed) or CHECKPOINT_UPLOADED}, "
+                       f"retrying remaining phases in the same page: {exc}")
+        if on_retry is not None:
+            hook_result = on_retry(failed_phase, exc)
+            if inspect.isawaitable(hook_result):
+                await hook_result
+
+    policy = RetryPolicy(
+        max_attempts=None, base_delay=2, max_delay=30, max_elapsed=deadline,
+        classify=lambda exc: failed_step_retries and is_transient(exc),
+    )
+    await retry_async(run_pending, policy, platform=platform, operation="resume_phases", on_retry=before_retry)
+    return completed
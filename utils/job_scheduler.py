@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from loguru import logger
+
+from utils import metrics
+from utils.rate_limit import resolve_limits
+
+try:
+    # 在 conf.py 里用 SCHEDULER 配置优先级、公平权重和准入控制，见 conf.example.py
+    from conf import SCHEDULER
+except ImportError:
+    SCHEDULER = {}
+
+PRIORITY_URGENT = "urgent"
+PRIORITY_NORMAL = "normal"
+PRIORITY_BULK = "bulk"
+# 数字越小越先跑
+PRIORITY_CLASSES = {PRIORITY_URGENT: 0, PRIORITY_NORMAL: 1, PRIORITY_BULK: 2}
+
+ADMISSION_DEFER = "defer"
+ADMISSION_REJECT = "reject"
+ADMISSION_OFF = "off"
+ADMISSION_MODES = (ADMISSION_DEFER, ADMISSION_REJECT, ADMISSION_OFF)
+
+
+class AdmissionRejected(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulerSettings:
+    default_priority: str = PRIORITY_NORMAL
+    admission: str = ADMISSION_DEFER
+    # 定时发布的任务要在发布时间之前这么多秒传完
+    deadline_margin_seconds: float = 0
+    # 准入控制估算用的单个任务耗时
+    default_job_seconds: float = 600
+    job_seconds: dict = field(default_factory=dict)
+    operator_weights: dict = field(default_factory=dict)
+    # 键为 "platform:account"
+    account_weights: dict = field(default_factory=dict)
+    backend_concurrency: int = 4
+    backend_platform_concurrency: int = 2
+
+
+def load_settings(config: dict | None = None) -> SchedulerSettings:
+    settings = SchedulerSettings(**(SCHEDULER if config is None else config))
+    if settings.default_priority not in PRIORITY_CLASSES:
+        raise RuntimeError(
+            f"Unknown default priority '{settings.default_priority}', expected one of {', '.join(PRIORITY_CLASSES)}"
+        )
+    if settings.admission not in ADMISSION_MODES:
+        raise RuntimeError(f"Unknown admission mode '{settings.admission}', expected one of {', '.join(ADMISSION_MODES)}")
+    return settings
+
+
+def deadline_from(publish_date) -> float | None:
+    """Epoch seconds of a publish_date (datetime or timestamp); 0 / None mean publish now, no deadline."""
+    if isinstance(publish_date, datetime):
+        return publish_date.timestamp()
+    if isinstance(publish_date, (int, float)) and publish_date > 0:
+        return float(publish_date)
+    return None
+
+
+@dataclass(slots=True, eq=False)
+class JobTicket:
+    platform: str
+    account: str = ""
+    operator: str = ""
+    priority: str = PRIORITY_NORMAL
+    deadline: float | None = None
+    size: int | None = None
+    seq: int = 0
+    deferred: bool = False
+    projected_finish: float | None = None
+    wake: Callable[[], None] | None = None
+
+
+class JobScheduler:
+    """
+    Decides which waiting publish job gets the next free slot, instead of first come first served.
+
+    Order: priority class (urgent, normal, bulk), then earliest deadline first for jobs with a
+    publish_date, then weighted fair sharing between operators and, within an operator, between
+    accounts (start-time fair queueing: a flow's next job is tagged 1/weight after its last one),
+    then submission order. At most `concurrency` jobs run at once and at most the platform's
+    limit per platform; a job whose platform is full does not hold up jobs of other platforms.
+
+    A job with a deadline is admitted only if the jobs ahead of it, at the estimated job time
+    (p50 from `history` when there is enough, else SCHEDULER's job_seconds), the platform's
+    slots and the account's rate limit, leave it time to finish; otherwise it is
+    rejected (AdmissionRejected) or deferred behind all work that can still make it.
+
+    Asyncio callers use `slot()`, threads (backend request handlers) use `hold()`; both share
+    one queue.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        platform_concurrency: dict[str, int] | None = None,
+        default_platform_concurrency: int = 2,
+        settings: SchedulerSettings | None = None,
+        estimate: Callable[[JobTicket], float] | None = None,
+        history=None,
+        clock=time.time,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.platform_concurrency = platform_concurrency or {}
+        self.default_platform_concurrency = default_platform_concurrency
+        self.settings = settings or load_settings()
+        # utils.job_history.JobHistory：有足够历史记录时按同平台、同文件大小档的 p50 估算
+        self.history = history
+        self.estimate = estimate or self.expected_job_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._waiting: list[JobTicket] = []
+        self._running: list[JobTicket] = []
+        self._seq = itertools.count()
+        self._finish_tags: dict[tuple, float] = {}
+        self._virtual_time = {"operator": 0.0, "account": 0.0}
+
+    def expected_job_seconds(self, ticket: JobTicket) -> float:
+        stats = self.history.expected(ticket.platform, ticket.size) if self.history is not None else None
+        if stats is not None:
+            return stats.p50
+        return float(self.settings.job_seconds.get(ticket.platform, self.settings.default_job_seconds))
+
+    def platform_limit(self, platform: str) -> int:
+        return max(1, min(self.concurrency, self.platform_concurrency.get(platform, self.default_platform_concurrency)))
+
+    def _flows(self, ticket: JobTicket) -> list[tuple[tuple, float]]:
+        operator_weight = self.settings.operator_weights.get(ticket.operator, 1)
+        account_weight = self.settings.account_weights.get(f"{ticket.platform}:{ticket.account}", 1)
+        return [
+            (("operator", ticket.operator), float(operator_weight)),
+            (("account", ticket.operator, ticket.platform, ticket.account), float(account_weight)),
+        ]
+
+    def _start_tag(self, flow: tuple) -> float:
+        return max(self._finish_tags.get(flow, 0.0), self._virtual_time[flow[0]])
+
+    def _order(self, ticket: JobTicket) -> tuple:
+        rank = PRIORITY_CLASSES[ticket.priority] + (len(PRIORITY_CLASSES) if ticket.deferred else 0)
+        deadline = ticket.deadline if ticket.deadline is not None else math.inf
+        return (rank, deadline, *(self._start_tag(flow) for flow, _ in self._flows(ticket)), ticket.seq)
+
+    def _projected_finish(self, ticket: JobTicket) -> float:
+        """Fluid estimate: work ahead of the job spread over the slots it competes for, plus its own run."""
+        order = self._order(ticket)
+        ahead = self._running + [other for other in self._waiting if self._order(other) < order]
+        wait = sum(self.estimate(other) for other in ahead) / self.concurrency
+        same_platform = [other for other in ahead if other.platform == ticket.platform]
+        wait = max(wait, sum(self.estimate(other) for other in same_platform) / self.platform_limit(ticket.platform))
+        _, account_limit = resolve_limits(ticket.platform)
+        if account_limit is not None and ticket.account:
+            # 账号级令牌桶：前面同账号的任务用完突发额度后，每个任务至少隔一个 interval
+            same_account = sum(1 for other in same_platform if other.account == ticket.account)
+            wait = max(wait, max(0.0, same_account + 1 - account_limit.capacity) * account_limit.interval)
+        return self.clock() + wait + self.estimate(ticket)
+
+    def _admit(self, ticket: JobTicket) -> None:
+        decision = "admitted"
+        if ticket.deadline is not None and self.settings.admission != ADMISSION_OFF:
+            ticket.projected_finish = self._projected_finish(ticket)
+            due = ticket.deadline - self.settings.deadline_margin_seconds
+            if ticket.projected_finish > due:
+                late = datetime.fromtimestamp(ticket.projected_finish).strftime("%Y-%m-%d %H:%M")
+                message = (f"{ticket.platform} job for {ticket.account or 'default account'} would finish around {late}, "
+                           f"after its publish time {datetime.fromtimestamp(ticket.deadline).strftime('%Y-%m-%d %H:%M')}")
+                if self.settings.admission == ADMISSION_REJECT:
+                    metrics.increment("sau_scheduler_admissions_total", platform=ticket.platform, decision="rejected")
+                    raise AdmissionRejected(message)
+                ticket.deferred = True
+                decision = "deferred"
+                logger.warning(f"{message}; deferring it behind jobs that can still make their deadline")
+        metrics.increment("sau_scheduler_admissions_total", platform=ticket.platform, decision=decision)
+
+    def _enqueue(self, ticket: JobTicket) -> None:
+        with self._lock:
+            ticket.seq = next(self._seq)
+            self._admit(ticket)
+            self._waiting.append(ticket)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start waiting jobs in order while there are free slots; called with the lock held."""
+        running_per_platform: dict[str, int] = {}
+        for ticket in self._running:
+            running_per_platform[ticket.platform] = running_per_platform.get(ticket.platform, 0) + 1
+        for ticket in sorted(self._waiting, key=self._order):
+            if len(self._running) >= self.concurrency:
+                break
+            if running_per_platform.get(ticket.platform, 0) >= self.platform_limit(ticket.platform):
+                continue
+            for flow, weight in self._flows(ticket):
+                start = self._start_tag(flow)
+                self._virtual_time[flow[0]] = start
+                self._finish_tags[flow] = start + 1.0 / max(weight, 1e-6)
+            self._waiting.remove(ticket)
+            self._running.append(ticket)
+            running_per_platform[ticket.platform] = running_per_platform.get(ticket.platform, 0) + 1
+            ticket.wake()
+
+    def _release(self, ticket: JobTicket) -> None:
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+            elif ticket in self._running:
+                self._running.remove(ticket)
+            self._dispatch()
+
+    def _ticket(self, platform, account, priority, operator, deadline, size) -> JobTicket:
+        priority = priority or self.settings.default_priority
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITY_CLASSES)}")
+        return JobTicket(platform, account or "", operator or "", priority, deadline_from(deadline), size)
+
+    @asynccontextmanager
+    async def slot(self, platform: str, account: str = "", *, priority: str | None = None, operator: str = "",
+                   deadline=None, size: int | None = None):
+        """
+        Wait for this job's turn.
+        :param deadline: publish_date of the job (datetime / timestamp), or None / 0
+        :param size: bytes to upload, for the duration estimate
+        :raises AdmissionRejected: the job cannot finish before its deadline and admission is "reject"
+        """
+        ticket = self._ticket(platform, account, priority, operator, deadline, size)
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+
+        ticket.wake = wake
+        self._enqueue(ticket)
+        try:
+            await started
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    @contextmanager
+    def hold(self, platform: str, account: str = "", *, priority: str | None = None, operator: str = "",
+             deadline=None, size: int | None = None):
+        """Blocking slot() for request-handler threads."""
+        ticket = self._ticket(platform, account, priority, operator, deadline, size)
+        started = threading.Event()
+        ticket.wake = started.set
+        self._enqueue(ticket)
+        try:
+            started.wait()
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._waiting),
+                "deferred": sum(1 for ticket in self._waiting if ticket.deferred),
+            }
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Iterable
+
+from conf import BASE_DIR
+from utils.browser_processes import sample_process
+
+try:
+    # 在 conf.py 里用 METRICS 调整指标快照目录和写出周期，见 conf.example.py
+    from conf import METRICS
+except ImportError:
+    METRICS = {}
+
+Key = tuple[str, tuple[tuple[str, str], ...]]
+
+# 覆盖从毫秒级的 HTTP 请求到一小时的上传
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+METRICS_DIR = Path(METRICS.get("directory") or BASE_DIR / "db" / "metrics")
+FLUSH_INTERVAL_SECONDS = METRICS.get("flush_interval_seconds", 15)
+# 已退出进程的快照保留这么久，之后从汇总里消失
+RETENTION_HOURS = METRICS.get("retention_hours", 24)
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+# 每个线程只写自己的分片，热路径上不加锁；读的时候再把所有分片加起来
+_local = threading.local()
+_shards: list[tuple[threading.Thread, defaultdict]] = []
+# 已退出线程的分片合并到这里
+_retired: defaultdict = defaultdict(float)
+_read_lock = threading.Lock()
+_types: dict[str, str] = {}
+_collectors: list[Callable[[], Iterable[tuple[str, dict, float]]]] = []
+_flusher: threading.Thread | None = None
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _shard() -> defaultdict:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = defaultdict(float)
+        with _read_lock:
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+def increment(name: str, value: float = 1.0, **labels) -> None:
+    """
+    Add `value` to the counter `name` with the given labels.
+    :param name: Metric name, e.g. sau_retry_total
+    :param value: Amount to add
+    """
+    _types.setdefault(name, "counter")
+    _shard()[_key(name, labels)] += value
+
+
+def add_gauge(name: str, delta: float, **labels) -> None:
+    """Move the gauge `name` up or down, e.g. +1 when a login starts and -1 when it ends."""
+    _types.setdefault(name, "gauge")
+    _shard()[_key(name, labels)] += delta
+
+
+def observe(name: str, value: float, buckets: Iterable[float] = DEFAULT_BUCKETS, **labels) -> None:
+    """
+    Record one observation in the histogram `name` (cumulative buckets, _sum and _count).
+    :param name: Family name without suffix, e.g. sau_http_request_duration_seconds
+    :param value: Observed value, seconds for durations
+    """
+    shard = _shard()
+    for suffix in HISTOGRAM_SUFFIXES:
+        _types.setdefault(name + suffix, "histogram")
+    for bound in (*buckets, math.inf):
+        if value <= bound:
+            shard[_key(name + "_bucket", {**labels, "le": _format_bound(bound)})] += 1
+    shard[_key(name + "_sum", labels)] += value
+    shard[_key(name + "_count", labels)] += 1
+
+
+def register_collector(collector: Callable[[], Iterable[tuple[str, dict, float]]]) -> None:
+    """
+    Add a callback read at snapshot time for point-in-time gauges (pool usage, queue
+    depth). It returns (name, labels, value) tuples.
+    """
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def _values() -> dict[Key, float]:
+    with _read_lock:
+        alive = []
+        for thread, shard in _shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for key, value in shard.copy().items():
+                    _retired[key] += value
+        _shards[:] = alive
+        totals = defaultdict(float, _retired)
+        for _thread, shard in alive:
+            for key, value in shard.copy().items():
+                totals[key] += value
+    for collector in list(_collectors):
+        try:
+            samples = list(collector())
+        except Exception:
+            continue
+        for name, labels, value in samples:
+            _types.setdefault(name, "gauge")
+            totals[_key(name, labels)] = value
+    return totals
+
+
+def get(name: str, **labels) -> float:
+    return _values().get(_key(name, labels), 0.0)
+
+
+def snapshot() -> list[dict]:
+    return [
+        {"name": name, "labels": dict(labels), "value": value, "type": _types.get(name, "counter")}
+        for (name, labels), value in _values().items()
+    ]
+
+
+def reset() -> None:
+    with _read_lock:
+        for _thread, shard in _shards:
+            shard.clear()
+        _retired.clear()
+
+
+def _after_fork_in_child() -> None:
+    # 子进程继承了父进程的计数，不清掉会在汇总时重复计算
+    global _flusher
+    with _read_lock:
+        current = getattr(_local, "shard", None)
+        for _thread, shard in _shards:
+            shard.clear()
+        _shards[:] = [(threading.current_thread(), current)] if current is not None else []
+        _retired.clear()
+    _flusher = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _process_token() -> tuple[int, int]:
+    sample = sample_process(os.getpid())
+    return os.getpid(), sample.start_ticks if sample else 0
+
+
+def _process_alive(pid: int, start_ticks: int) -> bool:
+    sample = sample_process(pid)
+    if sample is not None:
+        return sample.start_ticks == start_ticks
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def write_snapshot(directory: str | Path | None = None) -> Path:
+    """
+    Write this process's samples to <directory>/<pid>-<start>.json (atomically), where
+    `collect()` in any other process picks them up.
+    """
+    directory = Path(directory or METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    pid, start_ticks = _process_token()
+    path = directory / f"{pid}-{start_ticks}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({
+        "pid": pid,
+        "start_ticks": start_ticks,
+        "written_at": time.time(),
+        "samples": snapshot(),
+    }), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def collect(directory: str | Path | None = None, clock=time.time) -> list[dict]:
+    """
+    Samples of this process plus the last snapshot of every other process: counters
+    and histograms are summed, gauges only count for processes that are still running.
+    Snapshots of processes that exited more than RETENTION_HOURS ago are deleted.
+    """
+    directory = Path(directory or METRICS_DIR)
+    pid, start_ticks = _process_token()
+    totals: defaultdict = defaultdict(float)
+    types: dict[str, str] = {}
+
+    def add(samples: list[dict]) -> None:
+        for sample in samples:
+            totals[_key(sample["name"], sample["labels"])] += sample["value"]
+            types.setdefault(sample["name"], sample.get("type", "counter"))
+
+    add(snapshot())
+    for path in sorted(directory.glob("*.json")) if directory.is_dir() else []:
+        if path.stem == f"{pid}-{start_ticks}":
+            continue
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        alive = _process_alive(data["pid"], data["start_ticks"])
+        if not alive and clock() - data["written_at"] > RETENTION_HOURS * 3600:
+            path.unlink(missing_ok=True)
+            continue
+        add([sample for sample in data["samples"] if alive or sample.get("type") != "gauge"])
+    return [
+        {"name": name, "labels": dict(labels), "value": value, "type": types[name]}
+        for (name, labels), value in totals.items()
+    ]
+
+
+def start_flushing(directory: str | Path | None = None, interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+    """Write this process's snapshot every `interval` seconds and at exit (idempotent)."""
+    global _flusher
+    if METRICS.get("enabled", True) is False or (_flusher is not None and _flusher.is_alive()):
+        return
+
+    def flush() -> None:
+        try:
+            write_snapshot(directory)
+        except OSError:
+            pass
+
+    def loop() -> None:
+        while True:
+            time.sleep(interval)
+            flush()
+
+    atexit.register(flush)
+    _flusher = threading.Thread(target=loop, name="sau-metrics-flusher", daemon=True)
+    _flusher.start()
+
+
+def _family(name: str, metric_type: str) -> str:
+    if metric_type == "histogram":
+        for suffix in HISTOGRAM_SUFFIXES:
+            if name.endswith(suffix):
+                return name[:-len(suffix)]
+    return name
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(samples: list[dict] | None = None) -> str:
+    """Samples (default: `collect()`) in the Prometheus text exposition format 0.0.4."""
+    samples = collect() if samples is None else samples
+    families: dict[str, list[dict]] = defaultdict(list)
+    family_types: dict[str, str] = {}
+    for sample in samples:
+        family = _family(sample["name"], sample["type"])
+        families[family].append(sample)
+        family_types[family] = sample["type"]
+
+    def order(sample: dict) -> tuple:
+        labels = {k: v for k, v in sample["labels"].items() if k != "le"}
+        suffix = sample["name"][len(_family(sample["name"], sample["type"])):]
+        le = sample["labels"].get("le")
+        return sorted(labels.items()), HISTOGRAM_SUFFIXES.index(suffix) if suffix else 0, float(le) if le else 0
+
+    lines = []
+    for family in sorted(families):
+        lines.append(f"# TYPE {family} {family_types[family]}")
+        for sample in sorted(families[family], key=order):
+            lines.append(f"{sample['name']}{_format_labels(sample['labels'])} {_format_value(sample['value'])}")
+    return "\n".join(lines) + "\n"
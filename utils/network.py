@@ -1,28 +1,26 @@
-import asyncio
-import time
-from functools import wraps
+import threading
 
+import requests
+from requests.adapters import HTTPAdapter
 
-def async_retry(timeout=60, max_retries=None):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            start_time = time.time()
-            attempts = 0
-            while True:
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if max_retries is not None and attempts >= max_retries:
-                        print(f"Reached maximum retries of {max_retries}.")
-                        raise Exception(f"Failed after {max_retries} retries.") from e
-                    if time.time() - start_time > timeout:
-                        print(f"Function timeout after {timeout} seconds.")
-                        raise TimeoutError(f"Function execution exceeded {timeout} seconds timeout.") from e
-                    print(f"Attempt {attempts} failed: {e}. Retrying...")
-                    await asyncio.sleep(1)  # Sleep to avoid tight loop or provide backoff logic here
+_http_sessions: dict[tuple[int, str | None], requests.Session] = {}
+_http_lock = threading.Lock()
 
-        return wrapper
 
-    return decorator
\ No newline at end of file
+def pooled_http_session(pool_size: int = 4, proxy: str | None = None) -> requests.Session:
+    """
+    Process-wide keep-alive connection pool for direct-to-API upload engines, shared by
+    every job with the same pool size and proxy. The pool never resends a request body
+    on its own: callers retry from the offset the server acknowledged.
+    """
+    with _http_lock:
+        key = (pool_size, proxy)
+        if key not in _http_sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if proxy:
+                session.proxies = {"http": proxy, "https": proxy}
+            _http_sessions[key] = session
+        return _http_sessions[key]
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+
+from utils import metrics
+
+# 每个检查项在页面里的求值逻辑；text 只按 textContent 归一化空白后匹配，匹配到的元素里取第一个报告状态
+_PROBE_BODY = """
+    const normalize = s => (s || '').replace(/\\s+/g, ' ').trim();
+    const isVisible = el => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    const byText = (texts, exact) => {
+        const found = [];
+        const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            const parent = node.parentElement;
+            if (!parent || ['SCRIPT', 'STYLE', 'NOSCRIPT'].includes(parent.tagName) || found.includes(parent)) continue;
+            const text = normalize(parent.textContent).toLowerCase();
+            if (texts.some(t => exact ? text === t.toLowerCase() : text.includes(t.toLowerCase()))) found.push(parent);
+        }
+        return found;
+    };
+    const result = {};
+    for (const [key, check] of Object.entries(checks)) {
+        let matches;
+        if (check.selector) {
+            matches = Array.from(document.querySelectorAll(check.selector));
+            if (check.text) {
+                matches = matches.filter(el => {
+                    const text = normalize(el.textContent);
+                    return check.text.some(t => check.exact ? text === t : text.includes(t));
+                });
+            }
+        } else {
+            matches = byText(check.text, check.exact);
+        }
+        const first = matches[0];
+        result[key] = first ? [
+            matches.length,
+            isVisible(first),
+            !first.disabled && first.getAttribute('aria-disabled') !== 'true',
+            normalize(first.innerText === undefined ? first.textContent : first.innerText).slice(0, 200),
+        ] : [0, false, false, ''];
+    }
+    return result;
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class ProbeCheck:
+    """
+    One thing a polling loop looks at: elements matching a CSS `selector`, optionally
+    only those whose text contains (or, with `exact`, equals) one of `text`; without a
+    selector, the elements directly holding one of `text`, like get_by_text().
+    """
+
+    selector: str | None = None
+    text: tuple[str, ...] = ()
+    exact: bool = False
+
+    def __post_init__(self):
+        if isinstance(self.text, str):
+            object.__setattr__(self, "text", (self.text,))
+        if not self.selector and not self.text:
+            raise ValueError("a probe check needs a selector or a text")
+
+
+@dataclass(frozen=True, slots=True)
+class ElementState:
+    """Snapshot of a check: how many elements match, and whether the first one is visible / enabled."""
+
+    count: int = 0
+    visible: bool = False
+    enabled: bool = False
+    text: str = ""
+
+
+class PageProbe:
+    """
+    A platform's page state read in a single page.evaluate() round trip, for loops
+    that poll every second or so: instead of a count() and an is_visible() per element
+    per iteration (each its own CDP round trip), the loop branches on one snapshot.
+    `prelude` is JS run first in the same call, e.g. removing overlays that block clicks.
+    """
+
+    def __init__(self, platform: str, checks: dict[str, ProbeCheck], prelude: str = ""):
+        self.platform = platform
+        self.checks = checks
+        self._spec = {key: {"selector": check.selector, "text": list(check.text), "exact": check.exact}
+                      for key, check in checks.items()}
+        self.script = "(checks) => {\n" + (f"try {{ {prelude} }} catch (e) {{}}\n" if prelude else "") + _PROBE_BODY + "}"
+
+    async def snapshot(self, page) -> dict[str, ElementState]:
+        raw = await page.evaluate(self.script, self._spec)
+        metrics.increment("sau_page_probes_total", platform=self.platform)
+        return {key: ElementState(*raw.get(key, ())) for key in self.checks}
+
+    def describe(self, state: dict[str, ElementState]) -> str:
+        """Compact one-line form of a snapshot for debug logs."""
+        return json.dumps({key: asdict(value) for key, value in state.items() if value.count}, ensure_ascii=False)
@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable
+
+from loguru import logger
+
+from utils import metrics
+from utils.job_phase import CHECKPOINT_PUBLISHED, current_tracker, track_job
+from utils.retry import FatalError
+from utils.state_db import StateStore
+
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+_DIGEST_CACHE_SIZE = 256
+_digest_cache: dict[tuple, str] = {}
+_digest_lock = threading.Lock()
+
+# 发布中的认领：租约到期前别的任务不能再发同一内容；任务活着时每 CLAIM_RENEW_SECONDS 续一次
+CLAIM_LEASE_SECONDS = 300
+CLAIM_RENEW_SECONDS = 60
+CLAIM_PENDING = "pending"
+# 点了发布却没拿到作品 ID 就失败：不知道平台有没有收下，等人工确认后 `sau published forget`
+CLAIM_UNKNOWN = "unknown"
+# 失败时已经进入这些阶段，平台可能已经收下作品
+PUBLISH_PHASES = ("publish",)
+
+
+class PublishInProgress(FatalError):
+    """The content is being published by another job, or an earlier attempt may already have published it."""
+
+
+@dataclass(frozen=True, slots=True)
+class PublishResponseRule:
+    """Where a platform's publish API answers and which JSON keys carry the new post ID."""
+
+    url_patterns: tuple[str, ...]
+    id_keys: tuple[str, ...]
+    url_template: str | None = None
+
+
+# 各平台发布接口：URL 包含任一片段的 POST 响应会被解析，按 id_keys 顺序找作品 ID
+PUBLISH_RESPONSE_RULES = {
+    "douyin": PublishResponseRule(
+        ("/web/api/media/aweme/create",),
+        ("item_id", "aweme_id"),
+        "https://www.douyin.com/video/{post_id}",
+    ),
+    "kuaishou": PublishResponseRule(
+        ("/rest/cp/works/v2/video/pc/submit", "/rest/cp/works/v2/photo/pc/submit"),
+        ("photoId", "photo_id", "workId"),
+        "https://www.kuaishou.com/short-video/{post_id}",
+    ),
+    "xiaohongshu": PublishResponseRule(
+        ("/web_api/sns/v2/note",),
+        ("note_id", "id"),
+        "https://www.xiaohongshu.com/explore/{post_id}",
+    ),
+    "tencent": PublishResponseRule(
+        ("/post/post_create",),
+        ("exportId", "objectId", "object_id"),
+    ),
+    "tiktok": PublishResponseRule(
+        ("/tiktok/web/project/post",),
+        ("item_id", "aweme_id"),
+        "https://www.tiktok.com/@/video/{post_id}",
+    ),
+    "youtube": PublishResponseRule(
+        ("/youtubei/v1/upload/createvideo",),
+        ("videoId",),
+        "https://www.youtube.com/watch?v={post_id}",
+    ),
+    "bilibili": PublishResponseRule(
+        ("/x/vu/web/add",),
+        ("bvid", "aid"),
+        "https://www.bilibili.com/video/{post_id}",
+    ),
+    "baijiahao": PublishResponseRule(
+        ("/pcui/article/publish",),
+        ("article_id", "nid"),
+    ),
+    "weibo": PublishResponseRule(
+        ("/ajax/statuses/update",),
+        ("idstr", "mid"),
+        "https://weibo.com/detail/{post_id}",
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class PublishedPost:
+    idempotency_key: str
+    platform: str
+    account: str
+    title: str
+    post_id: str | None
+    post_url: str | None
+    published_at: float
+
+
+def file_digest(paths: Iterable[str | Path]) -> str:
+    """
+    SHA-256 over the content of every file, in order. Results are cached per file
+    path, size and mtime, so the jobs of one publish plan hash a video only once.
+    :param paths: Video file, or image files of a note
+    :returns: hex digest
+    """
+    paths = [Path(path) for path in paths]
+    signature = tuple((str(path.resolve()), stat.st_size, stat.st_mtime_ns) for path in paths for stat in [path.stat()])
+    with _digest_lock:
+        cached = _digest_cache.get(signature)
+    if cached is not None:
+        return cached
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as handle:
+            while chunk := handle.read(_DIGEST_CHUNK_SIZE):
+                digest.update(chunk)
+        digest.update(b"\0")
+    with _digest_lock:
+        if len(_digest_cache) >= _DIGEST_CACHE_SIZE:
+            _digest_cache.pop(next(iter(_digest_cache)))
+        _digest_cache[signature] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def idempotency_key(platform: str, account: str, files: Iterable[str | Path], title: str) -> str:
+    """
+    Key identifying "this content on this account": the same files with the same title
+    published again by the same account map to the same key.
+    :returns: hex digest
+    """
+    raw = json.dumps([platform, account, file_digest(files), (title or "").strip()], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def extract_post_id(payload, id_keys: Iterable[str]) -> str | None:
+    """
+    Find the first non-empty value for any of `id_keys` in a JSON payload, trying keys
+    in order and searching nested objects breadth-first.
+    """
+    for key in id_keys:
+        pending = [payload]
+        while pending:
+            node = pending.pop(0)
+            if isinstance(node, dict):
+                value = node.get(key)
+                if isinstance(value, (str, int)) and not isinstance(value, bool) and str(value) not in ("", "0"):
+                    return str(value)
+                pending.extend(node.values())
+            elif isinstance(node, list):
+                pending.extend(node)
+    return None
+
+
+def record_post_id(platform: str, post_id: str | None) -> None:
+    """Record a post ID read from the page (e.g. the creator's post list) on the current job."""
+    tracker = current_tracker()
+    if post_id is None or tracker is None or tracker.post_id is not None:
+        return
+    rule = PUBLISH_RESPONSE_RULES.get(platform)
+    tracker.post_id = str(post_id)
+    tracker.post_url = rule.url_template.format(post_id=post_id) if rule and rule.url_template else None
+
+
+def watch_publish_responses(page, platform: str) -> None:
+    """
+    Record the post ID and URL from the platform's publish API response on the current
+    job tracker (see utils.job_phase.track_job). Safe to call for platforms without a
+    rule or outside a tracked job.
+    """
+    rule = PUBLISH_RESPONSE_RULES.get(platform)
+    tracker = current_tracker()
+    if rule is None or tracker is None:
+        return
+    pending_tasks = set()
+
+    async def capture(response):
+        try:
+            if response.request.method != "POST" or response.status >= 400:
+                return
+            post_id = extract_post_id(await response.json(), rule.id_keys)
+        except Exception:
+            return
+        if post_id is None or tracker.post_id is not None:
+            return
+        tracker.post_id = post_id
+        tracker.post_url = rule.url_template.format(post_id=post_id) if rule.url_template else None
+        logger.info(f"{platform} publish response returned post {post_id}")
+
+    def on_response(response):
+        if not any(pattern in response.url for pattern in rule.url_patterns):
+            return
+        task = asyncio.ensure_future(capture(response))
+        pending_tasks.add(task)
+        task.add_done_callback(pending_tasks.discard)
+
+    page.on("response", on_response)
+
+
+class PublishLedger(StateStore):
+    """
+    Record of what was actually published, keyed by idempotency_key().
+    Stored in the shared state database, so a job retried by the backend, the CLI or a
+    batch run finds the earlier publish and skips the browser flow. While a job runs it
+    holds a leased claim on the key, so two identical jobs started at the same time
+    (a batch and the watch folder, the backend and the CLI) cannot both publish.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS published_posts (
+            idempotency_key TEXT PRIMARY KEY,
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            title TEXT NOT NULL,
+            post_id TEXT,
+            post_url TEXT,
+            published_at REAL NOT NULL
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS publish_claims (
+            idempotency_key TEXT PRIMARY KEY,
+            platform TEXT NOT NULL,
+            account TEXT NOT NULL,
+            status TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            claimed_at REAL NOT NULL,
+            lease_until REAL
+        )''',
+    )
+
+    def __init__(self, db_path: str | Path | None = None, clock=time.time):
+        self.db_path = db_path
+        self.clock = clock
+
+    def lookup(self, key: str) -> PublishedPost | None:
+        conn = self._connect(create=False)
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT idempotency_key, platform, account, title, post_id, post_url, published_at "
+                "FROM published_posts WHERE idempotency_key = ?",
+                (key,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return PublishedPost(*row) if row else None
+
+    def record(self, key: str, platform: str, account: str, title: str,
+               post_id: str | None = None, post_url: str | None = None) -> PublishedPost:
+        post = PublishedPost(key, platform, account, title or "", post_id, post_url, self.clock())
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO published_posts "
+                "(idempotency_key, platform, account, title, post_id, post_url, published_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (post.idempotency_key, post.platform, post.account, post.title,
+                 post.post_id, post.post_url, post.published_at),
+            )
+        finally:
+            conn.close()
+        return post
+
+    def forget(self, key: str) -> bool:
+        """Drop a record, or an unknown-outcome claim, so the same content can deliberately be published again."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return False
+        try:
+            posts = conn.execute("DELETE FROM published_posts WHERE idempotency_key = ?", (key,)).rowcount
+            claims = conn.execute("DELETE FROM publish_claims WHERE idempotency_key = ?", (key,)).rowcount
+            return posts + claims > 0
+        finally:
+            conn.close()
+
+    def claim(self, key: str, platform: str, account: str) -> tuple[PublishedPost | None, str | None]:
+        """
+        Atomically check the ledger and claim `key` for this job.
+        :returns: (existing post, None) when already published, else (None, claim token)
+        :raises PublishInProgress: another job holds a live claim, or an earlier attempt's outcome is unknown
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT idempotency_key, platform, account, title, post_id, post_url, published_at "
+                "FROM published_posts WHERE idempotency_key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return PublishedPost(*row), None
+            now = self.clock()
+            held = conn.execute(
+                "SELECT status, lease_until FROM publish_claims WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+            if held is not None:
+                status, lease_until = held
+                if status == CLAIM_UNKNOWN:
+                    conn.execute("ROLLBACK")
+                    raise PublishInProgress(
+                        f"An earlier {platform}/{account} attempt may already have published this content; "
+                        f"check the account, then run `sau published forget {key}` to publish it again"
+                    )
+                if lease_until is not None and lease_until > now:
+                    conn.execute("ROLLBACK")
+                    raise PublishInProgress(f"{platform}/{account} is already publishing this content in another job")
+                logger.warning(f"{platform}/{account}: taking over the expired publish claim on {key}")
+            token = uuid.uuid4().hex
+            conn.execute(
+                "INSERT OR REPLACE INTO publish_claims "
+                "(idempotency_key, platform, account, status, owner, claimed_at, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, platform, account, CLAIM_PENDING, token, now, now + CLAIM_LEASE_SECONDS),
+            )
+            conn.execute("COMMIT")
+            return None, token
+        finally:
+            conn.close()
+
+    def renew(self, key: str, token: str) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE publish_claims SET lease_until = ? WHERE idempotency_key = ? AND owner = ? AND status = ?",
+                (self.clock() + CLAIM_LEASE_SECONDS, key, token, CLAIM_PENDING),
+            ).rowcount > 0
+        finally:
+            conn.close()
+
+    def resolve(self, key: str, token: str, post: PublishedPost | None = None, unknown: bool = False) -> None:
+        """
+        End this job's claim: record `post` and drop the claim in one transaction, keep
+        the claim as CLAIM_UNKNOWN, or just release it so a retry may publish.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if post is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO published_posts "
+                    "(idempotency_key, platform, account, title, post_id, post_url, published_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (post.idempotency_key, post.platform, post.account, post.title,
+                     post.post_id, post.post_url, post.published_at),
+                )
+            if unknown and post is None:
+                conn.execute(
+                    "UPDATE publish_claims SET status = ?, lease_until = NULL WHERE idempotency_key = ? AND owner = ?",
+                    (CLAIM_UNKNOWN, key, token),
+                )
+            else:
+                conn.execute("DELETE FROM publish_claims WHERE idempotency_key = ? AND owner = ?", (key, token))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    async def _keep_claim(self, key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(CLAIM_RENEW_SECONDS)
+            try:
+                await asyncio.to_thread(self.renew, key, token)
+            except sqlite3.Error as exc:
+                logger.warning(f"Could not renew the publish claim on {key}: {exc}")
+
+    def recent(self, platform: str | None = None, limit: int = 50) -> list[PublishedPost]:
+        conn = self._connect(create=False)
+        if conn is None:
+            return []
+        try:
+            query = ("SELECT idempotency_key, platform, account, title, post_id, post_url, published_at "
+                     "FROM published_posts")
+            params: tuple = ()
+            if platform:
+                query += " WHERE platform = ?"
+                params = (platform,)
+            rows = conn.execute(query + " ORDER BY published_at DESC LIMIT ?", (*params, limit)).fetchall()
+        finally:
+            conn.close()
+        return [PublishedPost(*row) for row in rows]
+
+    async def publish_once(
+        self,
+        key: str,
+        platform: str,
+        account: str,
+        title: str,
+        publish: Callable[[], Awaitable[object]],
+    ) -> PublishedPost:
+        """
+        Run `publish` unless the content behind `key` (see idempotency_key) was already
+        published or is being published by another job (see claim). When the publish flow
+        fails after the platform already returned a post ID (e.g. a timeout waiting for the
+        redirect), the post is still recorded before re-raising, so the retry
+        short-circuits instead of posting twice. When it fails at the publish step without
+        a post ID, the claim is kept as unknown until `sau published forget`.
+        :returns: the new record, or the existing one when skipped
+        :raises PublishInProgress: see claim()
+        """
+        existing, token = self.claim(key, platform, account)
+        if existing is not None:
+            metrics.increment("sau_publish_deduplicated_total", platform=platform)
+            logger.info(f"{platform}/{account} already published this content"
+                        f"{f' as {existing.post_id}' if existing.post_id else ''}, skipping")
+            return existing
+
+        tracker = current_tracker()
+        with nullcontext(tracker) if tracker is not None else track_job(platform) as tracker:
+            keeper = asyncio.ensure_future(self._keep_claim(key, token))
+            try:
+                await publish()
+            except BaseException:
+                if tracker.post_id is not None:
+                    self.resolve(key, token, self._post(key, platform, account, title, tracker))
+                    logger.warning(f"{platform}/{account} failed after the platform accepted post "
+                                   f"{tracker.post_id}; recorded it so a retry will not post again")
+                elif tracker.phase in PUBLISH_PHASES or CHECKPOINT_PUBLISHED in tracker.checkpoints:
+                    self.resolve(key, token, unknown=True)
+                    logger.warning(f"{platform}/{account} failed while publishing without a post ID; "
+                                   f"not retrying it automatically, run `sau published forget {key}` once checked")
+                else:
+                    self.resolve(key, token)
+                raise
+            finally:
+                keeper.cancel()
+            post = self._post(key, platform, account, title, tracker)
+            self.resolve(key, token, post)
+            return post
+
+    def _post(self, key: str, platform: str, account: str, title: str, tracker) -> PublishedPost:
+        return PublishedPost(key, platform, account, title or "", tracker.post_id, tracker.post_url, self.clock())
+
+
+publish_ledger = PublishLedger()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import cv2
+from loguru import logger
+
+from conf import BASE_DIR
+from utils.publish_ledger import file_digest
+
+# 抽取的封面按内容摘要命名，同一个视频再发一次直接复用
+COVER_DIR = Path(BASE_DIR) / "videoFile" / "covers"
+COVER_AUTO = "auto"
+# 默认在视频 10% 处取封面（最多第 5 秒），避开片头黑屏
+COVER_AT_FRACTION = 0.1
+COVER_AT_MAX_SECONDS = 5.0
+
+# 各平台标题上限，和各上传器里实际截断的长度一致
+TITLE_LIMITS = {
+    "douyin": 30,
+    "xiaohongshu": 20,
+    "bilibili": 80,
+    "youtube": 100,
+    "alipay": 30,
+    "baijiahao": 30,
+    "weibo": 30,
+    "hupu": 40,
+}
+TAG_LIMITS = {"kuaishou": 3, "xiaohongshu": 10}
+# 分横竖两个封面位的平台：按视频方向填对应的那个
+ORIENTED_COVER_PLATFORMS = {"douyin", "tencent"}
+
+
+@dataclass(frozen=True, slots=True)
+class VideoProbe:
+    duration: float
+    width: int
+    height: int
+    fps: float
+
+    @property
+    def orientation(self) -> str:
+        return "portrait" if self.height > self.width else "landscape"
+
+
+@dataclass(slots=True)
+class PreparedAsset:
+    """Everything about one video that is the same for every platform, computed once per plan."""
+
+    path: Path
+    size: int
+    digest: str
+    probe: VideoProbe
+    cover: Path | None = None
+    warnings: list[str] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        return {
+            "file": str(self.path),
+            "size": self.size,
+            "sha256": self.digest,
+            "probe": {**asdict(self.probe), "orientation": self.probe.orientation},
+            "cover": str(self.cover) if self.cover else None,
+            "warnings": list(self.warnings),
+        }
+
+
+def probe_video(path: str | Path) -> VideoProbe:
+    """Duration, resolution and frame rate; a file no platform could play fails here, before any upload."""
+    capture = cv2.VideoCapture(str(path))
+    try:
+        if not capture.isOpened():
+            raise ValueError(f"Not a readable video: {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+    finally:
+        capture.release()
+    if not width or not height:
+        raise ValueError(f"Video has no picture: {path}")
+    return VideoProbe(round(frames / fps, 3) if fps else 0.0, width, height, round(fps, 3))
+
+
+def extract_cover(path: str | Path, probe: VideoProbe, destination: Path, at_seconds: float | None = None) -> Path:
+    """Save one frame as a JPEG cover; by default 10% into the video, at most 5s in."""
+    if at_seconds is None:
+        at_seconds = min(probe.duration * COVER_AT_FRACTION, COVER_AT_MAX_SECONDS)
+    capture = cv2.VideoCapture(str(path))
+    try:
+        capture.set(cv2.CAP_PROP_POS_MSEC, max(0.0, at_seconds) * 1000)
+        ok, frame = capture.read()
+        if not ok:
+            # 个别容器不支持按时间定位，退回第一帧
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        raise ValueError(f"Could not read a frame for the cover from {path}")
+    # Windows 下 cv2.imwrite 对中文路径不稳定，先编码再自己写
+    encoded, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    if not encoded:
+        raise ValueError(f"Could not encode the cover frame of {path}")
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    destination.write_bytes(data.tobytes())
+    return destination
+
+
+def normalize_title(platform: str, title: str) -> str:
+    title = re.sub(r"\s+", " ", title or "").strip()
+    limit = TITLE_LIMITS.get(platform)
+    return title[:limit] if limit else title
+
+
+def normalize_tags(platform: str, tags: list[str] | str | None) -> list[str]:
+    """Tags without '#' or inner spaces, deduplicated case-insensitively, cut to the platform's limit."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    result: list[str] = []
+    seen: set[str] = set()
+    for tag in tags or []:
+        cleaned = re.sub(r"\s+", "", str(tag)).lstrip("#")
+        if cleaned and cleaned.lower() not in seen:
+            seen.add(cleaned.lower())
+            result.append(cleaned)
+    limit = TAG_LIMITS.get(platform)
+    return result[:limit] if limit else result
+
+
+def prepare_asset(
+    path: str | Path,
+    cover: str | Path | None = None,
+    cover_at: float | None = None,
+    cover_dir: Path = COVER_DIR,
+) -> PreparedAsset:
+    """
+    Validate, hash, probe and (with cover="auto") extract a cover for one video. The hash
+    lands in file_digest()'s cache, so every platform job's publish-ledger key reuses it.
+    :param cover: "auto" to extract a frame, a cover image path, or None for platform defaults
+    """
+    path = Path(path).resolve()
+    if not path.is_file():
+        raise FileNotFoundError(f"Video file not found: {path}")
+    probe = probe_video(path)
+    asset = PreparedAsset(path, path.stat().st_size, file_digest([path]), probe)
+    if cover == COVER_AUTO:
+        name = asset.digest[:16] if cover_at is None else f"{asset.digest[:16]}-{cover_at:g}s"
+        destination = cover_dir / f"{name}.jpg"
+        asset.cover = destination if destination.exists() else extract_cover(path, probe, destination, cover_at)
+    elif cover:
+        asset.cover = Path(cover).resolve()
+        if not asset.cover.is_file():
+            raise FileNotFoundError(f"Cover image not found: {asset.cover}")
+    if probe.duration <= 0:
+        asset.warnings.append("video duration could not be read")
+    return asset
+
+
+def _cover_field(platform: str, orientation: str) -> str:
+    if platform in ORIENTED_COVER_PLATFORMS:
+        return f"thumbnail_{orientation}"
+    return "thumbnail"
+
+
+def plan_rows(asset: PreparedAsset, targets: list[dict], title: str, desc: str = "", tags=None) -> list[dict]:
+    """
+    One `sau batch` row per target. A target's own title / tags / desc / cover fields win
+    over the plan's; titles and tags are normalized per platform either way.
+    """
+    rows = []
+    for target in targets:
+        row = {"action": "upload-video", **target, "file": str(asset.path)}
+        platform = row["platform"]
+        raw_title = str(row.get("title") or title)
+        row["title"] = normalize_title(platform, raw_title)
+        if row["title"] != re.sub(r"\s+", " ", raw_title).strip():
+            asset.warnings.append(f"{platform}: title cut to {len(row['title'])} characters")
+        row_tags = normalize_tags(platform, row["tags"] if "tags" in row else tags)
+        if row_tags:
+            row["tags"] = row_tags
+        else:
+            row.pop("tags", None)
+        if desc and not row.get("desc"):
+            row["desc"] = desc
+        elif platform == "bilibili" and not row.get("desc"):
+            # B 站必须有简介
+            row["desc"] = row["title"]
+        cover_field = _cover_field(platform, asset.probe.orientation)
+        if asset.cover and not any(key.startswith("thumbnail") for key in row):
+            row[cover_field] = str(asset.cover)
+        row["id"] = f"{asset.path.name}:{platform}:{row.get('account', '')}"
+        rows.append(row)
+    return rows
+
+
+def aggregate_results(asset: PreparedAsset, results: list[dict]) -> dict:
+    """The single result of a plan: the shared preparation plus one entry per platform job."""
+    failed = [record for record in results if record.get("status") != "ok"]
+    if failed:
+        logger.warning(f"Publish plan for {asset.path.name}: {len(failed)} of {len(results)} target(s) failed")
+    return {
+        **asset.summary(),
+        "status": "ok" if not failed else ("error" if len(failed) == len(results) else "partial"),
+        "ok": len(results) - len(failed),
+        "failed": len(failed),
+        "results": results,
+    }
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from utils.state_db import StateStore
+
+try:
+    # 在 conf.py 里用 RATE_LIMITS 覆盖默认限流，见 conf.example.py
+    from conf import RATE_LIMITS
+except ImportError:
+    RATE_LIMITS = {}
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    """Token bucket: up to `capacity` jobs back-to-back, then one more every `interval` seconds."""
+
+    capacity: float
+    interval: float
+
+    @property
+    def refill_rate(self) -> float:
+        return 1.0 / self.interval
+
+
+# 平台级：同一平台所有账号共享；账号级：同一个 (platform, account) 单独计数
+DEFAULT_PLATFORM_LIMIT = RateLimit(capacity=10, interval=6)
+DEFAULT_ACCOUNT_LIMIT = RateLimit(capacity=2, interval=300)
+
+
+class RateLimitTimeout(RuntimeError):
+    pass
+
+
+def _parse_limit(value) -> RateLimit | None:
+    if value is None:
+        return None
+    if isinstance(value, RateLimit):
+        return value
+    capacity, interval = value
+    return RateLimit(capacity=float(capacity), interval=float(interval))
+
+
+def resolve_limits(platform: str, overrides: dict | None = None) -> tuple[RateLimit | None, RateLimit | None]:
+    """
+    Resolve (platform_limit, account_limit) for a platform.
+    A limit explicitly configured as None disables that bucket.
+    """
+    config = (RATE_LIMITS if overrides is None else overrides).get(platform, {})
+    platform_limit = _parse_limit(config["platform"]) if "platform" in config else DEFAULT_PLATFORM_LIMIT
+    account_limit = _parse_limit(config["account"]) if "account" in config else DEFAULT_ACCOUNT_LIMIT
+    return platform_limit, account_limit
+
+
+class TokenBucketRateLimiter(StateStore):
+    """
+    Per-platform and per-(platform, account) token buckets persisted in SQLite.
+
+    Buckets live in the shared state database so limits survive restarts and are
+    enforced across the backend, CLI processes and batch workers. Both buckets are
+    checked and debited inside one `BEGIN IMMEDIATE` transaction, so two processes
+    can never spend the same token.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket_key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )''',
+    )
+
+    def __init__(self, db_path: str | Path | None = None, overrides: dict | None = None, clock=time.time):
+        self.db_path = db_path
+        self.overrides = overrides
+        self.clock = clock
+
+    def _buckets(self, platform: str, account: str | None) -> list[tuple[str, RateLimit]]:
+        platform_limit, account_limit = resolve_limits(platform, self.overrides)
+        buckets = []
+        if platform_limit is not None:
+            buckets.append((f"platform:{platform}", platform_limit))
+        if account and account_limit is not None:
+            buckets.append((f"account:{platform}:{account}", account_limit))
+        return buckets
+
+    def try_acquire(self, platform: str, account: str | None = None, spend: bool = True) -> float:
+        """
+        Take one token from every bucket that applies, or none of them.
+        :param spend: False only checks that a token is available and leaves it in the bucket
+        :returns: 0 when the job may start, otherwise seconds to wait before retrying
+        """
+        buckets = self._buckets(platform, account)
+        if not buckets:
+            return 0.0
+
+        conn = self._connect(create=spend)
+        if conn is None:
+            # 还没扣过任何令牌，所有桶都是满的
+            return 0.0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            levels = []
+            wait_seconds = 0.0
+            for key, limit in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    tokens = limit.capacity
+                else:
+                    elapsed = max(0.0, now - row[1])
+                    tokens = min(limit.capacity, row[0] + elapsed * limit.refill_rate)
+                levels.append((key, tokens))
+                if tokens < 1:
+                    wait_seconds = max(wait_seconds, (1 - tokens) / limit.refill_rate)
+
+            if wait_seconds > 0 or not spend:
+                conn.execute("ROLLBACK")
+                return wait_seconds
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limit_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?)",
+                [(key, tokens - 1, now) for key, tokens in levels],
+            )
+            conn.execute("COMMIT")
+            return 0.0
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _waits(self, platform: str, account: str | None, timeout: float | None, spend: bool):
+        """
+        The one wait loop behind `acquire` and `acquire_blocking`: yields how long to sleep
+        before trying again, and stops once a token was taken.
+        """
+        waited = 0.0
+        while True:
+            wait_seconds = self.try_acquire(platform, account, spend)
+            if wait_seconds <= 0:
+                return
+            if timeout is not None and waited + wait_seconds > timeout:
+                raise RateLimitTimeout(
+                    f"Rate limit for {platform}/{account or '*'} needs another {wait_seconds:.0f}s, exceeding the {timeout:.0f}s timeout"
+                )
+            logger.info(f"Rate limit reached for {platform}/{account or '*'}, waiting {wait_seconds:.1f}s")
+            yield wait_seconds
+            waited += wait_seconds
+
+    async def acquire(
+        self, platform: str, account: str | None = None, timeout: float | None = None, spend: bool = True
+    ) -> float:
+        """
+        Wait until a publish slot is available.
+        :param spend: False waits until a token is available without taking it; jobs do this
+            before queueing for a scheduler slot, so one account sitting out its bucket does
+            not hold a slot other accounts could use, and take the token once admitted
+        :returns: total seconds spent waiting
+        """
+        waited = 0.0
+        for wait_seconds in self._waits(platform, account, timeout, spend):
+            await asyncio.sleep(wait_seconds)
+            waited += wait_seconds
+        return waited
+
+    def acquire_blocking(
+        self, platform: str, account: str | None = None, timeout: float | None = None, spend: bool = True
+    ) -> float:
+        """Synchronous variant of `acquire` for thread-based callers such as myUtils.postVideo."""
+        waited = 0.0
+        for wait_seconds in self._waits(platform, account, timeout, spend):
+            time.sleep(wait_seconds)
+            waited += wait_seconds
+        return waited
+
+    def status(self) -> list[dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT bucket_key, tokens, updated_at FROM rate_limit_buckets ORDER BY bucket_key").fetchall()
+        finally:
+            conn.close()
+        return [{"bucket": row[0], "tokens": round(row[1], 3), "updated_at": row[2]} for row in rows]
+
+
+publish_rate_limiter = TokenBucketRateLimiter()
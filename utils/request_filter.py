@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field, replace
+
+from loguru import logger
+
+from utils import metrics
+
+try:
+    # 在 conf.py 里用 REQUEST_FILTER 按平台开启请求过滤，见 conf.example.py
+    from conf import REQUEST_FILTER
+except ImportError:
+    REQUEST_FILTER = {}
+
+# 上传、签名、发布、登录校验相关的请求无论怎么配置都不拦
+PROTECTED_URL_PATTERNS = (
+    r"upload",
+    r"sign",
+    r"publish",
+    r"/create",
+    r"/post/",
+    r"passport|login|auth|captcha|verify",
+    r"/vod/|tos-|\.myqcloud\.com|/cos/",
+)
+# 被拦请求没有响应，字节数按资源类型估算，指标名里带 estimated，不要当成实测流量
+ESTIMATED_BYTES = {"image": 40_000, "media": 1_500_000, "font": 60_000}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+COMMON_BEACON_PATTERNS = (
+    r"google-analytics\.com|googletagmanager\.com|hm\.baidu\.com",
+    r"sentry|/beacon|/collect\b|/track\b|/report\b",
+)
+PLATFORM_BEACON_PATTERNS = {
+    "douyin": (r"mcs\.zijieapi\.com", r"mon\.zijieapi\.com|mon\.snssdk\.com", r"/monitor_browser/", r"slardar"),
+    "tencent": (r"aegis\.qq\.com|h\.trace\.qq\.com|report\.qq\.com", r"/mmdata/"),
+    "kuaishou": (r"log-sdk\.ksapisrv\.com|/rest/wd/common/log", r"/radar/|/collect/"),
+    "xiaohongshu": (r"t2\.xiaohongshu\.com|apm-fe\.xiaohongshu\.com", r"/api/v2/collect"),
+}
+
+
+def _compile(patterns) -> re.Pattern | None:
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.I) if patterns else None
+
+
+_PROTECTED = _compile(PROTECTED_URL_PATTERNS)
+
+
+@dataclass(frozen=True, slots=True)
+class RequestFilterRule:
+    """
+    What to drop on one platform's creator pages. A request is blocked when its
+    resource type or URL is denied and its URL matches neither `allow_url_patterns`
+    nor PROTECTED_URL_PATTERNS; documents are never blocked.
+    """
+
+    block_resource_types: tuple[str, ...] = ("image", "media", "font")
+    block_url_patterns: tuple[str, ...] = COMMON_BEACON_PATTERNS
+    # 封面预览和编辑器要读图片
+    allow_url_patterns: tuple[str, ...] = (r"cover|poster|thumb",)
+    _compiled: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def _matches(self, name: str, url: str) -> bool:
+        if name not in self._compiled:
+            self._compiled[name] = _compile(getattr(self, name))
+        regex = self._compiled[name]
+        return bool(regex and regex.search(url))
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type == "document" or _PROTECTED.search(url) or self._matches("allow_url_patterns", url):
+            return False
+        return resource_type in self.block_resource_types or self._matches("block_url_patterns", url)
+
+
+def rule_for(platform: str, config: dict | None = None) -> RequestFilterRule | None:
+    """
+    Build the filter for `platform` from REQUEST_FILTER, or None when it is off.
+    `True` uses the built-in rule; a dict replaces any of its fields.
+    """
+    setting = (REQUEST_FILTER if config is None else config).get(platform)
+    if not setting:
+        return None
+    rule = RequestFilterRule(
+        block_url_patterns=COMMON_BEACON_PATTERNS + PLATFORM_BEACON_PATTERNS.get(platform, ()),
+    )
+    if isinstance(setting, dict):
+        overrides = {key: tuple(value) for key, value in setting.items() if key != "enabled"}
+        if setting.get("enabled", True) is False:
+            return None
+        rule = replace(rule, _compiled={}, **overrides)
+    return rule
+
+
+class RequestFilterStats:
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.blocked_requests = 0
+        self.estimated_bytes = 0
+
+    def record(self, resource_type: str) -> None:
+        size = ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+        self.blocked_requests += 1
+        self.estimated_bytes += size
+        metrics.increment("sau_request_filter_blocked_total", platform=self.platform, resource_type=resource_type)
+        metrics.increment("sau_request_filter_estimated_bytes_saved_total", size, platform=self.platform)
+
+    def log_summary(self, *_args) -> None:
+        if self.blocked_requests:
+            logger.info(
+                f"{self.platform} request filter blocked {self.blocked_requests} requests "
+                f"(~{self.estimated_bytes / 1024 / 1024:.1f} MB)"
+            )
+
+
+async def install_request_filter(context, platform: str, rule: RequestFilterRule | None = None):
+    """
+    Drop analytics beacons, images, video previews and fonts the upload automation does
+    not need, when REQUEST_FILTER enables it for `platform`.
+    Uses route.fallback() for allowed requests so other routes on the context still apply.
+    :returns: the RequestFilterStats collecting blocked requests, or None when off
+    """
+    rule = rule or rule_for(platform)
+    if rule is None:
+        return None
+    stats = RequestFilterStats(platform)
+
+    async def handle(route):
+        request = route.request
+        if rule.should_block(request.url, request.resource_type):
+            stats.record(request.resource_type)
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    await context.route("**/*", handle)
+    context.on("close", stats.log_summary)
+    return stats
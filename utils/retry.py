@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+
+from utils import metrics
+
+try:
+    # 在 conf.py 里用 RETRY_BUDGETS 覆盖默认重试预算，见 conf.example.py
+    from conf import RETRY_BUDGETS
+except ImportError:
+    RETRY_BUDGETS = {}
+
+T = TypeVar("T")
+
+
+class TransientError(RuntimeError):
+    """Raise to mark a failure as safe to retry regardless of its wrapped cause."""
+
+
+class FatalError(RuntimeError):
+    """Raise to stop retrying immediately, e.g. invalid cookie or rejected content."""
+
+
+# 参数错误 / 文件缺失之类重试多少次都不会好，直接抛出
+FATAL_EXCEPTION_TYPES: tuple[type[BaseException], ...] = (
+    FatalError,
+    ValueError,
+    TypeError,
+    FileNotFoundError,
+    PermissionError,
+    NotImplementedError,
+)
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, TransientError):
+        return True
+    if isinstance(exc, FATAL_EXCEPTION_TYPES):
+        return False
+    return isinstance(exc, Exception)
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, capped by attempts and elapsed time.
+    `None` for max_attempts / max_elapsed means no cap on that dimension.
+    """
+
+    max_attempts: int | None = 5
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    max_elapsed: float | None = 60.0
+    classify: Callable[[BaseException], bool] = field(default=is_transient)
+
+    def backoff(self, attempt: int, rng: random.Random | None = None) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return (rng or random).uniform(0, ceiling)
+
+
+# 点击「发布」后等跳转的循环：单次尝试本身就要等几秒，退避上限给小一点
+PUBLISH_RETRY_POLICY = RetryPolicy(max_attempts=60, base_delay=0.5, max_delay=8, max_elapsed=600)
+# 上传文件后等待跳转到发布页：只按总时长封顶
+PAGE_WAIT_RETRY_POLICY = RetryPolicy(max_attempts=None, base_delay=0.5, max_delay=5, max_elapsed=300)
+# 等视频传完：大文件要传很久，总时长和看门狗 upload_file 阶段的默认上限一致
+UPLOAD_WAIT_RETRY_POLICY = RetryPolicy(max_attempts=None, base_delay=1, max_delay=5, max_elapsed=3600)
+
+
+class RetryBudget:
+    """
+    Rolling-window cap on retries for one platform, shared by every job in the process.
+    When a platform is failing across the board the budget drains and jobs fail fast
+    instead of multiplying load on a broken page.
+    """
+
+    def __init__(self, max_retries: int, window_seconds: float, clock=time.monotonic):
+        self.max_retries = max_retries
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self._spent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            while self._spent and now - self._spent[0] >= self.window_seconds:
+                self._spent.popleft()
+            if len(self._spent) >= self.max_retries:
+                return False
+            self._spent.append(now)
+            return True
+
+    def remaining(self) -> int:
+        with self._lock:
+            now = self.clock()
+            active = sum(1 for spent_at in self._spent if now - spent_at < self.window_seconds)
+            return max(0, self.max_retries - active)
+
+
+DEFAULT_RETRY_BUDGET = (300, 60)
+_budgets: dict[str, RetryBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(platform: str) -> RetryBudget | None:
+    if not platform:
+        return None
+    with _budgets_lock:
+        if platform not in _budgets:
+            config = RETRY_BUDGETS.get(platform, DEFAULT_RETRY_BUDGET)
+            if config is None:
+                return None
+            _budgets[platform] = RetryBudget(*config)
+        return _budgets[platform]
+
+
+async def retry_async(
+    operation_fn: Callable[[], Awaitable[T]],
+    policy: RetryPolicy = RetryPolicy(),
+    *,
+    platform: str = "",
+    operation: str = "",
+    on_retry: Callable[[int, BaseException, float], object] | None = None,
+    budget: RetryBudget | None = None,
+    rng: random.Random | None = None,
+) -> T:
+    """
+    Run `operation_fn` until it succeeds or the policy gives up, then re-raise the last error.
+    :param operation_fn: Zero-argument coroutine factory, called once per attempt
+    :param policy: Backoff, attempt and elapsed-time caps plus exception classification
+    :param platform: Platform name, selects the retry budget and labels metrics
+    :param operation: Short operation name for metrics and logs, e.g. publish
+    :param on_retry: Optional hook (attempt, exc, delay) run before sleeping, may be async
+    :param budget: Explicit budget, defaults to the platform budget
+    """
+    budget = budget if budget is not None else get_retry_budget(platform)
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            result = await operation_fn()
+        except Exception as exc:
+            outcome = None
+            if not policy.classify(exc):
+                outcome = "fatal"
+            elif policy.max_attempts is not None and attempt >= policy.max_attempts:
+                outcome = "attempts_exhausted"
+            delay = policy.backoff(attempt, rng)
+            if outcome is None and policy.max_elapsed is not None and time.monotonic() - started + delay > policy.max_elapsed:
+                outcome = "deadline_exhausted"
+            if outcome is None and budget is not None and not budget.try_spend():
+                outcome = "budget_exhausted"
+            if outcome is not None:
+                metrics.increment("sau_retry_total", platform=platform, operation=operation, outcome=outcome)
+                logger.warning(f"{platform or '-'}/{operation or '-'} gave up after {attempt} attempt(s) ({outcome}): {exc}")
+                raise
+
+            metrics.increment("sau_retry_total", platform=platform, operation=operation, outcome="retry")
+            metrics.increment("sau_retry_delay_seconds_total", delay, platform=platform, operation=operation)
+            logger.debug(f"{platform or '-'}/{operation or '-'} attempt {attempt} failed, retrying in {delay:.2f}s: {exc}")
+            if on_retry is not None:
+                hook_result = on_retry(attempt, exc, delay)
+                if inspect.isawaitable(hook_result):
+                    await hook_result
+            await asyncio.sleep(delay)
+            continue
+
+        if attempt > 1:
+            metrics.increment("sau_retry_total", platform=platform, operation=operation, outcome="recovered")
+        return result
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+
+from utils import metrics
+from utils.state_db import StateStore
+
+
+class SelectorRegistry(StateStore):
+    """
+    Learned order of the fallback selectors an uploader tries for one step, per platform.
+
+    Uploaders keep their variants in the order they were written; whichever variant
+    matched last time is tried first from then on, so after a page redesign only the
+    first job pays for the stale variant. The ranking (last win, number of wins) is kept
+    in the shared state database so CLI runs, batch workers and the backend learn together.
+    """
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS selector_ranks (
+            platform TEXT NOT NULL,
+            step TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            hits INTEGER NOT NULL,
+            last_hit_at REAL NOT NULL,
+            PRIMARY KEY (platform, step, variant)
+        )''',
+    )
+
+    def __init__(self, db_path: str | Path | None = None, clock=time.time):
+        self.db_path = db_path
+        self.clock = clock
+        # (platform, step) -> {variant: (last_hit_at, hits)}
+        self._ranks: dict[tuple[str, str], dict[str, tuple[float, int]]] = {}
+
+    def _load(self, platform: str, step: str) -> dict[str, tuple[float, int]]:
+        key = (platform, step)
+        if key not in self._ranks:
+            ranks: dict[str, tuple[float, int]] = {}
+            conn = self._connect(create=False)
+            if conn is not None:
+                try:
+                    for variant, hits, last_hit_at in conn.execute(
+                        "SELECT variant, hits, last_hit_at FROM selector_ranks WHERE platform = ? AND step = ?",
+                        (platform, step),
+                    ):
+                        ranks[variant] = (last_hit_at, hits)
+                finally:
+                    conn.close()
+            self._ranks[key] = ranks
+        return self._ranks[key]
+
+    def ranked(self, platform: str, step: str, variants) -> list[str]:
+        """`variants` with the most recent winner first, then by wins; never-seen ones keep their written order."""
+        ranks = self._load(platform, step)
+        return sorted(variants, key=lambda variant: (-ranks.get(variant, (0.0, 0))[0], -ranks.get(variant, (0.0, 0))[1]))
+
+    def record(self, platform: str, step: str, variant: str, tried_first: str | None = None) -> None:
+        """Remember that `variant` matched; `tried_first` is the variant that was tried before it, if any."""
+        ranks = self._load(platform, step)
+        now = self.clock()
+        hits = ranks.get(variant, (0.0, 0))[1] + 1
+        ranks[variant] = (now, hits)
+        outcome = "learned" if tried_first in (None, variant) else "fallback"
+        metrics.increment("sau_selector_lookups_total", platform=platform, step=step, outcome=outcome)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO selector_ranks (platform, step, variant, hits, last_hit_at) VALUES (?, ?, ?, ?, ?)",
+                (platform, step, variant, hits, now),
+            )
+        finally:
+            conn.close()
+
+    async def first_present(self, platform: str, step: str, candidates: dict, visible: bool = False):
+        """
+        Check `candidates` ({variant: locator}) once each in learned order, without waiting.
+        :returns: (variant, locator) of the first one on the page (and visible, with `visible`), or None
+        """
+        order = self.ranked(platform, step, candidates)
+        for variant in order:
+            locator = candidates[variant]
+            try:
+                if await locator.count() and (not visible or await locator.is_visible()):
+                    self.record(platform, step, variant, order[0])
+                    return variant, locator
+            except Exception:
+                continue
+        return None
+
+    async def race(self, platform: str, step: str, candidates: dict, timeout: float, state: str = "attached"):
+        """
+        Like first_present(), but when nothing matches yet wait for all variants at once
+        instead of giving each its own timeout; the first one to reach `state` wins.
+        :param timeout: milliseconds, as in Playwright
+        :returns: (variant, locator)
+        :raises TimeoutError: when no variant reached `state` within `timeout`
+        """
+        found = await self.first_present(platform, step, candidates, visible=state == "visible")
+        if found is not None:
+            return found
+        order = self.ranked(platform, step, candidates)
+        waits = {
+            asyncio.ensure_future(candidates[variant].wait_for(state=state, timeout=timeout)): variant
+            for variant in order
+        }
+        pending = set(waits)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [waits[task] for task in done if not task.cancelled() and task.exception() is None]
+                if winners:
+                    variant = min(winners, key=order.index)
+                    # 同一次渲染里排在前面的写法往往也已经出现，只是晚一步返回
+                    for earlier in order[:order.index(variant)]:
+                        try:
+                            if await candidates[earlier].count():
+                                variant = earlier
+                                break
+                        except Exception:
+                            continue
+                    self.record(platform, step, variant, order[0])
+                    return variant, candidates[variant]
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        metrics.increment("sau_selector_lookups_total", platform=platform, step=step, outcome="miss")
+        raise TimeoutError(f"none of the {step} selectors for {platform} appeared within {timeout / 1000:.0f}s")
+
+
+selector_registry = SelectorRegistry()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+from conf import BASE_DIR
+
+STATE_DB_PATH = Path(BASE_DIR / "db" / "database.db")
+
+
+def connect_state_db(db_path: str | Path | None = None) -> sqlite3.Connection:
+    """
+    Open the shared SQLite database used for cross-process runtime state.
+    WAL mode lets the backend, CLI runs and workers read while one of them writes.
+    :param db_path: Optional override, defaults to db/database.db
+    :returns: sqlite3.Connection
+    """
+    path = Path(db_path or STATE_DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class StateStore:
+    """
+    Base for the classes that keep their runtime state in the shared database.
+    Subclasses list their CREATE statements in SCHEMA_STATEMENTS; they run once per
+    instance, on the first connection that is allowed to create the database.
+    """
+
+    SCHEMA_STATEMENTS: tuple[str, ...] = ()
+
+    db_path: str | Path | None = None
+    _schema_ready = False
+
+    def _connect(self, create: bool = True) -> sqlite3.Connection | None:
+        """
+        :param create: When False and the database file does not exist yet, return None
+            instead of creating it, so read-only lookups leave no empty database behind
+        """
+        if not create and not Path(self.db_path or STATE_DB_PATH).exists():
+            return None
+        conn = connect_state_db(self.db_path)
+        if not self._schema_ready:
+            for statement in self.SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            self._schema_ready = True
+        return conn
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import shutil
+import sqlite3
+import struct
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+from conf import BASE_DIR
+from utils import metrics
+from utils.state_db import STATE_DB_PATH, StateStore
+
+VIDEO_SUFFIXES = (".mp4", ".mov", ".m4v", ".mkv", ".webm")
+INGEST_DIR = Path(BASE_DIR / "videoFile")
+DEFAULT_SETTLE_SECONDS = 15
+DEFAULT_POLL_SECONDS = 5
+# inotify 模式下也定期全量扫一遍，补上队列溢出等情况漏掉的事件
+RESCAN_SECONDS = 300
+
+# linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+# linux/fs.h，btrfs / XFS / bcachefs 上共享数据块的拷贝
+FICLONE = 0x40049409
+
+
+@dataclass(frozen=True, slots=True)
+class VideoMetadata:
+    title: str
+    tags: list[str] = field(default_factory=list)
+    desc: str = ""
+
+
+def sidecar_path(video: Path) -> Path:
+    return video.with_suffix(".txt")
+
+
+def read_sidecar(video: Path) -> VideoMetadata:
+    """
+    Metadata of a dropped video from <name>.txt next to it, in the format
+    utils.files_times.get_title_and_hashtags reads: title on the first line, hashtags
+    ("#a #b") on the second; any further lines become the description.
+    Without a sidecar the file name is the title.
+    """
+    try:
+        lines = sidecar_path(video).read_text(encoding="utf-8-sig").strip().splitlines()
+    except FileNotFoundError:
+        return VideoMetadata(title=video.stem)
+    title = lines[0].strip() if lines and lines[0].strip() else video.stem
+    tags = [tag for tag in (lines[1].replace("#", " ").split() if len(lines) > 1 else []) if tag]
+    desc = "\n".join(lines[2:]).strip()
+    return VideoMetadata(title=title, tags=tags, desc=desc)
+
+
+def _reflink(source: Path, target: Path) -> None:
+    import fcntl
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink(missing_ok=True)
+            raise
+
+
+def ingest_file(source: Path, directory: Path = INGEST_DIR) -> tuple[Path, str]:
+    """
+    Put `source` into `directory` under a unique name without copying its data: a hard
+    link when both are on the same file system, otherwise a reflink where the file
+    system supports it. Only when neither works is the file copied.
+    :returns: (ingested path, "hardlink" | "reflink" | "copy")
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{uuid.uuid1()}_{source.name}"
+    try:
+        os.link(source, target)
+        method = "hardlink"
+    except OSError as exc:
+        if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+            raise
+        try:
+            _reflink(source, target)
+            method = "reflink"
+        except (OSError, ImportError):
+            shutil.copy2(source, target)
+            method = "copy"
+            logger.warning(f"{source} could not be linked into {directory} (different file system), copied instead")
+    metrics.increment("sau_watch_ingested_total", method=method)
+    return target, method
+
+
+def record_material(path: Path, db_path: str | Path | None = None) -> None:
+    """List an ingested video in the web UI's materials when its database exists."""
+    db_path = Path(db_path or STATE_DB_PATH)
+    if not db_path.exists():
+        return
+    with sqlite3.connect(db_path) as conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_records'").fetchone() is None:
+            return
+        conn.execute(
+            "INSERT INTO file_records (filename, filesize, file_path) VALUES (?, ?, ?)",
+            (path.name.split("_", 1)[1], round(path.stat().st_size / (1024 * 1024), 2), path.name),
+        )
+
+
+class InotifyWatcher:
+    """Names of entries changed in one directory, from Linux inotify (not recursive)."""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+
+    def read(self) -> set[str] | None:
+        """:returns: changed names, or None when the kernel queue overflowed and a full rescan is needed"""
+        names: set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+                offset += length
+
+    async def wait(self, timeout: float) -> set[str] | None:
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(self.fd, readable.set)
+        try:
+            await asyncio.wait_for(readable.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(self.fd)
+        return self.read()
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class IngestLedger(StateStore):
+    """Source files already ingested, by (path, size, mtime), so a restart does not ingest them again."""
+
+    SCHEMA_STATEMENTS = (
+        '''
+        CREATE TABLE IF NOT EXISTS watch_ingested (
+            source TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            ingested_path TEXT NOT NULL,
+            ingested_at REAL NOT NULL,
+            PRIMARY KEY (source, size, mtime_ns)
+        )''',
+    )
+
+    def __init__(self, db_path: str | Path | None = None):
+        self.db_path = db_path
+
+    def contains(self, source: Path, stat: os.stat_result) -> bool:
+        conn = self._connect(create=False)
+        if conn is None:
+            return False
+        try:
+            return conn.execute(
+                "SELECT 1 FROM watch_ingested WHERE source = ? AND size = ? AND mtime_ns = ?",
+                (str(source), stat.st_size, stat.st_mtime_ns),
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    def add(self, source: Path, stat: os.stat_result, ingested: Path) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO watch_ingested VALUES (?, ?, ?, ?, ?)",
+                (str(source), stat.st_size, stat.st_mtime_ns, str(ingested), time.time()),
+            )
+        finally:
+            conn.close()
+
+
+class FolderWatcher:
+    """
+    Watches a drop folder and hands over each video once it and its .txt sidecar have
+    stopped changing for `settle_seconds`, so files still being written or copied over
+    the network are never picked up half-way. Uses inotify on Linux and falls back to
+    polling (`poll=True`, non-Linux systems, or when inotify is unavailable); network
+    mounts (NFS / SMB) need polling, as the kernel does not see remote writes.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        poll: bool = False,
+        require_sidecar: bool = False,
+        ledger: IngestLedger | None = None,
+        clock=time.monotonic,
+    ):
+        self.directory = directory
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.require_sidecar = require_sidecar
+        self.ledger = ledger or IngestLedger()
+        self.clock = clock
+        # 视频路径 -> (视频和 sidecar 的大小 / 修改时间, 从什么时候起没再变)
+        self.pending: dict[Path, tuple[tuple, float]] = {}
+        # 已经处理过（交出去或跳过）的视频和当时的签名，文件再变才重新考虑
+        self.handled: dict[Path, tuple] = {}
+        self.inotify: InotifyWatcher | None = None
+        if not poll:
+            try:
+                self.inotify = InotifyWatcher(directory)
+            except (OSError, AttributeError) as exc:
+                logger.info(f"inotify is not available ({exc}), polling {directory} every {poll_seconds}s")
+
+    @staticmethod
+    def is_video(path: Path) -> bool:
+        # 隐藏文件多半是 rsync / 下载工具的临时文件
+        return path.suffix.lower() in VIDEO_SUFFIXES and not path.name.startswith(".")
+
+    def _signature(self, video: Path) -> tuple | None:
+        try:
+            stat = video.stat()
+        except FileNotFoundError:
+            return None
+        try:
+            sidecar = sidecar_path(video).stat()
+            sidecar_signature = (sidecar.st_size, sidecar.st_mtime_ns)
+        except FileNotFoundError:
+            sidecar_signature = None
+        return stat.st_size, stat.st_mtime_ns, sidecar_signature
+
+    def touch(self, video: Path) -> None:
+        """(Re)consider one video after a change to it or its sidecar."""
+        signature = self._signature(video)
+        if signature is None:
+            self.pending.pop(video, None)
+            self.handled.pop(video, None)
+            return
+        if self.handled.get(video) == signature:
+            return
+        previous = self.pending.get(video)
+        if previous is None or previous[0] != signature:
+            self.pending[video] = (signature, self.clock())
+
+    def scan(self) -> None:
+        for path in self.directory.iterdir():
+            if self.is_video(path) and path.is_file():
+                self.touch(path)
+        for videos in (self.pending, self.handled):
+            for video in [video for video in videos if not video.exists()]:
+                del videos[video]
+
+    def take_ready(self) -> list[Path]:
+        """Videos whose content and sidecar have been unchanged for settle_seconds, skipping ones already ingested."""
+        now = self.clock()
+        ready = []
+        for video, (signature, since) in list(self.pending.items()):
+            # 上次检查之后又被写过，重新计时
+            if self._signature(video) != signature or now - since < self.settle_seconds:
+                self.touch(video)
+                continue
+            del self.pending[video]
+            self.handled[video] = signature
+            if signature[0] == 0 or (self.require_sidecar and signature[2] is None):
+                continue
+            if not self.ledger.contains(video, video.stat()):
+                ready.append(video)
+        return sorted(ready)
+
+    def _touch_names(self, names: set[str]) -> None:
+        for name in names:
+            path = self.directory / name
+            if path.suffix.lower() == ".txt":
+                path = next((path.with_suffix(suffix) for suffix in VIDEO_SUFFIXES
+                             if path.with_suffix(suffix).exists()), None)
+                if path is None:
+                    continue
+            if self.is_video(path):
+                self.touch(path)
+
+    async def run(self, on_ready, once: bool = False) -> None:
+        """
+        Call `await on_ready(video)` for every settled video, forever or, with `once`,
+        until the videos in the folder right now are all handled.
+        """
+        self.scan()
+        last_scan = self.clock()
+        try:
+            while True:
+                for video in self.take_ready():
+                    await on_ready(video)
+                if once and not self.pending:
+                    return
+                # 还有没稳定下来的文件时每秒检查一次
+                timeout = 1.0 if self.pending else self.poll_seconds
+                if self.inotify is None:
+                    await asyncio.sleep(min(timeout, self.poll_seconds))
+                    self.scan()
+                    continue
+                names = await self.inotify.wait(timeout if self.pending else RESCAN_SECONDS)
+                if names is None or self.clock() - last_scan >= RESCAN_SECONDS:
+                    self.scan()
+                    last_scan = self.clock()
+                else:
+                    self._touch_names(names)
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+
+from utils import metrics
+from utils.browser_processes import kill_process_trees
+from utils.browser_supervisor import browser_supervisor
+from utils.job_phase import current_tracker, track_job
+from utils.retry import FatalError
+
+try:
+    # 在 conf.py 里用 PHASE_DEADLINES 调整每个阶段的最长耗时（秒），见 conf.example.py
+    from conf import PHASE_DEADLINES
+except ImportError:
+    PHASE_DEADLINES = {}
+
+T = TypeVar("T")
+
+# 阶段名见各 uploader 里的 set_phase()；None 表示不限时
+DEFAULT_PHASE_DEADLINES = {
+    # 第一个阶段之前（校验参数、启动浏览器）；不上报阶段的 uploader 整个任务都算在这里
+    "start": 3600,
+    # 等发布限流放行，限流器自己有上限
+    "rate_limit": None,
+    # 包含登录页跳转和短信验证码
+    "open_page": 600,
+    # 包含等待视频传完
+    "upload_file": 3600,
+    "fill_meta": 600,
+    "set_cover": 600,
+    "publish": 900,
+    "default": 900,
+}
+POLL_INTERVAL_SECONDS = 1.0
+# 取消任务后留给 uploader 自己的 finally 关浏览器的时间
+CANCEL_GRACE_SECONDS = 10
+CLOSE_TIMEOUT_SECONDS = 10
+
+_current_watch: ContextVar[JobWatch | None] = ContextVar("sau_job_watch", default=None)
+
+
+class JobTimeoutError(FatalError):
+    """A job overran its phase deadline and was torn down by the watchdog."""
+
+    def __init__(self, platform: str, phase: str, elapsed: float, budget: float):
+        super().__init__(f"{platform} job stuck in phase {phase} for {elapsed:.0f}s (budget {budget:.0f}s)")
+        self.platform = platform
+        self.phase = phase
+        self.elapsed = elapsed
+
+
+@dataclass(slots=True)
+class JobWatch:
+    """Browsers, contexts and Chromium processes one watched job has opened."""
+
+    platform: str
+    closables: list = field(default_factory=list)
+    pids: set[int] = field(default_factory=set)
+
+    async def teardown(self) -> list[int]:
+        closables, self.closables = self.closables, []
+        for closable in reversed(closables):
+            try:
+                await asyncio.wait_for(closable.close(), timeout=CLOSE_TIMEOUT_SECONDS)
+            except BaseException as exc:
+                if isinstance(exc, (KeyboardInterrupt, SystemExit)):
+                    raise
+                logger.debug(f"Watchdog could not close {type(closable).__name__}: {exc}")
+        pids, self.pids = self.pids, set()
+        # close() 卡住或 driver 已经断开时，直接杀掉这个任务启动的浏览器进程
+        return await asyncio.to_thread(kill_process_trees, pids) if pids else []
+
+
+def watch_closable(closable):
+    """Let the watchdog close `closable` (a browser or context) if the job hangs; no-op when unwatched."""
+    watch = _current_watch.get()
+    if watch is not None:
+        watch.closables.append(closable)
+    return closable
+
+
+async def watched_launch(launch: Callable[[], Awaitable[T]]) -> T:
+    """
+    Launch a local browser through the browser supervisor and attribute the browser
+    processes it started to the watched job, so a hung job can be killed even when
+    close() no longer answers.
+    """
+    tracker = current_tracker()
+    browser, pids = await browser_supervisor.launch(launch, tracker.platform if tracker else None)
+    watch = _current_watch.get()
+    if watch is not None:
+        watch.pids |= pids
+    return watch_closable(browser)
+
+
+async def run_with_watchdog(
+    job: Callable[[], Awaitable[T]],
+    *,
+    platform: str,
+    deadlines: dict | None = None,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    clock=time.monotonic,
+) -> T:
+    """
+    Run one upload job, cancelling it when it stays in one phase (see set_phase) longer
+    than that phase's deadline. On overrun the browsers and contexts it opened are
+    force-closed, leftover browser processes are killed and JobTimeoutError is raised.
+    Every job is counted and timed per outcome (success, error, timeout, cancelled).
+    :param job: Coroutine function running the upload
+    :param platform: Platform name for logs and metrics
+    :param deadlines: Per-phase seconds, on top of PHASE_DEADLINES
+    :raises JobTimeoutError: when a phase overran
+    """
+    budgets = {**DEFAULT_PHASE_DEADLINES, **PHASE_DEADLINES, **(deadlines or {})}
+    tracker = current_tracker()
+    if tracker is None:
+        with track_job(platform):
+            return await run_with_watchdog(
+                job, platform=platform, deadlines=deadlines, poll_interval=poll_interval, clock=clock
+            )
+
+    watch = JobWatch(platform)
+    token = _current_watch.set(watch)
+    try:
+        task = asyncio.ensure_future(job())
+    finally:
+        _current_watch.reset(token)
+    phase, phase_started = tracker.phase, clock()
+    started, outcome = phase_started, "error"
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                result = task.result()
+                outcome = "success"
+                return result
+            now = clock()
+            if tracker.phase != phase:
+                phase, phase_started = tracker.phase, now
+            name = phase or "start"
+            budget = budgets.get(name, budgets["default"])
+            elapsed = now - phase_started
+            if budget is None or elapsed <= budget:
+                continue
+            logger.error(f"{platform} job stuck in phase {name} for {elapsed:.0f}s, tearing it down")
+            task.cancel()
+            await asyncio.wait({task}, timeout=CANCEL_GRACE_SECONDS)
+            killed = await watch.teardown()
+            if killed:
+                logger.warning(f"Killed {len(killed)} leftover browser processes of the {platform} job")
+            metrics.increment("sau_job_timeout_total", platform=platform, phase=name)
+            outcome = "timeout"
+            raise JobTimeoutError(platform, name, elapsed, budget)
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        if not task.done():
+            task.cancel()
+        metrics.increment("sau_publish_jobs_total", platform=platform, outcome=outcome)
+        metrics.observe("sau_publish_job_duration_seconds", clock() - started, platform=platform, outcome=outcome)